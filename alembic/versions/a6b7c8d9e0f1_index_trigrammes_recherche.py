@@ -0,0 +1,50 @@
+"""Ajouter les index trigrammes (pg_trgm) de la recherche textuelle sur produit, tiers et station
+
+Revision ID: a6b7c8d9e0f1
+Revises: f5a6b7c8d9e0
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6b7c8d9e0f1'
+down_revision: Union[str, Sequence[str], None] = 'f5a6b7c8d9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Champs déclarés dans __champs_recherche__ des modèles : la recherche ILIKE '%q%' et le classement
+# par similarity() sont servis par un index GIN gin_trgm_ops par colonne (combinés en BitmapOr)
+INDEX_RECHERCHE = [
+    ('produit', 'nom'),
+    ('produit', 'code'),
+    ('produit', 'code_barre'),
+    ('tiers', 'nom'),
+    ('tiers', 'email'),
+    ('tiers', 'telephone'),
+    ('station', 'nom'),
+    ('station', 'code'),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Création concurrente pour ne pas bloquer les écritures sur les gros catalogues
+    with op.get_context().autocommit_block():
+        for table, colonne in INDEX_RECHERCHE:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{colonne}_trgm "
+                f"ON {table} USING gin ({colonne} gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, colonne in INDEX_RECHERCHE:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{colonne}_trgm")
+    # L'extension pg_trgm est conservée : d'autres objets peuvent en dépendre
@@ -0,0 +1,39 @@
+"""Ajouter l'état du calcul incrémental du coût moyen pondéré à stock_produit
+
+Revision ID: b1c2d3e4f5a6
+Revises: 202601071200
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1c2d3e4f5a6'
+down_revision: Union[str, Sequence[str], None] = '202601071200'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # L'état reste vide (date_dernier_mouvement_cmp NULL) : il est reconstruit
+    # à partir de l'historique au premier mouvement de chaque produit/station
+    op.add_column('stock_produit', sa.Column('quantite_cmp', sa.Numeric(15, 3), server_default='0', nullable=True))
+    op.add_column('stock_produit', sa.Column('valeur_stock_cmp', sa.Numeric(18, 4), server_default='0', nullable=True))
+    op.add_column('stock_produit', sa.Column('date_dernier_mouvement_cmp', sa.DateTime(), nullable=True))
+
+    # Index utilisé par le rejeu chronologique de l'historique
+    op.create_index(
+        'idx_mouvements_stock_produit_station_date',
+        'mouvements_stock',
+        ['produit_id', 'station_id', 'date_mouvement']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_mouvements_stock_produit_station_date', table_name='mouvements_stock')
+    op.drop_column('stock_produit', 'date_dernier_mouvement_cmp')
+    op.drop_column('stock_produit', 'valeur_stock_cmp')
+    op.drop_column('stock_produit', 'quantite_cmp')
@@ -0,0 +1,32 @@
+"""Ajouter l'index (cuve_id, date_vente) de vente_carburant pour le débit récent des cuves
+
+Revision ID: b7c8d9e0f1a2
+Revises: a6b7c8d9e0f1
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c8d9e0f1a2'
+down_revision: Union[str, Sequence[str], None] = 'a6b7c8d9e0f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Le calcul d'autonomie des cuves somme les ventes récentes de chaque cuve : un parcours de plage
+    # sur (cuve_id, date_vente) au lieu de toutes les ventes de la cuve
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_vente_carburant_cuve_date "
+            "ON vente_carburant (cuve_id, date_vente) INCLUDE (quantite_vendue)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_vente_carburant_cuve_date")
@@ -0,0 +1,251 @@
+"""Ajouter la table solde_tresorerie maintenue par triggers
+
+Revision ID: c2d3e4f5a6b7
+Revises: b1c2d3e4f5a6
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d3e4f5a6b7'
+down_revision: Union[str, Sequence[str], None] = 'b1c2d3e4f5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'solde_tresorerie',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('type_tresorerie', sa.String(), nullable=False),
+        sa.Column('reference_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('solde_initial', sa.Numeric(15, 2), server_default='0', nullable=False),
+        sa.Column('total_mouvements', sa.Numeric(18, 2), server_default='0', nullable=False),
+        sa.Column('solde', sa.Numeric(18, 2), server_default='0', nullable=False),
+        sa.Column('date_dernier_mouvement', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('est_actif', sa.Boolean(), server_default=sa.text('true'), nullable=False),
+        sa.UniqueConstraint('type_tresorerie', 'reference_id', name='uq_solde_tresorerie_reference'),
+    )
+
+    # Ajoute un delta au solde d'une trésorerie (UPSERT : la ligne est verrouillée le temps de la mise à jour)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION appliquer_delta_solde_tresorerie(
+            p_type_tresorerie VARCHAR, p_reference_id UUID, p_delta NUMERIC, p_date_mouvement TIMESTAMPTZ
+        ) RETURNS VOID AS $$
+        BEGIN
+            INSERT INTO solde_tresorerie (
+                id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde,
+                date_dernier_mouvement, created_at, updated_at, est_actif
+            ) VALUES (
+                md5(p_type_tresorerie || ':' || p_reference_id::text)::uuid, p_type_tresorerie, p_reference_id,
+                0, p_delta, p_delta, p_date_mouvement, now(), now(), true
+            )
+            ON CONFLICT (type_tresorerie, reference_id) DO UPDATE SET
+                total_mouvements = solde_tresorerie.total_mouvements + p_delta,
+                solde = solde_tresorerie.solde + p_delta,
+                date_dernier_mouvement = GREATEST(solde_tresorerie.date_dernier_mouvement, p_date_mouvement),
+                updated_at = now();
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Remplace le solde initial d'une trésorerie en conservant le cumul des mouvements
+    op.execute("""
+        CREATE OR REPLACE FUNCTION definir_solde_initial_tresorerie(
+            p_type_tresorerie VARCHAR, p_reference_id UUID, p_solde_initial NUMERIC
+        ) RETURNS VOID AS $$
+        BEGIN
+            INSERT INTO solde_tresorerie (
+                id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde,
+                created_at, updated_at, est_actif
+            ) VALUES (
+                md5(p_type_tresorerie || ':' || p_reference_id::text)::uuid, p_type_tresorerie, p_reference_id,
+                p_solde_initial, 0, p_solde_initial, now(), now(), true
+            )
+            ON CONFLICT (type_tresorerie, reference_id) DO UPDATE SET
+                solde_initial = p_solde_initial,
+                solde = p_solde_initial + solde_tresorerie.total_mouvements,
+                updated_at = now();
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Seuls les mouvements validés comptent ; une annulation (statut 'annulé') retire le mouvement du solde
+    op.execute("""
+        CREATE OR REPLACE FUNCTION appliquer_mouvement_solde_tresorerie(
+            p_tresorerie_station_id UUID, p_tresorerie_globale_id UUID, p_station_id UUID,
+            p_type_mouvement VARCHAR, p_montant NUMERIC, p_date_mouvement TIMESTAMPTZ
+        ) RETURNS VOID AS $$
+        DECLARE
+            v_delta NUMERIC := CASE p_type_mouvement
+                WHEN 'entrée' THEN p_montant
+                WHEN 'sortie' THEN -p_montant
+                ELSE 0
+            END;
+        BEGIN
+            IF p_tresorerie_station_id IS NOT NULL THEN
+                PERFORM appliquer_delta_solde_tresorerie('tresorerie_station', p_tresorerie_station_id, v_delta, p_date_mouvement);
+            ELSIF p_tresorerie_globale_id IS NOT NULL THEN
+                PERFORM appliquer_delta_solde_tresorerie('tresorerie_globale', p_tresorerie_globale_id, v_delta, p_date_mouvement);
+            ELSIF p_station_id IS NOT NULL THEN
+                PERFORM appliquer_delta_solde_tresorerie('station', p_station_id, v_delta, p_date_mouvement);
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maj_solde_tresorerie_mouvement() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.statut = 'validé' THEN
+                PERFORM appliquer_mouvement_solde_tresorerie(
+                    OLD.tresorerie_station_id, OLD.tresorerie_globale_id, OLD.station_id,
+                    OLD.type_mouvement, -OLD.montant, NULL
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.statut = 'validé' THEN
+                PERFORM appliquer_mouvement_solde_tresorerie(
+                    NEW.tresorerie_station_id, NEW.tresorerie_globale_id, NEW.station_id,
+                    NEW.type_mouvement, NEW.montant, NEW.date_mouvement
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_solde_tresorerie_mouvement
+        AFTER INSERT OR DELETE OR UPDATE OF statut, montant, type_mouvement, tresorerie_station_id, tresorerie_globale_id, station_id
+        ON mouvement_tresorerie
+        FOR EACH ROW EXECUTE FUNCTION maj_solde_tresorerie_mouvement();
+    """)
+
+    # Le solde initial d'une trésorerie station est l'état initial le plus récent
+    op.execute("""
+        CREATE OR REPLACE FUNCTION recalculer_etat_initial_solde_tresorerie(p_tresorerie_station_id UUID) RETURNS VOID AS $$
+        DECLARE
+            v_montant NUMERIC;
+        BEGIN
+            SELECT montant INTO v_montant
+            FROM etat_initial_tresorerie
+            WHERE tresorerie_station_id = p_tresorerie_station_id
+            ORDER BY date_enregistrement DESC
+            LIMIT 1;
+
+            PERFORM definir_solde_initial_tresorerie('tresorerie_station', p_tresorerie_station_id, COALESCE(v_montant, 0));
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maj_solde_tresorerie_etat_initial() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM recalculer_etat_initial_solde_tresorerie(OLD.tresorerie_station_id);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM recalculer_etat_initial_solde_tresorerie(NEW.tresorerie_station_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_solde_tresorerie_etat_initial
+        AFTER INSERT OR DELETE OR UPDATE OF montant, date_enregistrement, tresorerie_station_id
+        ON etat_initial_tresorerie
+        FOR EACH ROW EXECUTE FUNCTION maj_solde_tresorerie_etat_initial();
+    """)
+
+    # Le solde initial d'une trésorerie globale est porté par la trésorerie elle-même
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maj_solde_tresorerie_globale() RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM definir_solde_initial_tresorerie('tresorerie_globale', NEW.id, COALESCE(NEW.solde_initial, 0));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_solde_tresorerie_globale
+        AFTER INSERT OR UPDATE OF solde_initial
+        ON tresorerie
+        FOR EACH ROW EXECUTE FUNCTION maj_solde_tresorerie_globale();
+    """)
+
+    # Initialisation à partir de l'existant : un agrégat groupé par type de trésorerie
+    op.execute("""
+        INSERT INTO solde_tresorerie (
+            id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde, date_dernier_mouvement
+        )
+        SELECT
+            md5('tresorerie_station:' || ts.id::text)::uuid, 'tresorerie_station', ts.id,
+            COALESCE(ei.montant, 0), COALESCE(m.total, 0), COALESCE(ei.montant, 0) + COALESCE(m.total, 0),
+            m.dernier_mouvement
+        FROM tresorerie_station ts
+        LEFT JOIN LATERAL (
+            SELECT e.montant FROM etat_initial_tresorerie e
+            WHERE e.tresorerie_station_id = ts.id
+            ORDER BY e.date_enregistrement DESC
+            LIMIT 1
+        ) ei ON TRUE
+        LEFT JOIN (
+            SELECT tresorerie_station_id AS reference_id,
+                   SUM(CASE type_mouvement WHEN 'entrée' THEN montant WHEN 'sortie' THEN -montant ELSE 0 END) AS total,
+                   MAX(date_mouvement) AS dernier_mouvement
+            FROM mouvement_tresorerie
+            WHERE statut = 'validé' AND tresorerie_station_id IS NOT NULL
+            GROUP BY tresorerie_station_id
+        ) m ON m.reference_id = ts.id
+    """)
+    op.execute("""
+        INSERT INTO solde_tresorerie (
+            id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde, date_dernier_mouvement
+        )
+        SELECT
+            md5('tresorerie_globale:' || t.id::text)::uuid, 'tresorerie_globale', t.id,
+            COALESCE(t.solde_initial, 0), COALESCE(m.total, 0), COALESCE(t.solde_initial, 0) + COALESCE(m.total, 0),
+            m.dernier_mouvement
+        FROM tresorerie t
+        LEFT JOIN (
+            SELECT tresorerie_globale_id AS reference_id,
+                   SUM(CASE type_mouvement WHEN 'entrée' THEN montant WHEN 'sortie' THEN -montant ELSE 0 END) AS total,
+                   MAX(date_mouvement) AS dernier_mouvement
+            FROM mouvement_tresorerie
+            WHERE statut = 'validé' AND tresorerie_globale_id IS NOT NULL
+            GROUP BY tresorerie_globale_id
+        ) m ON m.reference_id = t.id
+    """)
+    op.execute("""
+        INSERT INTO solde_tresorerie (
+            id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde, date_dernier_mouvement
+        )
+        SELECT
+            md5('station:' || station_id::text)::uuid, 'station', station_id, 0,
+            SUM(CASE type_mouvement WHEN 'entrée' THEN montant WHEN 'sortie' THEN -montant ELSE 0 END),
+            SUM(CASE type_mouvement WHEN 'entrée' THEN montant WHEN 'sortie' THEN -montant ELSE 0 END),
+            MAX(date_mouvement)
+        FROM mouvement_tresorerie
+        WHERE statut = 'validé' AND station_id IS NOT NULL
+        GROUP BY station_id
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_solde_tresorerie_globale ON tresorerie")
+    op.execute("DROP TRIGGER IF EXISTS trg_solde_tresorerie_etat_initial ON etat_initial_tresorerie")
+    op.execute("DROP TRIGGER IF EXISTS trg_solde_tresorerie_mouvement ON mouvement_tresorerie")
+    op.execute("DROP FUNCTION IF EXISTS maj_solde_tresorerie_globale()")
+    op.execute("DROP FUNCTION IF EXISTS maj_solde_tresorerie_etat_initial()")
+    op.execute("DROP FUNCTION IF EXISTS recalculer_etat_initial_solde_tresorerie(UUID)")
+    op.execute("DROP FUNCTION IF EXISTS maj_solde_tresorerie_mouvement()")
+    op.execute("DROP FUNCTION IF EXISTS appliquer_mouvement_solde_tresorerie(UUID, UUID, UUID, VARCHAR, NUMERIC, TIMESTAMPTZ)")
+    op.execute("DROP FUNCTION IF EXISTS definir_solde_initial_tresorerie(VARCHAR, UUID, NUMERIC)")
+    op.execute("DROP FUNCTION IF EXISTS appliquer_delta_solde_tresorerie(VARCHAR, UUID, NUMERIC, TIMESTAMPTZ)")
+    op.drop_table('solde_tresorerie')
@@ -0,0 +1,376 @@
+"""Ajouter les cumuls journaliers des ventes (carburant et boutique) maintenus par triggers
+
+Revision ID: c8d9e0f1a2b3
+Revises: b7c8d9e0f1a2
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d9e0f1a2b3'
+down_revision: Union[str, Sequence[str], None] = 'b7c8d9e0f1a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _colonnes_communes():
+    return [
+        sa.Column('jour', sa.Date(), nullable=False),
+        sa.Column('chiffre_affaires', sa.Numeric(18, 2), server_default='0', nullable=False),
+        sa.Column('cout_cmp', sa.Numeric(18, 4), server_default='0', nullable=False),
+        sa.Column('nombre_transactions', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('est_actif', sa.Boolean(), server_default=sa.text('true'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    # Coût unitaire au CMP figé à l'enregistrement de la vente : la marge d'une vente annulée
+    # est retirée des cumuls avec le coût qui y avait été ajouté
+    op.add_column('vente_carburant', sa.Column('cout_unitaire_cmp', sa.Numeric(15, 4), nullable=True))
+    op.add_column('ventes_details', sa.Column('cout_unitaire_cmp', sa.Numeric(15, 4), nullable=True))
+
+    op.create_table(
+        'cumul_vente_carburant_jour',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('station_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('station.id'), nullable=False),
+        sa.Column('carburant_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('carburant.id'), nullable=False),
+        sa.Column('volume', sa.Numeric(16, 2), server_default='0', nullable=False),
+        *_colonnes_communes(),
+        sa.UniqueConstraint('station_id', 'carburant_id', 'jour', name='uq_cumul_vente_carburant_jour'),
+    )
+    op.create_index('idx_cumul_vente_carburant_jour_station_jour', 'cumul_vente_carburant_jour', ['station_id', 'jour'])
+
+    op.create_table(
+        'cumul_vente_boutique_jour',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('station_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('station.id'), nullable=False),
+        sa.Column('produit_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('produit.id'), nullable=False),
+        sa.Column('quantite', sa.Numeric(16, 2), server_default='0', nullable=False),
+        *_colonnes_communes(),
+        sa.UniqueConstraint('station_id', 'produit_id', 'jour', name='uq_cumul_vente_boutique_jour'),
+    )
+    op.create_index('idx_cumul_vente_boutique_jour_station_jour', 'cumul_vente_boutique_jour', ['station_id', 'jour'])
+
+    # Ajoute (p_signe = 1) ou retire (p_signe = -1) une vente du cumul de sa journée
+    op.execute("""
+        CREATE OR REPLACE FUNCTION appliquer_cumul_vente_carburant(
+            p_station_id UUID, p_carburant_id UUID, p_jour DATE, p_volume NUMERIC,
+            p_montant NUMERIC, p_cout NUMERIC, p_signe INTEGER
+        ) RETURNS VOID AS $$
+        BEGIN
+            IF p_carburant_id IS NULL THEN
+                RETURN;
+            END IF;
+
+            INSERT INTO cumul_vente_carburant_jour (
+                id, station_id, carburant_id, jour, volume, chiffre_affaires, cout_cmp,
+                nombre_transactions, created_at, updated_at, est_actif
+            ) VALUES (
+                md5('cumul_vente_carburant:' || p_station_id::text || ':' || p_carburant_id::text || ':' || p_jour::text)::uuid,
+                p_station_id, p_carburant_id, p_jour,
+                p_signe * COALESCE(p_volume, 0), p_signe * COALESCE(p_montant, 0), p_signe * COALESCE(p_cout, 0),
+                p_signe, now(), now(), true
+            )
+            ON CONFLICT (station_id, carburant_id, jour) DO UPDATE SET
+                volume = cumul_vente_carburant_jour.volume + EXCLUDED.volume,
+                chiffre_affaires = cumul_vente_carburant_jour.chiffre_affaires + EXCLUDED.chiffre_affaires,
+                cout_cmp = cumul_vente_carburant_jour.cout_cmp + EXCLUDED.cout_cmp,
+                nombre_transactions = cumul_vente_carburant_jour.nombre_transactions + EXCLUDED.nombre_transactions,
+                updated_at = now();
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION appliquer_cumul_vente_boutique(
+            p_station_id UUID, p_produit_id UUID, p_jour DATE, p_quantite NUMERIC,
+            p_montant NUMERIC, p_cout NUMERIC, p_signe INTEGER
+        ) RETURNS VOID AS $$
+        BEGIN
+            INSERT INTO cumul_vente_boutique_jour (
+                id, station_id, produit_id, jour, quantite, chiffre_affaires, cout_cmp,
+                nombre_transactions, created_at, updated_at, est_actif
+            ) VALUES (
+                md5('cumul_vente_boutique:' || p_station_id::text || ':' || p_produit_id::text || ':' || p_jour::text)::uuid,
+                p_station_id, p_produit_id, p_jour,
+                p_signe * COALESCE(p_quantite, 0), p_signe * COALESCE(p_montant, 0), p_signe * COALESCE(p_cout, 0),
+                p_signe, now(), now(), true
+            )
+            ON CONFLICT (station_id, produit_id, jour) DO UPDATE SET
+                quantite = cumul_vente_boutique_jour.quantite + EXCLUDED.quantite,
+                chiffre_affaires = cumul_vente_boutique_jour.chiffre_affaires + EXCLUDED.chiffre_affaires,
+                cout_cmp = cumul_vente_boutique_jour.cout_cmp + EXCLUDED.cout_cmp,
+                nombre_transactions = cumul_vente_boutique_jour.nombre_transactions + EXCLUDED.nombre_transactions,
+                updated_at = now();
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Coût unitaire au CMP du moment : CMP du stock de la cuve, à défaut prix d'achat du carburant de la station
+    op.execute("""
+        CREATE OR REPLACE FUNCTION figer_cout_vente_carburant() RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.cout_unitaire_cmp IS NULL THEN
+                SELECT COALESCE(NULLIF(sc.cout_moyen_pondere, 0), pc.prix_achat)
+                INTO NEW.cout_unitaire_cmp
+                FROM cuve c
+                LEFT JOIN stock_carburant sc ON sc.cuve_id = c.id
+                LEFT JOIN prix_carburant pc ON pc.carburant_id = c.carburant_id AND pc.station_id = NEW.station_id
+                WHERE c.id = NEW.cuve_id
+                LIMIT 1;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION figer_cout_vente_detail() RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.cout_unitaire_cmp IS NULL THEN
+                SELECT sp.cout_moyen_pondere
+                INTO NEW.cout_unitaire_cmp
+                FROM ventes v
+                JOIN stock_produit sp ON sp.produit_id = NEW.produit_id AND sp.station_id = v.station_id
+                WHERE v.id = NEW.vente_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Une vente de carburant compte tant qu'elle est active et non annulée
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maj_cumul_vente_carburant() RETURNS TRIGGER AS $$
+        DECLARE
+            v_carburant_id UUID;
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.est_actif AND OLD.statut IS DISTINCT FROM 'annulée' THEN
+                SELECT carburant_id INTO v_carburant_id FROM cuve WHERE id = OLD.cuve_id;
+                PERFORM appliquer_cumul_vente_carburant(
+                    OLD.station_id, v_carburant_id, OLD.date_vente::date, OLD.quantite_vendue,
+                    OLD.montant_total, OLD.quantite_vendue * OLD.cout_unitaire_cmp, -1
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.est_actif AND NEW.statut IS DISTINCT FROM 'annulée' THEN
+                SELECT carburant_id INTO v_carburant_id FROM cuve WHERE id = NEW.cuve_id;
+                PERFORM appliquer_cumul_vente_carburant(
+                    NEW.station_id, v_carburant_id, NEW.date_vente::date, NEW.quantite_vendue,
+                    NEW.montant_total, NEW.quantite_vendue * NEW.cout_unitaire_cmp, 1
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Une ligne de vente boutique compte si elle et sa vente sont actives et la vente n'est pas annulée
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maj_cumul_vente_detail() RETURNS TRIGGER AS $$
+        DECLARE
+            v_vente RECORD;
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.est_actif THEN
+                SELECT station_id, date, statut, est_actif INTO v_vente FROM ventes WHERE id = OLD.vente_id;
+                IF FOUND AND v_vente.est_actif AND v_vente.statut IS DISTINCT FROM 'annulee' THEN
+                    PERFORM appliquer_cumul_vente_boutique(
+                        v_vente.station_id, OLD.produit_id, v_vente.date::date, OLD.quantite,
+                        OLD.montant, OLD.quantite * OLD.cout_unitaire_cmp, -1
+                    );
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.est_actif THEN
+                SELECT station_id, date, statut, est_actif INTO v_vente FROM ventes WHERE id = NEW.vente_id;
+                IF FOUND AND v_vente.est_actif AND v_vente.statut IS DISTINCT FROM 'annulee' THEN
+                    PERFORM appliquer_cumul_vente_boutique(
+                        v_vente.station_id, NEW.produit_id, v_vente.date::date, NEW.quantite,
+                        NEW.montant, NEW.quantite * NEW.cout_unitaire_cmp, 1
+                    );
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Annulation (ou changement de date / station) d'une vente boutique : ses lignes sont retirées
+    # des cumuls avec les anciens attributs puis ajoutées avec les nouveaux
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maj_cumul_vente_boutique() RETURNS TRIGGER AS $$
+        DECLARE
+            v_ligne RECORD;
+            v_comptait BOOLEAN := OLD.est_actif AND OLD.statut IS DISTINCT FROM 'annulee';
+            v_compte BOOLEAN := NEW.est_actif AND NEW.statut IS DISTINCT FROM 'annulee';
+        BEGIN
+            IF v_comptait = v_compte AND (NOT v_compte OR (
+                OLD.station_id = NEW.station_id AND OLD.date::date = NEW.date::date
+            )) THEN
+                RETURN NULL;
+            END IF;
+
+            FOR v_ligne IN
+                SELECT produit_id, quantite, montant, cout_unitaire_cmp
+                FROM ventes_details
+                WHERE vente_id = NEW.id AND est_actif
+            LOOP
+                IF v_comptait THEN
+                    PERFORM appliquer_cumul_vente_boutique(
+                        OLD.station_id, v_ligne.produit_id, OLD.date::date, v_ligne.quantite,
+                        v_ligne.montant, v_ligne.quantite * v_ligne.cout_unitaire_cmp, -1
+                    );
+                END IF;
+                IF v_compte THEN
+                    PERFORM appliquer_cumul_vente_boutique(
+                        NEW.station_id, v_ligne.produit_id, NEW.date::date, v_ligne.quantite,
+                        v_ligne.montant, v_ligne.quantite * v_ligne.cout_unitaire_cmp, 1
+                    );
+                END IF;
+            END LOOP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Reconstruit les cumuls d'une station (toutes si NULL) sur une période (tout l'historique si NULL)
+    # à partir des ventes : réparation, et initialisation de l'historique
+    op.execute("""
+        CREATE OR REPLACE FUNCTION reconstruire_cumuls_ventes(
+            p_station_id UUID, p_debut DATE, p_fin DATE
+        ) RETURNS INTEGER AS $$
+        DECLARE
+            v_carburant INTEGER;
+            v_boutique INTEGER;
+        BEGIN
+            DELETE FROM cumul_vente_carburant_jour
+            WHERE (p_station_id IS NULL OR station_id = p_station_id)
+              AND (p_debut IS NULL OR jour >= p_debut)
+              AND (p_fin IS NULL OR jour <= p_fin);
+
+            INSERT INTO cumul_vente_carburant_jour (
+                id, station_id, carburant_id, jour, volume, chiffre_affaires, cout_cmp,
+                nombre_transactions, created_at, updated_at, est_actif
+            )
+            SELECT
+                md5('cumul_vente_carburant:' || vc.station_id::text || ':' || c.carburant_id::text || ':' || vc.date_vente::date::text)::uuid,
+                vc.station_id, c.carburant_id, vc.date_vente::date,
+                SUM(vc.quantite_vendue), SUM(vc.montant_total), COALESCE(SUM(vc.quantite_vendue * vc.cout_unitaire_cmp), 0),
+                COUNT(*), now(), now(), true
+            FROM vente_carburant vc
+            JOIN cuve c ON c.id = vc.cuve_id
+            WHERE vc.est_actif AND vc.statut IS DISTINCT FROM 'annulée'
+              AND (p_station_id IS NULL OR vc.station_id = p_station_id)
+              AND (p_debut IS NULL OR vc.date_vente::date >= p_debut)
+              AND (p_fin IS NULL OR vc.date_vente::date <= p_fin)
+            GROUP BY vc.station_id, c.carburant_id, vc.date_vente::date;
+
+            GET DIAGNOSTICS v_carburant = ROW_COUNT;
+
+            DELETE FROM cumul_vente_boutique_jour
+            WHERE (p_station_id IS NULL OR station_id = p_station_id)
+              AND (p_debut IS NULL OR jour >= p_debut)
+              AND (p_fin IS NULL OR jour <= p_fin);
+
+            INSERT INTO cumul_vente_boutique_jour (
+                id, station_id, produit_id, jour, quantite, chiffre_affaires, cout_cmp,
+                nombre_transactions, created_at, updated_at, est_actif
+            )
+            SELECT
+                md5('cumul_vente_boutique:' || v.station_id::text || ':' || d.produit_id::text || ':' || v.date::date::text)::uuid,
+                v.station_id, d.produit_id, v.date::date,
+                SUM(d.quantite), SUM(d.montant), COALESCE(SUM(d.quantite * d.cout_unitaire_cmp), 0),
+                COUNT(*), now(), now(), true
+            FROM ventes_details d
+            JOIN ventes v ON v.id = d.vente_id
+            WHERE d.est_actif AND v.est_actif AND v.statut IS DISTINCT FROM 'annulee'
+              AND (p_station_id IS NULL OR v.station_id = p_station_id)
+              AND (p_debut IS NULL OR v.date::date >= p_debut)
+              AND (p_fin IS NULL OR v.date::date <= p_fin)
+            GROUP BY v.station_id, d.produit_id, v.date::date;
+
+            GET DIAGNOSTICS v_boutique = ROW_COUNT;
+            RETURN v_carburant + v_boutique;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Historique : le coût au moment des ventes passées n'est pas connu, le CMP actuel en tient lieu
+    op.execute("""
+        UPDATE vente_carburant vc
+        SET cout_unitaire_cmp = (
+            SELECT COALESCE(NULLIF(sc.cout_moyen_pondere, 0), pc.prix_achat)
+            FROM cuve c
+            LEFT JOIN stock_carburant sc ON sc.cuve_id = c.id
+            LEFT JOIN prix_carburant pc ON pc.carburant_id = c.carburant_id AND pc.station_id = vc.station_id
+            WHERE c.id = vc.cuve_id
+            LIMIT 1
+        )
+        WHERE vc.cout_unitaire_cmp IS NULL
+    """)
+    op.execute("""
+        UPDATE ventes_details d
+        SET cout_unitaire_cmp = sp.cout_moyen_pondere
+        FROM ventes v
+        JOIN stock_produit sp ON sp.station_id = v.station_id
+        WHERE v.id = d.vente_id AND sp.produit_id = d.produit_id AND d.cout_unitaire_cmp IS NULL
+    """)
+
+    op.execute("""
+        CREATE TRIGGER trg_figer_cout_vente_carburant
+        BEFORE INSERT ON vente_carburant
+        FOR EACH ROW EXECUTE FUNCTION figer_cout_vente_carburant();
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_figer_cout_vente_detail
+        BEFORE INSERT ON ventes_details
+        FOR EACH ROW EXECUTE FUNCTION figer_cout_vente_detail();
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_maj_cumul_vente_carburant
+        AFTER INSERT OR DELETE OR UPDATE OF station_id, cuve_id, quantite_vendue, montant_total, date_vente, statut, est_actif, cout_unitaire_cmp
+        ON vente_carburant
+        FOR EACH ROW EXECUTE FUNCTION maj_cumul_vente_carburant();
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_maj_cumul_vente_detail
+        AFTER INSERT OR DELETE OR UPDATE OF vente_id, produit_id, quantite, montant, est_actif, cout_unitaire_cmp
+        ON ventes_details
+        FOR EACH ROW EXECUTE FUNCTION maj_cumul_vente_detail();
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_maj_cumul_vente_boutique
+        AFTER UPDATE OF station_id, date, statut, est_actif
+        ON ventes
+        FOR EACH ROW EXECUTE FUNCTION maj_cumul_vente_boutique();
+    """)
+
+    # Initialiser les cumuls à partir de l'historique existant
+    op.execute("SELECT reconstruire_cumuls_ventes(NULL, NULL, NULL)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_maj_cumul_vente_boutique ON ventes")
+    op.execute("DROP TRIGGER IF EXISTS trg_maj_cumul_vente_detail ON ventes_details")
+    op.execute("DROP TRIGGER IF EXISTS trg_maj_cumul_vente_carburant ON vente_carburant")
+    op.execute("DROP TRIGGER IF EXISTS trg_figer_cout_vente_detail ON ventes_details")
+    op.execute("DROP TRIGGER IF EXISTS trg_figer_cout_vente_carburant ON vente_carburant")
+    op.execute("DROP FUNCTION IF EXISTS reconstruire_cumuls_ventes(UUID, DATE, DATE)")
+    op.execute("DROP FUNCTION IF EXISTS maj_cumul_vente_boutique()")
+    op.execute("DROP FUNCTION IF EXISTS maj_cumul_vente_detail()")
+    op.execute("DROP FUNCTION IF EXISTS maj_cumul_vente_carburant()")
+    op.execute("DROP FUNCTION IF EXISTS figer_cout_vente_detail()")
+    op.execute("DROP FUNCTION IF EXISTS figer_cout_vente_carburant()")
+    op.execute("DROP FUNCTION IF EXISTS appliquer_cumul_vente_boutique(UUID, UUID, DATE, NUMERIC, NUMERIC, NUMERIC, INTEGER)")
+    op.execute("DROP FUNCTION IF EXISTS appliquer_cumul_vente_carburant(UUID, UUID, DATE, NUMERIC, NUMERIC, NUMERIC, INTEGER)")
+    op.drop_index('idx_cumul_vente_boutique_jour_station_jour', table_name='cumul_vente_boutique_jour')
+    op.drop_table('cumul_vente_boutique_jour')
+    op.drop_index('idx_cumul_vente_carburant_jour_station_jour', table_name='cumul_vente_carburant_jour')
+    op.drop_table('cumul_vente_carburant_jour')
+    op.drop_column('ventes_details', 'cout_unitaire_cmp')
+    op.drop_column('vente_carburant', 'cout_unitaire_cmp')
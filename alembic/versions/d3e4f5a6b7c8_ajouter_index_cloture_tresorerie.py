@@ -0,0 +1,38 @@
+"""Ajouter l'index utilisé par la clôture mensuelle ensembliste des trésoreries
+
+Revision ID: d3e4f5a6b7c8
+Revises: c2d3e4f5a6b7
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3e4f5a6b7c8'
+down_revision: Union[str, Sequence[str], None] = 'c2d3e4f5a6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Agrégat des mouvements validés d'un mois, groupé par trésorerie station
+    op.create_index(
+        'idx_mouvement_tresorerie_station_date',
+        'mouvement_tresorerie',
+        ['tresorerie_station_id', 'date_mouvement'],
+        postgresql_where=sa.text("statut = 'validé'")
+    )
+    # Lecture des clôtures du mois précédent
+    op.create_index(
+        'idx_cloture_solde_tresorerie_date',
+        'cloture_solde_tresorerie',
+        ['date_cloture']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_cloture_solde_tresorerie_date', table_name='cloture_solde_tresorerie')
+    op.drop_index('idx_mouvement_tresorerie_station_date', table_name='mouvement_tresorerie')
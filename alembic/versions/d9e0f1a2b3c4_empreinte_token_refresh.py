@@ -0,0 +1,54 @@
+"""Remplacer le token de rafraîchissement stocké par son empreinte SHA-256 indexée
+
+Revision ID: d9e0f1a2b3c4
+Revises: c8d9e0f1a2b3
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9e0f1a2b3c4'
+down_revision: Union[str, Sequence[str], None] = 'c8d9e0f1a2b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Les sessions expirées ou désactivées ne peuvent plus servir : inutile de les convertir
+    op.execute("DELETE FROM token_session WHERE actif IS NOT TRUE OR date_expiration < now()")
+
+    op.add_column('token_session', sa.Column('empreinte_refresh', sa.String(length=64), nullable=True))
+    op.execute("UPDATE token_session SET empreinte_refresh = encode(sha256(convert_to(token_refresh, 'UTF8')), 'hex')")
+
+    # Deux connexions dans la même seconde produisaient le même jeton : ne garder qu'une session par empreinte
+    op.execute("""
+        DELETE FROM token_session a
+        USING token_session b
+        WHERE a.empreinte_refresh = b.empreinte_refresh
+          AND a.ctid < b.ctid
+    """)
+
+    op.alter_column('token_session', 'empreinte_refresh', nullable=False)
+    op.create_index('uq_token_session_empreinte_refresh', 'token_session', ['empreinte_refresh'], unique=True)
+    op.create_index('idx_token_session_date_expiration', 'token_session', ['date_expiration'])
+    op.create_index(
+        'idx_token_session_inactives', 'token_session', ['updated_at'],
+        postgresql_where=sa.text('actif = false')
+    )
+    op.drop_column('token_session', 'token_refresh')
+
+
+def downgrade() -> None:
+    # Les jetons ne peuvent pas être retrouvés à partir de leur empreinte : les sessions sont supprimées
+    # et les utilisateurs devront se reconnecter
+    op.execute("DELETE FROM token_session")
+    op.add_column('token_session', sa.Column('token_refresh', sa.String(), nullable=False))
+    op.drop_index('idx_token_session_inactives', table_name='token_session')
+    op.drop_index('idx_token_session_date_expiration', table_name='token_session')
+    op.drop_index('uq_token_session_empreinte_refresh', table_name='token_session')
+    op.drop_column('token_session', 'empreinte_refresh')
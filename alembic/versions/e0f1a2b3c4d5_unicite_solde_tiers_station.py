@@ -0,0 +1,68 @@
+"""Fusionner les soldes de tiers en double et rendre (tiers_id, station_id) unique
+
+Revision ID: e0f1a2b3c4d5
+Revises: d9e0f1a2b3c4
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e0f1a2b3c4d5'
+down_revision: Union[str, Sequence[str], None] = 'd9e0f1a2b3c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Deux premières opérations concurrentes pouvaient créer chacune un solde pour le même tiers et la même
+    # station. Le plus ancien est conservé et reçoit la somme des montants des doublons, qui sont supprimés.
+    # Les variations appliquées ensuite à tous les doublons ont pu compter le solde plusieurs fois :
+    # POST /tiers/fournisseurs/soldes/recalculer le reconstruit à partir des achats et paiements.
+    op.execute("""
+        WITH soldes AS (
+            SELECT id,
+                   first_value(id) OVER (
+                       PARTITION BY tiers_id, station_id ORDER BY created_at, id
+                   ) AS id_conserve,
+                   count(*) OVER (PARTITION BY tiers_id, station_id) AS nombre
+            FROM solde_tiers
+        ),
+        totaux AS (
+            SELECT s.id_conserve,
+                   sum(st.montant_initial) AS montant_initial,
+                   sum(st.montant_actuel) AS montant_actuel,
+                   max(st.date_derniere_mise_a_jour) AS date_derniere_mise_a_jour
+            FROM soldes s
+            JOIN solde_tiers st ON st.id = s.id
+            WHERE s.nombre > 1
+            GROUP BY s.id_conserve
+        )
+        UPDATE solde_tiers st
+        SET montant_initial = t.montant_initial,
+            montant_actuel = t.montant_actuel,
+            date_derniere_mise_a_jour = t.date_derniere_mise_a_jour
+        FROM totaux t
+        WHERE st.id = t.id_conserve
+    """)
+    op.execute("""
+        DELETE FROM solde_tiers st
+        USING (
+            SELECT id,
+                   first_value(id) OVER (
+                       PARTITION BY tiers_id, station_id ORDER BY created_at, id
+                   ) AS id_conserve
+            FROM solde_tiers
+        ) s
+        WHERE st.id = s.id
+          AND s.id <> s.id_conserve
+    """)
+
+    op.create_unique_constraint('uq_solde_tiers_tiers_station', 'solde_tiers', ['tiers_id', 'station_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_solde_tiers_tiers_station', 'solde_tiers', type_='unique')
@@ -0,0 +1,181 @@
+"""Tenir stock_avant / stock_apres des mouvements de cuve par triggers (registre à solde courant)
+
+Revision ID: e4f5a6b7c8d9
+Revises: d3e4f5a6b7c8
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f5a6b7c8d9'
+down_revision: Union[str, Sequence[str], None] = 'd3e4f5a6b7c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Ordre du registre d'une cuve : le niveau courant est le stock_apres de la dernière ligne
+    op.create_index(
+        'idx_mouvement_stock_cuve_registre',
+        'mouvement_stock_cuve',
+        ['cuve_id', 'date_mouvement', 'created_at', 'id']
+    )
+
+    # Variation de volume d'un mouvement (0 pour un mouvement annulé ou inactif)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION delta_mouvement_stock_cuve(
+            p_type_mouvement VARCHAR, p_quantite NUMERIC, p_statut VARCHAR, p_est_actif BOOLEAN
+        ) RETURNS NUMERIC AS $$
+            SELECT CASE
+                WHEN NOT COALESCE(p_est_actif, true) OR p_statut = 'annulé' THEN 0
+                WHEN p_type_mouvement IN ('sortie', 'ajustement_negatif') THEN -COALESCE(p_quantite, 0)
+                WHEN p_type_mouvement IN ('stock_initial', 'entrée', 'entree', 'ajustement_positif', 'ajustement')
+                    THEN COALESCE(p_quantite, 0)
+                ELSE 0
+            END;
+        $$ LANGUAGE sql IMMUTABLE;
+    """)
+
+    # Verrou transactionnel par cuve : sérialise les écritures du registre d'une même cuve
+    op.execute("""
+        CREATE OR REPLACE FUNCTION verrouiller_registre_cuve(p_cuve_id UUID) RETURNS VOID AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtextextended('mouvement_stock_cuve:' || p_cuve_id::text, 0));
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Recalcule les soldes courants d'une cuve à partir d'une date (toute l'histoire si p_depuis est NULL)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION recalculer_stock_mouvement_cuve(p_cuve_id UUID, p_depuis TIMESTAMP)
+        RETURNS INTEGER AS $$
+        DECLARE
+            v_base NUMERIC := 0;
+            v_nombre INTEGER;
+        BEGIN
+            PERFORM verrouiller_registre_cuve(p_cuve_id);
+
+            IF p_depuis IS NOT NULL THEN
+                SELECT COALESCE(stock_apres, 0) INTO v_base
+                FROM mouvement_stock_cuve
+                WHERE cuve_id = p_cuve_id AND date_mouvement < p_depuis
+                ORDER BY date_mouvement DESC, created_at DESC, id DESC
+                LIMIT 1;
+                v_base := COALESCE(v_base, 0);
+            END IF;
+
+            UPDATE mouvement_stock_cuve m
+            SET stock_avant = r.stock_apres - r.delta,
+                stock_apres = r.stock_apres
+            FROM (
+                SELECT id,
+                       delta_mouvement_stock_cuve(type_mouvement, quantite, statut, est_actif) AS delta,
+                       v_base + SUM(delta_mouvement_stock_cuve(type_mouvement, quantite, statut, est_actif)) OVER (
+                           ORDER BY date_mouvement, created_at, id
+                           ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                       ) AS stock_apres
+                FROM mouvement_stock_cuve
+                WHERE cuve_id = p_cuve_id AND (p_depuis IS NULL OR date_mouvement >= p_depuis)
+            ) r
+            WHERE m.id = r.id
+              AND (m.stock_avant IS DISTINCT FROM r.stock_apres - r.delta OR m.stock_apres IS DISTINCT FROM r.stock_apres);
+
+            GET DIAGNOSTICS v_nombre = ROW_COUNT;
+            RETURN v_nombre;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Insertion : le mouvement prend le solde de son prédécesseur ; un mouvement antidaté décale les suivants
+    op.execute("""
+        CREATE OR REPLACE FUNCTION attribuer_stock_mouvement_cuve() RETURNS TRIGGER AS $$
+        DECLARE
+            v_stock_avant NUMERIC;
+            v_delta NUMERIC;
+        BEGIN
+            PERFORM verrouiller_registre_cuve(NEW.cuve_id);
+
+            NEW.created_at := COALESCE(NEW.created_at, now());
+
+            SELECT stock_apres INTO v_stock_avant
+            FROM mouvement_stock_cuve
+            WHERE cuve_id = NEW.cuve_id
+              AND (date_mouvement, created_at, id) < (NEW.date_mouvement, NEW.created_at, NEW.id)
+            ORDER BY date_mouvement DESC, created_at DESC, id DESC
+            LIMIT 1;
+
+            v_delta := delta_mouvement_stock_cuve(NEW.type_mouvement, NEW.quantite, NEW.statut, NEW.est_actif);
+            NEW.stock_avant := COALESCE(v_stock_avant, 0);
+            NEW.stock_apres := NEW.stock_avant + v_delta;
+
+            IF v_delta <> 0 THEN
+                UPDATE mouvement_stock_cuve
+                SET stock_avant = stock_avant + v_delta,
+                    stock_apres = stock_apres + v_delta
+                WHERE cuve_id = NEW.cuve_id
+                  AND (date_mouvement, created_at, id) > (NEW.date_mouvement, NEW.created_at, NEW.id);
+            END IF;
+
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Modification ou suppression : recalcul de la cuve à partir du plus ancien mouvement concerné
+    op.execute("""
+        CREATE OR REPLACE FUNCTION recalculer_stock_apres_modification_mouvement_cuve() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM recalculer_stock_mouvement_cuve(OLD.cuve_id, OLD.date_mouvement);
+                RETURN OLD;
+            END IF;
+
+            IF NEW.cuve_id IS DISTINCT FROM OLD.cuve_id THEN
+                PERFORM recalculer_stock_mouvement_cuve(OLD.cuve_id, OLD.date_mouvement);
+                PERFORM recalculer_stock_mouvement_cuve(NEW.cuve_id, NEW.date_mouvement);
+            ELSE
+                PERFORM recalculer_stock_mouvement_cuve(NEW.cuve_id, LEAST(OLD.date_mouvement, NEW.date_mouvement));
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER trg_attribuer_stock_mouvement_cuve
+        BEFORE INSERT ON mouvement_stock_cuve
+        FOR EACH ROW EXECUTE FUNCTION attribuer_stock_mouvement_cuve();
+    """)
+    # Les recalculs ne modifient que stock_avant / stock_apres : ils ne redéclenchent pas ce trigger
+    op.execute("""
+        CREATE TRIGGER trg_recalculer_stock_modification_mouvement_cuve
+        AFTER UPDATE OF cuve_id, type_mouvement, quantite, date_mouvement, statut, est_actif ON mouvement_stock_cuve
+        FOR EACH ROW EXECUTE FUNCTION recalculer_stock_apres_modification_mouvement_cuve();
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_recalculer_stock_suppression_mouvement_cuve
+        AFTER DELETE ON mouvement_stock_cuve
+        FOR EACH ROW EXECUTE FUNCTION recalculer_stock_apres_modification_mouvement_cuve();
+    """)
+
+    # Renseigner les soldes des mouvements existants
+    op.execute("""
+        SELECT recalculer_stock_mouvement_cuve(cuve_id, NULL)
+        FROM (SELECT DISTINCT cuve_id FROM mouvement_stock_cuve) c;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_recalculer_stock_suppression_mouvement_cuve ON mouvement_stock_cuve")
+    op.execute("DROP TRIGGER IF EXISTS trg_recalculer_stock_modification_mouvement_cuve ON mouvement_stock_cuve")
+    op.execute("DROP TRIGGER IF EXISTS trg_attribuer_stock_mouvement_cuve ON mouvement_stock_cuve")
+    op.execute("DROP FUNCTION IF EXISTS recalculer_stock_apres_modification_mouvement_cuve()")
+    op.execute("DROP FUNCTION IF EXISTS attribuer_stock_mouvement_cuve()")
+    op.execute("DROP FUNCTION IF EXISTS recalculer_stock_mouvement_cuve(UUID, TIMESTAMP)")
+    op.execute("DROP FUNCTION IF EXISTS verrouiller_registre_cuve(UUID)")
+    op.execute("DROP FUNCTION IF EXISTS delta_mouvement_stock_cuve(VARCHAR, NUMERIC, VARCHAR, BOOLEAN)")
+    op.drop_index('idx_mouvement_stock_cuve_registre', table_name='mouvement_stock_cuve')
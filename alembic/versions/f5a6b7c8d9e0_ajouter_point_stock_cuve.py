@@ -0,0 +1,191 @@
+"""Ajouter les points journaliers de stock des cuves (point_stock_cuve) maintenus par triggers
+
+Revision ID: f5a6b7c8d9e0
+Revises: e4f5a6b7c8d9
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5a6b7c8d9e0'
+down_revision: Union[str, Sequence[str], None] = 'e4f5a6b7c8d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'point_stock_cuve',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('cuve_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('cuve.id'), nullable=False),
+        sa.Column('date_point', sa.Date(), nullable=False),
+        sa.Column('volume_entree', sa.Numeric(14, 2), server_default='0', nullable=False),
+        sa.Column('volume_sortie', sa.Numeric(14, 2), server_default='0', nullable=False),
+        sa.Column('volume_ajustement', sa.Numeric(14, 2), server_default='0', nullable=False),
+        sa.Column('volume_initialisation', sa.Numeric(14, 2), server_default='0', nullable=False),
+        sa.Column('nombre_entrees', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('nombre_sorties', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('nombre_ajustements', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('stock_cloture', sa.Numeric(14, 2), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('est_actif', sa.Boolean(), server_default=sa.text('true'), nullable=False),
+        sa.UniqueConstraint('cuve_id', 'date_point', name='uq_point_stock_cuve_date'),
+    )
+
+    # Ajoute (p_signe = 1) ou retire (p_signe = -1) un mouvement du point de sa journée, et décale
+    # le stock de clôture des points suivants de la variation de volume
+    op.execute("""
+        CREATE OR REPLACE FUNCTION appliquer_point_stock_cuve(
+            p_cuve_id UUID, p_jour DATE, p_type_mouvement VARCHAR, p_quantite NUMERIC,
+            p_statut VARCHAR, p_est_actif BOOLEAN, p_signe INTEGER
+        ) RETURNS VOID AS $$
+        DECLARE
+            v_delta NUMERIC;
+            v_quantite NUMERIC;
+            v_cloture_precedente NUMERIC;
+            v_est_entree BOOLEAN := p_type_mouvement IN ('entrée', 'entree');
+            v_est_sortie BOOLEAN := p_type_mouvement = 'sortie';
+            v_est_ajustement BOOLEAN := p_type_mouvement = 'ajustement';
+            v_est_initialisation BOOLEAN := p_type_mouvement IN ('stock_initial', 'ajustement_positif', 'ajustement_negatif');
+        BEGIN
+            IF NOT COALESCE(p_est_actif, true) OR p_statut = 'annulé' THEN
+                RETURN;
+            END IF;
+
+            v_delta := p_signe * delta_mouvement_stock_cuve(p_type_mouvement, p_quantite, p_statut, p_est_actif);
+            v_quantite := p_signe * COALESCE(p_quantite, 0);
+
+            SELECT stock_cloture INTO v_cloture_precedente
+            FROM point_stock_cuve
+            WHERE cuve_id = p_cuve_id AND date_point < p_jour
+            ORDER BY date_point DESC
+            LIMIT 1;
+
+            INSERT INTO point_stock_cuve (
+                id, cuve_id, date_point, volume_entree, volume_sortie, volume_ajustement, volume_initialisation,
+                nombre_entrees, nombre_sorties, nombre_ajustements, stock_cloture, created_at, updated_at, est_actif
+            ) VALUES (
+                md5('point_stock_cuve:' || p_cuve_id::text || ':' || p_jour::text)::uuid, p_cuve_id, p_jour,
+                CASE WHEN v_est_entree THEN v_quantite ELSE 0 END,
+                CASE WHEN v_est_sortie THEN v_quantite ELSE 0 END,
+                CASE WHEN v_est_ajustement THEN v_quantite ELSE 0 END,
+                CASE WHEN v_est_initialisation THEN v_delta ELSE 0 END,
+                CASE WHEN v_est_entree THEN p_signe ELSE 0 END,
+                CASE WHEN v_est_sortie THEN p_signe ELSE 0 END,
+                CASE WHEN v_est_ajustement THEN p_signe ELSE 0 END,
+                COALESCE(v_cloture_precedente, 0) + v_delta,
+                now(), now(), true
+            )
+            ON CONFLICT (cuve_id, date_point) DO UPDATE SET
+                volume_entree = point_stock_cuve.volume_entree + EXCLUDED.volume_entree,
+                volume_sortie = point_stock_cuve.volume_sortie + EXCLUDED.volume_sortie,
+                volume_ajustement = point_stock_cuve.volume_ajustement + EXCLUDED.volume_ajustement,
+                volume_initialisation = point_stock_cuve.volume_initialisation + EXCLUDED.volume_initialisation,
+                nombre_entrees = point_stock_cuve.nombre_entrees + EXCLUDED.nombre_entrees,
+                nombre_sorties = point_stock_cuve.nombre_sorties + EXCLUDED.nombre_sorties,
+                nombre_ajustements = point_stock_cuve.nombre_ajustements + EXCLUDED.nombre_ajustements,
+                stock_cloture = point_stock_cuve.stock_cloture + v_delta,
+                updated_at = now();
+
+            IF v_delta <> 0 THEN
+                UPDATE point_stock_cuve
+                SET stock_cloture = stock_cloture + v_delta,
+                    updated_at = now()
+                WHERE cuve_id = p_cuve_id AND date_point > p_jour;
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maj_point_stock_cuve() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM verrouiller_registre_cuve(OLD.cuve_id);
+                PERFORM appliquer_point_stock_cuve(
+                    OLD.cuve_id, OLD.date_mouvement::date, OLD.type_mouvement, OLD.quantite,
+                    OLD.statut, OLD.est_actif, -1
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM verrouiller_registre_cuve(NEW.cuve_id);
+                PERFORM appliquer_point_stock_cuve(
+                    NEW.cuve_id, NEW.date_mouvement::date, NEW.type_mouvement, NEW.quantite,
+                    NEW.statut, NEW.est_actif, 1
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Reconstruit tous les points d'une cuve à partir de ses mouvements (réparation et initialisation)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION reconstruire_points_stock_cuve(p_cuve_id UUID) RETURNS INTEGER AS $$
+        DECLARE
+            v_nombre INTEGER;
+        BEGIN
+            PERFORM verrouiller_registre_cuve(p_cuve_id);
+
+            DELETE FROM point_stock_cuve WHERE cuve_id = p_cuve_id;
+
+            INSERT INTO point_stock_cuve (
+                id, cuve_id, date_point, volume_entree, volume_sortie, volume_ajustement, volume_initialisation,
+                nombre_entrees, nombre_sorties, nombre_ajustements, stock_cloture, created_at, updated_at, est_actif
+            )
+            SELECT
+                md5('point_stock_cuve:' || p_cuve_id::text || ':' || j.jour::text)::uuid, p_cuve_id, j.jour,
+                j.volume_entree, j.volume_sortie, j.volume_ajustement, j.volume_initialisation,
+                j.nombre_entrees, j.nombre_sorties, j.nombre_ajustements,
+                SUM(j.delta) OVER (ORDER BY j.jour ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW),
+                now(), now(), true
+            FROM (
+                SELECT
+                    date_mouvement::date AS jour,
+                    COALESCE(SUM(quantite) FILTER (WHERE type_mouvement IN ('entrée', 'entree')), 0) AS volume_entree,
+                    COALESCE(SUM(quantite) FILTER (WHERE type_mouvement = 'sortie'), 0) AS volume_sortie,
+                    COALESCE(SUM(quantite) FILTER (WHERE type_mouvement = 'ajustement'), 0) AS volume_ajustement,
+                    COALESCE(SUM(delta_mouvement_stock_cuve(type_mouvement, quantite, statut, est_actif)) FILTER (
+                        WHERE type_mouvement IN ('stock_initial', 'ajustement_positif', 'ajustement_negatif')
+                    ), 0) AS volume_initialisation,
+                    COUNT(*) FILTER (WHERE type_mouvement IN ('entrée', 'entree')) AS nombre_entrees,
+                    COUNT(*) FILTER (WHERE type_mouvement = 'sortie') AS nombre_sorties,
+                    COUNT(*) FILTER (WHERE type_mouvement = 'ajustement') AS nombre_ajustements,
+                    SUM(delta_mouvement_stock_cuve(type_mouvement, quantite, statut, est_actif)) AS delta
+                FROM mouvement_stock_cuve
+                WHERE cuve_id = p_cuve_id AND est_actif AND statut IS DISTINCT FROM 'annulé'
+                GROUP BY date_mouvement::date
+            ) j;
+
+            GET DIAGNOSTICS v_nombre = ROW_COUNT;
+            RETURN v_nombre;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER trg_maj_point_stock_cuve
+        AFTER INSERT OR DELETE OR UPDATE OF cuve_id, type_mouvement, quantite, date_mouvement, statut, est_actif
+        ON mouvement_stock_cuve
+        FOR EACH ROW EXECUTE FUNCTION maj_point_stock_cuve();
+    """)
+
+    # Initialiser les points à partir de l'historique existant
+    op.execute("""
+        SELECT reconstruire_points_stock_cuve(cuve_id)
+        FROM (SELECT DISTINCT cuve_id FROM mouvement_stock_cuve) c;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_maj_point_stock_cuve ON mouvement_stock_cuve")
+    op.execute("DROP FUNCTION IF EXISTS reconstruire_points_stock_cuve(UUID)")
+    op.execute("DROP FUNCTION IF EXISTS maj_point_stock_cuve()")
+    op.execute("DROP FUNCTION IF EXISTS appliquer_point_stock_cuve(UUID, DATE, VARCHAR, NUMERIC, VARCHAR, BOOLEAN, INTEGER)")
+    op.drop_table('point_stock_cuve')
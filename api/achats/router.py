@@ -24,7 +24,7 @@ router = APIRouter()
             summary="Récupérer les achats de produits",
             description="Récupérer la liste des achats de produits avec pagination. Cet endpoint permet de consulter tous les achats effectués dans le module de boutique, avec filtrage possible par utilisateur, station et compagnie. Nécessite la permission 'Module Achats Boutique'. Les utilisateurs n'ont accès qu'aux achats liés à leur station ou compagnie selon leur rôle.",
             tags=["achats"])
-async def get_achats(
+def get_achats(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -37,7 +37,7 @@ async def get_achats(
              summary="Créer un nouvel achat de produits",
              description="Crée un nouvel achat de produits dans le système. Cet endpoint permet d'enregistrer un achat avec ses détails, y compris les produits achetés, les quantités, les prix et les éventuelles remises. Nécessite la permission 'Module Achats Boutique'. L'utilisateur doit appartenir à la même compagnie que la station concernée par l'achat.",
              tags=["achats"])
-async def create_achat(
+def create_achat(
     achat: schemas.AchatCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Achats Boutique"))
@@ -49,7 +49,7 @@ async def create_achat(
             summary="Récupérer un achat de produit par ID",
             description="Récupère les détails d'un achat de produit spécifique par son identifiant. Cet endpoint permet d'obtenir toutes les informations relatives à un achat spécifique, y compris ses détails de produits achetés. Nécessite la permission 'Module Achats Boutique'. L'utilisateur doit avoir accès à la station ou compagnie liée à l'achat.",
             tags=["achats"])
-async def get_achat_by_id(
+def get_achat_by_id(
     achat_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Achats Boutique"))
@@ -61,7 +61,7 @@ async def get_achat_by_id(
             summary="Mettre à jour un achat de produit",
             description="Met à jour les informations d'un achat de produit existant. Cet endpoint permet de modifier les détails d'un achat, comme le fournisseur, la date, le statut ou le numéro de pièce comptable. Nécessite la permission 'Module Achats Boutique'. L'utilisateur doit avoir accès à la station ou compagnie liée à l'achat et les modifications peuvent affecter les calculs de stock et de trésorerie.",
             tags=["achats"])
-async def update_achat(
+def update_achat(
     achat_id: uuid.UUID,
     achat: schemas.AchatUpdate,
     db: Session = Depends(get_db),
@@ -73,7 +73,7 @@ async def update_achat(
                 summary="Supprimer un achat de produit",
                 description="Supprime un achat de produit du système. Cet endpoint effectue une suppression logique de l'achat en mettant à jour son statut. Nécessite la permission 'Module Achats Boutique'. L'utilisateur doit avoir accès à la station ou compagnie liée à l'achat. La suppression peut affecter les calculs de stock et de trésorerie et ne doit être effectuée que si l'achat n'a pas été entièrement traité.",
                 tags=["achats"])
-async def delete_achat(
+def delete_achat(
     achat_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Achats Boutique"))
@@ -85,7 +85,7 @@ async def delete_achat(
             summary="Récupérer les détails d'un achat",
             description="Récupère les détails d'un achat spécifique, y compris les produits achetés, les quantités, les prix unitaires et les montants. Nécessite la permission 'Module Achats Boutique'. L'utilisateur doit avoir accès à la station ou compagnie liée à l'achat. Ces détails sont essentiels pour la gestion des stocks et les rapprochements comptables.",
             tags=["achats"])
-async def get_achat_details(
+def get_achat_details(
     achat_id: uuid.UUID,
     skip: int = 0,
     limit: int = 100,
@@ -98,7 +98,7 @@ async def get_achat_details(
             summary="Annuler un achat boutique",
             description="Annule un achat boutique en effectuant des écritures inverses pour le stock et la trésorerie. Cette opération crée des mouvements inverses pour annuler les effets de l'achat sur le stock et la trésorerie. Nécessite la permission 'Module Achats Boutique'.",
             tags=["achats"])
-async def annuler_achat(
+def annuler_achat(
     achat_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Achats Boutique"))
@@ -110,7 +110,7 @@ async def annuler_achat(
             summary="Corriger une ligne de détail d'achat",
             description="Corrige une ligne de détail d'achat suite à une erreur de saisie. Cette opération met à jour la quantité et/ou le prix unitaire d'un produit dans un achat, et ajuste les mouvements de stock et de trésorerie en conséquence. Nécessite la permission 'Module Achats Boutique'.",
             tags=["achats"])
-async def corriger_achat_detail(
+def corriger_achat_detail(
     achat_id: uuid.UUID,
     detail_id: uuid.UUID,
     correction: schemas.AchatDetailCorrection,
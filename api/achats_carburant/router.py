@@ -24,7 +24,7 @@ security = HTTPBearer()
             summary="Récupérer les achats de carburant",
             description="Récupère la liste des achats de carburant avec possibilité de paginer les résultats. Nécessite la permission 'Module Achats Carburant'. Permet de visualiser l'historique des approvisionnements en carburant.",
             tags=["Achats carburant"])
-async def get_achats_carburant(
+def get_achats_carburant(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -50,7 +50,7 @@ async def get_achats_carburant(
              summary="Créer un nouvel achat de carburant",
              description="Crée un nouvel achat de carburant. Nécessite la permission 'Module Achats Carburant'. L'achat de carburant enregistre une commande d'approvisionnement qui sera liée aux livraisons effectives ultérieurement.",
              tags=["Achats carburant"])
-async def create_achat_carburant(
+def create_achat_carburant(
     achat_carburant: schemas.AchatCarburantCreateWithDetails,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -86,7 +86,7 @@ async def create_achat_carburant(
             summary="Récupérer un achat de carburant par ID",
             description="Récupère les détails d'un achat de carburant spécifique par son identifiant. Nécessite la permission 'Module Achats Carburant'. Permet d'obtenir toutes les informations relatives à une commande d'approvisionnement en carburant.",
             tags=["Achats carburant"])
-async def get_achat_carburant_by_id(
+def get_achat_carburant_by_id(
     achat_carburant_id: UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -115,7 +115,7 @@ async def get_achat_carburant_by_id(
             summary="Mettre à jour un achat de carburant",
             description="Met à jour les détails d'un achat de carburant existant. Nécessite la permission 'Module Achats Carburant'. La mise à jour peut affecter les calculs de stock et les écritures comptables associées.",
             tags=["Achats carburant"])
-async def update_achat_carburant(
+def update_achat_carburant(
     achat_carburant_id: UUID,
     achat_carburant: schemas.AchatCarburantUpdate,
     db: Session = Depends(get_db),
@@ -181,7 +181,7 @@ async def update_achat_carburant(
                summary="Supprimer un achat de carburant",
                description="Supprime un achat de carburant existant. Nécessite la permission 'Module Achats Carburant'. La suppression affecte les calculs de stock et les écritures comptables associées.",
                tags=["Achats carburant"])
-async def delete_achat_carburant(
+def delete_achat_carburant(
     achat_carburant_id: UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -215,7 +215,7 @@ async def delete_achat_carburant(
              summary="Valider un achat de carburant",
              description="Valide un achat de carburant et gère les paiements et soldes fournisseurs. Cela correspond à l'étape 2 du processus : enregistrement des paiements. Nécessite la permission 'Module Achats Carburant'.",
              tags=["Achats carburant"])
-async def valider_achat_carburant_endpoint(
+def valider_achat_carburant_endpoint(
     achat_carburant_id: UUID,
     reglements: Optional[List[schemas.AchatCarburantReglementCreate]] = Body(None),
     db: Session = Depends(get_db),
@@ -288,7 +288,7 @@ async def valider_achat_carburant_endpoint(
              summary="Traiter la livraison d'un achat de carburant",
              description="Traite la livraison d'un achat de carburant, met à jour les stocks et les soldes fournisseurs. Cela correspond à l'étape 3 du processus : enregistrement de la livraison avec récapitulation automatique. Nécessite la permission 'Module Achats Carburant'.",
              tags=["Achats carburant"])
-async def traiter_livraison_achat_carburant_endpoint(
+def traiter_livraison_achat_carburant_endpoint(
     achat_carburant_id: UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -314,7 +314,7 @@ async def traiter_livraison_achat_carburant_endpoint(
             summary="Annuler un achat de carburant",
             description="Annule un achat de carburant existant et gère les opérations associées (paiements, écritures comptables). Nécessite la permission 'Module Achats Carburant'.",
             tags=["Achats carburant"])
-async def annuler_achat_carburant_endpoint(
+def annuler_achat_carburant_endpoint(
     achat_carburant_id: UUID,
     motif: str = None,
     db: Session = Depends(get_db),
@@ -354,7 +354,7 @@ async def annuler_achat_carburant_endpoint(
             summary="Modifier un achat de carburant complet",
             description="Modifie un achat de carburant avec ses détails et paiements en une seule opération. Nécessite la permission 'Module Achats Carburant'.",
             tags=["Achats carburant"])
-async def modifier_achat_carburant_complet_endpoint(
+def modifier_achat_carburant_complet_endpoint(
     achat_carburant_id: UUID,
     achat_data: schemas.AchatCarburantCreateWithDetails,
     db: Session = Depends(get_db),
@@ -395,7 +395,7 @@ async def modifier_achat_carburant_complet_endpoint(
             summary="Récupérer les lignes d'un achat de carburant",
             description="Récupère la liste des lignes d'achat de carburant pour un achat spécifique. Nécessite la permission 'Module Achats Carburant'. Les lignes détaillent les produits (carburants) commandés, leurs quantités et prix respectifs.",
             tags=["Achats carburant"])
-async def get_lignes_achat_carburant(
+def get_lignes_achat_carburant(
     achat_carburant_id: UUID,
     skip: int = 0,
     limit: int = 100,
@@ -423,7 +423,7 @@ async def get_lignes_achat_carburant(
              summary="Créer une ligne d'achat de carburant",
              description="Crée une nouvelle ligne d'achat de carburant pour un achat spécifique. Nécessite la permission 'Module Achats Carburant'. La ligne détaille un produit (carburant) commandé, sa quantité et son prix.",
              tags=["Achats carburant"])
-async def create_ligne_achat_carburant(
+def create_ligne_achat_carburant(
     achat_carburant_id: UUID,
     ligne: schemas.LigneAchatCarburantCreate,
     db: Session = Depends(get_db),
@@ -471,7 +471,7 @@ async def create_ligne_achat_carburant(
              summary="Créer une compensation financière",
              description="Crée une nouvelle compensation financière pour un achat de carburant. Nécessite la permission 'Module Achats Carburant'. Les compensations sont utilisées pour ajuster les différences entre quantités commandées et livrées.",
              tags=["Achats carburant"])
-async def create_compensation_financiere(
+def create_compensation_financiere(
     compensation: schemas.CompensationFinanciereCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -576,7 +576,7 @@ async def create_compensation_financiere(
              summary="Créer un avoir de compensation",
              description="Crée un nouvel avoir de compensation pour une compensation financière existante. Nécessite la permission 'Module Achats Carburant'. Les avoirs de compensation sont utilisés pour enregistrer les ajustements financiers liés aux différences de quantité.",
              tags=["Achats carburant"])
-async def create_avoir_compensation(
+def create_avoir_compensation(
     avoir: schemas.AvoirCompensationCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -624,7 +624,7 @@ async def create_avoir_compensation(
              summary="Créer un paiement pour un achat de carburant",
              description="Crée un nouveau paiement pour un achat de carburant spécifique. Nécessite la permission 'Module Achats Carburant'. Permet d'enregistrer les règlements effectués pour chaque commande d'approvisionnement en carburant.",
              tags=["Achats carburant"])
-async def create_paiement_achat_carburant(
+def create_paiement_achat_carburant(
     achat_carburant_id: UUID,
     paiement: schemas.PaiementAchatCarburantCreate,
     db: Session = Depends(get_db),
@@ -691,7 +691,7 @@ async def create_paiement_achat_carburant(
             summary="Récupérer les paiements d'un achat de carburant",
             description="Récupère la liste des paiements pour un achat de carburant spécifique. Nécessite la permission 'Module Achats Carburant'. Permet de suivre les règlements effectués pour une commande d'approvisionnement en carburant.",
             tags=["Achats carburant"])
-async def get_paiements_achat_carburant(
+def get_paiements_achat_carburant(
     achat_carburant_id: UUID,
     skip: int = 0,
     limit: int = 100,
@@ -721,7 +721,7 @@ async def get_paiements_achat_carburant(
             summary="Mettre à jour un paiement d'achat de carburant",
             description="Met à jour les détails d'un paiement d'achat de carburant existant. Nécessite la permission 'Module Achats Carburant'.",
             tags=["Achats carburant"])
-async def update_paiement_achat_carburant(
+def update_paiement_achat_carburant(
     paiement_id: UUID,
     paiement: schemas.PaiementAchatCarburantUpdate,
     db: Session = Depends(get_db),
@@ -760,7 +760,7 @@ async def update_paiement_achat_carburant(
                summary="Supprimer un paiement d'achat de carburant",
                description="Supprime un paiement d'achat de carburant existant. Nécessite la permission 'Module Achats Carburant'.",
                tags=["Achats carburant"])
-async def delete_paiement_achat_carburant(
+def delete_paiement_achat_carburant(
     paiement_id: UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -794,7 +794,7 @@ async def delete_paiement_achat_carburant(
              summary="Calculer le stock théorique après achat",
              description="Calcule automatiquement le stock théorique pour toutes les cuves concernées par un achat de carburant. Nécessite la permission 'Module Achats Carburant'. Cet endpoint est utilisé pour vérifier les niveaux de stock après la réception d'un approvisionnement.",
              tags=["Achats carburant"])
-async def calculer_stock_theorique_apres_achat(
+def calculer_stock_theorique_apres_achat(
     achat_carburant_id: UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
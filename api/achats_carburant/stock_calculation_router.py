@@ -20,7 +20,7 @@ security = HTTPBearer()
             response_model=dict,
             summary="Calculer le stock théorique d'une cuve",
             description="Calcule le stock théorique d'une cuve à une date donnée en se basant sur l'état initial et toutes les livraisons de carburant effectuées jusqu'à cette date. Nécessite la permission 'Module Achats Carburant'.")
-async def get_stock_theorique_cuve(
+def get_stock_theorique_cuve(
     cuve_id: UUID,
     date_livraison: str,  # Date as string in YYYY-MM-DD format
     db: Session = Depends(get_db),
@@ -64,7 +64,7 @@ async def get_stock_theorique_cuve(
              response_model=dict,
              summary="Vérifier et créer des compensations automatiques",
              description="Vérifie s'il y a des écarts entre les quantités commandées et livrées et crée automatiquement des compensations si nécessaires. Nécessite la permission 'Module Achats Carburant'.")
-async def verifier_et_creer_compensations_auto(
+def verifier_et_creer_compensations_auto(
     livraison_id: UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -111,7 +111,7 @@ async def verifier_et_creer_compensations_auto(
             response_model=dict,
             summary="Vérifier les écarts de livraison",
             description="Vérifie les écarts entre les quantités prévues dans les commandes et les quantités réellement livrées. Nécessite la permission 'Module Achats Carburant'.")
-async def get_verification_ecarts_livraison_achat(
+def get_verification_ecarts_livraison_achat(
     livraison_id: UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -3,71 +3,86 @@ from typing import Optional
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from ..models import User, TokenSession
 from ..rbac_utils import get_modules_utilisateur
 from ..database import get_db
+from .cache_utilisateur import (
+    cache_utilisateurs,
+    obtenir_utilisateur_requete,
+    enregistrer_utilisateur_requete
+)
+import hashlib
 import os
-from sqlalchemy import and_
+from sqlalchemy import and_, update, delete, select, or_, func
 import uuid
 
-# Create password context for hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .hachage import (
+    pwd_context,
+    hacher_mot_de_passe,
+    verifier_mot_de_passe,
+    verifier_mot_de_passe_async,
+    dernieres_connexions
+)
 
 # Secret key and algorithm from environment
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+# Durée de conservation des sessions expirées ou révoquées avant leur purge
+TOKEN_SESSION_RETENTION_DAYS = float(os.getenv("TOKEN_SESSION_RETENTION_DAYS", "7"))
 
 
 def verify_password(plain_password, hashed_password):
     """
     Verify a plain password against a hashed password.
-    Truncates password to 72 bytes if longer, as bcrypt has a 72-byte password limit.
+    The check runs in the bounded hashing executor; passwords are truncated to bcrypt's 72-byte limit.
     """
-    try:
-        # Truncate password to 72 bytes if longer, as bcrypt has a 72-byte password limit
-        truncated_password = plain_password[:72] if len(plain_password) > 72 else plain_password
-        return pwd_context.verify(truncated_password, hashed_password)
-    except ValueError as e:
-        if "password cannot be longer than 72 bytes" in str(e):
-            # Even after truncation, if there's still an issue, we handle it gracefully
-            # This shouldn't happen with our truncation, but added as additional safety
-            return False
-        else:
-            raise e
+    valide, _ = verifier_mot_de_passe(plain_password, hashed_password)
+    return valide
 
 
 def get_password_hash(password):
     """
-    Generate a hash for a plain password.
-    Truncates password to 72 bytes if longer, as bcrypt has a 72-byte password limit.
+    Generate a hash for a plain password with the configured bcrypt work factor (BCRYPT_ROUNDS).
+    The hash runs in the bounded hashing executor; passwords are truncated to bcrypt's 72-byte limit.
     """
-    try:
-        # Truncate password to 72 bytes if longer, as bcrypt has a 72-byte password limit
-        truncated_password = password[:72] if len(password) > 72 else password
-        return pwd_context.hash(truncated_password)
-    except ValueError as e:
-        if "password cannot be longer than 72 bytes" in str(e):
-            # Handle the edge case where there's still an issue after truncation
-            truncated_password = password[:72]
-            return pwd_context.hash(truncated_password[:72])
-        else:
-            raise e
+    return hacher_mot_de_passe(password)
+
+
+def _finaliser_connexion(db: Session, user: User, nouveau_hachage: Optional[str]):
+    # Mettre à niveau le hachage si le facteur de travail a changé depuis qu'il a été calculé
+    if nouveau_hachage:
+        user.mot_de_passe_hash = nouveau_hachage
+        db.commit()
+
+    # La date de dernière connexion est écrite par lot, hors du chemin de la connexion
+    dernieres_connexions.enregistrer(user.id)
 
 
 def authenticate_user(db: Session, login: str, password: str):
     user = db.query(User).filter(User.login == login).first()
-    if not user or not verify_password(password, user.mot_de_passe_hash):
+    valide, nouveau_hachage = verifier_mot_de_passe(password, user.mot_de_passe_hash if user else None)
+    if not user or not valide:
         return False
 
-    # Update last login time
-    user.date_derniere_connexion = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(user)
+    _finaliser_connexion(db, user, nouveau_hachage)
+    return user
 
+
+async def authenticate_user_async(db: Session, login: str, password: str):
+    """
+    Same as authenticate_user for `async def` endpoints: database access runs in the thread pool
+    and the password check in the hashing executor, so the event loop is never blocked.
+    """
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.login == login).first())
+    valide, nouveau_hachage = await verifier_mot_de_passe_async(password, user.mot_de_passe_hash if user else None)
+    if not user or not valide:
+        return False
+
+    await run_in_threadpool(_finaliser_connexion, db, user, nouveau_hachage)
     return user
 
 
@@ -85,7 +100,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # jti rend chaque jeton unique, même pour deux connexions dans la même seconde
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -139,11 +155,18 @@ def get_current_user(db: Session, token: str):
 def get_current_user_security(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer()), db: Session = Depends(get_db)):
     """
     Nouvelle version de get_current_user qui retourne un objet Pydantic UserWithPermissions
-    pour éviter les problèmes de sérialisation avec les objets SQLAlchemy modifiés
+    pour éviter les problèmes de sérialisation avec les objets SQLAlchemy modifiés.
+    Le résultat est mémorisé pour la durée de la requête et conservé dans un cache
+    à durée de vie courte, invalidé lors des modifications de profil, d'affectation ou de station.
     """
     from .schemas import UserWithPermissions, StationResponse
     from ..models import AffectationUtilisateurStation, Station
 
+    # Déjà résolu pendant cette requête (dépendance require_permission puis appel explicite)
+    user_with_permissions = obtenir_utilisateur_requete(credentials.credentials)
+    if user_with_permissions is not None:
+        return user_with_permissions
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -162,6 +185,12 @@ def get_current_user_security(credentials: HTTPAuthorizationCredentials = Depend
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+
+    user_with_permissions = cache_utilisateurs.obtenir(login)
+    if user_with_permissions is not None:
+        enregistrer_utilisateur_requete(credentials.credentials, user_with_permissions)
+        return user_with_permissions
+
     user = db.query(User).filter(User.login == login).first()
     if user is None:
         raise credentials_exception
@@ -232,15 +261,20 @@ def get_current_user_security(credentials: HTTPAuthorizationCredentials = Depend
         stations_accessibles=stations_accessibles
     )
 
+    cache_utilisateurs.enregistrer(login, user_with_permissions)
+    enregistrer_utilisateur_requete(credentials.credentials, user_with_permissions)
+
     return user_with_permissions
 
 
-def get_user_from_refresh_token(db: Session, refresh_token: str) -> tuple:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate refresh token",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def empreinte_token(token: str) -> str:
+    """
+    SHA-256 digest of a token: refresh tokens are stored and looked up by this fixed-length digest.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _decode_refresh_token(refresh_token: str, credentials_exception: HTTPException) -> str:
     try:
         payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
         login: str = payload.get("sub")
@@ -254,16 +288,30 @@ def get_user_from_refresh_token(db: Session, refresh_token: str) -> tuple:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return login
+
+
+def _refresh_token_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def get_user_from_refresh_token(db: Session, refresh_token: str) -> tuple:
+    credentials_exception = _refresh_token_exception()
+    login = _decode_refresh_token(refresh_token, credentials_exception)
 
     user = db.query(User).filter(User.login == login).first()
     if user is None:
         raise credentials_exception
 
-    # Check if the refresh token exists in the database
+    # Check if the refresh token exists in the database (unique index on its digest)
     token_entry = db.query(TokenSession).filter(
         and_(
+            TokenSession.empreinte_refresh == empreinte_token(refresh_token),
             TokenSession.utilisateur_id == user.id,
-            TokenSession.token_refresh == refresh_token,
             TokenSession.actif == True,
             TokenSession.date_expiration > datetime.now(timezone.utc)
         )
@@ -275,26 +323,124 @@ def get_user_from_refresh_token(db: Session, refresh_token: str) -> tuple:
     return user, token_entry
 
 
-def create_tokens_for_user(db: Session, user: User):
+def _add_token_session(db: Session, user: User):
     # Create new tokens
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # cid lets the rate limiter key requests by company without a database lookup
+    access_data = {"sub": user.login}
+    if user.compagnie_id is not None:
+        access_data["cid"] = str(user.compagnie_id)
     access_token = create_access_token(
-        data={"sub": user.login}, expires_delta=access_token_expires
+        data=access_data, expires_delta=access_token_expires
     )
 
     refresh_token = create_refresh_token(
         data={"sub": user.login}
     )
 
-    # Store the refresh token in database
+    # Store the refresh token digest in database
     token_session = TokenSession(
         utilisateur_id=user.id,
         token=access_token,
-        token_refresh=refresh_token,
+        empreinte_refresh=empreinte_token(refresh_token),
         date_expiration=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     )
 
     db.add(token_session)
+    return access_token, refresh_token
+
+
+def create_tokens_for_user(db: Session, user: User):
+    access_token, refresh_token = _add_token_session(db, user)
     db.commit()
 
-    return access_token, refresh_token
\ No newline at end of file
+    return access_token, refresh_token
+
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> tuple:
+    """
+    Exchange a refresh token for a new token pair. The old session is deactivated by a single
+    UPDATE ... RETURNING on its digest, so a token can only be used once even under concurrent
+    requests; the new session is committed in the same transaction.
+
+    Returns:
+        tuple: (user, access_token, refresh_token)
+    """
+    credentials_exception = _refresh_token_exception()
+    login = _decode_refresh_token(refresh_token, credentials_exception)
+
+    utilisateur_id = db.execute(
+        update(TokenSession)
+        .where(
+            TokenSession.empreinte_refresh == empreinte_token(refresh_token),
+            TokenSession.actif == True,
+            TokenSession.date_expiration > datetime.now(timezone.utc)
+        )
+        .values(actif=False, date_modification=func.now())
+        .returning(TokenSession.utilisateur_id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+    user = db.get(User, utilisateur_id) if utilisateur_id is not None else None
+    if user is None or user.login != login:
+        db.rollback()
+        raise credentials_exception
+
+    access_token, new_refresh_token = _add_token_session(db, user)
+    db.commit()
+
+    return user, access_token, new_refresh_token
+
+
+def revoke_refresh_token(db: Session, refresh_token: str, utilisateur_id=None) -> bool:
+    """
+    Deactivate the session of a refresh token (logout). Returns True if an active session was found.
+    """
+    query = update(TokenSession).where(
+        TokenSession.empreinte_refresh == empreinte_token(refresh_token),
+        TokenSession.actif == True
+    )
+    if utilisateur_id is not None:
+        query = query.where(TokenSession.utilisateur_id == utilisateur_id)
+
+    result = db.execute(
+        query.values(actif=False, date_modification=func.now()).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount > 0
+
+
+def purger_sessions_expirees(session_factory=None, retention_jours: float = None, taille_lot: int = 5000) -> int:
+    """
+    Supprime les sessions expirées ou révoquées depuis plus de `retention_jours`, par lots pour ne pas
+    verrouiller la table longtemps. Retourne le nombre de sessions supprimées.
+    """
+    if session_factory is None:
+        from ..database import SessionLocal as session_factory
+    if retention_jours is None:
+        retention_jours = TOKEN_SESSION_RETENTION_DAYS
+
+    limite = datetime.now(timezone.utc) - timedelta(days=retention_jours)
+    perimees = or_(
+        TokenSession.date_expiration < limite,
+        and_(TokenSession.actif == False, TokenSession.date_modification < limite)
+    )
+
+    total = 0
+    db = session_factory()
+    try:
+        while True:
+            lot = select(TokenSession.id).where(perimees).limit(taille_lot).scalar_subquery()
+            supprimees = db.execute(
+                delete(TokenSession).where(TokenSession.id.in_(lot)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            total += supprimees
+            if supprimees < taille_lot:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return total
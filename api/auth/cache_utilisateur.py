@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..logging_config import completer_contexte_journal
+
+
+class CacheUtilisateurs:
+    """
+    Cache borné (LRU) à durée de vie courte des utilisateurs authentifiés (UserWithPermissions),
+    indexé par le sujet du jeton (login). Partagé entre les requêtes d'un même worker.
+    """
+
+    def __init__(self, duree_vie: float = 30.0, taille_max: int = 1024):
+        self.duree_vie = duree_vie
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, login: str):
+        """
+        Retourne l'utilisateur en cache pour ce login, ou None s'il est absent ou expiré
+        """
+        if self.duree_vie <= 0:
+            return None
+        with self._verrou:
+            entree = self._entrees.get(login)
+            if entree is None:
+                return None
+            utilisateur, expiration = entree
+            if expiration < time.monotonic():
+                del self._entrees[login]
+                return None
+            self._entrees.move_to_end(login)
+            return utilisateur
+
+    def enregistrer(self, login: str, utilisateur):
+        """
+        Enregistre un utilisateur en cache en évinçant les entrées les plus anciennes au-delà de la taille maximale
+        """
+        if self.duree_vie <= 0:
+            return
+        with self._verrou:
+            self._entrees[login] = (utilisateur, time.monotonic() + self.duree_vie)
+            self._entrees.move_to_end(login)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def invalider_utilisateur(self, utilisateur_id):
+        """
+        Supprime du cache les entrées d'un utilisateur
+        """
+        utilisateur_id = str(utilisateur_id)
+        with self._verrou:
+            for login in [l for l, (u, _) in self._entrees.items() if str(u.id) == utilisateur_id]:
+                del self._entrees[login]
+
+    def invalider_compagnie(self, compagnie_id):
+        """
+        Supprime du cache les entrées de tous les utilisateurs d'une compagnie
+        """
+        compagnie_id = str(compagnie_id)
+        with self._verrou:
+            for login in [l for l, (u, _) in self._entrees.items() if str(u.compagnie_id) == compagnie_id]:
+                del self._entrees[login]
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+cache_utilisateurs = CacheUtilisateurs(
+    duree_vie=float(os.getenv("AUTH_CACHE_TTL", "30")),
+    taille_max=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
+)
+
+# Mémorisation par requête : jeton -> utilisateur, initialisée par le middleware de l'application
+_utilisateurs_requete: ContextVar[Optional[dict]] = ContextVar("utilisateurs_requete", default=None)
+
+
+def debut_requete():
+    """
+    Ouvre la mémorisation de l'utilisateur authentifié pour la requête courante
+    """
+    return _utilisateurs_requete.set({})
+
+
+def fin_requete(jeton_contexte):
+    _utilisateurs_requete.reset(jeton_contexte)
+
+
+def obtenir_utilisateur_requete(jeton: str):
+    utilisateurs = _utilisateurs_requete.get()
+    return utilisateurs.get(jeton) if utilisateurs is not None else None
+
+
+def enregistrer_utilisateur_requete(jeton: str, utilisateur):
+    utilisateurs = _utilisateurs_requete.get()
+    if utilisateurs is not None:
+        utilisateurs[jeton] = utilisateur
+    # Les logs de la requête portent l'utilisateur authentifié et sa compagnie
+    completer_contexte_journal(user_id=utilisateur.id, company_id=utilisateur.compagnie_id)
+
+
+def _invalider_pour_objet(obj):
+    """
+    Invalide les entrées du cache concernées par la modification d'un objet
+    """
+    from ..models import User, AffectationUtilisateurStation, Station
+    from ..rbac_models import Profil, ProfilModule, UtilisateurProfil
+
+    if isinstance(obj, User):
+        cache_utilisateurs.invalider_utilisateur(obj.id)
+    elif isinstance(obj, (AffectationUtilisateurStation, UtilisateurProfil)):
+        cache_utilisateurs.invalider_utilisateur(obj.utilisateur_id)
+    elif isinstance(obj, Station):
+        cache_utilisateurs.invalider_compagnie(obj.compagnie_id)
+    elif isinstance(obj, Profil):
+        cache_utilisateurs.invalider_compagnie(obj.compagnie_id)
+    elif isinstance(obj, ProfilModule):
+        # Le profil n'est pas forcément chargé : on vide tout le cache (modification rare)
+        cache_utilisateurs.vider()
+
+
+@event.listens_for(Session, "after_flush")
+def _invalider_apres_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        _invalider_pour_objet(obj)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _invalider_apres_requete_groupee(contexte):
+    from ..models import User, AffectationUtilisateurStation, Station
+    from ..rbac_models import Profil, ProfilModule, UtilisateurProfil
+
+    if contexte.mapper.class_ in (User, AffectationUtilisateurStation, Station, Profil, ProfilModule, UtilisateurProfil):
+        cache_utilisateurs.vider()
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from sqlalchemy import update
+
+
+# Facteur de travail bcrypt : chaque incrément double le coût d'un hachage ou d'une vérification.
+# Les hachages d'un facteur différent restent vérifiables et sont mis à niveau à la connexion suivante.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def _tronquer(mot_de_passe: str) -> str:
+    # bcrypt est limité à 72 octets
+    return mot_de_passe[:72] if len(mot_de_passe) > 72 else mot_de_passe
+
+
+class ExecuteurHachage:
+    """
+    Exécuteur dédié au hachage des mots de passe : bcrypt occupe le CPU plusieurs centaines de millisecondes,
+    il ne doit ni bloquer la boucle d'événements ni accaparer le pool de threads des autres endpoints.
+    Le nombre de hachages simultanés est borné par les threads, celui des hachages en attente par une
+    file de taille fixe au-delà de laquelle la demande est refusée (503).
+    """
+
+    def __init__(self, nombre_threads: int = 2, attente_max: int = 64):
+        self.nombre_threads = nombre_threads
+        self._executeur = ThreadPoolExecutor(max_workers=nombre_threads, thread_name_prefix="hachage")
+        self._places = threading.BoundedSemaphore(nombre_threads + attente_max)
+
+    def _soumettre(self, fonction, *args):
+        if not self._places.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Trop de demandes d'authentification simultanées, veuillez réessayer",
+                headers={"Retry-After": "1"}
+            )
+        try:
+            future = self._executeur.submit(fonction, *args)
+        except Exception:
+            self._places.release()
+            raise
+        future.add_done_callback(lambda _: self._places.release())
+        return future
+
+    def executer(self, fonction, *args):
+        """
+        Exécute la fonction dans l'exécuteur et attend son résultat (appelants synchrones)
+        """
+        return self._soumettre(fonction, *args).result()
+
+    async def executer_async(self, fonction, *args):
+        """
+        Exécute la fonction dans l'exécuteur sans bloquer la boucle d'événements
+        """
+        return await asyncio.wrap_future(self._soumettre(fonction, *args))
+
+    def arreter(self):
+        self._executeur.shutdown(wait=False, cancel_futures=True)
+
+
+executeur_hachage = ExecuteurHachage(
+    nombre_threads=int(os.getenv("HACHAGE_THREADS", str(max(1, (os.cpu_count() or 2) // 2)))),
+    attente_max=int(os.getenv("HACHAGE_ATTENTE_MAX", "64"))
+)
+
+
+@lru_cache(maxsize=1)
+def _hachage_factice() -> str:
+    # Hachage vérifié lorsque le login est inconnu, pour que la réponse prenne le même temps
+    return pwd_context.hash("successfuel-login-inconnu")
+
+
+def _verifier_et_mettre_a_jour(mot_de_passe: str, hachage: Optional[str]) -> Tuple[bool, Optional[str]]:
+    try:
+        return pwd_context.verify_and_update(_tronquer(mot_de_passe), hachage or _hachage_factice())
+    except ValueError:
+        return False, None
+
+
+def hacher_mot_de_passe(mot_de_passe: str) -> str:
+    return executeur_hachage.executer(pwd_context.hash, _tronquer(mot_de_passe))
+
+
+def verifier_mot_de_passe(mot_de_passe: str, hachage: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifie un mot de passe ; retourne (valide, nouveau hachage) où le nouveau hachage est renseigné
+    lorsque l'ancien doit être mis à niveau (facteur de travail modifié, schéma obsolète)
+    """
+    valide, nouveau_hachage = executeur_hachage.executer(_verifier_et_mettre_a_jour, mot_de_passe, hachage)
+    return (valide and hachage is not None), nouveau_hachage
+
+
+async def hacher_mot_de_passe_async(mot_de_passe: str) -> str:
+    return await executeur_hachage.executer_async(pwd_context.hash, _tronquer(mot_de_passe))
+
+
+async def verifier_mot_de_passe_async(mot_de_passe: str, hachage: Optional[str]) -> Tuple[bool, Optional[str]]:
+    valide, nouveau_hachage = await executeur_hachage.executer_async(_verifier_et_mettre_a_jour, mot_de_passe, hachage)
+    return (valide and hachage is not None), nouveau_hachage
+
+
+class DernieresConnexions:
+    """
+    Dates de dernière connexion en attente d'écriture : une connexion ne fait pas de commit,
+    les dates sont écrites par lot (un UPDATE pour tous les utilisateurs connectés depuis le dernier lot).
+    """
+
+    def __init__(self):
+        self._dates: Dict[object, datetime] = {}
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, utilisateur_id):
+        with self._verrou:
+            self._dates[utilisateur_id] = datetime.now(timezone.utc)
+
+    def ecrire(self, session_factory=None) -> int:
+        """
+        Écrit les dates en attente en une requête et retourne le nombre d'utilisateurs mis à jour
+        """
+        with self._verrou:
+            dates, self._dates = self._dates, {}
+        if not dates:
+            return 0
+
+        from ..models import User
+        if session_factory is None:
+            from ..database import SessionLocal as session_factory
+
+        db = session_factory()
+        try:
+            db.execute(
+                update(User),
+                [{"id": utilisateur_id, "date_derniere_connexion": date} for utilisateur_id, date in dates.items()]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Les dates seront retentées au prochain lot, sans écraser une connexion plus récente
+            with self._verrou:
+                for utilisateur_id, date in dates.items():
+                    self._dates.setdefault(utilisateur_id, date)
+            raise
+        finally:
+            db.close()
+        return len(dates)
+
+
+dernieres_connexions = DernieresConnexions()
+
+INTERVALLE_DERNIERES_CONNEXIONS = float(os.getenv("DERNIERE_CONNEXION_INTERVALLE", "30"))
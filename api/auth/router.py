@@ -5,6 +5,7 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 from ..rate_limiter import limiter, get_limit_for_env, auth_limiter
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from sqlalchemy import and_, func
@@ -22,7 +23,7 @@ class UserCreateWithoutCompanyId(BaseModel):
     password: str
     role: str  # gerant_compagnie, utilisateur_compagnie
 
-from .auth_handler import authenticate_user, get_current_user, get_current_user_security, get_password_hash, create_tokens_for_user, get_user_from_refresh_token
+from .auth_handler import authenticate_user, authenticate_user_async, get_current_user, get_current_user_security, get_password_hash, create_tokens_for_user, rotate_refresh_token, revoke_refresh_token
 from .journalisation import log_user_action
 from .permission_check import check_company_access
 from ..translations import get_translation
@@ -36,7 +37,8 @@ security = HTTPBearer()
              tags=["Authentification"])
 @limiter.limit(get_limit_for_env(auth_limiter))
 async def login(user_credentials: schemas.UserLogin, request: Request, db: Session = Depends(get_db)):
-    user = authenticate_user(db, user_credentials.login, user_credentials.password)
+    # La vérification bcrypt s'exécute dans l'exécuteur de hachage borné, l'accès à la base dans le pool de threads
+    user = await authenticate_user_async(db, user_credentials.login, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,7 +46,7 @@ async def login(user_credentials: schemas.UserLogin, request: Request, db: Sessi
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token, refresh_token = create_tokens_for_user(db, user)
+    access_token, refresh_token = await run_in_threadpool(create_tokens_for_user, db, user)
 
     # Définir le refresh_token dans un cookie HTTPONLY
     response = JSONResponse(content={
@@ -67,7 +69,7 @@ async def login(user_credentials: schemas.UserLogin, request: Request, db: Sessi
              summary="Rafraîchissement du token d'accès",
              description="Permet de rafraîchir le token d'accès à l'aide du token de rafraîchissement stocké dans les cookies. L'utilisateur doit être authentifié via le cookie refresh_token.",
              tags=["Authentification"])
-async def refresh_token(
+def refresh_token(
     request: Request,
     db: Session = Depends(get_db)
 ):
@@ -85,14 +87,8 @@ async def refresh_token(
         return response
 
     try:
-        user, token_entry = get_user_from_refresh_token(db, refresh_token)
-
-        # Mark old token as inactive
-        token_entry.actif = False
-        db.commit()
-
-        # Create new tokens
-        new_access_token, new_refresh_token = create_tokens_for_user(db, user)
+        # Deactivate the old session and create the new one in a single transaction
+        user, new_access_token, new_refresh_token = rotate_refresh_token(db, refresh_token)
 
         # Set the new refresh token in the cookie
         response = JSONResponse(content={
@@ -124,7 +120,7 @@ async def refresh_token(
              summary="Déconnexion de l'utilisateur",
              description="Déconnecte l'utilisateur en invalidant le token de rafraîchissement et en supprimant le cookie. Requiert un token d'accès valide.",
              tags=["Authentification"])
-async def logout(
+def logout(
     request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -136,28 +132,12 @@ async def logout(
         from .auth_handler import get_current_user
         current_user = get_current_user(db, token)
 
-        # Trouver et désactiver le token de rafraîchissement associé
-        from ..models import TokenSession
-        from datetime import datetime
-        from sqlalchemy import and_
-
         # Récupérer le refresh_token depuis le cookie
         refresh_token = request.cookies.get("refresh_token")
 
         if refresh_token:
-            # Trouver l'entrée dans la base de données
-            token_entry = db.query(TokenSession).filter(
-                and_(
-                    TokenSession.utilisateur_id == current_user.id,
-                    TokenSession.token_refresh == refresh_token,
-                    TokenSession.actif == True
-                )
-            ).first()
-
-            if token_entry:
-                # Marquer comme inactif
-                token_entry.actif = False
-                db.commit()
+            # Désactiver la session associée, retrouvée par l'empreinte du jeton
+            revoke_refresh_token(db, refresh_token, current_user.id)
 
     except Exception:
         # Si le token est invalide, on continue quand même
@@ -175,7 +155,7 @@ async def logout(
              summary="Récupérer les utilisateurs de la compagnie",
              description="Récupère la liste des utilisateurs appartenant à la même compagnie que l'utilisateur connecté. Nécessite des droits de gérant de compagnie ou administrateur.",
              tags=["Authentification"])
-async def get_users(
+def get_users(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -198,7 +178,7 @@ async def get_users(
              summary="Créer un nouvel utilisateur",
              description="Crée un nouvel utilisateur dans la compagnie de l'utilisateur connecté. Nécessite des droits de gérant de compagnie ou administrateur.",
              tags=["Authentification"])
-async def create_user(
+def create_user(
     user: UserCreateWithoutCompanyId,
     request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -277,7 +257,7 @@ async def create_user(
              summary="Récupérer les informations de l'utilisateur connecté",
              description="Récupère les informations de l'utilisateur connecté avec ses permissions. Cet endpoint nécessite un token d'accès valide.",
              tags=["Authentification"])
-async def read_users_me(current_user = Depends(get_current_user_security)):
+def read_users_me(current_user = Depends(get_current_user_security)):
     return current_user
 
 
@@ -286,7 +266,7 @@ async def read_users_me(current_user = Depends(get_current_user_security)):
              summary="Mettre à jour les informations de l'utilisateur connecté",
              description="Met à jour les informations de l'utilisateur connecté. Inclut la possibilité de changer le mot de passe, les informations personnelles ou la désactivation du compte.",
              tags=["Authentification"])
-async def update_current_user(
+def update_current_user(
     user_update: schemas.UserUpdate,
     request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -343,7 +323,7 @@ async def update_current_user(
              summary="Récupérer les stations affectées à un utilisateur",
              description="Récupère la liste des stations affectées à un utilisateur spécifique. Nécessite des droits de gérant de compagnie ou administrateur.",
              tags=["Authentification"])
-async def get_user_stations(
+def get_user_stations(
     user_id: str,  # UUID as string
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -362,7 +342,7 @@ async def get_user_stations(
              summary="Affecter un utilisateur à une station",
              description="Affecte un utilisateur à une station spécifique. Nécessite des droits de gérant de compagnie ou administrateur.",
              tags=["Authentification"])
-async def assign_user_to_station(
+def assign_user_to_station(
     user_id: str,  # UUID as string
     affectation: schemas.AffectationUtilisateurStationCreate,
     db: Session = Depends(get_db),
@@ -405,7 +385,7 @@ async def assign_user_to_station(
                summary="Retirer un utilisateur d'une station",
                description="Retire l'affectation d'un utilisateur à une station spécifique. Nécessite des droits de gérant de compagnie ou administrateur.",
                tags=["Authentification"])
-async def remove_user_from_station(
+def remove_user_from_station(
     user_id: str,  # UUID as string
     station_id: str,
     db: Session = Depends(get_db),
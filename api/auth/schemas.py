@@ -85,7 +85,7 @@ class AffectationUtilisateurStationResponse(BaseModel):
 class TokenSessionCreate(BaseModel):
     utilisateur_id: uuid.UUID = Field(..., description="UUID de l'utilisateur", example="3fa85f64-5717-4562-b3fc-2c963f66afa6")
     token: str = Field(..., description="Token d'accès", example="eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9...")
-    token_refresh: str = Field(..., description="Token de rafraîchissement", example="def50200d55e3e4...")
+    empreinte_refresh: str = Field(..., description="Empreinte SHA-256 (hexadécimale) du token de rafraîchissement, jamais le token lui-même", example="9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08")
     date_expiration: datetime = Field(..., description="Date d'expiration du token", example="2023-01-01T13:00:00")
 
 
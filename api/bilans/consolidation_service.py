@@ -1,14 +1,226 @@
 from sqlalchemy.orm import Session
-from typing import Dict
-from datetime import datetime
+from sqlalchemy import func, case, cast, Numeric
+from typing import Dict, List
+from datetime import datetime, timedelta
+from decimal import Decimal
 from ..models import Station
-from ..models.tresorerie import TresorerieStation, MouvementTresorerie
+from ..models.tresorerie import TresorerieStation, MouvementTresorerie, EtatInitialTresorerie
 from ..models.immobilisation import Immobilisation
 from ..models.stock import StockProduit
+from ..models.produit import Produit
 from ..models.tiers import SoldeTiers
+from ..models.compagnie import Cuve, EtatInitialCuve
+from ..models.prix_carburant import PrixCarburant
+from ..models.vente import Vente
+from ..models.achat import Achat
 from fastapi import HTTPException
 
 
+RUBRIQUES_BILAN = (
+    "tresorerie",
+    "immobilisations",
+    "stocks_carburant",
+    "stocks_boutique",
+    "creances",
+    "dettes",
+    "total_ventes",
+    "total_achats",
+)
+
+
+def _decimal(valeur) -> Decimal:
+    return Decimal(str(valeur)) if valeur is not None else Decimal('0')
+
+
+def _montant(valeur: Decimal) -> float:
+    """
+    Arrondit un total calculé en Decimal au centime pour la réponse JSON
+    """
+    return float(valeur.quantize(Decimal('0.01')))
+
+
+def _agreger(totaux: Dict, rubrique: str, lignes):
+    """
+    Reporte dans les totaux par station le résultat d'un agrégat groupé (station_id, montant)
+    """
+    for station_id, montant in lignes:
+        if station_id in totaux:
+            totaux[station_id][rubrique] += _decimal(montant)
+
+
+def calculer_totaux_stations(
+    db: Session,
+    station_ids: List,
+    date_debut_obj: datetime,
+    date_fin_exclue: datetime
+) -> Dict:
+    """
+    Calcule les rubriques du bilan de chaque station avec un agrégat groupé par station et par rubrique :
+    le nombre de requêtes est constant quel que soit le nombre de stations.
+
+    Returns:
+        Dictionnaire station_id -> {rubrique: Decimal}
+    """
+    totaux = {station_id: {rubrique: Decimal('0') for rubrique in RUBRIQUES_BILAN} for station_id in station_ids}
+    if not station_ids:
+        return totaux
+
+    # 1. Trésorerie : état initial le plus récent de chaque trésorerie station + mouvements validés de la période
+    etats_initiaux = db.query(
+        EtatInitialTresorerie.tresorerie_station_id,
+        EtatInitialTresorerie.montant
+    ).distinct(
+        EtatInitialTresorerie.tresorerie_station_id
+    ).order_by(
+        EtatInitialTresorerie.tresorerie_station_id,
+        EtatInitialTresorerie.date_enregistrement.desc()
+    ).subquery()
+
+    mouvements = db.query(
+        MouvementTresorerie.tresorerie_station_id,
+        func.sum(case(
+            (MouvementTresorerie.type_mouvement == "entrée", MouvementTresorerie.montant),
+            (MouvementTresorerie.type_mouvement == "sortie", -MouvementTresorerie.montant),
+            else_=0
+        )).label("total")
+    ).filter(
+        MouvementTresorerie.date_mouvement >= date_debut_obj,
+        MouvementTresorerie.date_mouvement < date_fin_exclue,
+        MouvementTresorerie.statut == "validé"
+    ).group_by(MouvementTresorerie.tresorerie_station_id).subquery()
+
+    _agreger(totaux, "tresorerie", db.query(
+        TresorerieStation.station_id,
+        func.sum(func.coalesce(etats_initiaux.c.montant, 0) + func.coalesce(mouvements.c.total, 0))
+    ).outerjoin(
+        etats_initiaux, etats_initiaux.c.tresorerie_station_id == TresorerieStation.id
+    ).outerjoin(
+        mouvements, mouvements.c.tresorerie_station_id == TresorerieStation.id
+    ).filter(
+        TresorerieStation.station_id.in_(station_ids)
+    ).group_by(TresorerieStation.station_id).all())
+
+    # 2. Immobilisations : valeur nette, à défaut valeur d'origine
+    _agreger(totaux, "immobilisations", db.query(
+        Immobilisation.station_id,
+        func.sum(func.coalesce(Immobilisation.valeur_nette, Immobilisation.valeur_origine, 0))
+    ).filter(
+        Immobilisation.station_id.in_(station_ids)
+    ).group_by(Immobilisation.station_id).all())
+
+    # 3. Stocks de carburant : volume initial de chaque cuve valorisé au prix de vente (à défaut prix d'achat)
+    etats_cuves = db.query(
+        EtatInitialCuve.cuve_id,
+        EtatInitialCuve.volume_initial_calcule
+    ).distinct(
+        EtatInitialCuve.cuve_id
+    ).order_by(
+        EtatInitialCuve.cuve_id,
+        EtatInitialCuve.date_initialisation.desc()
+    ).subquery()
+
+    prix = db.query(
+        PrixCarburant.carburant_id,
+        PrixCarburant.station_id,
+        func.coalesce(func.nullif(PrixCarburant.prix_vente, 0), PrixCarburant.prix_achat, 0).label("prix_unitaire")
+    ).filter(
+        PrixCarburant.station_id.in_(station_ids)
+    ).distinct(
+        PrixCarburant.carburant_id, PrixCarburant.station_id
+    ).order_by(
+        PrixCarburant.carburant_id, PrixCarburant.station_id, PrixCarburant.date_modification.desc()
+    ).subquery()
+
+    _agreger(totaux, "stocks_carburant", db.query(
+        Cuve.station_id,
+        func.sum(etats_cuves.c.volume_initial_calcule * func.coalesce(prix.c.prix_unitaire, 0))
+    ).join(
+        etats_cuves, etats_cuves.c.cuve_id == Cuve.id
+    ).outerjoin(
+        prix, (prix.c.carburant_id == Cuve.carburant_id) & (prix.c.station_id == Cuve.station_id)
+    ).filter(
+        Cuve.station_id.in_(station_ids)
+    ).group_by(Cuve.station_id).all())
+
+    # 4. Stocks de boutique valorisés au prix de vente du stock (les services ne sont pas stockés)
+    _agreger(totaux, "stocks_boutique", db.query(
+        StockProduit.station_id,
+        func.sum(func.coalesce(StockProduit.quantite_theorique, 0) * func.coalesce(StockProduit.prix_vente, 0))
+    ).join(
+        Produit, Produit.id == StockProduit.produit_id
+    ).filter(
+        StockProduit.station_id.in_(station_ids),
+        Produit.type != "service"
+    ).group_by(StockProduit.station_id).all())
+
+    # 5. Dettes (soldes négatifs) et créances (soldes positifs) des tiers
+    montant_tiers = cast(SoldeTiers.montant_actuel, Numeric(15, 2))
+    for station_id, dettes, creances in db.query(
+        SoldeTiers.station_id,
+        func.sum(case((montant_tiers < 0, -montant_tiers), else_=0)),
+        func.sum(case((montant_tiers >= 0, montant_tiers), else_=0))
+    ).filter(
+        SoldeTiers.station_id.in_(station_ids)
+    ).group_by(SoldeTiers.station_id).all():
+        if station_id in totaux:
+            totaux[station_id]["dettes"] += _decimal(dettes)
+            totaux[station_id]["creances"] += _decimal(creances)
+
+    # 6. Ventes et achats de la période pour le résultat
+    _agreger(totaux, "total_ventes", db.query(
+        Vente.station_id,
+        func.sum(cast(Vente.montant_total, Numeric(15, 2)))
+    ).filter(
+        Vente.station_id.in_(station_ids),
+        Vente.date >= date_debut_obj,
+        Vente.date < date_fin_exclue
+    ).group_by(Vente.station_id).all())
+
+    # Le montant des achats est stocké sous forme de chaîne
+    _agreger(totaux, "total_achats", db.query(
+        Achat.station_id,
+        func.sum(cast(func.nullif(Achat.montant_total, ''), Numeric(15, 2)))
+    ).filter(
+        Achat.station_id.in_(station_ids),
+        Achat.date >= date_debut_obj,
+        Achat.date < date_fin_exclue
+    ).group_by(Achat.station_id).all())
+
+    return totaux
+
+
+def _formater_bilan(totaux: Dict) -> Dict:
+    """
+    Met en forme les rubriques (Decimal) d'une station ou du consolidé selon la structure du bilan
+    """
+    total_actif = (
+        totaux["tresorerie"] + totaux["immobilisations"] + totaux["stocks_carburant"]
+        + totaux["stocks_boutique"] + totaux["creances"]
+    )
+    resultat = totaux["total_ventes"] - totaux["total_achats"]
+
+    return {
+        "actif": {
+            "tresorerie": _montant(totaux["tresorerie"]),
+            "immobilisations": _montant(totaux["immobilisations"]),
+            "stocks_carburant": _montant(totaux["stocks_carburant"]),
+            "stocks_boutique": _montant(totaux["stocks_boutique"]),
+            "creances": _montant(totaux["creances"])
+        },
+        "passif": {
+            "dettes": _montant(totaux["dettes"])
+        },
+        "resultat_period": {
+            "total_ventes": _montant(totaux["total_ventes"]),
+            "total_achats": _montant(totaux["total_achats"]),
+            "resultat": _montant(resultat)
+        },
+        "total_actif": _montant(total_actif),
+        "total_passif": _montant(totaux["dettes"]),
+        "bilan_solde": _montant(total_actif - totaux["dettes"] + resultat)
+    }
+
+
 def get_bilan_global(
     db: Session,
     current_user,
@@ -17,179 +229,57 @@ def get_bilan_global(
     station_id: str = None
 ) -> Dict:
     """
-    Générer un bilan global consolidé pour une période
+    Générer un bilan global consolidé pour une période, avec le détail par station
     """
-    from datetime import datetime
     import uuid
-    
+
     try:
         date_debut_obj = datetime.strptime(date_debut, "%Y-%m-%d")
         date_fin_obj = datetime.strptime(date_fin, "%Y-%m-%d")
     except ValueError:
         raise HTTPException(status_code=400, detail="Format de date invalide, utiliser YYYY-MM-DD")
 
-    # Initialiser les totaux
-    total_tresorerie = 0
-    total_immobilisations = 0
-    total_stocks_carburant = 0
-    total_stocks_boutique = 0
-    total_dettes = 0
-    total_creances = 0
-    total_ventes = 0
-    total_achats = 0
-    resultat = 0
+    # La date de fin est incluse dans la période
+    date_fin_exclue = date_fin_obj + timedelta(days=1)
 
     # Récupérer les stations de l'utilisateur
-    stations_query = db.query(Station).filter(
+    stations_query = db.query(Station.id, Station.nom).filter(
         Station.compagnie_id == current_user.compagnie_id
     )
-    
+
     if station_id:
         try:
             station_uuid = uuid.UUID(station_id)
             stations_query = stations_query.filter(Station.id == station_uuid)
         except ValueError:
             raise HTTPException(status_code=400, detail="ID de station invalide")
-    
+
     stations = stations_query.all()
 
-    # Calculer les totaux pour chaque station
-    for station in stations:
-        # 1. Calculer la tresorerie
-        tresoreries_station = db.query(TresorerieStation).filter(
-            TresorerieStation.station_id == station.id
-        ).all()
-
-        for tresorerie in tresoreries_station:
-            # Solde initial
-            solde_initial = float(tresorerie.solde_initial or 0)
-
-            # Récupération des mouvements dans la période
-            mouvements = db.query(MouvementTresorerie).filter(
-                MouvementTresorerie.tresorerie_station_id == tresorerie.id,
-                MouvementTresorerie.date_mouvement >= date_debut_obj,
-                MouvementTresorerie.date_mouvement <= date_fin_obj,
-                MouvementTresorerie.statut == "validé"
-            ).all()
-
-            total_entrees_per = sum(float(m.montant) for m in mouvements if m.type_mouvement == "entrée")
-            total_sorties_per = sum(float(m.montant) for m in mouvements if m.type_mouvement == "sortie")
-
-            # Calcul du solde final
-            solde_final = solde_initial + total_entrees_per - total_sorties_per
-            total_tresorerie += solde_final
-
-        # 2. Calculer les immobilisations
-        immobilisations = db.query(Immobilisation).filter(
-            Immobilisation.station_id == station.id
-        ).all()
-
-        for immobilisation in immobilisations:
-            total_immobilisations += float(immobilisation.valeur_nette or immobilisation.valeur_origine or 0)
-
-        # 3. Calculer les stocks de carburant
-        from ..models.compagnie import Cuve, EtatInitialCuve
-        from ..models.carburant import Carburant
-        
-        cuves = db.query(Cuve).filter(Cuve.station_id == station.id).all()
-        
-        for cuve in cuves:
-            etat_initial = db.query(EtatInitialCuve).filter(
-                EtatInitialCuve.cuve_id == cuve.id
-            ).first()
-            
-            if etat_initial:
-                # On calcule en se basant sur le volume initial et le prix du carburant
-                volume_initial = float(etat_initial.volume_initial_calcule or 0)
-
-                # Récupérer le prix du carburant pour la station spécifique
-                from ..models.prix_carburant import PrixCarburant
-                prix_carburant = db.query(PrixCarburant).filter(
-                    PrixCarburant.carburant_id == cuve.carburant_id,
-                    PrixCarburant.station_id == cuve.station_id
-                ).first()
-
-                # Utiliser le prix de vente s'il existe, sinon le prix d'achat
-                prix_unitaire = float(prix_carburant.prix_vente or prix_carburant.prix_achat or 0) if prix_carburant else 0
-                valeur_stock = volume_initial * prix_unitaire
-                total_stocks_carburant += valeur_stock
-
-        # 4. Calculer les stocks de boutique
-        stocks_boutique = db.query(StockProduit).filter(
-            StockProduit.station_id == station.id
-        ).all()
-
-        for stock in stocks_boutique:
-            from ..models.produit import Produit
-            produit = db.query(Produit).filter(Produit.id == stock.produit_id).first()
-            if produit and produit.type != "service":  # Ne pas inclure les services
-                valeur_stock = float(stock.quantite_theorique or 0) * float(produit.prix_vente or 0)
-                total_stocks_boutique += valeur_stock
-
-        # 5. Calculer les dettes et créances
-        soldes_tiers = db.query(SoldeTiers).filter(
-            SoldeTiers.station_id == station.id
-        ).all()
-
-        for solde_tiers in soldes_tiers:
-            montant = float(solde_tiers.montant_actuel)
-            if montant < 0:
-                total_dettes += abs(montant)  # Les dettes sont des montants négatifs
-            else:
-                total_creances += montant  # Les créances sont des montants positifs
-
-    # Calcul des ventes et achats pour le résultat
-    # On va récupérer les ventes et achats pour la période
-    from ..models.vente import Vente
-    from ..models.achat import Achat
-    
-    ventes_query = db.query(Vente).join(Station, Vente.station_id == Station.id).filter(
-        Station.compagnie_id == current_user.compagnie_id,
-        Vente.date >= date_debut_obj,
-        Vente.date <= date_fin_obj
+    totaux_stations = calculer_totaux_stations(
+        db, [station.id for station in stations], date_debut_obj, date_fin_exclue
     )
 
-    achats_query = db.query(Achat).join(Station, Achat.station_id == Station.id).filter(
-        Station.compagnie_id == current_user.compagnie_id,
-        Achat.date >= date_debut_obj,
-        Achat.date <= date_fin_obj
-    )
-    
-    if station_id:
-        ventes_query = ventes_query.filter(Vente.station_id == station_uuid)
-        achats_query = achats_query.filter(Achat.station_id == station_uuid)
-    
-    ventes = ventes_query.all()
-    achats = achats_query.all()
-    
-    total_ventes = sum(float(vente.montant_total or 0) for vente in ventes)
-    total_achats = sum(float(achat.montant_total or 0) for achat in achats)
-    
-    resultat = total_ventes - total_achats
+    # Consolidation des totaux (en Decimal) de toutes les stations
+    totaux_consolides = {rubrique: Decimal('0') for rubrique in RUBRIQUES_BILAN}
+    for totaux in totaux_stations.values():
+        for rubrique, montant in totaux.items():
+            totaux_consolides[rubrique] += montant
 
     # Retourner le bilan consolidé
     bilan_consolidé = {
         "date_debut": date_debut,
         "date_fin": date_fin,
         "station_id": station_id,
-        "actif": {
-            "tresorerie": total_tresorerie,
-            "immobilisations": total_immobilisations,
-            "stocks_carburant": total_stocks_carburant,
-            "stocks_boutique": total_stocks_boutique,
-            "creances": total_creances
-        },
-        "passif": {
-            "dettes": total_dettes
-        },
-        "resultat_period": {
-            "total_ventes": total_ventes,
-            "total_achats": total_achats,
-            "resultat": resultat
-        },
-        "total_actif": total_tresorerie + total_immobilisations + total_stocks_carburant + total_stocks_boutique + total_creances,
-        "total_passif": total_dettes,
-        "bilan_solde": (total_tresorerie + total_immobilisations + total_stocks_carburant + total_stocks_boutique + total_creances) - total_dettes + resultat
+        **_formater_bilan(totaux_consolides),
+        "stations": [
+            {
+                "station_id": str(station.id),
+                "nom_station": station.nom,
+                **_formater_bilan(totaux_stations[station.id])
+            }
+            for station in stations
+        ]
     }
 
-    return bilan_consolidé
\ No newline at end of file
+    return bilan_consolidé
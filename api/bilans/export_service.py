@@ -1,58 +1,217 @@
 import csv
 import json
+import logging
 from datetime import datetime, timezone
 from io import StringIO
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional
 from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+# Formats d'export supportés et type MIME associé
+FORMATS_EXPORT = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+# Taille (en caractères) à partir de laquelle le tampon d'écriture est envoyé au client
+TAILLE_TAMPON_EXPORT = 64 * 1024
+
+
+def _vider_tampon(tampon: StringIO) -> str:
+    contenu = tampon.getvalue()
+    tampon.seek(0)
+    tampon.truncate(0)
+    return contenu
+
+
+def ecrire_csv(lignes: Iterable[Dict[str, Any]], colonnes: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Écrit les lignes en CSV au fil de l'eau : seul le tampon courant est gardé en mémoire.
+    Les en-têtes sont les clés de la première ligne si elles ne sont pas fournies.
+    """
+    tampon = StringIO()
+    writer = csv.writer(tampon)
+
+    if colonnes is not None:
+        writer.writerow(colonnes)
+
+    for ligne in lignes:
+        if colonnes is None:
+            colonnes = list(ligne.keys())
+            writer.writerow(colonnes)
+        writer.writerow([ligne.get(colonne, "") for colonne in colonnes])
+
+        if tampon.tell() >= TAILLE_TAMPON_EXPORT:
+            yield _vider_tampon(tampon)
+
+    contenu = _vider_tampon(tampon)
+    if contenu:
+        yield contenu
+
+
+def ecrire_ndjson(lignes: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Écrit les lignes au format NDJSON (un objet JSON par ligne) au fil de l'eau
+    """
+    tampon = StringIO()
+    for ligne in lignes:
+        tampon.write(json.dumps(ligne, default=str, ensure_ascii=False))
+        tampon.write("\n")
+
+        if tampon.tell() >= TAILLE_TAMPON_EXPORT:
+            yield _vider_tampon(tampon)
+
+    contenu = _vider_tampon(tampon)
+    if contenu:
+        yield contenu
+
+
+def ecrire_json(lignes: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Écrit les lignes sous forme de tableau JSON au fil de l'eau
+    """
+    tampon = StringIO()
+    tampon.write("[")
+    separateur = "\n"
+    for ligne in lignes:
+        tampon.write(separateur)
+        tampon.write(json.dumps(ligne, default=str, ensure_ascii=False))
+        separateur = ",\n"
+
+        if tampon.tell() >= TAILLE_TAMPON_EXPORT:
+            yield _vider_tampon(tampon)
+
+    tampon.write("\n]\n")
+    yield _vider_tampon(tampon)
+
+
+def ecrire_export(lignes: Iterable[Dict[str, Any]], export_format: str = "csv") -> Iterator[str]:
+    """
+    Retourne l'écrivain incrémental correspondant au format demandé
+    """
+    export_format = export_format.lower()
+    if export_format == "csv":
+        return ecrire_csv(lignes)
+    elif export_format == "json":
+        return ecrire_json(lignes)
+    elif export_format == "ndjson":
+        return ecrire_ndjson(lignes)
+    else:
+        raise ValueError(f"Format d'export non supporté: {export_format}")
+
+
+def nom_fichier_export(prefixe: str, export_format: str) -> str:
+    return f"{prefixe}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.{export_format.lower()}"
+
+
+def _flux_octets(
+    morceaux: Iterator[str],
+    a_la_fin: Optional[Callable[[int, str], None]] = None
+) -> Iterator[bytes]:
+    """
+    Encode les morceaux en UTF-8 en comptant les octets envoyés ; a_la_fin(taille, statut) est appelé
+    une fois le flux terminé (complet), interrompu par le client (partiel) ou en erreur
+    """
+    taille = 0
+    statut = "partiel"
+    try:
+        for morceau in morceaux:
+            donnees = morceau.encode("utf-8")
+            taille += len(donnees)
+            yield donnees
+        statut = "complet"
+    except Exception:
+        statut = "erreur"
+        raise
+    finally:
+        if a_la_fin is not None:
+            try:
+                a_la_fin(taille, statut)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'enregistrement de l'audit d'export: {e}")
+
+
+def generer_export_streaming(
+    lignes: Iterable[Dict[str, Any]],
+    export_format: str,
+    nom_fichier: str,
+    a_la_fin: Optional[Callable[[int, str], None]] = None
+) -> StreamingResponse:
+    """
+    Construit une réponse qui écrit les lignes au fur et à mesure de leur lecture
+    """
+    morceaux = ecrire_export(lignes, export_format)
+    response = StreamingResponse(_flux_octets(morceaux, a_la_fin), media_type=FORMATS_EXPORT[export_format.lower()])
+    response.headers["Content-Disposition"] = f"attachment; filename={nom_fichier}"
+    return response
+
+
+def exporter_requete(
+    source_lignes: Callable[[Session], Iterable[Dict[str, Any]]],
+    export_format: str,
+    prefixe_fichier: str,
+    audit: Optional[Dict[str, Any]] = None
+) -> StreamingResponse:
+    """
+    Exporte en flux les lignes produites par source_lignes(db).
+
+    La source est exécutée dans une session de lecture dédiée (réplique si configurée), ouverte pendant
+    toute la durée du flux (curseur côté serveur) et indépendante de la session de la requête. Si audit est fourni
+    (arguments de log_export_action), l'export est journalisé après la fin du flux, avec la
+    taille réellement envoyée.
+    """
+    from ..database.db_config import SessionLocal, ReadSessionLocal
+    from .audit_service import log_export_action
+
+    nom_fichier = nom_fichier_export(prefixe_fichier, export_format)
+
+    def lignes():
+        db_export = ReadSessionLocal()
+        try:
+            yield from source_lignes(db_export)
+        finally:
+            db_export.close()
+
+    def journaliser(taille: int, statut: str):
+        if audit is None:
+            return
+        db_audit = SessionLocal()
+        try:
+            log_export_action(
+                db_audit,
+                fichier_genere=nom_fichier,
+                taille_fichier=taille,
+                statut=statut,
+                **audit
+            )
+        finally:
+            db_audit.close()
+
+    return generer_export_streaming(lignes(), export_format, nom_fichier, journaliser)
 
 
 def generate_export_data(data: Dict[str, Any], export_format: str = "csv") -> StreamingResponse:
     """
     Générer un fichier d'export à partir des données fournies
     """
-    if export_format.lower() == "csv":
-        # Convertir les données en CSV
-        output = StringIO()
-        writer = csv.writer(output)
-
-        # Écrire l'en-tête
-        headers = []
-
-        # Pour simplifier, on suppose que les données contiennent un tableau de lignes
-        if "details" in data and isinstance(data["details"], list) and len(data["details"]) > 0:
-            # Extraire les clés du premier élément comme en-têtes
-            headers = list(data["details"][0].keys())
-            writer.writerow(headers)
-
-            # Écrire les lignes
-            for item in data["details"]:
-                row = [item.get(key, "") for key in headers]
-                writer.writerow(row)
-        else:
-            # Si pas de détails, exporter les autres données
-            headers = list(data.keys())
-            writer.writerow(headers)
-            row = [data.get(key, "") for key in headers]
-            writer.writerow(row)
-
-        output.seek(0)
-        response = StreamingResponse(iter([output.getvalue()]), media_type="text/csv")
-        response.headers["Content-Disposition"] = f"attachment; filename=export_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.csv"
-        return response
-
-    elif export_format.lower() == "json":
-        # Convertir les données en JSON
-        json_content = json.dumps(data, default=str, ensure_ascii=False, indent=2)
-        response = StreamingResponse(iter([json_content]), media_type="application/json")
-        response.headers["Content-Disposition"] = f"attachment; filename=export_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.json"
-        return response
+    if export_format.lower() not in FORMATS_EXPORT:
+        raise ValueError(f"Format d'export non supporté: {export_format}")
 
+    # Les données contiennent en général un tableau de lignes ; sinon, on exporte les autres données
+    if "details" in data and isinstance(data["details"], list) and len(data["details"]) > 0:
+        lignes = data["details"]
     else:
-        raise ValueError(f"Format d'export non supporté: {export_format}")
+        lignes = [data]
+
+    return generer_export_streaming(lignes, export_format, nom_fichier_export("export", export_format))
 
 
 def export_bilan_tresorerie(
-    data: Dict[str, Any], 
+    data: Dict[str, Any],
     export_format: str = "csv"
 ) -> StreamingResponse:
     """
@@ -62,7 +221,7 @@ def export_bilan_tresorerie(
 
 
 def export_bilan_tiers(
-    data: Dict[str, Any], 
+    data: Dict[str, Any],
     export_format: str = "csv"
 ) -> StreamingResponse:
     """
@@ -72,7 +231,7 @@ def export_bilan_tiers(
 
 
 def export_bilan_operations(
-    data: Dict[str, Any], 
+    data: Dict[str, Any],
     export_format: str = "csv"
 ) -> StreamingResponse:
     """
@@ -82,7 +241,7 @@ def export_bilan_operations(
 
 
 def export_journal_operations(
-    data: Dict[str, Any], 
+    data: Dict[str, Any],
     export_format: str = "csv"
 ) -> StreamingResponse:
     """
@@ -92,10 +251,10 @@ def export_journal_operations(
 
 
 def export_journal_comptable(
-    data: Dict[str, Any], 
+    data: Dict[str, Any],
     export_format: str = "csv"
 ) -> StreamingResponse:
     """
     Exporter le journal comptable dans le format spécifié
     """
-    return generate_export_data(data, export_format)
\ No newline at end of file
+    return generate_export_data(data, export_format)
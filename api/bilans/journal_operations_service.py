@@ -1,28 +1,16 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
-def get_journal_operations(db: Session, date_debut: str, date_fin: str, station_id: str = None, type_operation: str = None):
+TAILLE_LOT_JOURNAL = 1000
+
+
+def _requete_journal_operations(date_debut_obj: datetime, date_fin_obj: datetime, station_id: str = None, type_operation: str = None):
     """
-    Récupérer le journal des opérations entre deux dates
-    
-    Args:
-        db: Session de base de données
-        date_debut: Date de début au format 'YYYY-MM-DD'
-        date_fin: Date de fin au format 'YYYY-MM-DD'
-        station_id: ID de la station (optionnel)
-        type_operation: Type d'opération (optionnel)
-    
-    Returns:
-        Liste des opérations
+    Construit la requête SQL du journal des opérations et ses paramètres
     """
-    # Conversion des dates
-    date_debut_obj = datetime.strptime(date_debut, "%Y-%m-%d")
-    date_fin_obj = datetime.strptime(date_fin, "%Y-%m-%d")
-    
-    # Construction de la requête SQL
     query = """
         SELECT 
             e.id as ecriture_id,
@@ -39,12 +27,13 @@ def get_journal_operations(db: Session, date_debut: str, date_fin: str, station_
         LEFT JOIN tiers t ON e.tiers_id = t.id
         LEFT JOIN plan_comptable c ON (e.compte_debit = c.id OR e.compte_credit = c.id)
         WHERE e.est_validee = TRUE
-          AND e.date_ecriture BETWEEN :debut AND :fin
+          AND e.date_ecriture >= :debut AND e.date_ecriture < :fin_exclue
     """
     
+    # La date de fin est incluse dans la période
     params = {
         "debut": date_debut_obj,
-        "fin": date_fin_obj
+        "fin_exclue": date_fin_obj + timedelta(days=1)
     }
     
     # Ajout des filtres optionnels
@@ -57,27 +46,50 @@ def get_journal_operations(db: Session, date_debut: str, date_fin: str, station_
         params["type_operation"] = type_operation
     
     query += " ORDER BY e.date_ecriture, e.id"
+    return query, params
+
+
+def _operation_depuis_ligne(row) -> dict:
+    return {
+        "ecriture_id": row.ecriture_id,
+        "date_ecriture": row.date_ecriture,
+        "libelle_ecriture": row.libelle_ecriture,
+        "montant": float(row.montant) if row.montant else 0,
+        "devise": row.devise,
+        "module_origine": row.module_origine,
+        "reference_origine": row.reference_origine,
+        "tiers_nom": row.tiers_nom,
+        "numero_compte": row.numero_compte,
+        "intitule_compte": row.intitule_compte
+    }
+
+
+def get_journal_operations(db: Session, date_debut: str, date_fin: str, station_id: str = None, type_operation: str = None):
+    """
+    Récupérer le journal des opérations entre deux dates
+    
+    Args:
+        db: Session de base de données
+        date_debut: Date de début au format 'YYYY-MM-DD'
+        date_fin: Date de fin au format 'YYYY-MM-DD'
+        station_id: ID de la station (optionnel)
+        type_operation: Type d'opération (optionnel)
+    
+    Returns:
+        Liste des opérations
+    """
+    # Conversion des dates
+    date_debut_obj = datetime.strptime(date_debut, "%Y-%m-%d")
+    date_fin_obj = datetime.strptime(date_fin, "%Y-%m-%d")
+    
+    query, params = _requete_journal_operations(date_debut_obj, date_fin_obj, station_id, type_operation)
     
     # Exécution de la requête
     result = db.execute(text(query), params)
     rows = result.fetchall()
     
     # Conversion des résultats en dictionnaires
-    operations = []
-    for row in rows:
-        operation = {
-            "ecriture_id": row.ecriture_id,
-            "date_ecriture": row.date_ecriture,
-            "libelle_ecriture": row.libelle_ecriture,
-            "montant": float(row.montant) if row.montant else 0,
-            "devise": row.devise,
-            "module_origine": row.module_origine,
-            "reference_origine": row.reference_origine,
-            "tiers_nom": row.tiers_nom,
-            "numero_compte": row.numero_compte,
-            "intitule_compte": row.intitule_compte
-        }
-        operations.append(operation)
+    operations = [_operation_depuis_ligne(row) for row in rows]
     
     return {
         "date_debut": date_debut_obj,
@@ -87,6 +99,36 @@ def get_journal_operations(db: Session, date_debut: str, date_fin: str, station_
     }
 
 
+def iter_journal_operations(db: Session, date_debut: str, date_fin: str, station_id: str = None, type_operation: str = None):
+    """
+    Parcourir le journal des opérations entre deux dates sans le charger en mémoire
+    
+    Les lignes sont lues par lots via un curseur côté serveur : la mémoire utilisée ne dépend
+    pas de la longueur de la période.
+    
+    Args:
+        db: Session de base de données (doit rester ouverte pendant tout le parcours)
+        date_debut: Date de début au format 'YYYY-MM-DD'
+        date_fin: Date de fin au format 'YYYY-MM-DD'
+        station_id: ID de la station (optionnel)
+        type_operation: Type d'opération (optionnel)
+    
+    Yields:
+        Une opération (dictionnaire) par écriture
+    """
+    date_debut_obj = datetime.strptime(date_debut, "%Y-%m-%d")
+    date_fin_obj = datetime.strptime(date_fin, "%Y-%m-%d")
+    
+    query, params = _requete_journal_operations(date_debut_obj, date_fin_obj, station_id, type_operation)
+    
+    result = db.execute(
+        text(query).execution_options(stream_results=True, yield_per=TAILLE_LOT_JOURNAL),
+        params
+    )
+    for row in result:
+        yield _operation_depuis_ligne(row)
+
+
 def get_journal_comptable(db: Session, date_debut: str, date_fin: str):
     """
     Récupérer le journal comptable entre deux dates
@@ -21,7 +21,7 @@ security = HTTPBearer()
            summary="Récupérer le compte de résultat",
            description="Permet de récupérer le compte de résultat pour une période donnée",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_compte_resultat(
+def get_compte_resultat(
     date_debut: str,  # Format: YYYY-MM-DD
     date_fin: str,    # Format: YYYY-MM-DD
     compagnie_id: str = None,
@@ -76,7 +76,7 @@ async def get_compte_resultat(
            summary="Récupérer le grand livre",
            description="Permet de récupérer le grand livre pour une période donnée",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_grand_livre(
+def get_grand_livre(
     date_debut: str,  # Format: YYYY-MM-DD
     date_fin: str,    # Format: YYYY-MM-DD
     compagnie_id: str = None,
@@ -127,7 +127,7 @@ async def get_grand_livre(
            summary="Récupérer le bilan de trésorerie",
            description="Permet de récupérer le bilan de trésorerie pour une période donnée, avec filtrage optionnel par station et type de trésorerie",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_bilan_tresorerie(
+def get_bilan_tresorerie(
     date_debut: str,  # Format: YYYY-MM-DD
     date_fin: str,    # Format: YYYY-MM-DD
     station_id: str = None,
@@ -159,7 +159,7 @@ async def get_bilan_tresorerie(
            summary="Récupérer le bilan des stocks",
            description="Permet de récupérer le bilan des stocks à une date donnée, incluant carburant, boutique et autres produits",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_bilan_stocks(
+def get_bilan_stocks(
     date: str,  # Format: YYYY-MM-DD
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -182,7 +182,7 @@ async def get_bilan_stocks(
            summary="Récupérer le bilan des tiers",
            description="Permet de récupérer le bilan des tiers (clients, fournisseurs, employés) à une date donnée, avec options de filtrage",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_bilan_tiers(
+def get_bilan_tiers(
     date: str,  # Format: YYYY-MM-DD
     type_tiers: str = None,  # client, fournisseur, employe
     tri: str = "nom",  # "nom", "solde", "date"
@@ -210,10 +210,10 @@ async def get_bilan_tiers(
 
 @router.get("/export",
            summary="Exporter les données de bilan",
-           description="Permet d'exporter les données de bilan dans différents formats (CSV, JSON) avec options de filtrage",
+           description="Permet d'exporter les données de bilan dans différents formats (CSV, JSON, NDJSON) avec options de filtrage. Les exports de trésorerie et d'opérations sont envoyés au fil de la lecture des données",
            dependencies=[Depends(require_permission("bilans"))])
-async def export_bilans(
-    format: str = "csv",  # csv, json
+def export_bilans(
+    format: str = "csv",  # csv, json, ndjson
     type_bilan: str = None,  # tresorerie, tiers, operations, etc.
     date_debut: str = None,  # Format: YYYY-MM-DD
     date_fin: str = None,    # Format: YYYY-MM-DD
@@ -226,41 +226,53 @@ async def export_bilans(
     current_user = get_current_user_security(credentials, db)
 
     # Import des services d'export et d'audit
-    from .export_service import export_bilan_tresorerie, export_bilan_tiers, export_bilan_operations
+    from .export_service import export_bilan_tiers, exporter_requete, FORMATS_EXPORT
     from .audit_service import log_export_action
 
+    if format.lower() not in FORMATS_EXPORT:
+        raise HTTPException(status_code=400, detail=f"Format d'export non supporté: {format}")
+
+    # Valider les dates avant de commencer l'envoi du fichier
+    for valeur_date in (date_debut, date_fin):
+        if valeur_date:
+            try:
+                datetime.strptime(valeur_date, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Format de date invalide, utiliser YYYY-MM-DD")
+
+    # Valider la station de la même façon : une fois le flux commencé, une erreur ne peut plus être
+    # renvoyée en 400/404. Les services reçoivent l'identifiant normalisé de la station vérifiée
+    if station_id:
+        station_id = str(check_station_access(db, current_user, station_id).id)
+
     # Récupérer les informations sur le client pour l'audit
     ip_utilisateur = request.client.host if request else None
     user_agent = request.headers.get("user-agent") if request else None
 
     # Récupérer le type de bilan à exporter
     if type_bilan == "tresorerie":
-        # Récupérer les données de bilan de trésorerie
-        from .tresorerie_service import get_bilan_tresorerie_etendu
-        data = get_bilan_tresorerie_etendu(
-            db,
-            current_user,
-            date_debut or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            date_fin or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            station_id,
-            None,
-            "date"
-        )
-
-        # Enregistrer l'action d'export dans l'audit
-        log_export_action(
-            db,
-            str(current_user.id),
-            "tresorerie",
+        # Exporter en flux les mouvements de trésorerie de la période, une ligne par mouvement
+        from .tresorerie_service import iter_mouvements_bilan_tresorerie
+        periode_debut = date_debut or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        periode_fin = date_fin or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+        # L'action d'export est enregistrée dans l'audit à la fin du flux, avec la taille du fichier
+        return exporter_requete(
+            lambda db_export: iter_mouvements_bilan_tresorerie(
+                db_export, current_user, periode_debut, periode_fin, station_id, None
+            ),
             format,
-            fichier_genere=f"export_tresorerie_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.{format}",
-            ip_utilisateur=ip_utilisateur,
-            user_agent=user_agent,
-            details=f"Export du bilan de trésorerie pour la période {date_debut or 'date non spécifiée'} à {date_fin or 'date non spécifiée'}"
+            "export_tresorerie",
+            audit={
+                "utilisateur_id": str(current_user.id),
+                "type_bilan": "tresorerie",
+                "format_export": format,
+                "ip_utilisateur": ip_utilisateur,
+                "user_agent": user_agent,
+                "details": f"Export du bilan de trésorerie pour la période {date_debut or 'date non spécifiée'} à {date_fin or 'date non spécifiée'}"
+            }
         )
 
-        return export_bilan_tresorerie(data, format)
-
     elif type_bilan == "tiers":
         # Récupérer les données de bilan des tiers
         from .tiers_service import get_bilan_tiers_etendu
@@ -288,30 +300,28 @@ async def export_bilans(
         return export_bilan_tiers(data, format)
 
     elif type_bilan == "operations":
-        # Récupérer les données de bilan des opérations
-        from .journal_operations_service import get_journal_operations
-        data = get_journal_operations(
-            db,
-            date_debut or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            date_fin or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            station_id,
-            None
-        )
-
-        # Enregistrer l'action d'export dans l'audit
-        log_export_action(
-            db,
-            str(current_user.id),
-            "operations",
+        # Exporter en flux le journal des opérations de la période
+        from .journal_operations_service import iter_journal_operations
+        periode_debut = date_debut or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        periode_fin = date_fin or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+        # L'action d'export est enregistrée dans l'audit à la fin du flux, avec la taille du fichier
+        return exporter_requete(
+            lambda db_export: iter_journal_operations(
+                db_export, periode_debut, periode_fin, station_id, None
+            ),
             format,
-            fichier_genere=f"export_operations_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.{format}",
-            ip_utilisateur=ip_utilisateur,
-            user_agent=user_agent,
-            details=f"Export du journal des opérations pour la période {date_debut or 'date non spécifiée'} à {date_fin or 'date non spécifiée'}"
+            "export_operations",
+            audit={
+                "utilisateur_id": str(current_user.id),
+                "type_bilan": "operations",
+                "format_export": format,
+                "ip_utilisateur": ip_utilisateur,
+                "user_agent": user_agent,
+                "details": f"Export du journal des opérations pour la période {date_debut or 'date non spécifiée'} à {date_fin or 'date non spécifiée'}"
+            }
         )
 
-        return export_bilan_operations(data, format)
-
     else:
         # Pour les autres types de bilans, on retourne une erreur
         from fastapi import HTTPException
@@ -342,7 +352,7 @@ def check_station_access(db: Session, current_user, station_id: str) -> Station:
            summary="Récupérer le bilan initial de départ d'une station",
            description="Permet de récupérer le bilan initial de départ pour une station spécifique",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_bilan_initial_depart(
+def get_bilan_initial_depart(
     station_id: str,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -364,7 +374,7 @@ async def get_bilan_initial_depart(
            summary="Récupérer le journal des opérations",
            description="Permet de récupérer le journal des opérations entre deux dates, avec options de filtrage",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_journal_operations_endpoint(
+def get_journal_operations_endpoint(
     date_debut: str,  # Format: YYYY-MM-DD
     date_fin: str,    # Format: YYYY-MM-DD
     station_id: str = None,
@@ -390,7 +400,7 @@ async def get_journal_operations_endpoint(
            summary="Récupérer le journal comptable",
            description="Permet de récupérer le journal comptable entre deux dates",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_journal_comptable_endpoint(
+def get_journal_comptable_endpoint(
     date_debut: str,  # Format: YYYY-MM-DD
     date_fin: str,    # Format: YYYY-MM-DD
     db: Session = Depends(get_db),
@@ -412,7 +422,7 @@ async def get_journal_comptable_endpoint(
            summary="Récupérer le bilan consolidé global",
            description="Permet de récupérer le bilan consolidé global pour une période donnée, avec option de filtrage par station",
            dependencies=[Depends(require_permission("bilans"))])
-async def get_bilan_consolidé(
+def get_bilan_consolidé(
     date_debut: str,  # Format: YYYY-MM-DD
     date_fin: str,    # Format: YYYY-MM-DD
     station_id: str = None,
@@ -439,7 +449,7 @@ async def get_bilan_consolidé(
            summary="Lire le bilan initial de départ enregistré",
            description="Permet de lire le bilan initial de départ enregistré dans la base de données pour une station",
            dependencies=[Depends(require_permission("bilans"))])
-async def lire_bilan_initial_depart(
+def lire_bilan_initial_depart(
     station_id: str,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -479,7 +489,7 @@ async def lire_bilan_initial_depart(
            summary="Mettre à jour le bilan initial de départ",
            description="Permet de mettre à jour le bilan initial de départ pour une station",
            dependencies=[Depends(require_permission("bilans"))])
-async def mettre_a_jour_bilan_initial_depart(
+def mettre_a_jour_bilan_initial_depart(
     station_id: str,
     bilan_data: BilanInitialUpdate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -512,7 +522,7 @@ async def mettre_a_jour_bilan_initial_depart(
              summary="Valider le bilan initial de départ",
              description="Permet d'enregistrer et valider le bilan initial de départ pour une station selon les calculs automatiques",
              dependencies=[Depends(require_permission("bilans"))])
-async def valider_bilan_initial_depart(
+def valider_bilan_initial_depart(
     station_id: str,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from ..models.tresorerie import TresorerieStation, MouvementTresorerie
 from ..models.compagnie import Station
 from fastapi import HTTPException
@@ -29,6 +29,9 @@ def get_bilan_tresorerie_etendu(
     except ValueError:
         raise HTTPException(status_code=400, detail="Format de date invalide, utiliser YYYY-MM-DD")
 
+    # La date de fin est incluse dans la période
+    date_fin_exclue = date_fin_obj + timedelta(days=1)
+
     # Construction de la requête pour récupérer les tresoreries
     query = db.query(TresorerieStation).join(
         Station,
@@ -75,7 +78,7 @@ def get_bilan_tresorerie_etendu(
         mouvements = db.query(MouvementTresorerie).filter(
             MouvementTresorerie.tresorerie_station_id == tresorerie.id,
             MouvementTresorerie.date_mouvement >= date_debut_obj,
-            MouvementTresorerie.date_mouvement <= date_fin_obj,
+            MouvementTresorerie.date_mouvement < date_fin_exclue,
             MouvementTresorerie.statut == "validé"
         ).order_by(MouvementTresorerie.date_mouvement if tri == "date" else MouvementTresorerie.montant).all()
 
@@ -132,4 +135,81 @@ def get_bilan_tresorerie_etendu(
         "total_sorties": total_sorties,
         "details": details,
         "message": "Bilan de trésorerie calculé à partir des données de trésorerie"
-    }
\ No newline at end of file
+    }
+
+def iter_mouvements_bilan_tresorerie(
+    db: Session,
+    current_user,
+    date_debut: str,
+    date_fin: str,
+    station_id: Optional[str] = None,
+    type_tresorerie: Optional[str] = None
+):
+    """
+    Parcourir les mouvements validés des trésoreries stations de la période, une ligne par mouvement,
+    sans les charger en mémoire (curseur côté serveur, lecture par lots). Utilisé pour les exports.
+    """
+    from ..models.tresorerie import Tresorerie
+    import uuid
+
+    try:
+        date_debut_obj = datetime.strptime(date_debut, "%Y-%m-%d")
+        date_fin_obj = datetime.strptime(date_fin, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format de date invalide, utiliser YYYY-MM-DD")
+
+    # La date de fin est incluse dans la période
+    date_fin_exclue = date_fin_obj + timedelta(days=1)
+
+    query = db.query(
+        TresorerieStation.id.label("tresorerie_id"),
+        Tresorerie.nom,
+        Tresorerie.type,
+        Station.id.label("station"),
+        Station.nom.label("station_nom"),
+        MouvementTresorerie.id.label("mouvement_id"),
+        MouvementTresorerie.type_mouvement,
+        MouvementTresorerie.montant,
+        MouvementTresorerie.date_mouvement,
+        MouvementTresorerie.description,
+        MouvementTresorerie.module_origine
+    ).join(
+        TresorerieStation, MouvementTresorerie.tresorerie_station_id == TresorerieStation.id
+    ).join(
+        Station, TresorerieStation.station_id == Station.id
+    ).join(
+        Tresorerie, TresorerieStation.tresorerie_id == Tresorerie.id
+    ).filter(
+        Station.compagnie_id == current_user.compagnie_id,
+        MouvementTresorerie.date_mouvement >= date_debut_obj,
+        MouvementTresorerie.date_mouvement < date_fin_exclue,
+        MouvementTresorerie.statut == "validé"
+    )
+
+    if station_id:
+        try:
+            query = query.filter(Station.id == uuid.UUID(station_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ID de station invalide")
+
+    if type_tresorerie:
+        query = query.filter(Tresorerie.type == type_tresorerie)
+
+    query = query.order_by(
+        Station.nom, TresorerieStation.id, MouvementTresorerie.date_mouvement
+    ).yield_per(1000)
+
+    for row in query:
+        yield {
+            "tresorerie_id": str(row.tresorerie_id),
+            "nom": row.nom,
+            "type": row.type,
+            "station": str(row.station),
+            "station_nom": row.station_nom,
+            "mouvement_id": str(row.mouvement_id),
+            "type_mouvement": row.type_mouvement,
+            "montant": float(row.montant),
+            "date": row.date_mouvement.isoformat() if row.date_mouvement else None,
+            "description": row.description,
+            "module_origine": row.module_origine
+        }
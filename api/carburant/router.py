@@ -15,7 +15,7 @@ security = HTTPBearer()
 @router.get("/carburants", response_model=List[CarburantResponse],
            summary="Récupérer la liste des carburants",
            description="Permet de récupérer la liste de tous les types de carburants disponibles dans le système")
-async def get_carburants(
+def get_carburants(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -31,7 +31,7 @@ async def get_carburants(
 @router.get("/carburants/grouped-by-company", response_model=List[CarburantGroupedByCompany],
            summary="Récupérer les carburants groupés par compagnie",
            description="Permet de récupérer la liste des carburants groupés par compagnie")
-async def get_carburants_grouped_by_company(
+def get_carburants_grouped_by_company(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
 from uuid import UUID
@@ -14,6 +14,9 @@ from ..auth.permission_check import check_company_access
 from ..stocks.schemas import StockCarburantInitialCreate
 from .schemas_etat_initial_update import EtatInitialCuveUpdateRequest
 from ..services.compagnie.etat_initial_cuve_service import update_etat_initial_cuve_service, delete_etat_initial_cuve_service, create_etat_initial_cuve_service
+from ..services.stocks.barremage_service import get_bareme_cuve, convertir_hauteurs_en_volumes
+from ..services.pagination_service import appliquer_recherche_textuelle
+from ..services.stocks.alerte_cuve_service import get_cuves_stock_bas as service_get_cuves_stock_bas
 
 
 def make_serializable(obj):
@@ -40,7 +43,7 @@ security = HTTPBearer()
              summary="Récupérer la compagnie de l'utilisateur",
              description="Récupère les informations de la compagnie à laquelle appartient l'utilisateur connecté.",
              tags=["Compagnie"])
-async def get_my_compagnie(
+def get_my_compagnie(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -57,7 +60,7 @@ async def get_my_compagnie(
              summary="Mettre à jour la compagnie de l'utilisateur",
              description="Met à jour les informations de la compagnie à laquelle appartient l'utilisateur connecté.",
              tags=["Compagnie"])
-async def update_my_compagnie(
+def update_my_compagnie(
     compagnie_update: schemas.CompagnieUpdate,
     request: Request,
     db: Session = Depends(get_db),
@@ -105,19 +108,23 @@ async def update_my_compagnie(
              summary="Récupérer les stations de la compagnie",
              description="Récupère la liste des stations appartenant à la compagnie de l'utilisateur connecté.",
              tags=["Compagnie"])
-async def get_stations(
+def get_stations(
     skip: int = 0,
     limit: int = 100,
+    q: Optional[str] = Query(None, description="Recherche sur le nom ou le code de la station"),
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     current_user = get_current_user_security(credentials, db)
 
     # Get stations for the user's company, excluding those with status 'supprimer'
-    stations = db.query(StationModel).filter(
+    query = db.query(StationModel).filter(
         StationModel.compagnie_id == current_user.compagnie_id,
         StationModel.statut != 'supprimer'
-    ).offset(skip).limit(limit).all()
+    )
+    # Text search on nom/code, most relevant first
+    query = appliquer_recherche_textuelle(query, StationModel, q)
+    stations = query.offset(skip).limit(limit).all()
     return stations
 
 @router.post("/stations",
@@ -125,7 +132,7 @@ async def get_stations(
              summary="Créer une nouvelle station",
              description="Crée une nouvelle station-service pour la compagnie de l'utilisateur connecté.",
              tags=["Compagnie"])
-async def create_station(
+def create_station(
     station: schemas.StationCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -193,7 +200,7 @@ async def create_station(
              summary="Récupérer les stations avec les informations de la compagnie",
              description="Récupère la liste des stations avec les informations de la compagnie à laquelle elles appartiennent.",
              tags=["Compagnie"])
-async def get_stations_with_compagnie(
+def get_stations_with_compagnie(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -213,7 +220,7 @@ async def get_stations_with_compagnie(
              summary="Récupérer les stations actives",
              description="Récupère la liste des stations actives appartenant à la compagnie de l'utilisateur connecté.",
              tags=["Compagnie"])
-async def get_active_stations(
+def get_active_stations(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -231,7 +238,7 @@ async def get_active_stations(
              summary="Récupérer une station par son ID",
              description="Récupère les détails d'une station spécifique par son ID.",
              tags=["Compagnie"])
-async def get_station_by_id(
+def get_station_by_id(
     station_id: str,  # Changed to string for UUID
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -253,7 +260,7 @@ async def get_station_by_id(
              summary="Activer une station",
              description="Active une station spécifique.",
              tags=["Compagnie"])
-async def activate_station(
+def activate_station(
     station_id: str,  # Changed to string for UUID
     request: Request,
     db: Session = Depends(get_db),
@@ -302,7 +309,7 @@ async def activate_station(
              summary="Mettre à jour une station",
              description="Met à jour les informations d'une station spécifique.",
              tags=["Compagnie"])
-async def update_station(
+def update_station(
     station_id: str,  # Changed to string for UUID
     station: schemas.StationUpdate,
     request: Request,
@@ -368,7 +375,7 @@ async def update_station(
              summary="Mettre à jour la configuration d'une station",
              description="Met à jour la configuration d'une station.",
              tags=["Compagnie"])
-async def update_station_config(
+def update_station_config(
     station_id: str,  # Changed to string for UUID
     config_update: schemas.StationConfigUpdate,
     request: Request,
@@ -445,7 +452,7 @@ async def update_station_config(
                summary="Supprimer une station",
                description="Supprime une station (suppression logique).",
                tags=["Compagnie"])
-async def delete_station(
+def delete_station(
     station_id: str,  # Changed to string for UUID
     request: Request,
     db: Session = Depends(get_db),
@@ -494,7 +501,7 @@ async def delete_station(
            summary="Récupérer les cuves d'une station",
            description="Récupère la liste de toutes les cuves associées à une station spécifique, avec les informations sur le carburant contenu. Cet endpoint nécessite une authentification JWT valide et l'utilisateur doit appartenir à la même compagnie que la station spécifiée.",
            tags=["Compagnie"])
-async def get_cuves(
+def get_cuves(
     station_id: str,  # Changed to string for UUID
     skip: int = Query(default=0, ge=0, description="Nombre d'éléments à ignorer pour la pagination"),
     limit: int = Query(default=100, ge=0, le=1000, description="Nombre maximum d'éléments à retourner, limité à 1000"),
@@ -531,12 +538,53 @@ async def get_cuves(
     cuves = db.query(Cuve).join(Carburant).filter(Cuve.station_id == station_id).offset(skip).limit(limit).all()
     return cuves
 
+@router.post("/stations/{station_id}/cuves/conversion-jauges",
+             response_model=List[schemas.ConversionJaugeResponse],
+             summary="Convertir des hauteurs de jauge en volumes",
+             description="Convertit en un appel les hauteurs de jauge de plusieurs cuves d'une station (par exemple les jaugeages de fin de poste) en volumes, d'après le barremage de chaque cuve. Une mesure en erreur (cuve inconnue, barremage absent ou mal formaté) n'empêche pas la conversion des autres.",
+             tags=["Compagnie"])
+def convertir_jauges_station(
+    station_id: str,
+    conversion: schemas.ConversionJaugesRequest,
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Convertir les hauteurs de jauge des cuves d'une station en volumes.
+
+    Args:
+        station_id: ID de la station des cuves jaugées
+        conversion: Mesures à convertir (cuve_id, hauteur_cm)
+        db: Session de base de données
+        credentials: Informations d'authentification de l'utilisateur
+
+    Returns:
+        List[schemas.ConversionJaugeResponse]: Volume (ou erreur) de chaque mesure, dans l'ordre des mesures
+
+    Raises:
+        HTTPException 404: Si la station n'existe pas ou ne fait pas partie de la compagnie de l'utilisateur
+    """
+    current_user = get_current_user_security(credentials, db)
+
+    station = db.query(StationModel).filter(
+        StationModel.id == station_id,
+        StationModel.compagnie_id == current_user.compagnie_id
+    ).first()
+    if not station:
+        raise HTTPException(status_code=404, detail="Station not found")
+
+    return convertir_hauteurs_en_volumes(
+        db,
+        [(mesure.cuve_id, mesure.hauteur_cm) for mesure in conversion.mesures],
+        station_id=station.id
+    )
+
 @router.get("/cuves",
            response_model=List[schemas.CuveWithStationResponse],
            summary="Récupérer toutes les cuves de la compagnie",
            description="Récupère la liste de toutes les cuves appartenant à la compagnie de l'utilisateur authentifié, avec les informations sur les stations auxquelles elles sont rattachées. Cet endpoint nécessite une authentification JWT valide.",
            tags=["Compagnie"])
-async def get_all_cuves_in_company(
+def get_all_cuves_in_company(
     skip: int = Query(default=0, ge=0, description="Nombre d'éléments à ignorer pour la pagination"),
     limit: int = Query(default=100, ge=0, le=1000, description="Nombre maximum d'éléments à retourner, limité à 1000"),
     db: Session = Depends(get_db),
@@ -570,7 +618,7 @@ async def get_all_cuves_in_company(
              summary="Créer une nouvelle cuve pour une station",
              description="Crée une nouvelle cuve associée à une station spécifique. Requiert une authentification JWT valide et des droits de gestionnaire de compagnie ou administrateur.",
              tags=["Compagnie"])
-async def create_cuve(
+def create_cuve(
     station_id: str,
     cuve: schemas.CuveCreate,
     request: Request,
@@ -642,7 +690,7 @@ async def create_cuve(
            summary="Récupérer une cuve spécifique par son ID",
            description="Récupère les détails d'une cuve spécifique par son identifiant, avec les informations sur le carburant qu'elle contient. Cet endpoint nécessite une authentification JWT valide et l'utilisateur doit appartenir à la même compagnie que la cuve.",
            tags=["Compagnie"])
-async def get_cuve_by_id(
+def get_cuve_by_id(
     cuve_id: str,  # Changed to string for UUID
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -678,7 +726,7 @@ async def get_cuve_by_id(
            summary="Mettre à jour une cuve spécifique",
            description="Met à jour les détails d'une cuve spécifique par son identifiant. Requiert une authentification JWT valide et des droits de gestionnaire de compagnie ou administrateur.",
            tags=["Compagnie"])
-async def update_cuve(
+def update_cuve(
     cuve_id: str,  # Changed to string for UUID
     cuve: schemas.CuveUpdate,
     request: Request,
@@ -750,7 +798,7 @@ async def update_cuve(
     return db_cuve
 
 @router.delete("/cuves/{cuve_id}")
-async def delete_cuve(
+def delete_cuve(
     cuve_id: str,  # Changed to string for UUID
     request: Request,
     db: Session = Depends(get_db),
@@ -791,7 +839,7 @@ async def delete_cuve(
 
 # Pistolet endpoints
 @router.get("/cuves/{cuve_id}/pistolets", response_model=List[schemas.PistoletWithCuveResponse])
-async def get_pistolets(
+def get_pistolets(
     cuve_id: str,  # Changed to string for UUID
     skip: int = 0,
     limit: int = 100,
@@ -808,7 +856,7 @@ async def get_pistolets(
     return pistolets
 
 @router.get("/pistolets-with-cuve", response_model=List[schemas.PistoletWithCuveResponse])
-async def get_pistolets_with_cuve(
+def get_pistolets_with_cuve(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -823,7 +871,7 @@ async def get_pistolets_with_cuve(
     return pistolets
 
 @router.post("/cuves/{cuve_id}/pistolets", response_model=schemas.PistoletResponse)
-async def create_pistolet(
+def create_pistolet(
     cuve_id: str,  # Changed to string for UUID
     pistolet: schemas.PistoletCreate,
     request: Request,
@@ -874,7 +922,7 @@ async def create_pistolet(
     return db_pistolet
 
 @router.get("/pistolets/{pistolet_id}", response_model=schemas.PistoletResponse)
-async def get_pistolet_by_id(
+def get_pistolet_by_id(
     pistolet_id: str,  # Changed to string for UUID
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -891,7 +939,7 @@ async def get_pistolet_by_id(
     return pistolet
 
 @router.put("/pistolets/{pistolet_id}", response_model=schemas.PistoletResponse)
-async def update_pistolet(
+def update_pistolet(
     pistolet_id: str,  # Changed to string for UUID
     pistolet: schemas.PistoletUpdate,
     request: Request,
@@ -945,7 +993,7 @@ async def update_pistolet(
     return db_pistolet
 
 @router.delete("/pistolets/{pistolet_id}")
-async def delete_pistolet(
+def delete_pistolet(
     pistolet_id: str,  # Changed to string for UUID
     request: Request,
     db: Session = Depends(get_db),
@@ -989,7 +1037,7 @@ async def delete_pistolet(
              response_model=schemas.EtatInitialCuveResponse,
              summary="Créer l'état initial d'une cuve",
              description="Crée l'état initial d'une cuve. Le champ cuve_id est transmis dans l'URL. Les champs date_initialisation et utilisateur_id sont automatiquement définis. Le volume_initial_calcule est automatiquement calculé à partir de la hauteur jauge et du barremage de la cuve.")
-async def create_etat_initial_cuve(
+def create_etat_initial_cuve(
     cuve_id: str,  # Changed to string for UUID
     etat_initial_data: StockCarburantInitialCreate,
     request: Request,
@@ -1022,32 +1070,17 @@ async def create_etat_initial_cuve(
 
     # Vérifier que la hauteur de jauge initiale n'est pas supérieure à la hauteur qui correspond à la capacité maximale
     try:
-        import json
-        # Gérer les deux cas : barremage peut être une chaîne JSON ou déjà un objet Python
-        if isinstance(cuve.barremage, str):
-            barremage = json.loads(cuve.barremage)
-        else:
-            # Si cuve.barremage n'est pas une chaîne, on suppose que c'est déjà un objet Python
-            barremage = cuve.barremage
-
-        # Vérifier que le barremage est bien une liste
-        if not isinstance(barremage, list):
-            raise ValueError("Le barremage doit être une liste d'objets")
-
-        # Trouver la hauteur maximale dans le barremage
-        # Supporte les deux formats (hauteur_cm et hauteur)
-        hauteurs = [item.get('hauteur_cm', item.get('hauteur', 0)) for item in barremage]
-        max_hauteur = max(hauteurs)
-        if etat_initial_data.hauteur_jauge_initiale > max_hauteur:
-            raise HTTPException(
-                status_code=400,
-                detail=f"La hauteur de jauge initiale dépasse la hauteur maximale du barremage ({max_hauteur} cm)"
-            )
-    except (json.JSONDecodeError, KeyError, ValueError, TypeError):
+        max_hauteur = get_bareme_cuve(cuve).hauteur_max
+    except ValueError:
         raise HTTPException(
             status_code=400,
             detail="Le barremage de la cuve est mal formaté ou incorrect"
         )
+    if etat_initial_data.hauteur_jauge_initiale > max_hauteur:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La hauteur de jauge initiale dépasse la hauteur maximale du barremage ({max_hauteur} cm)"
+        )
 
     # Calculer le volume à partir de la hauteur et du barremage
     try:
@@ -1074,7 +1107,7 @@ async def create_etat_initial_cuve(
         )
 
     # Créer le stock initial carburant
-    stock_initial = await create_etat_initial_cuve_service(
+    stock_initial = create_etat_initial_cuve_service(
         cuve_id,
         etat_initial_data,
         volume_calcule,
@@ -1118,7 +1151,7 @@ async def create_etat_initial_cuve(
     return response_data
 
 @router.get("/cuves/{cuve_id}/etat_initial", response_model=schemas.EtatInitialCuveWithCuveCarburantResponse)
-async def get_etat_initial_cuve(
+def get_etat_initial_cuve(
     cuve_id: str,  # Changed to string for UUID
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -1172,7 +1205,7 @@ async def get_etat_initial_cuve(
     }
 
 @router.put("/cuves/{cuve_id}/etat_initial", response_model=schemas.EtatInitialCuveResponse, operation_id="update_etat_initial_cuve")
-async def update_etat_initial_cuve(
+def update_etat_initial_cuve(
     cuve_id: str,  # Changed to string for UUID
     etat_initial_data: EtatInitialCuveUpdateRequest,
     request: Request,
@@ -1249,36 +1282,16 @@ async def update_etat_initial_cuve(
     # Vérifier que la hauteur jauge initiale est fournie si elle est dans les données de mise à jour
     if etat_initial_data.hauteur_jauge_initiale is not None:
         try:
-            import json
-            # Gérer les deux cas : barremage peut être une chaîne JSON ou déjà un objet Python
-            if isinstance(cuve.barremage, str):
-                barremage = json.loads(cuve.barremage)
-            else:
-                # Si cuve.barremage n'est pas une chaîne, on suppose que c'est déjà un objet Python
-                barremage = cuve.barremage
-
-            # Vérifier que le barremage est bien une liste
-            if not isinstance(barremage, list):
-                raise ValueError("Le barremage doit être une liste d'objets")
-
-            # Trouver la hauteur maximale dans le barremage
-            # Supporte les deux formats (hauteur_cm et hauteur)
-            hauteurs = [item.get('hauteur_cm', item.get('hauteur', 0)) for item in barremage]
-            max_hauteur = max(hauteurs)
-            if etat_initial_data.hauteur_jauge_initiale > max_hauteur:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"La hauteur jauge initiale ne doit pas dépasser {max_hauteur} cm."
-                )
-        except json.JSONDecodeError:
+            max_hauteur = get_bareme_cuve(cuve).hauteur_max
+        except ValueError as e:
             raise HTTPException(
                 status_code=400,
-                detail="Le format du barremage est invalide."
+                detail=str(e)
             )
-        except Exception as e:
+        if etat_initial_data.hauteur_jauge_initiale > max_hauteur:
             raise HTTPException(
                 status_code=400,
-                detail=str(e)
+                detail=f"La hauteur jauge initiale ne doit pas dépasser {max_hauteur} cm."
             )
 
     # Log the action before update
@@ -1301,7 +1314,7 @@ async def update_etat_initial_cuve(
         volume_calcule = db_etat_initial.volume_initial_calcule  # Use existing value if not updating
 
     # Use the service to update the initial state
-    updated_etat_initial = await update_etat_initial_cuve_service(
+    updated_etat_initial = update_etat_initial_cuve_service(
         cuve_id,
         etat_initial_data,
         volume_calcule,
@@ -1314,7 +1327,7 @@ async def update_etat_initial_cuve(
 
 
 @router.delete("/cuves/{cuve_id}/etat_initial", operation_id="delete_etat_initial_cuve")
-async def delete_etat_initial_cuve(
+def delete_etat_initial_cuve(
     cuve_id: str,  # Changed to string for UUID
     request: Request,
     db: Session = Depends(get_db),
@@ -1332,7 +1345,7 @@ async def delete_etat_initial_cuve(
 
     # Supprimer l'état initial
     try:
-        result = await delete_etat_initial_cuve_service(
+        result = delete_etat_initial_cuve_service(
             cuve_id,
             db,
             current_user
@@ -1363,7 +1376,7 @@ async def delete_etat_initial_cuve(
 
 # MouvementStockCuve endpoints
 @router.get("/cuves/{cuve_id}/mouvements", response_model=List[schemas.MouvementStockCuveResponse])
-async def get_mouvements_stock_cuve(
+def get_mouvements_stock_cuve(
     cuve_id: str,  # Changed to string for UUID
     skip: int = 0,
     limit: int = 100,
@@ -1393,7 +1406,7 @@ async def get_mouvements_stock_cuve(
 
 
 @router.post("/cuves/{cuve_id}/mouvements", response_model=schemas.MouvementStockCuveResponse)
-async def create_mouvement_stock_cuve(
+def create_mouvement_stock_cuve(
     cuve_id: str,  # Changed to string for UUID
     mouvement_data: schemas.MouvementStockCuveCreate,
     request: Request,
@@ -1421,24 +1434,13 @@ async def create_mouvement_stock_cuve(
             detail="Type de mouvement invalide. Doit être 'entrée', 'sortie' ou 'ajustement'"
         )
 
-    # Calculer les stocks avant et après
-    # Récupérer le dernier mouvement pour déterminer le stock de base
-    dernier_mouvement = db.query(MouvementStockCuve).filter(
-        MouvementStockCuve.cuve_id == cuve_id
-    ).order_by(MouvementStockCuve.date_mouvement.desc()).first()
-
-    stock_avant = 0
-    if dernier_mouvement:
-        stock_avant = dernier_mouvement.stock_apres or 0
-    else:
-        # Si aucun mouvement existant, vérifier l'état initial de la cuve
-        etat_initial = db.query(EtatInitialCuve).filter(
-            EtatInitialCuve.cuve_id == cuve_id
-        ).first()
-        if etat_initial:
-            stock_avant = etat_initial.volume_initial_calcule
+    # Calculer le stock après le mouvement à partir du niveau courant du registre de la cuve.
+    # Le verrou du registre est conservé jusqu'au commit : aucun autre mouvement ne peut s'intercaler
+    # entre ce contrôle et l'insertion. stock_avant / stock_apres sont attribués par le trigger du registre.
+    from ..services.stocks.registre_cuve_service import verrouiller_cuve, get_stock_cuve
+    verrouiller_cuve(db, cuve.id)
+    stock_avant = get_stock_cuve(db, cuve.id)
 
-    # Calculer le stock après
     if mouvement_data.type_mouvement == "entrée":
         stock_apres = stock_avant + float(mouvement_data.quantite)
     elif mouvement_data.type_mouvement == "sortie":
@@ -1449,8 +1451,8 @@ async def create_mouvement_stock_cuve(
                 status_code=400,
                 detail="Quantité de sortie supérieure au stock disponible"
             )
-    else:  # ajustement
-        stock_apres = float(mouvement_data.quantite)
+    else:  # ajustement (quantité signée)
+        stock_apres = stock_avant + float(mouvement_data.quantite)
 
     # Vérifier que le stock ne dépasse pas la capacité de la cuve
     if stock_apres > cuve.capacite_maximale:
@@ -1459,12 +1461,8 @@ async def create_mouvement_stock_cuve(
             detail="Le stock après mouvement dépasse la capacité maximale de la cuve"
         )
 
-    # Créer le mouvement de stock
-    nouveau_mouvement = MouvementStockCuve(
-        **mouvement_data.dict(),
-        stock_avant=stock_avant,
-        stock_apres=stock_apres
-    )
+    # Créer le mouvement de stock sur la cuve verrouillée
+    nouveau_mouvement = MouvementStockCuve(**{**mouvement_data.dict(), "cuve_id": cuve.id})
 
     db.add(nouveau_mouvement)
     db.commit()
@@ -1486,9 +1484,45 @@ async def create_mouvement_stock_cuve(
     return nouveau_mouvement
 
 
+@router.post("/cuves/{cuve_id}/mouvements/recalculer")
+def recalculer_registre_cuve(
+    cuve_id: str,  # Changed to string for UUID
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Recalcule stock_avant / stock_apres de tous les mouvements de la cuve et ses points journaliers
+    de stock (réparation du registre)
+    """
+    current_user = get_current_user_security(credentials, db)
+
+    # Vérifier que l'utilisateur a accès à la station de la cuve
+    cuve = db.query(Cuve).join(StationModel).filter(
+        Cuve.id == cuve_id,
+        StationModel.compagnie_id == current_user.compagnie_id
+    ).first()
+
+    if not cuve:
+        raise HTTPException(
+            status_code=404,
+            detail="Cuve non trouvée ou vous n'avez pas accès à cette cuve"
+        )
+
+    from ..services.stocks.registre_cuve_service import recalculer_registre_cuves, reconstruire_points_cuves, get_stock_cuve
+    nombre_mouvements = recalculer_registre_cuves(db, cuve.id)
+    nombre_points = reconstruire_points_cuves(db, cuve.id)
+
+    return {
+        "message": "Registre de la cuve recalculé",
+        "nombre_mouvements_corriges": nombre_mouvements,
+        "nombre_points_reconstruits": nombre_points,
+        "stock_actuel": get_stock_cuve(db, cuve.id)
+    }
+
+
 # Produits Boutique endpoints
 @router.get("/stations/{station_id}/produits-boutique", response_model=List[schemas.ProduitBoutiqueResponse])
-async def get_produits_boutique_station(
+def get_produits_boutique_station(
     station_id: str,  # Changed to string for UUID
     skip: int = 0,
     limit: int = 100,
@@ -1519,7 +1553,7 @@ async def get_produits_boutique_station(
 
 
 @router.get("/produits-boutique-with-station", response_model=List[schemas.ProduitBoutiqueWithStationResponse])
-async def get_produits_boutique_with_station(
+def get_produits_boutique_with_station(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -1538,7 +1572,7 @@ async def get_produits_boutique_with_station(
 
 # Endpoints pour la consultation des stocks de produits
 @router.get("/stocks-produits", response_model=List[schemas.StockProduitResponse])
-async def get_stocks_produits(
+def get_stocks_produits(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -1555,7 +1589,7 @@ async def get_stocks_produits(
 
 
 @router.get("/produits-with-stock", response_model=List[schemas.ProduitWithStockResponse])
-async def get_produits_with_stock(
+def get_produits_with_stock(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -1573,7 +1607,7 @@ async def get_produits_with_stock(
 
 # Endpoints d'intégration avec les modules opérationnels
 @router.post("/integration/ajouter-mouvement-stock", response_model=schemas.MouvementStockCuveResponse)
-async def integration_ajouter_mouvement_stock(
+def integration_ajouter_mouvement_stock(
     mouvement_data: schemas.MouvementStockCuveCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -1669,7 +1703,7 @@ async def integration_ajouter_mouvement_stock(
 
 
 @router.post("/integration/mettre-a-jour-stock-produit", response_model=schemas.StockProduitResponse)
-async def integration_mettre_a_jour_stock_produit(
+def integration_mettre_a_jour_stock_produit(
     produit_id: str,
     station_id: str,
     request: Request,
@@ -1749,8 +1783,36 @@ async def integration_mettre_a_jour_stock_produit(
 
 
 # Endpoints pour les stocks de cuves
+@router.get("/stocks-cuves/alertes",
+             response_model=List[schemas.StockCuveAlerteResponse],
+             summary="Récupérer les cuves en stock bas",
+             description="Retourne les cuves de la compagnie dont le stock est sous le seuil d'alerte, triées par autonomie croissante (jours de vente couverts par le stock, calculés sur le débit moyen des ventes récentes). Calculé en une requête, l'endpoint peut être interrogé régulièrement par les tableaux de bord.",
+             tags=["Compagnie"])
+def get_cuves_stock_bas(
+    station_id: Optional[uuid.UUID] = Query(None, description="Limiter aux cuves d'une station"),
+    periode_jours: int = Query(7, ge=1, le=90, description="Nombre de jours de ventes servant au calcul du débit moyen"),
+    jours_autonomie_max: Optional[float] = Query(None, ge=0, description="Inclure aussi les cuves au-dessus du seuil dont l'autonomie est inférieure ou égale à ce nombre de jours"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Endpoint de surveillance des cuves en stock bas
+    """
+    current_user = get_current_user_security(credentials, db)
+
+    return service_get_cuves_stock_bas(
+        db,
+        current_user.compagnie_id,
+        station_id=station_id,
+        periode_jours=periode_jours,
+        jours_autonomie_max=jours_autonomie_max,
+        limit=limit
+    )
+
+
 @router.get("/stocks-cuves/{cuve_id}", response_model=schemas.StockCuveResponse)
-async def get_stock_cuve(
+def get_stock_cuve(
     cuve_id: str,  # Changed to string for UUID
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -1763,11 +1825,13 @@ async def get_stock_cuve(
     # Vérifier que la cuve appartient à la même compagnie que l'utilisateur
     from sqlalchemy import text
     result = db.execute(text("""
-        SELECT * FROM vue_stock_cuve
-        WHERE cuve_id = :cuve_id
+        SELECT v.*, COALESCE(c.alert_stock, 0) AS alert_stock
+        FROM vue_stock_cuve v
+        JOIN cuve c ON c.id = v.cuve_id
+        WHERE v.cuve_id = :cuve_id
         AND EXISTS (
             SELECT 1 FROM station s
-            WHERE s.id = station_id AND s.compagnie_id = :compagnie_id
+            WHERE s.id = v.station_id AND s.compagnie_id = :compagnie_id
         )
     """), {"cuve_id": cuve_id, "compagnie_id": str(current_user.compagnie_id)})
 
@@ -1776,9 +1840,6 @@ async def get_stock_cuve(
     if not stock_data:
         raise HTTPException(status_code=404, detail="Cuve non trouvée ou vous n'avez pas accès à cette cuve")
 
-    # Récupérer les informations complètes de la cuve pour obtenir le champ alert_stock
-    cuve_complete = db.query(Cuve).filter(Cuve.id == cuve_id).first()
-
     # Convertir le résultat en dictionnaire pour le schéma
     stock_dict = {
         'cuve_id': stock_data.cuve_id,
@@ -1788,7 +1849,7 @@ async def get_stock_cuve(
         'cuve_code': stock_data.cuve_code,
         'capacite_maximale': stock_data.capacite_maximale,
         'cuve_statut': stock_data.cuve_statut,
-        'alert_stock': cuve_complete.alert_stock if cuve_complete else 0,  # Récupérer le seuil d'alerte
+        'alert_stock': float(stock_data.alert_stock),
         'stock_initial': float(stock_data.stock_initial),
         'stock_actuel': float(stock_data.stock_actuel),
         'derniere_date_mouvement': stock_data.derniere_date_mouvement,
@@ -1804,7 +1865,7 @@ async def get_stock_cuve(
 
 
 @router.get("/stocks-cuves", response_model=List[schemas.StockCuveResponse])
-async def get_all_stocks_cuves(
+def get_all_stocks_cuves(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -1816,26 +1877,21 @@ async def get_all_stocks_cuves(
     current_user = get_current_user_security(credentials, db)
 
     from sqlalchemy import text
+    # Le seuil d'alerte est lu avec le niveau, dans la même requête
     result = db.execute(text("""
-        SELECT * FROM vue_stock_cuve
+        SELECT v.*, COALESCE(c.alert_stock, 0) AS alert_stock
+        FROM vue_stock_cuve v
+        JOIN cuve c ON c.id = v.cuve_id
         WHERE EXISTS (
             SELECT 1 FROM station s
-            WHERE s.id = station_id AND s.compagnie_id = :compagnie_id
+            WHERE s.id = v.station_id AND s.compagnie_id = :compagnie_id
         )
-        ORDER BY cuve_nom
+        ORDER BY v.cuve_nom
         LIMIT :limit OFFSET :offset
     """), {"compagnie_id": str(current_user.compagnie_id), "limit": limit, "offset": skip})
 
     stocks_data = result.fetchall()
 
-    # Récupérer toutes les cuves de la compagnie pour obtenir leurs seuils d'alerte
-    cuves_compagnie = db.query(Cuve).join(StationModel).filter(
-        StationModel.compagnie_id == current_user.compagnie_id
-    ).all()
-
-    # Créer un dictionnaire pour un accès rapide aux seuils d'alerte
-    cuves_alertes = {str(cuve.id): cuve.alert_stock for cuve in cuves_compagnie}
-
     stocks = []
     for stock_row in stocks_data:
         stock_dict = {
@@ -1846,7 +1902,7 @@ async def get_all_stocks_cuves(
             'cuve_code': stock_row.cuve_code,
             'capacite_maximale': stock_row.capacite_maximale,
             'cuve_statut': stock_row.cuve_statut,
-            'alert_stock': cuves_alertes.get(str(stock_row.cuve_id), 0),  # Récupérer le seuil d'alerte
+            'alert_stock': float(stock_row.alert_stock),
             'stock_initial': float(stock_row.stock_initial),
             'stock_actuel': float(stock_row.stock_actuel),
             'derniere_date_mouvement': stock_row.derniere_date_mouvement,
@@ -1864,7 +1920,7 @@ async def get_all_stocks_cuves(
 
 # Endpoints pour la gestion des prix de carburant
 @router.post("/prix-carburants", response_model=schemas.PrixCarburantResponse)
-async def create_prix_carburant(
+def create_prix_carburant(
     prix_data: schemas.PrixCarburantCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -1913,7 +1969,7 @@ async def create_prix_carburant(
 
 
 @router.get("/prix-carburants/{carburant_id}/{station_id}", response_model=schemas.PrixCarburantResponse)
-async def get_prix_carburant(
+def get_prix_carburant(
     carburant_id: str,  # UUID du carburant
     station_id: str,    # UUID de la station
     db: Session = Depends(get_db),
@@ -1945,7 +2001,7 @@ async def get_prix_carburant(
 
 
 @router.put("/prix-carburants/{carburant_id}/{station_id}", response_model=schemas.PrixCarburantResponse)
-async def update_prix_carburant(
+def update_prix_carburant(
     carburant_id: str,   # UUID du carburant
     station_id: str,     # UUID de la station
     prix_update: schemas.PrixCarburantUpdate,
@@ -1986,7 +2042,7 @@ async def update_prix_carburant(
 
 
 @router.get("/stations/{station_id}/carburants", response_model=List[schemas.PrixCarburantWithCarburantResponse])
-async def get_all_prix_carburants_station(
+def get_all_prix_carburants_station(
     station_id: str,  # UUID de la station
     skip: int = 0,
     limit: int = 100,
@@ -2046,7 +2102,7 @@ async def get_all_prix_carburants_station(
 
 # Endpoint pour récupérer tous les pistolets d'une station spécifique
 @router.get("/stations/{station_id}/pistolets", response_model=List[schemas.PistoletWithCuveForStationResponse])
-async def get_pistolets_station(
+def get_pistolets_station(
     station_id: str,  # Changed to string for UUID
     skip: int = 0,
     limit: int = 100,
@@ -280,6 +280,12 @@ class StockCuveResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class StockCuveAlerteResponse(StockCuveResponse):
+    volume_vendu_periode: float = Field(..., description="Volume vendu depuis la cuve sur la période d'observation, en litres", example=21000.0)
+    debit_journalier_moyen: float = Field(..., description="Volume moyen vendu par jour sur la période, en litres", example=3000.0)
+    jours_autonomie: Optional[float] = Field(None, description="Nombre de jours de vente couverts par le stock actuel (absent si aucune vente sur la période)", example=1.67)
+    sous_seuil_alerte: bool = Field(..., description="Indique si le stock actuel est inférieur ou égal au seuil d'alerte", example=True)
+
 class CuveUpdate(BaseModel):
     nom: Optional[str] = Field(None, description="Nom de la cuve", example="Cuve principale A")
     code: Optional[str] = Field(None, description="Code unique de la cuve", example="CP-A-001")
@@ -630,4 +636,19 @@ class StationConfigUpdate(BaseModel):
     completion: Optional[Dict[str, Any]] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MesureJaugeCuve(BaseModel):
+    cuve_id: uuid.UUID = Field(..., description="ID de la cuve jaugée", example="3fa85f64-5717-4562-b3fc-2c963f66afa6")
+    hauteur_cm: float = Field(..., ge=0, description="Hauteur de jauge mesurée en cm", example=125.5)
+
+
+class ConversionJaugesRequest(BaseModel):
+    mesures: List[MesureJaugeCuve] = Field(..., description="Jaugeages à convertir (par exemple ceux de fin de poste de la station)")
+
+
+class ConversionJaugeResponse(BaseModel):
+    cuve_id: uuid.UUID = Field(..., description="ID de la cuve jaugée")
+    hauteur_cm: float = Field(..., description="Hauteur de jauge mesurée en cm")
+    volume_litres: Optional[float] = Field(None, description="Volume correspondant d'après le barremage de la cuve")
+    erreur: Optional[str] = Field(None, description="Motif de l'échec de la conversion, le cas échéant")
@@ -11,7 +11,7 @@ security = HTTPBearer()
 @router.get("/parametres",
            summary="Récupérer les paramètres système",
            description="Permet de récupérer les paramètres système configurables pour l'application")
-async def get_parametres(
+def get_parametres(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -33,7 +33,7 @@ async def get_parametres(
 @router.get("/seuils",
            summary="Récupérer les seuils configurables",
            description="Permet de récupérer les seuils configurables pour l'application")
-async def get_seuils(
+def get_seuils(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -55,7 +55,7 @@ async def get_seuils(
 @router.get("/paiements",
            summary="Récupérer les modes de paiement configurés",
            description="Permet de récupérer les modes de paiement configurés pour l'application")
-async def get_modes_paiement(
+def get_modes_paiement(
     current_user = Depends(require_permission("Module Configuration", "read"))
 ):
     # This is a placeholder implementation
@@ -1,4 +1,4 @@
-from .db_config import SessionLocal, engine, get_db
+from .db_config import SessionLocal, engine, get_db, ReadSessionLocal, read_engine, get_read_db
 from . import transaction_manager
 
-__all__ = ["SessionLocal", "engine", "get_db", "transaction_manager"]
\ No newline at end of file
+__all__ = ["SessionLocal", "engine", "get_db", "ReadSessionLocal", "read_engine", "get_read_db", "transaction_manager"]
\ No newline at end of file
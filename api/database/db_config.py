@@ -3,16 +3,70 @@ from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from .statistiques_pool import PoolMesure
+
 load_dotenv()
 
 # Use PostgreSQL with environment-based configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost:5432/succesfuel")
 
-engine = create_engine(
-    DATABASE_URL
-)
+# Base de lecture seule (réplique), facultative : à défaut, les lectures utilisent la base principale
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+
+def _env_bool(nom: str, defaut: bool) -> bool:
+    valeur = os.getenv(nom)
+    if valeur is None:
+        return defaut
+    return valeur.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Paramètres du pool de connexions, par worker : avec plusieurs workers gunicorn, le nombre de connexions
+# ouvertes sur PostgreSQL peut aller jusqu'à workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Vérifier la connexion avant de la réutiliser (connexions coupées par un redémarrage de PostgreSQL)
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# Durée de vie maximale d'une connexion en secondes (-1 pour ne jamais la recycler)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Durée maximale d'une requête SQL en millisecondes (0 pour ne pas la limiter)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+def _creer_engine(url: str, lecture_seule: bool = False):
+    """
+    Crée un engine avec les paramètres de pool de l'environnement
+    """
+    options = []
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        options.append(f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}")
+    if lecture_seule:
+        options.append("-c default_transaction_read_only=on")
+
+    connect_args = {}
+    if options and url.startswith("postgresql"):
+        connect_args["options"] = " ".join(options)
+
+    return create_engine(
+        url,
+        poolclass=PoolMesure,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args=connect_args
+    )
+
+
+engine = _creer_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine de lecture seule : les transactions y sont ouvertes en READ ONLY
+read_engine = _creer_engine(DATABASE_READ_URL, lecture_seule=True) if DATABASE_READ_URL else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 # Import Base depuis le module base
 from ..base import Base
 
@@ -22,4 +76,23 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency to get a read-only DB session (réplique si DATABASE_READ_URL est défini)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_statistiques_pools() -> dict:
+    """
+    Retourne l'état des pools de connexions du worker courant
+    """
+    statistiques = {"principal": engine.pool.statistiques()}
+    if read_engine is not engine:
+        statistiques["lecture"] = read_engine.pool.statistiques()
+    return statistiques
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMesure(QueuePool):
+    """
+    Pool de connexions qui mesure le temps nécessaire pour obtenir une connexion (attente d'une connexion
+    libre, ouverture d'une nouvelle connexion, pre-ping) et compte les dépassements du délai d'attente.
+    La classe est conservée lorsque le pool est recréé (engine.dispose()), les compteurs repartent de zéro.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._verrou_statistiques = threading.Lock()
+        self._nombre_obtentions = 0
+        self._nombre_depassements = 0
+        self._attente_totale = 0.0
+        self._attente_max = 0.0
+
+    def connect(self):
+        debut = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._verrou_statistiques:
+                self._nombre_depassements += 1
+            raise
+        finally:
+            attente = time.perf_counter() - debut
+            with self._verrou_statistiques:
+                self._nombre_obtentions += 1
+                self._attente_totale += attente
+                self._attente_max = max(self._attente_max, attente)
+
+    def statistiques(self) -> dict:
+        """
+        Retourne l'état courant du pool et les temps d'attente cumulés depuis le démarrage du worker
+        """
+        with self._verrou_statistiques:
+            nombre_obtentions = self._nombre_obtentions
+            attente_totale = self._attente_totale
+            attente_max = self._attente_max
+            nombre_depassements = self._nombre_depassements
+
+        return {
+            "taille": self.size(),
+            "connexions_utilisees": self.checkedout(),
+            "connexions_disponibles": self.checkedin(),
+            "debordement": max(self.overflow(), 0),
+            "debordement_max": self._max_overflow,
+            "delai_attente": self._timeout,
+            "nombre_obtentions": nombre_obtentions,
+            "nombre_depassements_delai": nombre_depassements,
+            "attente_moyenne_ms": round(attente_totale / nombre_obtentions * 1000, 3) if nombre_obtentions else 0.0,
+            "attente_max_ms": round(attente_max * 1000, 3)
+        }
@@ -0,0 +1,92 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Nombre de requêtes SQL au-delà duquel un endpoint est signalé (0 pour désactiver le signalement)
+SEUIL_REQUETES_SQL = int(os.getenv("SQL_QUERY_COUNT_THRESHOLD", "50"))
+
+# Longueur maximale de la requête la plus lente conservée pour les logs
+LONGUEUR_MAX_REQUETE = 500
+
+
+class StatistiquesRequete:
+    """
+    Requêtes SQL exécutées pendant le traitement d'une requête HTTP
+    """
+
+    __slots__ = ("nombre_requetes", "duree_totale", "duree_max", "requete_max")
+
+    def __init__(self):
+        self.nombre_requetes = 0
+        self.duree_totale = 0.0
+        self.duree_max = 0.0
+        self.requete_max = None
+
+    def enregistrer(self, statement: str, duree: float):
+        self.nombre_requetes += 1
+        self.duree_totale += duree
+        if duree > self.duree_max:
+            self.duree_max = duree
+            self.requete_max = statement
+
+    @property
+    def seuil_depasse(self) -> bool:
+        return SEUIL_REQUETES_SQL > 0 and self.nombre_requetes > SEUIL_REQUETES_SQL
+
+    def to_dict(self) -> dict:
+        return {
+            "nombre_requetes": self.nombre_requetes,
+            "duree_sql_ms": round(self.duree_totale * 1000, 3),
+            "requete_plus_lente_ms": round(self.duree_max * 1000, 3),
+            "requete_plus_lente": " ".join(self.requete_max.split())[:LONGUEUR_MAX_REQUETE] if self.requete_max else None,
+            "seuil_depasse": self.seuil_depasse
+        }
+
+
+# Statistiques de la requête HTTP courante, initialisées par le middleware de l'application.
+# Le contexte est copié dans les threads qui exécutent les endpoints : l'objet est partagé avec eux.
+_statistiques_requete: ContextVar[Optional[StatistiquesRequete]] = ContextVar("statistiques_requete", default=None)
+
+
+def debut_statistiques():
+    """
+    Ouvre le comptage des requêtes SQL pour la requête HTTP courante
+    """
+    statistiques = StatistiquesRequete()
+    return statistiques, _statistiques_requete.set(statistiques)
+
+
+def fin_statistiques(jeton_contexte):
+    _statistiques_requete.reset(jeton_contexte)
+
+
+def get_statistiques_requete() -> Optional[StatistiquesRequete]:
+    return _statistiques_requete.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+    if _statistiques_requete.get() is not None:
+        conn.info.setdefault("debut_requetes", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+    statistiques = _statistiques_requete.get()
+    debuts = conn.info.get("debut_requetes")
+    if statistiques is not None and debuts:
+        statistiques.enregistrer(statement, time.perf_counter() - debuts.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _erreur_execution(contexte):
+    # Une requête en erreur ne passe pas par after_cursor_execute : elle est comptée ici
+    statistiques = _statistiques_requete.get()
+    debuts = contexte.connection.info.get("debut_requetes") if contexte.connection is not None else None
+    if statistiques is not None and debuts:
+        statistiques.enregistrer(contexte.statement or "", time.perf_counter() - debuts.pop())
@@ -14,7 +14,7 @@ router = APIRouter(tags=["Ecriture comptable"])
 @router.get("/", response_model=List[schemas.EcritureComptableResponse],
            summary="Récupérer la liste des écritures comptables",
            dependencies=[Depends(require_permission("ecritures_comptables"))])
-async def get_ecritures_comptables(
+def get_ecritures_comptables(
     skip: int = 0,
     limit: int = 100,
     date_debut: str = None,
@@ -46,7 +46,7 @@ async def get_ecritures_comptables(
 @router.post("/", response_model=schemas.EcritureComptableResponse,
              summary="Créer une nouvelle écriture comptable",
              dependencies=[Depends(require_permission("ecritures_comptables"))])
-async def create_ecriture_comptable(
+def create_ecriture_comptable(
     ecriture: schemas.EcritureComptableCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
@@ -60,7 +60,7 @@ async def create_ecriture_comptable(
 @router.put("/{ecriture_id}/valider",
             summary="Valider une écriture comptable",
             dependencies=[Depends(require_permission("ecritures_comptables"))])
-async def valider_ecriture_comptable(
+def valider_ecriture_comptable(
     ecriture_id: str,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
@@ -75,7 +75,7 @@ async def valider_ecriture_comptable(
 @router.get("/{ecriture_id}", response_model=schemas.EcritureComptableResponse,
            summary="Récupérer une écriture comptable par son ID",
            dependencies=[Depends(require_permission("ecritures_comptables"))])
-async def get_ecriture_comptable_by_id(
+def get_ecriture_comptable_by_id(
     ecriture_id: str,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
@@ -7,8 +7,7 @@ from pydantic import ValidationError
 import logging
 
 
-# Configurer le logger
-logging.basicConfig(level=logging.INFO)
+# Logger du module : les handlers sont configurés une seule fois par setup_logging
 logger = logging.getLogger(__name__)
 
 
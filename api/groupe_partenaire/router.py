@@ -36,7 +36,7 @@ def make_serializable(obj):
     tags=["Groupes Partenaires"],
     dependencies=[Depends(require_permission("Module Groupes Partenaires"))]
 )
-async def create_groupe_partenaire(
+def create_groupe_partenaire(
     groupe: GroupePartenaireCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -70,7 +70,7 @@ async def create_groupe_partenaire(
     tags=["Groupes Partenaires"],
     dependencies=[Depends(require_permission("Module Groupes Partenaires"))]
 )
-async def get_groupes_partenaire(
+def get_groupes_partenaire(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -91,7 +91,7 @@ async def get_groupes_partenaire(
     tags=["Groupes Partenaires"],
     dependencies=[Depends(require_permission("Module Groupes Partenaires"))]
 )
-async def get_groupe_partenaire_by_id(
+def get_groupe_partenaire_by_id(
     groupe_id: str,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user_security)
@@ -114,7 +114,7 @@ async def get_groupe_partenaire_by_id(
     tags=["Groupes Partenaires"],
     dependencies=[Depends(require_permission("Module Groupes Partenaires"))]
 )
-async def update_groupe_partenaire(
+def update_groupe_partenaire(
     groupe_id: str,
     groupe: GroupePartenaireUpdate,
     request: Request,
@@ -155,7 +155,7 @@ async def update_groupe_partenaire(
     tags=["Groupes Partenaires"],
     dependencies=[Depends(require_permission("Module Groupes Partenaires"))]
 )
-async def delete_groupe_partenaire(
+def delete_groupe_partenaire(
     groupe_id: str,
     request: Request,
     db: Session = Depends(get_db),
@@ -1,15 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from ..database import get_db
+from ..database.db_config import get_statistiques_pools
+from ..logging_config import statistiques_journalisation
 from fastapi.security import HTTPBearer
 
 router = APIRouter()
 security = HTTPBearer()
 
 
+def verifier_jeton_diagnostic(x_diagnostic_token: Optional[str] = Header(None)):
+    """
+    Réserve les métriques internes (pool, journalisation) aux outils de supervision : l'en-tête
+    X-Diagnostic-Token doit correspondre à la variable DIAGNOSTIC_TOKEN. Sans cette variable, les métriques
+    ne sont pas exposées. La vérification n'utilise pas la base, pour répondre même quand le pool est épuisé.
+    """
+    jeton_attendu = os.getenv("DIAGNOSTIC_TOKEN")
+    if not jeton_attendu or not x_diagnostic_token or not hmac.compare_digest(
+        x_diagnostic_token.encode("utf-8"), jeton_attendu.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Jeton de diagnostic manquant ou invalide")
+
+
 @router.get("/health", status_code=200)
-async def health_check(db: Session = Depends(get_db)):
+def health_check(db: Session = Depends(get_db)):
     """
     Health check endpoint that verifies the API and database are functioning properly.
     Returns a 200 status if everything is OK.
@@ -35,7 +53,7 @@ async def health_check(db: Session = Depends(get_db)):
 
 
 @router.get("/ready", status_code=200)
-async def readiness_check(db: Session = Depends(get_db)):
+def readiness_check(db: Session = Depends(get_db)):
     """
     Readiness check endpoint that indicates if the service is ready to accept traffic.
     This checks if the database is accessible.
@@ -57,4 +75,18 @@ async def readiness_check(db: Session = Depends(get_db)):
                 "database": "unavailable",
                 "message": "Service is not ready to accept requests"
             }
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/health/pool", status_code=200, dependencies=[Depends(verifier_jeton_diagnostic)])
+def pool_status():
+    """
+    Connection pool metrics for the current worker (checked-out connections, overflow, wait time)
+    and logging queue state. Requires the X-Diagnostic-Token header (DIAGNOSTIC_TOKEN).
+    Does not use a database connection, so it still answers when the pool is exhausted.
+    """
+    return {
+        "status": "ok",
+        "pool": get_statistiques_pools(),
+        "journalisation": statistiques_journalisation()
+    }
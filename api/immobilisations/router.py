@@ -19,7 +19,7 @@ security = HTTPBearer()
 @router.get("/", response_model=List[schemas.ImmobilisationResponse],
            summary="Récupérer la liste des immobilisations",
            description="Permet de récupérer la liste des immobilisations appartenant aux stations de l'utilisateur")
-async def get_immobilisations(
+def get_immobilisations(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -51,7 +51,7 @@ async def get_immobilisations(
 @router.post("/", response_model=schemas.ImmobilisationResponse,
             summary="Créer une nouvelle immobilisation",
             description="Permet de créer une nouvelle immobilisation pour une station")
-async def create_immobilisation(
+def create_immobilisation(
     immobilisation: schemas.ImmobilisationCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Immobilisations"))
@@ -106,7 +106,7 @@ async def create_immobilisation(
 @router.get("/{immobilisation_id}", response_model=schemas.ImmobilisationResponse,
            summary="Récupérer une immobilisation par son ID",
            description="Permet de récupérer les détails d'une immobilisation spécifique par son identifiant")
-async def get_immobilisation_by_id(
+def get_immobilisation_by_id(
     immobilisation_id: str,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Immobilisations"))
@@ -148,7 +148,7 @@ async def get_immobilisation_by_id(
 @router.put("/{immobilisation_id}", response_model=schemas.ImmobilisationUpdate,
            summary="Mettre à jour une immobilisation",
            description="Permet de modifier les informations d'une immobilisation existante")
-async def update_immobilisation(
+def update_immobilisation(
     immobilisation_id: str,
     immobilisation: schemas.ImmobilisationUpdate,
     db: Session = Depends(get_db),
@@ -196,7 +196,7 @@ async def update_immobilisation(
 @router.delete("/{immobilisation_id}",
                summary="Supprimer une immobilisation",
                description="Permet de supprimer une immobilisation existante")
-async def delete_immobilisation(
+def delete_immobilisation(
     immobilisation_id: str,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Immobilisations"))
@@ -248,7 +248,7 @@ async def delete_immobilisation(
 @router.get("/{immobilisation_id}/mouvements", response_model=List[schemas.MouvementImmobilisationResponse],
            summary="Récupérer les mouvements d'une immobilisation",
            description="Permet de récupérer la liste des mouvements associés à une immobilisation spécifique")
-async def get_mouvements_immobilisation(
+def get_mouvements_immobilisation(
     immobilisation_id: str,
     skip: int = 0,
     limit: int = 100,
@@ -296,7 +296,7 @@ async def get_mouvements_immobilisation(
 @router.post("/{immobilisation_id}/mouvements", response_model=schemas.MouvementImmobilisationResponse,
              summary="Créer un mouvement pour une immobilisation",
              description="Permet de créer un nouveau mouvement (acquisition, cession, amortissement, etc.) pour une immobilisation")
-async def create_mouvement_immobilisation(
+def create_mouvement_immobilisation(
     immobilisation_id: str,
     mouvement: schemas.MouvementImmobilisationCreate,
     db: Session = Depends(get_db),
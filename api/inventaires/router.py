@@ -16,7 +16,7 @@ security = HTTPBearer()
 @router.get("/", response_model=List[schemas.InventaireResponse],
            summary="Récupérer la liste des inventaires",
            description="Permet de récupérer la liste des inventaires appartenant à la compagnie de l'utilisateur connecté")
-async def get_inventaires(
+def get_inventaires(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -32,7 +32,7 @@ async def get_inventaires(
 @router.post("/", response_model=schemas.InventaireResponse,
             summary="Créer un nouvel inventaire",
             description="Permet de créer un nouvel inventaire pour la compagnie de l'utilisateur connecté")
-async def create_inventaire(
+def create_inventaire(
     inventaire: schemas.InventaireCreate,
     db: Session = Depends(get_db),
     current_user=Depends(require_permission("inventaire", "creer"))
@@ -44,7 +44,7 @@ async def create_inventaire(
 @router.get("/{inventaire_id}", response_model=schemas.InventaireResponse,
            summary="Récupérer un inventaire par son ID",
            description="Permet de récupérer les détails d'un inventaire spécifique par son identifiant")
-async def get_inventaire_by_id(
+def get_inventaire_by_id(
     inventaire_id: str,
     db: Session = Depends(get_db),
     current_user=Depends(require_permission("inventaire", "lire"))
@@ -59,7 +59,7 @@ async def get_inventaire_by_id(
 @router.put("/{inventaire_id}", response_model=schemas.InventaireResponse,
            summary="Mettre à jour un inventaire",
            description="Permet de modifier les informations d'un inventaire existant")
-async def update_inventaire(
+def update_inventaire(
     inventaire_id: str,
     inventaire: schemas.InventaireUpdate,
     db: Session = Depends(get_db),
@@ -72,7 +72,7 @@ async def update_inventaire(
 @router.delete("/{inventaire_id}",
                summary="Supprimer un inventaire",
                description="Permet de supprimer un inventaire existant")
-async def delete_inventaire(
+def delete_inventaire(
     inventaire_id: str,
     db: Session = Depends(get_db),
     current_user=Depends(require_permission("inventaire", "supprimer"))
@@ -89,7 +89,7 @@ async def delete_inventaire(
 @router.get("/{inventaire_id}/ecarts", response_model=List[schemas.EcartInventaireResponse],
            summary="Récupérer les écarts d'un inventaire",
            description="Permet de récupérer la liste des écarts identifiés pour un inventaire spécifique")
-async def get_inventaire_ecarts(
+def get_inventaire_ecarts(
     inventaire_id: str,
     db: Session = Depends(get_db),
     current_user=Depends(require_permission("inventaire", "lire"))
@@ -108,7 +108,7 @@ async def get_inventaire_ecarts(
 @router.post("/ecarts", response_model=schemas.EcartInventaireResponse,
              summary="Créer un écart d'inventaire",
              description="Permet de créer manuellement un écart d'inventaire")
-async def create_ecart_inventaire(
+def create_ecart_inventaire(
     ecart_inventaire: schemas.EcartInventaireCreate,
     db: Session = Depends(get_db),
     current_user=Depends(require_permission("inventaire", "creer"))
@@ -125,7 +125,7 @@ async def create_ecart_inventaire(
 @router.get("/ecarts/", response_model=List[schemas.EcartInventaireResponse],
            summary="Récupérer la liste des écarts d'inventaire",
            description="Permet de récupérer la liste des écarts d'inventaire appartenant à la compagnie de l'utilisateur connecté")
-async def get_ecarts_inventaire(
+def get_ecarts_inventaire(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -147,7 +147,7 @@ async def get_ecarts_inventaire(
 @router.get("/ecarts/{ecart_id}", response_model=schemas.EcartInventaireResponse,
            summary="Récupérer un écart d'inventaire par son ID",
            description="Permet de récupérer les détails d'un écart d'inventaire spécifique par son identifiant")
-async def get_ecart_inventaire_by_id(
+def get_ecart_inventaire_by_id(
     ecart_id: str,
     db: Session = Depends(get_db),
     current_user=Depends(require_permission("inventaire", "lire"))
@@ -162,7 +162,7 @@ async def get_ecart_inventaire_by_id(
 @router.put("/ecarts/{ecart_id}", response_model=schemas.EcartInventaireResponse,
            summary="Mettre à jour un écart d'inventaire",
            description="Permet de modifier les informations d'un écart d'inventaire existant")
-async def update_ecart_inventaire(
+def update_ecart_inventaire(
     ecart_id: str,
     ecart_inventaire: schemas.EcartInventaireUpdate,
     db: Session = Depends(get_db),
@@ -180,7 +180,7 @@ async def update_ecart_inventaire(
 @router.delete("/ecarts/{ecart_id}",
                summary="Supprimer un écart d'inventaire",
                description="Permet de supprimer un écart d'inventaire existant")
-async def delete_ecart_inventaire(
+def delete_ecart_inventaire(
     ecart_id: str,
     db: Session = Depends(get_db),
     current_user=Depends(require_permission("inventaire", "supprimer"))
@@ -28,7 +28,7 @@ security = HTTPBearer()
             summary="Récupérer les livraisons",
             description="Récupérer la liste des livraisons de carburant avec pagination. Ces endpoints gèrent les livraisons physiques de carburant liées aux achats de carburant. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
             dependencies=[Depends(require_permission("livraisons", "read"))])
-async def get_livraisons(
+def get_livraisons(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -64,7 +64,7 @@ async def get_livraisons(
              summary="Créer une livraison",
              description="Créer une nouvelle livraison de carburant dans le système. Cette endpoint gère les livraisons physiques de carburant liées aux achats de carburant. La livraison représente l'approvisionnement effectif des cuves et est utilisée pour les calculs de stock théorique. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
              dependencies=[Depends(require_permission("livraisons", "create"))])
-async def create_livraison(
+def create_livraison(
     livraison: schemas.LivraisonCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -108,7 +108,7 @@ async def create_livraison(
             summary="Récupérer une livraison par ID",
             description="Récupérer les détails d'une livraison de carburant spécifique par son identifiant. Cette endpoint gère les livraisons physiques de carburant liées aux achats de carburant. Permet d'obtenir toutes les informations relatives à une livraison spécifique, y compris les mesures de jauge et les différences éventuelles. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
             dependencies=[Depends(require_permission("livraisons", "read"))])
-async def get_livraison_by_id(
+def get_livraison_by_id(
     livraison_id: str,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -144,7 +144,7 @@ async def get_livraison_by_id(
             summary="Mettre à jour une livraison",
             description="Mettre à jour les informations d'une livraison de carburant existante. Cette endpoint gère les livraisons physiques de carburant liées aux achats de carburant. La mise à jour peut affecter les calculs de stock et les vérifications d'écarts. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
             dependencies=[Depends(require_permission("livraisons", "update"))])
-async def update_livraison(
+def update_livraison(
     livraison_id: str,
     livraison: schemas.LivraisonUpdate,
     db: Session = Depends(get_db),
@@ -181,7 +181,7 @@ async def update_livraison(
                summary="Supprimer une livraison",
                description="Supprimer une livraison de carburant du système. Cette endpoint gère les livraisons physiques de carburant liées aux achats de carburant. La suppression affecte les calculs de stock théorique et les vérifications d'écarts. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
                dependencies=[Depends(require_permission("livraisons", "delete"))])
-async def delete_livraison(
+def delete_livraison(
     livraison_id: str,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -221,7 +221,7 @@ async def delete_livraison(
             summary="Historique des livraisons pour une cuve",
             description="Récupérer l'historique des livraisons pour une cuve spécifique. Cette endpoint gère les livraisons physiques de carburant liées aux achats de carburant. Permet de visualiser toutes les livraisons effectuées à une cuve précise pour des analyses de stock ou de performance. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
             dependencies=[Depends(require_permission("livraisons", "read"))])
-async def get_livraisons_by_cuve(
+def get_livraisons_by_cuve(
     cuve_id: str,
     skip: int = 0,
     limit: int = 100,
@@ -262,7 +262,7 @@ async def get_livraisons_by_cuve(
             summary="Historique des livraisons pour un achat de carburant",
             description="Récupérer l'historique des livraisons liées à un achat de carburant spécifique. Cette endpoint permet de suivre les livraisons effectuées pour un achat donné, utile pour comparer les quantités commandées vs livrées. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
             dependencies=[Depends(require_permission("livraisons", "read"))])
-async def get_livraisons_by_achat(
+def get_livraisons_by_achat(
     achat_carburant_id: str,
     skip: int = 0,
     limit: int = 100,
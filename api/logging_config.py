@@ -1,63 +1,257 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
 from datetime import datetime, timezone
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Optional
+
+
+# Contexte de la requête en cours (request_id, user_id, company_id), recopié sur chaque enregistrement de log.
+# Le dictionnaire est ouvert par le middleware de l'application et complété lors de l'authentification,
+# y compris depuis le pool de threads (le dictionnaire est partagé, seule la variable est copiée).
+_contexte_journal: ContextVar[Optional[dict]] = ContextVar("contexte_journal", default=None)
+
+_CHAMPS_CONTEXTE = ("request_id", "user_id", "company_id")
+
+
+def debut_contexte_journal(request_id: str):
+    """
+    Ouvre le contexte de journalisation de la requête courante
+    """
+    return _contexte_journal.set({"request_id": request_id})
+
+
+def fin_contexte_journal(jeton_contexte):
+    _contexte_journal.reset(jeton_contexte)
+
+
+def completer_contexte_journal(**champs):
+    """
+    Ajoute des champs (user_id, company_id) au contexte de journalisation de la requête courante
+    """
+    contexte = _contexte_journal.get()
+    if contexte is not None:
+        contexte.update({cle: str(valeur) for cle, valeur in champs.items() if valeur is not None})
+
+
+class FormatteurJSON(logging.Formatter):
+    """
+    Un objet JSON par ligne : horodatage, niveau, logger, message, contexte de la requête et exception éventuelle
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        donnees = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for champ in _CHAMPS_CONTEXTE:
+            valeur = getattr(record, champ, None)
+            if valeur is not None:
+                donnees[champ] = valeur
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            donnees["exception"] = record.exc_text
+        return json.dumps(donnees, ensure_ascii=False, default=str)
+
+
+class FileJournalBornee(QueueHandler):
+    """
+    Dépose les enregistrements dans une file bornée vidée par un unique thread d'écriture (QueueListener) :
+    un appel de log ne fait jamais d'entrée/sortie sur le chemin de la requête. File pleine, l'enregistrement
+    est abandonné et compté ; le nombre de pertes est signalé dès que la file accepte de nouveau des messages.
+    """
+
+    def __init__(self, file_attente: queue.Queue):
+        super().__init__(file_attente)
+        self.messages_perdus = 0
+        self._pertes_a_signaler = 0
+        self._verrou = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Recopier le contexte dans le thread appelant : le thread d'écriture ne le voit pas
+        contexte = _contexte_journal.get()
+        if contexte:
+            for champ, valeur in contexte.items():
+                setattr(record, champ, valeur)
+        # Figer le message et la trace de l'exception, les arguments ne sont pas forcément sérialisables
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._verrou:
+                self.messages_perdus += 1
+                self._pertes_a_signaler += 1
+            return
+
+        if self._pertes_a_signaler:
+            with self._verrou:
+                pertes, self._pertes_a_signaler = self._pertes_a_signaler, 0
+            if pertes:
+                avertissement = logging.makeLogRecord({
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"LOG_OVERFLOW: {pertes} messages de journal perdus (file pleine)",
+                })
+                try:
+                    self.queue.put_nowait(avertissement)
+                except queue.Full:
+                    with self._verrou:
+                        self._pertes_a_signaler += pertes
+
+
+_logging_configure = False
+_file_journal: Optional[FileJournalBornee] = None
+_ecrivain_journal: Optional[QueueListener] = None
+
+
+def _purger_anciens_journaux(log_dir: str, retention_jours: int):
+    """
+    Supprime les fichiers de logs des processus terminés plus anciens que la rétention :
+    la rotation d'un processus ne purge que ses propres fichiers
+    """
+    limite = time.time() - retention_jours * 86400
+    for nom in os.listdir(log_dir):
+        if not nom.startswith(("app.", "error.")):
+            continue
+        chemin = os.path.join(log_dir, nom)
+        try:
+            if os.path.getmtime(chemin) < limite:
+                os.remove(chemin)
+        except OSError:
+            # Fichier déjà supprimé par un autre worker
+            pass
 
 
 def setup_logging():
     """
     Configure le système de logging pour l'application.
+    Les loggers déposent leurs enregistrements dans une file bornée ; un thread d'écriture unique les écrit
+    en JSON dans des fichiers à rotation quotidienne propres au processus (logs/app.<pid>.log,
+    logs/error.<pid>.log) et sur la console.
+    Idempotent : un nouvel appel (rechargement, création d'une autre application) n'ajoute pas de handlers.
     """
+    global _logging_configure, _file_journal, _ecrivain_journal
+    if _logging_configure:
+        return logging.getLogger()
+    _logging_configure = True
+
     # Créer le répertoire de logs si nécessaire
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    log_dir = os.getenv("LOG_DIR", "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    retention_jours = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+    _purger_anciens_journaux(log_dir, retention_jours)
 
-    # Formats de log
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    formatter_json = FormatteurJSON()
 
-    # Handler pour les logs dans un fichier de rotation
-    file_handler = RotatingFileHandler(
-        f'logs/app_{datetime.now(timezone.utc).strftime("%Y%m%d")}.log',
-        maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=5
+    # Un fichier par processus : la rotation d'un worker renomme et purge ses seuls fichiers, jamais
+    # ceux qu'un autre worker est en train d'écrire (rotation quotidienne, minuit UTC)
+    pid = os.getpid()
+    file_handler = TimedRotatingFileHandler(
+        os.path.join(log_dir, f"app.{pid}.log"),
+        when="midnight",
+        backupCount=retention_jours,
+        encoding="utf-8",
+        utc=True
     )
     file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter_json)
 
     # Handler pour les logs d'erreurs critiques
-    error_handler = RotatingFileHandler(
-        f'logs/error_{datetime.now(timezone.utc).strftime("%Y%m%d")}.log',
-        maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=5
+    error_handler = TimedRotatingFileHandler(
+        os.path.join(log_dir, f"error.{pid}.log"),
+        when="midnight",
+        backupCount=retention_jours,
+        encoding="utf-8",
+        utc=True
     )
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(formatter)
+    error_handler.setFormatter(formatter_json)
 
     # Handler pour la console en développement
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    ))
 
-    # Configurer le logger principal
+    _file_journal = FileJournalBornee(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_MAX", "10000"))))
+    _ecrivain_journal = QueueListener(
+        _file_journal.queue, file_handler, error_handler, console_handler, respect_handler_level=True
+    )
+    _ecrivain_journal.start()
+    atexit.register(arreter_logging)
+
+    # Configurer le logger principal : seul handler, la file
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(error_handler)
-    root_logger.addHandler(console_handler)
+    root_logger.addHandler(_file_journal)
 
-    # Configurer des loggers spécifiques pour les modules sensibles
+    # Le logger d'audit n'a pas de handler propre : ses messages remontent au logger principal
+    # et sont écrits une seule fois
     audit_logger = logging.getLogger('audit')
     audit_logger.setLevel(logging.INFO)
-    audit_logger.addHandler(file_handler)
-    audit_logger.addHandler(error_handler)
-    audit_logger.addHandler(console_handler)
 
     return root_logger
 
 
+def _reconfigurer_apres_fork():
+    # Application importée avant le fork (gunicorn --preload) : le thread d'écriture n'existe pas dans
+    # le worker et les fichiers portent le pid du maître ; le worker ouvre sa propre file et ses fichiers
+    global _logging_configure, _file_journal, _ecrivain_journal
+    if not _logging_configure:
+        return
+    logging.getLogger().removeHandler(_file_journal)
+    _logging_configure = False
+    _file_journal = None
+    _ecrivain_journal = None
+    setup_logging()
+
+
+os.register_at_fork(after_in_child=_reconfigurer_apres_fork)
+
+
+def arreter_logging():
+    """
+    Écrit les enregistrements encore en file et arrête le thread d'écriture (arrêt du worker)
+    """
+    global _ecrivain_journal
+    if _ecrivain_journal is not None:
+        _ecrivain_journal.stop()
+        _ecrivain_journal = None
+
+
+def statistiques_journalisation() -> dict:
+    """
+    État de la file de journalisation : taille courante, capacité et messages perdus depuis le démarrage
+    """
+    if _file_journal is None:
+        return {"configure": False}
+    return {
+        "configure": True,
+        "file_taille": _file_journal.queue.qsize(),
+        "file_capacite": _file_journal.queue.maxsize,
+        "messages_perdus": _file_journal.messages_perdus,
+    }
+
+
 def get_audit_logger():
     """
     Retourne un logger spécifique pour les opérations critiques nécessitant une auditabilité.
@@ -157,4 +351,37 @@ def log_security_event(event_type: str, details: dict, severity: str = "INFO"):
     elif severity == "WARNING":
         audit_logger.warning(f"SECURITY_EVENT: {event_details}")
     else:
-        audit_logger.info(f"SECURITY_EVENT: {event_details}")
\ No newline at end of file
+        audit_logger.info(f"SECURITY_EVENT: {event_details}")
+
+def get_performance_logger():
+    """
+    Retourne le logger des mesures de performance des requêtes HTTP.
+    """
+    return logging.getLogger('performance')
+
+
+def log_request_stats(method: str, path: str, status_code: int, duration_ms: float, sql_stats: dict):
+    """
+    Enregistre les mesures d'une requête HTTP : durée, nombre de requêtes SQL, temps SQL et requête la plus lente.
+    Les requêtes qui dépassent le seuil de requêtes SQL sont journalisées en WARNING.
+
+    Args:
+        method: Méthode HTTP
+        path: Route de l'endpoint (modèle de chemin, ex: /api/v1/ventes/{vente_id})
+        status_code: Code de statut de la réponse
+        duration_ms: Durée totale de traitement de la requête en millisecondes
+        sql_stats: Statistiques SQL de la requête (StatistiquesRequete.to_dict())
+    """
+    performance_logger = get_performance_logger()
+    request_details = {
+        "method": method,
+        "path": path,
+        "status_code": status_code,
+        "duration_ms": round(duration_ms, 3),
+        **sql_stats,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    if sql_stats.get("seuil_depasse"):
+        performance_logger.warning(f"REQUEST_STATS: {json.dumps(request_details, ensure_ascii=False)}")
+    else:
+        performance_logger.info(f"REQUEST_STATS: {json.dumps(request_details, ensure_ascii=False)}")
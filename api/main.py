@@ -1,5 +1,10 @@
+import asyncio
+import logging
 import os
-from fastapi import FastAPI, Request, Depends, HTTPException
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Request, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -9,7 +14,7 @@ from starlette.responses import Response
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from pydantic import ValidationError
 from .translations import get_translation
-from .database.db_config import SessionLocal, engine
+from .database.db_config import engine
 from .exception_handlers import (
     validation_exception_handler,
     database_integrity_exception_handler,
@@ -19,16 +24,16 @@ from .exception_handlers import (
 )
 from .services.database_service import DatabaseIntegrityException
 from .rate_limiter import add_rate_limiter
-from .logging_config import setup_logging
+from .logging_config import setup_logging, log_request_stats, debut_contexte_journal, fin_contexte_journal
+from .auth.cache_utilisateur import debut_requete, fin_requete
+from .auth.hachage import dernieres_connexions, executeur_hachage, INTERVALLE_DERNIERES_CONNEXIONS
+from .auth.auth_handler import purger_sessions_expirees
+from .database.statistiques_requetes import debut_statistiques, fin_statistiques
 
-# Importer les modèles pour s'assurer qu'ils sont enregistrés
-from .models import Base
-
-# Setup logging system
-setup_logging()
-
-# Créer toutes les tables si elles n'existent pas
-Base.metadata.create_all(bind=engine)
+# Importer les modèles pour s'assurer qu'ils sont enregistrés.
+# Le schéma de la base est géré uniquement par les migrations Alembic (alembic upgrade head) :
+# le démarrage d'un worker ne se connecte pas à la base.
+from . import models  # noqa: F401
 
 # Classe pour le middleware i18n
 class I18nMiddleware(BaseHTTPMiddleware):
@@ -46,40 +51,102 @@ class I18nMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         return response
 
-# Initialiser l'application
-app = FastAPI(
-    title="Succès Fuel API",
-    description="API for managing fuel station operations",
-    version="1.0.0"
-)
+# Middleware ouvrant la mémorisation de l'utilisateur authentifié pour la durée de la requête
+class UtilisateurRequeteMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        jeton_contexte = debut_requete()
+        try:
+            return await call_next(request)
+        finally:
+            fin_requete(jeton_contexte)
 
-# Ajouter le middleware i18n
-app.add_middleware(I18nMiddleware)
-
-# Ajouter le middleware de rate limiting
-# Désactiver le middleware en développement pour éviter les erreurs
-if os.getenv("ENVIRONMENT") != "development":
-    app.add_middleware(SlowAPIMiddleware)
-
-# Ajouter le middleware CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure this properly in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Middleware ouvrant le contexte de journalisation de la requête : identifiant repris de l'en-tête X-Request-ID
+# (ou généré) et renvoyé dans la réponse ; l'utilisateur et la compagnie y sont ajoutés à l'authentification
+class ContexteJournalMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+        jeton_contexte = debut_contexte_journal(request_id)
+        try:
+            response = await call_next(request)
+        finally:
+            fin_contexte_journal(jeton_contexte)
+        response.headers["X-Request-ID"] = request_id
+        return response
 
-# Ajouter le rate limiter à l'application
-add_rate_limiter(app)
+# Middleware mesurant la durée de chaque requête et les requêtes SQL qu'elle exécute.
+# Les mesures sont journalisées ; hors production, elles sont aussi renvoyées dans les en-têtes de la réponse.
+class StatistiquesRequeteMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        debut = time.perf_counter()
+        statistiques, jeton_contexte = debut_statistiques()
+        try:
+            response = await call_next(request)
+        finally:
+            fin_statistiques(jeton_contexte)
+
+        duree_ms = (time.perf_counter() - debut) * 1000
+        route = request.scope.get("route")
+        log_request_stats(
+            request.method,
+            getattr(route, "path", request.url.path),
+            response.status_code,
+            duree_ms,
+            statistiques.to_dict()
+        )
 
-# Ajouter les gestionnaires d'exceptions
-app.add_exception_handler(RequestValidationError, validation_exception_handler)
-app.add_exception_handler(IntegrityError, database_integrity_exception_handler)
-app.add_exception_handler(DatabaseIntegrityException, database_integrity_exception_handler)
-app.add_exception_handler(SQLAlchemyError, database_sqlalchemy_exception_handler)
-app.add_exception_handler(ValidationError, pydantic_validation_exception_handler)
-app.add_exception_handler(Exception, general_exception_handler)
+        if os.getenv("ENVIRONMENT") != "production":
+            response.headers["X-Response-Time-Ms"] = f"{duree_ms:.1f}"
+            response.headers["X-DB-Query-Count"] = str(statistiques.nombre_requetes)
+            response.headers["X-DB-Time-Ms"] = f"{statistiques.duree_totale * 1000:.1f}"
+            response.headers["X-DB-Slowest-Ms"] = f"{statistiques.duree_max * 1000:.1f}"
+            if statistiques.seuil_depasse:
+                response.headers["X-DB-Query-Threshold-Exceeded"] = "true"
+        return response
+
+# Tâches de fond exécutées à intervalle régulier dans le pool de threads
+async def _executer_periodiquement(intervalle: float, fonction, description: str):
+    from starlette.concurrency import run_in_threadpool
+    while True:
+        await asyncio.sleep(intervalle)
+        try:
+            await run_in_threadpool(fonction)
+        except Exception:
+            logging.getLogger(__name__).exception("Échec de la tâche périodique : %s", description)
+
+@asynccontextmanager
+async def cycle_de_vie(app: FastAPI):
+    """
+    Démarrage et arrêt d'un worker : rien n'est exécuté à l'import du module
+    """
+    # Les endpoints qui accèdent à la base sont déclarés avec `def` : FastAPI les exécute
+    # dans le pool de threads d'AnyIO, ce qui évite de bloquer la boucle d'événements.
+    # La taille du pool est alignée sur celle du pool de connexions SQLAlchemy.
+    taille_pool_threads = os.getenv("THREADPOOL_SIZE")
+    if taille_pool_threads:
+        from anyio import to_thread
+        to_thread.current_default_thread_limiter().total_tokens = int(taille_pool_threads)
+
+    # Les dates de dernière connexion sont écrites par lot plutôt qu'à chaque connexion,
+    # les sessions expirées ou révoquées sont purgées au-delà de leur durée de conservation
+    taches_periodiques = [
+        asyncio.create_task(_executer_periodiquement(
+            INTERVALLE_DERNIERES_CONNEXIONS, dernieres_connexions.ecrire, "dates de dernière connexion"
+        )),
+        asyncio.create_task(_executer_periodiquement(
+            float(os.getenv("TOKEN_SESSION_PURGE_INTERVAL", "3600")), purger_sessions_expirees, "purge des sessions"
+        )),
+    ]
+    try:
+        yield
+    finally:
+        for tache in taches_periodiques:
+            tache.cancel()
+        try:
+            dernieres_connexions.ecrire()
+        except Exception:
+            logging.getLogger(__name__).exception("Échec de l'écriture des dates de dernière connexion")
+        executeur_hachage.arreter()
+        engine.dispose()
 
 # Fonction pour extraire la langue du header Accept-Language
 def obtenir_langue_depuis_en_tete(request: Request):
@@ -95,15 +162,17 @@ class ExceptionLocalisee(HTTPException):
         detail = get_translation(cle_message, request.state.lang, "common")
         super().__init__(status_code=code_statut, detail=detail)
 
+router_systeme = APIRouter()
+
 # Endpoint racine avec message localisé
-@app.get("/")
+@router_systeme.get("/")
 async def racine(request: Request):
     message = get_translation("welcome_message", request.state.lang, "common")
     return {"message": message}
 
 # Endpoint de test pour bcrypt
-@app.get("/test-bcrypt")
-async def test_bcrypt():
+@router_systeme.get("/test-bcrypt")
+def test_bcrypt():
     try:
         import bcrypt
         import passlib
@@ -162,7 +231,7 @@ async def test_bcrypt():
         return {"error": f"Bcrypt test failed: {str(e)}"}
 
 # Include all module routers
-def inclure_routes():
+def inclure_routes(app: FastAPI):
     from .auth.router import router as auth_router
     from .compagnie.router import router as compagnie_router
     from .tiers.router import router as tiers_router
@@ -171,7 +240,6 @@ def inclure_routes():
     from .achats.router import router as achats_router
     from .achats.demande_achat_router import router as demande_achat_router
     from .achats_carburant.router import router as achats_carburant_router
-    from .achats_carburant.stock_calculation_router import router as stock_calculation_router
     from .ventes.router import router as ventes_router
     from .inventaires.router import router as inventaires_router
     from .livraisons.router import router as livraisons_router
@@ -190,6 +258,7 @@ def inclure_routes():
     from .groupe_partenaire.router import router as groupe_partenaire_router
     from .plan_comptable.router import router as plan_comptable_router
 
+    app.include_router(router_systeme)
     app.include_router(auth_router, prefix="/api/v1/auth", tags=["Authentification"])
     app.include_router(compagnie_router, prefix="/api/v1/compagnie", tags=["Compagnie"])
     app.include_router(tiers_router, prefix="/api/v1/tiers", tags=["Tiers"])
@@ -200,7 +269,8 @@ def inclure_routes():
     app.include_router(achats_router, prefix="/api/v1/achats", tags=["achats"])
     app.include_router(demande_achat_router, prefix="/api/v1/achats", tags=["achats"])
     app.include_router(achats_carburant_router, prefix="/api/v1/achats-carburant", tags=["Achats carburant"])
-    #app.include_router(stock_calculation_router, prefix="/api/v1/achats-carburant", tags=["calculs-stock-carburant"])
+    # Router de calcul de stock non exposé (api.achats_carburant.stock_calculation_router) :
+    # il n'est pas importé pour ne pas alourdir le démarrage
     app.include_router(ventes_router, prefix="/api/v1/ventes", tags=["Ventes"])
     app.include_router(inventaires_router, prefix="/api/v1/inventaires", tags=["Inventaires"])
     app.include_router(livraisons_router, prefix="/api/v1/livraisons", tags=["Livraisons"])  
@@ -217,4 +287,71 @@ def inclure_routes():
     app.include_router(groupe_partenaire_router, prefix="/api/v1/groupe-partenaire", tags=["Groupes Partenaires"])
     app.include_router(plan_comptable_router, prefix="/api/v1/plan-comptable", tags=["Plan Comptable"])
 
-inclure_routes()
\ No newline at end of file
+
+def create_app() -> FastAPI:
+    """
+    Construit l'application : configuration des logs (idempotente), middlewares, gestionnaires
+    d'exceptions et routes. Aucune connexion à la base n'est ouverte ici.
+    """
+    setup_logging()
+
+    app = FastAPI(
+        title="Succès Fuel API",
+        description="API for managing fuel station operations",
+        version="1.0.0",
+        lifespan=cycle_de_vie
+    )
+
+    # Ajouter le middleware i18n
+    app.add_middleware(I18nMiddleware)
+
+    # Ajouter le middleware de mémorisation de l'utilisateur par requête
+    app.add_middleware(UtilisateurRequeteMiddleware)
+
+    # Ajouter le middleware de mesure des requêtes SQL (ajouté après les autres pour englober leur traitement)
+    app.add_middleware(StatistiquesRequeteMiddleware)
+
+    # Ajouter le middleware de contexte de journalisation (englobe la mesure pour que ses logs portent le request_id)
+    app.add_middleware(ContexteJournalMiddleware)
+
+    # Ajouter le middleware de rate limiting
+    # Désactiver le middleware en développement pour éviter les erreurs
+    if os.getenv("ENVIRONMENT") != "development":
+        app.add_middleware(SlowAPIMiddleware)
+
+    # Ajouter le middleware CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Configure this properly in production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Ajouter le rate limiter à l'application
+    add_rate_limiter(app)
+
+    # Ajouter les gestionnaires d'exceptions
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+    app.add_exception_handler(IntegrityError, database_integrity_exception_handler)
+    app.add_exception_handler(DatabaseIntegrityException, database_integrity_exception_handler)
+    app.add_exception_handler(SQLAlchemyError, database_sqlalchemy_exception_handler)
+    app.add_exception_handler(ValidationError, pydantic_validation_exception_handler)
+    app.add_exception_handler(Exception, general_exception_handler)
+
+    inclure_routes(app)
+    return app
+
+
+# L'application n'est pas construite à l'import : `uvicorn --factory api.main:create_app` ou
+# `gunicorn "api.main:create_app()"`. `api.main:app` reste accepté et la construit au premier accès.
+_app = None
+
+
+def __getattr__(nom):
+    global _app
+    if nom == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
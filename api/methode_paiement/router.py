@@ -20,7 +20,7 @@ security = HTTPBearer()
             summary="Récupérer les méthodes de paiement",
             description="Récupère la liste des méthodes de paiement avec pagination. Cet endpoint permet de consulter toutes les méthodes de paiement disponibles dans la compagnie de l'utilisateur. Nécessite une authentification valide.",
             tags=["Methodes paiement"])
-async def get_methodes_paiement(
+def get_methodes_paiement(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -40,7 +40,7 @@ async def get_methodes_paiement(
              summary="Créer une nouvelle méthode de paiement",
              description="Crée une nouvelle méthode de paiement dans le système. La méthode est créée sans association à une trésorerie spécifique. Pour associer la méthode à une trésorerie, utilisez l'endpoint d'association. Nécessite une authentification valide.",
              tags=["Methodes paiement"])
-async def create_methode_paiement(
+def create_methode_paiement(
     methode_paiement: schemas.MethodePaiementCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -81,7 +81,7 @@ async def create_methode_paiement(
             summary="Récupérer une méthode de paiement par ID",
             description="Récupère les détails d'une méthode de paiement spécifique par son identifiant. Permet d'obtenir toutes les informations relatives à une méthode de paiement. Nécessite une authentification valide et des droits d'accès appropriés.",
             tags=["Methodes paiement"])
-async def get_methode_paiement_by_id(
+def get_methode_paiement_by_id(
     methode_paiement_id: uuid.UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -103,7 +103,7 @@ async def get_methode_paiement_by_id(
             summary="Mettre à jour une méthode de paiement",
             description="Met à jour les informations d'une méthode de paiement existante. Permet de modifier les détails de la méthode de paiement, comme son nom, son type ou son état d'activation. Nécessite une authentification valide et des droits d'accès appropriés.",
             tags=["Methodes paiement"])
-async def update_methode_paiement(
+def update_methode_paiement(
     methode_paiement_id: uuid.UUID,
     methode_paiement: schemas.MethodePaiementUpdate,
     db: Session = Depends(get_db),
@@ -131,7 +131,7 @@ async def update_methode_paiement(
                 summary="Désactiver une méthode de paiement",
                 description="Désactive une méthode de paiement du système. Cet endpoint effectue une suppression logique en mettant à jour le statut d'activation de la méthode. La méthode ne sera plus disponible pour les transactions mais les données historiques sont conservées. Nécessite une authentification valide et des droits d'accès appropriés.",
                 tags=["Methodes paiement"])
-async def delete_methode_paiement(
+def delete_methode_paiement(
     methode_paiement_id: uuid.UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -157,7 +157,7 @@ async def delete_methode_paiement(
              summary="Associer une méthode de paiement à une trésorerie",
              description="Crée une association entre une méthode de paiement et une trésorerie spécifique. Cela permet de limiter l'utilisation de la méthode de paiement à une trésorerie précise. Nécessite une authentification valide et des droits d'accès appropriés à la trésorerie concernée.",
              tags=["Methodes paiement"])
-async def associer_methode_paiement_a_tresorerie(
+def associer_methode_paiement_a_tresorerie(
     association: schemas.TresorerieMethodePaiementCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -213,7 +213,7 @@ async def associer_methode_paiement_a_tresorerie(
             summary="Récupérer les méthodes de paiement d'une trésorerie",
             description="Récupère la liste des méthodes de paiement associées à une trésorerie spécifique via la table d'association. Cet endpoint permet de consulter toutes les méthodes de paiement disponibles pour une trésorerie donnée. Nécessite une authentification valide et des droits d'accès appropriés à la trésorerie concernée.",
             tags=["Methodes paiement"])
-async def get_methodes_paiement_par_tresorerie(
+def get_methodes_paiement_par_tresorerie(
     tresorerie_id: uuid.UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -273,7 +273,7 @@ async def get_methodes_paiement_par_tresorerie(
              summary="Dissocier une méthode de paiement d'une trésorerie",
              description="Supprime l'association entre une méthode de paiement et une trésorerie spécifique. Cette opération n'est possible que si l'association n'a pas de mouvements liés. Nécessite une authentification valide et des droits d'accès appropriés à la trésorerie concernée.",
              tags=["Methodes paiement"])
-async def dissocier_methode_paiement_de_tresorerie(
+def dissocier_methode_paiement_de_tresorerie(
     dissociation: schemas.TresorerieMethodePaiementDissocier,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
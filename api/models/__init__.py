@@ -4,7 +4,7 @@ from .user import User
 from .affectation_utilisateur_station import AffectationUtilisateurStation
 from .journal_action_utilisateur import JournalActionUtilisateur
 from .compagnie import Compagnie, Station
-from .tresorerie import Tresorerie, TresorerieStation, MouvementTresorerie, TransfertTresorerie, EtatInitialTresorerie
+from .tresorerie import Tresorerie, TresorerieStation, MouvementTresorerie, TransfertTresorerie, EtatInitialTresorerie, SoldeTresorerie
 from .methode_paiement import MethodePaiement, TresorerieMethodePaiement
 from .tiers import Tiers, SoldeTiers
 from .achat import Achat, AchatDetail
@@ -22,13 +22,14 @@ from .charge import Charge, CategorieCharge
 from .immobilisation import Immobilisation, MouvementImmobilisation
 from .salaire import Salaire
 from .token_session import TokenSession
-from .compagnie import Cuve, Pistolet, EtatInitialCuve, MouvementStockCuve
+from .compagnie import Cuve, Pistolet, EtatInitialCuve, MouvementStockCuve, PointStockCuve
 from .stock_carburant import StockCarburant
 from .stock import StockProduit
 from .prix_carburant import PrixCarburant
 from .lot import Lot
 from .achat_carburant import AchatCarburant, LigneAchatCarburant, CompensationFinanciere, AvoirCompensation, PaiementAchatCarburant
 from .vente_carburant import VenteCarburant
+from .cumul_vente import CumulVenteCarburantJour, CumulVenteBoutiqueJour
 from .creance_employe import CreanceEmploye
 from .mouvement_financier import Reglement, Creance, Avoir
 from .journal_operations import JournalOperations
@@ -55,6 +56,7 @@ __all__ = [
     "MouvementTresorerie",
     "TransfertTresorerie",
     "EtatInitialTresorerie",
+    "SoldeTresorerie",
     "MethodePaiement",
     "TresorerieMethodePaiement",
     "Tiers",
@@ -85,6 +87,7 @@ __all__ = [
     "Pistolet",
     "EtatInitialCuve",
     "MouvementStockCuve",
+    "PointStockCuve",
     "StockCarburant",
     "StockProduit",
     "PrixCarburant",
@@ -95,6 +98,8 @@ __all__ = [
     "AvoirCompensation",
     "PaiementAchatCarburant",
     "VenteCarburant",
+    "CumulVenteCarburantJour",
+    "CumulVenteBoutiqueJour",
     "CreanceEmploye",
     "Reglement",
     "Creance",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, func, ForeignKey, DECIMAL, CheckConstraint
+from sqlalchemy import Column, String, Integer, Boolean, Date, DateTime, func, ForeignKey, DECIMAL, CheckConstraint, FetchedValue, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
@@ -33,6 +33,8 @@ class Compagnie(BaseModel):
 
 class Station(BaseModel):
     __tablename__ = "station"  # Changed to match the actual database table
+    # Champs couverts par la recherche textuelle (paramètre q), indexés en trigrammes
+    __champs_recherche__ = ("nom", "code")
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     compagnie_id = Column(UUID(as_uuid=True), ForeignKey("compagnie.id"), nullable=False)
@@ -100,160 +102,18 @@ class Cuve(BaseModel):
     def calculer_volume(self, hauteur_cm):
         """
         Calcule le volume en litres à partir de la hauteur en cm
-        en utilisant le barremage de la cuve
+        en utilisant le barremage de la cuve (compilé une fois puis mis en cache)
         """
-        if not self.barremage:
-            raise ValueError("Le barremage n'est pas défini pour cette cuve")
-
-        import json
-        # Gérer les deux cas : barremage peut être une chaîne JSON ou déjà un objet Python
-        if isinstance(self.barremage, str):
-            try:
-                barremage = json.loads(self.barremage)
-            except json.JSONDecodeError:
-                raise ValueError("Le barremage est mal formaté")
-        else:
-            # Si self.barremage n'est pas une chaîne, on suppose que c'est déjà un objet Python
-            barremage = self.barremage
-
-        # Vérifier que le barremage est bien une liste
-        if not isinstance(barremage, list):
-            raise ValueError("Le barremage est mal formaté - ce n'est pas une liste d'objets")
-
-        # Trier le barremage par hauteur pour assurer l'ordre
-        # Supporte les deux formats (hauteur_cm/volume_litres et hauteur/volume)
-        def get_hauteur(item):
-            return item.get('hauteur_cm', item.get('hauteur', 0))
-
-        barremage_trie = sorted(barremage, key=get_hauteur)
-
-        # Trouver les deux points entre lesquels se trouve la hauteur
-        point_inf = None
-        point_sup = None
-
-        for i, point in enumerate(barremage_trie):
-            point_hauteur = get_hauteur(point)
-            if point_hauteur <= hauteur_cm:
-                point_inf = point
-            if point_hauteur >= hauteur_cm and point_inf is not None:
-                point_sup = point
-                break
-
-        # Si la hauteur est inférieure à la plus petite hauteur du barremage
-        if point_inf is None:
-            # Prendre le premier point
-            first_point = barremage_trie[0] if barremage_trie else {}
-            return first_point.get('volume_litres', first_point.get('volume', 0))
-
-        # Si la hauteur est supérieure à la plus grande hauteur du barremage
-        if point_sup is None:
-            # Prendre le dernier point
-            last_point = barremage_trie[-1] if barremage_trie else {}
-            return last_point.get('volume_litres', last_point.get('volume', 0))
-
-        # Si la hauteur correspond exactement à un point
-        point_inf_hauteur = get_hauteur(point_inf)
-        point_sup_hauteur = get_hauteur(point_sup)
-
-        if point_inf_hauteur == hauteur_cm:
-            return point_inf.get('volume_litres', point_inf.get('volume', 0))
-
-        if point_sup_hauteur == hauteur_cm:
-            return point_sup.get('volume_litres', point_sup.get('volume', 0))
-
-        # Calculer le volume par interpolation linéaire
-        hauteur_inf = get_hauteur(point_inf)
-        hauteur_sup = get_hauteur(point_sup)
-
-        hauteur_diff = hauteur_sup - hauteur_inf
-        volume_inf = point_inf.get('volume_litres', point_inf.get('volume', 0))
-        volume_sup = point_sup.get('volume_litres', point_sup.get('volume', 0))
-        volume_diff = volume_sup - volume_inf
-
-        # Calculer le facteur d'interpolation
-        facteur = (hauteur_cm - hauteur_inf) / hauteur_diff if hauteur_diff != 0 else 0
-
-        volume = volume_inf + (volume_diff * facteur)
-        return round(volume, 2)  # Arrondir à 2 décimales
+        from ..services.stocks.barremage_service import get_bareme_cuve
+        return get_bareme_cuve(self).volume(hauteur_cm)
 
     def calculer_hauteur(self, volume_litres):
         """
         Calcule la hauteur en cm à partir du volume en litres
-        en utilisant le barremage de la cuve
+        en utilisant le barremage de la cuve (compilé une fois puis mis en cache)
         """
-        if not self.barremage:
-            raise ValueError("Le barremage n'est pas défini pour cette cuve")
-
-        import json
-        # Gérer les deux cas : barremage peut être une chaîne JSON ou déjà un objet Python
-        if isinstance(self.barremage, str):
-            try:
-                barremage = json.loads(self.barremage)
-            except json.JSONDecodeError:
-                raise ValueError("Le barremage est mal formaté")
-        else:
-            # Si self.barremage n'est pas une chaîne, on suppose que c'est déjà un objet Python
-            barremage = self.barremage
-
-        # Vérifier que le barremage est bien une liste
-        if not isinstance(barremage, list):
-            raise ValueError("Le barremage est mal formaté - ce n'est pas une liste d'objets")
-
-        # Trier le barremage par volume pour assurer l'ordre
-        # Supporte les deux formats (hauteur_cm/volume_litres et hauteur/volume)
-        def get_volume(item):
-            return item.get('volume_litres', item.get('volume', 0))
-
-        barremage_trie = sorted(barremage, key=get_volume)
-
-        # Trouver les deux points entre lesquels se trouve le volume
-        point_inf = None
-        point_sup = None
-
-        for i, point in enumerate(barremage_trie):
-            point_volume = get_volume(point)
-            if point_volume <= volume_litres:
-                point_inf = point
-            if point_volume >= volume_litres and point_inf is not None:
-                point_sup = point
-                break
-
-        # Si le volume est inférieur au plus petit volume du barremage
-        if point_inf is None:
-            # Prendre le premier point
-            first_point = barremage_trie[0] if barremage_trie else {}
-            return first_point.get('hauteur_cm', first_point.get('hauteur', 0))
-
-        # Si le volume est supérieur au plus grand volume du barremage
-        if point_sup is None:
-            # Prendre le dernier point
-            last_point = barremage_trie[-1] if barremage_trie else {}
-            return last_point.get('hauteur_cm', last_point.get('hauteur', 0))
-
-        # Si le volume correspond exactement à un point
-        point_inf_volume = get_volume(point_inf)
-        point_sup_volume = get_volume(point_sup)
-
-        if point_inf_volume == volume_litres:
-            return point_inf.get('hauteur_cm', point_inf.get('hauteur', 0))
-
-        if point_sup_volume == volume_litres:
-            return point_sup.get('hauteur_cm', point_sup.get('hauteur', 0))
-
-        # Calculer la hauteur par interpolation linéaire
-        volume_inf = get_volume(point_inf)
-        volume_sup = get_volume(point_sup)
-
-        volume_diff = volume_sup - volume_inf
-        hauteur_inf = point_inf.get('hauteur_cm', point_inf.get('hauteur', 0))
-        hauteur_sup = point_sup.get('hauteur_cm', point_sup.get('hauteur', 0))
-        hauteur_diff = hauteur_sup - hauteur_inf
-
-        # Calculer le facteur d'interpolation
-        facteur = (volume_litres - volume_inf) / volume_diff if volume_diff != 0 else 0
-
-        hauteur = hauteur_inf + (hauteur_diff * facteur)
-        return round(hauteur, 2)  # Arrondir à 2 décimales
+        from ..services.stocks.barremage_service import get_bareme_cuve
+        return get_bareme_cuve(self).hauteur(volume_litres)
 
 
 class Pistolet(BaseModel):
@@ -297,9 +157,35 @@ class MouvementStockCuve(BaseModel):
     type_mouvement = Column(String(20), nullable=False)  # 'stock_initial', 'entree', 'sortie', 'ajustement_positif', 'ajustement_negatif'
     quantite = Column(DECIMAL(12, 2), nullable=False)
     date_mouvement = Column(DateTime, nullable=False)
-    stock_avant = Column(DECIMAL(12, 2))  # Stock avant le mouvement
-    stock_apres = Column(DECIMAL(12, 2))  # Stock après le mouvement
+    # Solde courant de la cuve avant et après le mouvement, attribués par les triggers du registre
+    # (trg_attribuer_stock_mouvement_cuve) : rechargés depuis la base après chaque écriture
+    stock_avant = Column(DECIMAL(12, 2), server_default=FetchedValue(), server_onupdate=FetchedValue())
+    stock_apres = Column(DECIMAL(12, 2), server_default=FetchedValue(), server_onupdate=FetchedValue())
     utilisateur_id = Column(UUID(as_uuid=True), ForeignKey("utilisateur.id"), nullable=False)
     reference_origine = Column(String(100), nullable=False)
     module_origine = Column(String(100), nullable=False)
     statut = Column(String(20), default="validé")  # 'validé', 'annulé'
+
+
+class PointStockCuve(BaseModel):
+    """
+    Point journalier du stock d'une cuve, tenu à jour par les triggers de la base à chaque écriture
+    dans mouvement_stock_cuve (y compris les mouvements antidatés, qui décalent les points suivants).
+    Le stock à une date se lit sur le dernier point antérieur, complété des mouvements du jour.
+    """
+    __tablename__ = "point_stock_cuve"
+
+    cuve_id = Column(UUID(as_uuid=True), ForeignKey("cuve.id"), nullable=False)
+    date_point = Column(Date, nullable=False)
+    volume_entree = Column(DECIMAL(14, 2), nullable=False, default=0)  # Entrées (livraisons)
+    volume_sortie = Column(DECIMAL(14, 2), nullable=False, default=0)  # Sorties (ventes)
+    volume_ajustement = Column(DECIMAL(14, 2), nullable=False, default=0)  # Ajustements (quantité signée)
+    volume_initialisation = Column(DECIMAL(14, 2), nullable=False, default=0)  # Stock initial et ses corrections
+    nombre_entrees = Column(Integer, nullable=False, default=0)
+    nombre_sorties = Column(Integer, nullable=False, default=0)
+    nombre_ajustements = Column(Integer, nullable=False, default=0)
+    stock_cloture = Column(DECIMAL(14, 2), nullable=False, default=0)  # Niveau de la cuve en fin de journée
+
+    __table_args__ = (
+        UniqueConstraint('cuve_id', 'date_point', name='uq_point_stock_cuve_date'),
+    )
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, DECIMAL, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import UUID
+from .base_model import BaseModel
+
+
+class CumulVenteCarburantJour(BaseModel):
+    """
+    Cumul journalier des ventes de carburant par station et carburant, tenu à jour par les triggers
+    de la base à chaque enregistrement, modification ou annulation d'une vente_carburant.
+    La marge se déduit du chiffre d'affaires et du coût au CMP figé sur chaque vente.
+    """
+    __tablename__ = "cumul_vente_carburant_jour"
+
+    station_id = Column(UUID(as_uuid=True), ForeignKey("station.id"), nullable=False)
+    carburant_id = Column(UUID(as_uuid=True), ForeignKey("carburant.id"), nullable=False)
+    jour = Column(Date, nullable=False)
+    volume = Column(DECIMAL(16, 2), nullable=False, default=0)  # Litres vendus
+    chiffre_affaires = Column(DECIMAL(18, 2), nullable=False, default=0)
+    cout_cmp = Column(DECIMAL(18, 4), nullable=False, default=0)  # Coût des ventes au CMP
+    nombre_transactions = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('station_id', 'carburant_id', 'jour', name='uq_cumul_vente_carburant_jour'),
+        Index('idx_cumul_vente_carburant_jour_station_jour', 'station_id', 'jour'),
+    )
+
+
+class CumulVenteBoutiqueJour(BaseModel):
+    """
+    Cumul journalier des ventes boutique par station et produit, tenu à jour par les triggers de la base
+    sur ventes_details (lignes) et ventes (annulation, changement de date ou de station).
+    """
+    __tablename__ = "cumul_vente_boutique_jour"
+
+    station_id = Column(UUID(as_uuid=True), ForeignKey("station.id"), nullable=False)
+    produit_id = Column(UUID(as_uuid=True), ForeignKey("produit.id"), nullable=False)
+    jour = Column(Date, nullable=False)
+    quantite = Column(DECIMAL(16, 2), nullable=False, default=0)
+    chiffre_affaires = Column(DECIMAL(18, 2), nullable=False, default=0)
+    cout_cmp = Column(DECIMAL(18, 4), nullable=False, default=0)  # Coût des ventes au CMP
+    nombre_transactions = Column(Integer, nullable=False, default=0)  # Lignes de vente
+
+    __table_args__ = (
+        UniqueConstraint('station_id', 'produit_id', 'jour', name='uq_cumul_vente_boutique_jour'),
+        Index('idx_cumul_vente_boutique_jour_station_jour', 'station_id', 'jour'),
+    )
@@ -20,6 +20,8 @@ class FamilleProduit(BaseModel):
 
 class Produit(BaseModel):
     __tablename__ = "produit"
+    # Champs couverts par la recherche textuelle (paramètre q), indexés en trigrammes
+    __champs_recherche__ = ("nom", "code", "code_barre")
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     nom = Column(String, nullable=False)
@@ -17,6 +17,11 @@ class StockProduit(BaseModel):
     prix_vente = Column(DECIMAL(10, 2), nullable=False, default=0)  # Prix de vente spécifique au stock
     seuil_stock_min = Column(DECIMAL(10, 2), default=0)  # Seuil minimum de stock spécifique au stock
 
+    # État courant du calcul incrémental du coût moyen pondéré
+    quantite_cmp = Column(DECIMAL(15, 3), default=0)        # Quantité valorisée au coût moyen
+    valeur_stock_cmp = Column(DECIMAL(18, 4), default=0)    # Valeur du stock au coût moyen
+    date_dernier_mouvement_cmp = Column(DateTime)           # Date du dernier mouvement pris en compte
+
     __table_args__ = (
         # Ajout d'une contrainte pour s'assurer qu'il n'y a qu'un seul stock par produit par station
         # Cela remplace la contrainte unique sur produit_id seule
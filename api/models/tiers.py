@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, UUID, DateTime, CheckConstraint, Float, ForeignKey, Numeric, Boolean
+from sqlalchemy import Column, String, UUID, DateTime, CheckConstraint, Float, ForeignKey, Numeric, Boolean, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -8,6 +8,8 @@ import uuid
 
 class Tiers(BaseModel):
     __tablename__ = "tiers"
+    # Champs couverts par la recherche textuelle (paramètre q), indexés en trigrammes
+    __champs_recherche__ = ("nom", "email", "telephone")
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     compagnie_id = Column(UUID(as_uuid=True), nullable=False)
@@ -51,6 +53,11 @@ class SoldeTiers(BaseModel):
     # Relations
     tiers = relationship("Tiers", back_populates="soldes", lazy="select")
 
+    __table_args__ = (
+        # Un seul solde par tiers et par station : les variations y sont appliquées par UPSERT
+        UniqueConstraint('tiers_id', 'station_id', name='uq_solde_tiers_tiers_station'),
+    )
+
 
 class MouvementTiers(BaseModel):
     __tablename__ = "mouvement_tiers"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, func
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index, func, text
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from .base_model import BaseModel
@@ -9,6 +9,14 @@ class TokenSession(BaseModel):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     utilisateur_id = Column(UUID(as_uuid=True), ForeignKey("utilisateur.id"), nullable=False)
     token = Column(String, nullable=False)
-    token_refresh = Column(String, nullable=False)
+    # Empreinte SHA-256 (hexadécimale) du token de rafraîchissement : le jeton lui-même n'est pas conservé
+    empreinte_refresh = Column(String(64), nullable=False)
     date_expiration = Column(DateTime, nullable=False)
     actif = Column(Boolean, default=True)
+
+    __table_args__ = (
+        Index('uq_token_session_empreinte_refresh', 'empreinte_refresh', unique=True),
+        Index('idx_token_session_date_expiration', 'date_expiration'),
+        # Sessions révoquées, purgées d'après leur date de révocation
+        Index('idx_token_session_inactives', 'updated_at', postgresql_where=text('actif = false')),
+    )
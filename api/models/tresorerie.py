@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Date, Boolean, ForeignKey, DECIMAL, Index, JSON, CheckConstraint
+from sqlalchemy import Column, String, Integer, Float, DateTime, Date, Boolean, ForeignKey, DECIMAL, Index, JSON, CheckConstraint, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
@@ -111,3 +111,25 @@ class TransfertTresorerie(BaseModel):
     description = Column(String)
     utilisateur_id = Column(PG_UUID(as_uuid=True), ForeignKey("utilisateur.id"), nullable=False)
     statut = Column(String, default='validé')  # validé, annulé
+
+
+class SoldeTresorerie(BaseModel):
+    """
+    Solde courant d'une trésorerie, tenu à jour par les triggers de la base à chaque mouvement
+    de trésorerie (création, annulation, transfert) et à chaque modification de l'état initial.
+    Une ligne par trésorerie : la lecture du solde se fait en O(1).
+    """
+    __tablename__ = "solde_tresorerie"
+
+    # Pas de clé étrangère : reference_id désigne une trésorerie station, une trésorerie globale
+    # ou une station selon type_tresorerie (même principe que TransfertTresorerie)
+    type_tresorerie = Column(String, nullable=False)  # tresorerie_station, tresorerie_globale, station
+    reference_id = Column(PG_UUID(as_uuid=True), nullable=False)
+    solde_initial = Column(DECIMAL(15, 2), nullable=False, default=0)  # État initial (station) ou solde initial (globale)
+    total_mouvements = Column(DECIMAL(18, 2), nullable=False, default=0)  # Somme des entrées - sorties validées
+    solde = Column(DECIMAL(18, 2), nullable=False, default=0)  # solde_initial + total_mouvements
+    date_dernier_mouvement = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint('type_tresorerie', 'reference_id', name='uq_solde_tresorerie_reference'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Index, DECIMAL
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
 from .base_model import BaseModel
@@ -44,6 +44,7 @@ class VenteDetail(BaseModel):
     prix_unitaire = Column(Float, nullable=False)
     montant = Column(Float, nullable=False)
     remise = Column(Float, default=0)
+    cout_unitaire_cmp = Column(DECIMAL(15, 4))  # Coût unitaire au CMP figé par la base à l'enregistrement (marge des cumuls)
 
     # Relationships
     vente = relationship("Vente", back_populates="details", lazy="select")
@@ -30,6 +30,7 @@ class VenteCarburant(BaseModel):
     utilisateur_id = Column(UUID(as_uuid=True), ForeignKey("utilisateur.id"), nullable=False)
     numero_piece_comptable = Column(String)
     creance_employe_id = Column(UUID(as_uuid=True), ForeignKey("creances_employes.id"))  # En cas de paiement insuffisant
+    cout_unitaire_cmp = Column(DECIMAL(15, 4))  # Coût unitaire au CMP figé par la base à l'enregistrement (marge des cumuls)
 
     # Relations
     station = relationship("Station", lazy="select")
@@ -16,7 +16,7 @@ security = HTTPBearer()
 @router.get("/reglements", response_model=List[schemas.ReglementResponse],
            summary="Récupérer la liste des règlements",
            description="Permet de récupérer la liste des règlements appartenant à la compagnie de l'utilisateur connecté")
-async def get_reglements(
+def get_reglements(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -30,7 +30,7 @@ async def get_reglements(
 @router.post("/reglements", response_model=schemas.ReglementResponse,
             summary="Créer un nouveau règlement",
             description="Permet de créer un nouveau règlement pour la compagnie de l'utilisateur connecté")
-async def create_reglement(
+def create_reglement(
     reglement: schemas.ReglementCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Mouvements Financiers"))
@@ -67,7 +67,7 @@ async def create_reglement(
 @router.get("/reglements/{reglement_id}", response_model=schemas.ReglementResponse,
            summary="Récupérer un règlement par son ID",
            description="Permet de récupérer les détails d'un règlement spécifique par son identifiant")
-async def get_reglement_by_id(
+def get_reglement_by_id(
     reglement_id: str,  # Changement de int à str pour UUID
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Mouvements Financiers"))
@@ -84,7 +84,7 @@ async def get_reglement_by_id(
 @router.get("/creances", response_model=List[schemas.CreanceResponse],
            summary="Récupérer la liste des créances",
            description="Permet de récupérer la liste des créances appartenant à la compagnie de l'utilisateur connecté")
-async def get_creances(
+def get_creances(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -98,7 +98,7 @@ async def get_creances(
 @router.post("/creances", response_model=schemas.CreanceResponse,
             summary="Créer une nouvelle créance",
             description="Permet de créer une nouvelle créance pour la compagnie de l'utilisateur connecté")
-async def create_creance(
+def create_creance(
     creance: schemas.CreanceCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Mouvements Financiers"))
@@ -119,7 +119,7 @@ async def create_creance(
 @router.get("/creances/{creance_id}", response_model=schemas.CreanceResponse,
            summary="Récupérer une créance par son ID",
            description="Permet de récupérer les détails d'une créance spécifique par son identifiant")
-async def get_creance_by_id(
+def get_creance_by_id(
     creance_id: str,  # Changement de int à str pour UUID
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Mouvements Financiers"))
@@ -136,7 +136,7 @@ async def get_creance_by_id(
 @router.get("/avoirs", response_model=List[schemas.AvoirResponse],
            summary="Récupérer la liste des avoirs",
            description="Permet de récupérer la liste des avoirs appartenant à la compagnie de l'utilisateur connecté")
-async def get_avoirs(
+def get_avoirs(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -150,7 +150,7 @@ async def get_avoirs(
 @router.post("/avoirs", response_model=schemas.AvoirResponse,
             summary="Créer un nouvel avoir",
             description="Permet de créer un nouvel avoir pour la compagnie de l'utilisateur connecté")
-async def create_avoir(
+def create_avoir(
     avoir: schemas.AvoirCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Mouvements Financiers"))
@@ -176,7 +176,7 @@ async def create_avoir(
 @router.get("/avoirs/{avoir_id}", response_model=schemas.AvoirResponse,
            summary="Récupérer un avoir par son ID",
            description="Permet de récupérer les détails d'un avoir spécifique par son identifiant")
-async def get_avoir_by_id(
+def get_avoir_by_id(
     avoir_id: str,  # Changement de int à str pour UUID
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Mouvements Financiers"))
@@ -192,7 +192,7 @@ async def get_avoir_by_id(
 @router.put("/avoirs/{avoir_id}", response_model=schemas.AvoirResponse,
            summary="Mettre à jour un avoir",
            description="Permet de modifier les informations d'un avoir existant")
-async def update_avoir(
+def update_avoir(
     avoir_id: str,  # Changement de int à str pour UUID
     avoir: schemas.AvoirUpdate,
     db: Session = Depends(get_db),
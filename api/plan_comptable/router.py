@@ -17,7 +17,7 @@ router = APIRouter(prefix="/plan-comptable", tags=["Plan Comptable"])
 
 @require_permission("plan_comptable:create")
 @router.post("/", response_model=PlanComptableResponse, status_code=status.HTTP_201_CREATED)
-async def create_plan_comptable(
+def create_plan_comptable(
     plan: PlanComptableCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
@@ -33,7 +33,7 @@ async def create_plan_comptable(
 
 @require_permission("plan_comptable:read")
 @router.get("/{plan_id}", response_model=PlanComptableResponse)
-async def get_plan_comptable(
+def get_plan_comptable(
     plan_id: UUID,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
@@ -49,7 +49,7 @@ async def get_plan_comptable(
 
 @require_permission("plan_comptable:update")
 @router.put("/{plan_id}", response_model=PlanComptableResponse)
-async def update_plan_comptable(
+def update_plan_comptable(
     plan_id: UUID,
     plan: PlanComptableUpdate,
     db: Session = Depends(get_db),
@@ -66,7 +66,7 @@ async def update_plan_comptable(
 
 @require_permission("plan_comptable:delete")
 @router.delete("/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_plan_comptable(
+def delete_plan_comptable(
     plan_id: UUID,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
@@ -82,7 +82,7 @@ async def delete_plan_comptable(
 
 @require_permission("plan_comptable:read")
 @router.get("/", response_model=List[PlanComptableResponse])
-async def get_all_plans_comptables(
+def get_all_plans_comptables(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
@@ -96,7 +96,7 @@ async def get_all_plans_comptables(
 
 @require_permission("plan_comptable:read")
 @router.get("/{plan_id}/hierarchy", response_model=PlanComptableHierarchyResponse)
-async def get_plan_hierarchy(
+def get_plan_hierarchy(
     plan_id: UUID,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
@@ -112,7 +112,7 @@ async def get_plan_hierarchy(
 
 @require_permission("plan_comptable:read")
 @router.get("/hierarchy/full", response_model=List[PlanComptableHierarchyResponse])
-async def get_full_plan_hierarchy(
+def get_full_plan_hierarchy(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
 ):
@@ -124,7 +124,7 @@ async def get_full_plan_hierarchy(
 
 @require_permission("plan_comptable:read")
 @router.get("/by-numero/{numero_compte}", response_model=PlanComptableHierarchyResponse)
-async def get_plan_hierarchy_by_numero(
+def get_plan_hierarchy_by_numero(
     numero_compte: str,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_security)
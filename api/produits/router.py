@@ -9,7 +9,7 @@ from ..models.compagnie import Station
 from . import schemas
 from ..utils.pagination import PaginatedResponse
 from ..utils.filters import ProduitFilterParams, FamilleProduitFilterParams
-from ..services.pagination_service import apply_filters_and_pagination, apply_specific_filters
+from ..services.pagination_service import apply_filters_and_pagination, apply_specific_filters, appliquer_recherche_textuelle
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from ..auth.auth_handler import get_current_user_security
 from ..auth.journalisation import log_user_action
@@ -25,7 +25,7 @@ security = HTTPBearer()
              summary="Récupérer les familles de produits",
              description="Récupère la liste paginée des familles de produits avec possibilité de filtrage et de tri. Les permissions varient selon le rôle de l'utilisateur. Uniquement accessible aux gérants de compagnie et utilisateurs avec permissions appropriées.",
              tags=["Produits"])
-async def get_familles(
+def get_familles(
     filters: FamilleProduitFilterParams = Depends(),
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -97,7 +97,7 @@ async def get_familles(
              summary="Créer une nouvelle famille de produits",
              description="Permet de créer une nouvelle famille de produits. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées. La famille créée permet d'organiser les produits par catégories.",
              tags=["Produits"])
-async def create_famille(
+def create_famille(
     famille: schemas.FamilleProduitCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -180,7 +180,7 @@ async def create_famille(
              summary="Récupérer les familles de produits racines",
              description="Récupère la liste paginée des familles de produits racines (sans parent) avec possibilité de filtrage et de tri. Les permissions varient selon le rôle de l'utilisateur. Uniquement accessible aux gérants de compagnie et utilisateurs avec permissions appropriées.",
              tags=["Produits"])
-async def get_familles_racines(
+def get_familles_racines(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -258,7 +258,7 @@ async def get_familles_racines(
              summary="Récupérer une famille de produits par ID",
              description="Récupère les détails d'une famille de produits spécifique par son identifiant unique. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
              tags=["Produits"])
-async def get_famille_by_id(
+def get_famille_by_id(
     famille_id: str,  # UUID
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -298,7 +298,7 @@ async def get_famille_by_id(
              summary="Mettre à jour une famille de produits",
              description="Met à jour les informations d'une famille de produits existante. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées. La modification affecte les produits associés à cette famille.",
              tags=["Produits"])
-async def update_famille(
+def update_famille(
     famille_id: str,  # UUID
     famille: schemas.FamilleProduitUpdate,
     request: Request,
@@ -384,7 +384,7 @@ async def update_famille(
                summary="Supprimer une famille de produits",
                description="Supprime une famille de produits existante. Seuls les utilisateurs avec les permissions appropriées peuvent supprimer une famille de produits. La suppression n'est possible que si la famille ne contient pas de sous-familles ni de produits associés.",
                tags=["Produits"])
-async def delete_famille(
+def delete_famille(
     famille_id: str,  # UUID
     request: Request,
     db: Session = Depends(get_db),
@@ -467,7 +467,7 @@ async def delete_famille(
              summary="Récupérer les familles enfants d'une famille parente",
              description="Récupère la liste paginée des familles enfants associées à une famille parente spécifique. Permet de visualiser la structure hiérarchique des familles de produits.",
              tags=["Produits"])
-async def get_famille_enfants(
+def get_famille_enfants(
     famille_id: str,  # UUID
     skip: int = 0,
     limit: int = 100,
@@ -527,7 +527,7 @@ async def get_famille_enfants(
              summary="Récupérer les produits",
              description="Récupère la liste paginée des produits avec possibilité de filtrage et de tri. Les permissions varient selon le rôle de l'utilisateur. Les gérants de compagnie ont accès à tous les produits de leur compagnie, tandis que les autres utilisateurs n'ont accès qu'aux produits des stations auxquelles ils sont affectés.",
              tags=["Produits"])
-async def get_produits(
+def get_produits(
     filters: ProduitFilterParams = Depends(),
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -623,6 +623,9 @@ async def get_produits(
         temp_filters.station_id = None
         query = apply_specific_filters(query, temp_filters, ProduitModel)
 
+    # Recherche textuelle sur le nom, le code et le code-barres (classée par pertinence sans tri explicite)
+    query = appliquer_recherche_textuelle(query, ProduitModel, filters.q, classer=not filters.sort_by)
+
     # Application du tri
     if filters.sort_by:
         sort_field = getattr(ProduitModel, filters.sort_by, None)
@@ -655,7 +658,7 @@ async def get_produits(
              summary="Récupérer les produits avec leur stock",
              description="Récupère la liste paginée des produits avec leurs quantités en stock. Permet de visualiser l'inventaire en temps réel selon les stations auxquelles l'utilisateur a accès. Les gérants de compagnie ont accès à tous les stocks de leur compagnie, tandis que les autres utilisateurs n'ont accès qu'aux stocks des stations auxquelles ils sont affectés.",
              tags=["Produits"])
-async def get_produits_avec_stock(
+def get_produits_avec_stock(
     filters: ProduitFilterParams = Depends(),
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -751,6 +754,9 @@ async def get_produits_avec_stock(
                 if model_attr is not None:
                     produits_autorises = produits_autorises.filter(model_attr == value)
 
+    # Recherche textuelle sur le nom, le code et le code-barres
+    produits_autorises = appliquer_recherche_textuelle(produits_autorises, ProduitModel, filters.q, classer=False)
+
     # Application du tri
     if filters.sort_by:
         sort_field = getattr(ProduitModel, filters.sort_by, None)
@@ -813,7 +819,7 @@ async def get_produits_avec_stock(
              summary="Créer un nouveau produit",
              description="Permet de créer un nouveau produit dans le système de gestion. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées. Le produit est affecté à la station de l'utilisateur ou à la première station de la compagnie.",
              tags=["Produits"])
-async def create_produit(
+def create_produit(
     produit: schemas.ProduitCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -937,7 +943,7 @@ async def create_produit(
              summary="Récupérer un produit par ID",
              description="Récupère les détails d'un produit spécifique par son identifiant unique. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur. L'utilisateur doit avoir accès à la station à laquelle le produit est affecté.",
              tags=["Produits"])
-async def get_produit_by_id(
+def get_produit_by_id(
     produit_id: str,  # UUID
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -992,7 +998,7 @@ async def get_produit_by_id(
              summary="Mettre à jour un produit",
              description="Met à jour les informations d'un produit existant. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées. La modification affecte les ventes futures et les calculs de stock.",
              tags=["Produits"])
-async def update_produit(
+def update_produit(
     produit_id: str,  # UUID
     produit: schemas.ProduitUpdate,
     request: Request,
@@ -1091,7 +1097,7 @@ async def update_produit(
                summary="Supprimer un produit",
                description="Supprime un produit existant. Seuls les utilisateurs avec les permissions appropriées peuvent supprimer un produit.",
                tags=["Produits"])
-async def delete_produit(
+def delete_produit(
     produit_id: str,  # UUID
     request: Request,
     db: Session = Depends(get_db),
@@ -1162,7 +1168,7 @@ async def delete_produit(
              summary="Récupérer les lots d'un produit",
              description="Récupère la liste des lots associés à un produit spécifique. Nécessite des droits de gérant de compagnie ou administrateur. Uniquement disponible pour les produits avec gestion de stock.",
              tags=["Produits"])
-async def get_lots(
+def get_lots(
     produit_id: str,  # UUID
     skip: int = 0,
     limit: int = 100,
@@ -1200,7 +1206,7 @@ async def get_lots(
              summary="[DÉPRÉCIÉ] Créer un nouveau lot pour un produit",
              description="[DÉPRÉCIÉ] Crée un nouveau lot associé à un produit spécifique. Utiliser create_lot avec le schéma LotCreate. Nécessite des droits de gérant de compagnie ou administrateur.",
              tags=["Produits"])
-async def create_lot_old(
+def create_lot_old(
     produit_id: str,  # UUID
     numero_lot: str,
     quantite: int,
@@ -1293,7 +1299,7 @@ async def create_lot_old(
              summary="Créer un nouveau lot pour un produit",
              description="Crée un nouveau lot associé à un produit spécifique. Nécessite des droits de gérant de compagnie ou administrateur. Uniquement disponible pour les produits avec gestion de stock.",
              tags=["Produits"])
-async def create_lot(
+def create_lot(
     produit_id: str,  # UUID
     lot_data: schemas.LotCreate,
     request: Request = None,
@@ -1392,7 +1398,7 @@ async def create_lot(
              summary="Récupérer un lot par ID",
              description="Récupère les détails d'un lot spécifique par son identifiant unique. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur. L'utilisateur doit avoir accès à la station du produit associé.",
              tags=["Produits"])
-async def get_lot_by_id(
+def get_lot_by_id(
     produit_id: str,  # UUID
     lot_id: str,  # UUID
     db: Session = Depends(get_db),
@@ -1441,7 +1447,7 @@ async def get_lot_by_id(
              summary="Mettre à jour un lot",
              description="Met à jour les informations d'un lot existant. Nécessite des droits de gérant de compagnie ou administrateur. La modification affecte la gestion des stocks et les alertes de péremption.",
              tags=["Produits"])
-async def update_lot(
+def update_lot(
     produit_id: str,  # UUID
     lot_id: str,  # UUID
     lot_data: schemas.LotUpdate,
@@ -1521,7 +1527,7 @@ async def update_lot(
                summary="Supprimer un lot",
                description="Supprime un lot existant. Nécessite des droits de gérant de compagnie ou administrateur. La suppression affecte les calculs de stock et les alertes de péremption.",
                tags=["Produits"])
-async def delete_lot(
+def delete_lot(
     produit_id: str,  # UUID
     lot_id: str,  # UUID
     request: Request = None,
@@ -1589,7 +1595,7 @@ async def delete_lot(
              summary="Récupérer les produits avec stock par station",
              description="Récupère tous les produits avec leur stock pour une station spécifique. Permet de visualiser l'inventaire d'une station précise. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur : les gérants de compagnie ont accès à toutes les stations de leur compagnie, les autres utilisateurs n'ont accès qu'aux stations auxquelles ils sont affectés.",
              tags=["Produits"])
-async def get_produits_par_station(
+def get_produits_par_station(
     station_id: str,
     request: Request,
     db: Session = Depends(get_db),
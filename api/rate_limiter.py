@@ -1,11 +1,89 @@
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from jose import JWTError, jwt
 import os
 
+# Enregistre le stockage sqlite:// auprès de limits
+from . import rate_limiter_sqlite  # noqa: F401
+
+# Définition des limites spécifiques
+# Limite de 5 requêtes par minute pour les endpoints d'authentification
+auth_limiter = "5/minute"
+
+# Limite de 100 requêtes par minute pour les autres endpoints
+default_limiter = "100/minute"
+
+# Pour les endpoints de création/modification, utiliser une limite plus stricte
+write_limiter = "50/minute"
+
+# Budget partagé par toutes les routes pour une même clé (utilisateur de la compagnie depuis une adresse IP) ;
+# chaque requête en consomme selon son coût
+global_limiter = os.getenv("RATE_LIMIT_GLOBAL", "300/minute")
+
+# Coût des routes lourdes (préfixe de chemin -> unités de budget), le plus long préfixe l'emporte.
+# Les autres lectures coûtent 1, les écritures 2 (rapport entre default_limiter et write_limiter).
+COUTS_ROUTES = {
+    "/api/v1/bilans": 10,
+    "/api/v1/bilans/export": 20,
+    "/api/v1/bilans/consolide": 20,
+    "/api/v1/ventes/statistiques": 5,
+    "/api/v1/ventes/statistiques/reconstruire": 20,
+    "/api/v1/tiers/fournisseurs/soldes/recalculer": 20,
+}
+
+
+def cle_limite(request: Request) -> str:
+    """
+    Clé de rate limiting : compagnie, utilisateur et adresse IP pour une requête authentifiée, afin que
+    les stations derrière une même IP (NAT) aient chacune leur budget ; adresse IP seule sinon.
+    Le jeton n'est que décodé (signature vérifiée), sans accès à la base.
+    """
+    ip = get_remote_address(request)
+    autorisation = request.headers.get("authorization", "")
+    if not autorisation.lower().startswith("bearer "):
+        return ip
+
+    from .auth.auth_handler import SECRET_KEY, ALGORITHM
+    try:
+        payload = jwt.decode(autorisation[7:], SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return ip
+    if payload.get("type") != "access" or not payload.get("sub"):
+        return ip
+    return f"{payload.get('cid', '-')}:{payload['sub']}@{ip}"
+
+
+def cout_requete(request: Request) -> int:
+    """
+    Coût d'une requête dans le budget global : celui du plus long préfixe de COUTS_ROUTES qui correspond,
+    sinon 1 pour une lecture et 2 pour une écriture
+    """
+    chemin = request.url.path.rstrip("/")
+    prefixes = [p for p in COUTS_ROUTES if chemin == p or chemin.startswith(p + "/")]
+    if prefixes:
+        return COUTS_ROUTES[max(prefixes, key=len)]
+    return 1 if request.method in ("GET", "HEAD", "OPTIONS") else 2
+
+
 # Création du rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# RATE_LIMIT_STORAGE_URI : memory:// (compteurs propres à chaque worker, tests et développement),
+# sqlite:///limites.db ou sqlite:////chemin/absolu/limites.db (workers d'un même hôte), redis://hote:6379 (plusieurs hôtes)
+limiter = Limiter(
+    key_func=cle_limite,
+    application_limits=[global_limiter],
+    storage_uri=os.getenv("RATE_LIMIT_STORAGE_URI", "memory://"),
+    strategy=os.getenv("RATE_LIMIT_STRATEGY", "fixed-window"),
+    key_prefix="successfuel",
+    # Si le stockage partagé devient indisponible, limiter localement plutôt que refuser les requêtes
+    in_memory_fallback_enabled=True
+)
+
+# slowapi n'expose pas de coût pour les limites d'application : il est renseigné sur leurs groupes
+for groupe in limiter._application_limits:
+    groupe.cost = cout_requete
+
 
 def add_rate_limiter(app: FastAPI):
     """Ajoute le gestionnaire de rate limiting à l'application FastAPI"""
@@ -17,18 +95,9 @@ def add_rate_limiter(app: FastAPI):
         app.state.limiter = limiter
         app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# Définition des limites spécifiques
-# Limite de 5 requêtes par minute pour les endpoints d'authentification
-auth_limiter = "5/minute"
-
-# Limite de 100 requêtes par minute pour les autres endpoints
-default_limiter = "100/minute"
-
-# Pour les endpoints de création/modification, utiliser une limite plus stricte
-write_limiter = "50/minute"
 
 def get_limit_for_env(limit_str: str):
     """Retourne la limite appropriée selon l'environnement"""
     if os.getenv("ENVIRONMENT") == "development":
         return "1000/minute"  # Très haute limite en développement
-    return limit_str
\ No newline at end of file
+    return limit_str
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from limits.storage import Storage
+
+
+class StockageSQLite(Storage):
+    """
+    Stockage des compteurs de rate limiting dans un fichier SQLite partagé par les workers d'un même hôte.
+    Seule la stratégie fixed-window est prise en charge ; pour plusieurs hôtes, utiliser un stockage Redis (redis://).
+
+    L'URI suit la convention de SQLAlchemy :
+        sqlite:///limites.db               chemin relatif au répertoire de travail (trois barres obliques)
+        sqlite:////var/lib/app/limites.db  chemin absolu (quatre barres obliques)
+    Une base en mémoire (sqlite://) n'est pas acceptée : chaque connexion en aurait sa propre copie.
+    Pour les tests et le développement, utiliser le stockage memory://.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    # Nombre d'incréments entre deux purges des compteurs expirés
+    INTERVALLE_PURGE = 1000
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # Le chemin suit la barre oblique qui termine « sqlite:// » : /limites.db -> limites.db, //var/... -> /var/...
+        chemin = urlparse(uri).path
+        self.chemin = chemin[1:] if chemin.startswith("/") else chemin
+        if self.chemin in ("", ":memory:"):
+            # Une connexion par thread : une base en mémoire n'aurait ni compteurs partagés ni table hors du
+            # thread qui l'a créée, et check() réussirait encore, sans bascule vers le stockage de secours
+            raise ValueError(f"{uri} : un fichier est nécessaire (sqlite:///chemin/limites.db), utiliser memory:// pour un stockage en mémoire")
+        self.timeout = float(options.get("timeout", 5))
+        self._local = threading.local()
+        self._increments = 0
+        with self._connexion() as connexion:
+            connexion.execute(
+                "CREATE TABLE IF NOT EXISTS compteurs ("
+                "cle TEXT PRIMARY KEY, valeur INTEGER NOT NULL, expiration REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connexion(self) -> sqlite3.Connection:
+        # Une connexion par thread, rouverte après un fork (workers gunicorn)
+        connexion = getattr(self._local, "connexion", None)
+        if connexion is None or self._local.pid != os.getpid():
+            connexion = sqlite3.connect(self.chemin, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.connexion = connexion
+            self._local.pid = os.getpid()
+        return connexion
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        maintenant = time.time()
+        connexion = self._connexion()
+        # Une seule instruction : le compteur expiré repart de `amount`, sinon il est incrémenté
+        valeur = connexion.execute(
+            "INSERT INTO compteurs (cle, valeur, expiration) VALUES (?, ?, ?) "
+            "ON CONFLICT (cle) DO UPDATE SET "
+            "valeur = CASE WHEN compteurs.expiration <= ? THEN excluded.valeur ELSE compteurs.valeur + excluded.valeur END, "
+            "expiration = CASE WHEN compteurs.expiration <= ? THEN excluded.expiration ELSE compteurs.expiration END "
+            "RETURNING valeur",
+            (key, amount, maintenant + expiry, maintenant, maintenant)
+        ).fetchone()[0]
+
+        self._increments += 1
+        if self._increments % self.INTERVALLE_PURGE == 0:
+            connexion.execute("DELETE FROM compteurs WHERE expiration <= ?", (maintenant,))
+        return valeur
+
+    def get(self, key: str) -> int:
+        ligne = self._connexion().execute(
+            "SELECT valeur FROM compteurs WHERE cle = ? AND expiration > ?", (key, time.time())
+        ).fetchone()
+        return ligne[0] if ligne else 0
+
+    def get_expiry(self, key: str) -> float:
+        ligne = self._connexion().execute(
+            "SELECT expiration FROM compteurs WHERE cle = ? AND expiration > ?", (key, time.time())
+        ).fetchone()
+        return ligne[0] if ligne else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._connexion().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self._connexion().execute("DELETE FROM compteurs").rowcount
+
+    def clear(self, key: str) -> None:
+        self._connexion().execute("DELETE FROM compteurs WHERE cle = ?", (key,))
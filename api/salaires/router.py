@@ -13,7 +13,7 @@ security = HTTPBearer()
 @router.get("/", response_model=List[schemas.SalaireResponse],
            summary="Récupérer la liste des salaires",
            description="Permet de récupérer la liste des salaires avec possibilité de pagination")
-async def get_salaires(
+def get_salaires(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -25,7 +25,7 @@ async def get_salaires(
 @router.post("/", response_model=schemas.SalaireResponse,
              summary="Créer un nouveau salaire",
              description="Permet de créer une nouvelle fiche de salaire pour un employé")
-async def create_salaire(
+def create_salaire(
     salaire: schemas.SalaireCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -41,7 +41,7 @@ async def create_salaire(
 @router.get("/{salaire_id}", response_model=schemas.SalaireResponse,
            summary="Récupérer un salaire par son ID",
            description="Permet de récupérer les détails d'un salaire spécifique par son identifiant")
-async def get_salaire_by_id(
+def get_salaire_by_id(
     salaire_id: int,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -54,7 +54,7 @@ async def get_salaire_by_id(
 @router.put("/{salaire_id}", response_model=schemas.SalaireResponse,
            summary="Mettre à jour un salaire",
            description="Permet de modifier les informations d'un salaire existant")
-async def update_salaire(
+def update_salaire(
     salaire_id: int,
     salaire: schemas.SalaireUpdate,
     db: Session = Depends(get_db),
@@ -75,7 +75,7 @@ async def update_salaire(
 @router.delete("/{salaire_id}",
                summary="Supprimer un salaire",
                description="Permet de supprimer un salaire existant")
-async def delete_salaire(
+def delete_salaire(
     salaire_id: int,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -91,7 +91,7 @@ async def delete_salaire(
 @router.get("/{employe_id}/historique",
            summary="Récupérer l'historique des salaires d'un employé",
            description="Permet de récupérer l'historique des salaires d'un employé spécifique")
-async def get_salaire_historique(
+def get_salaire_historique(
     employe_id: str,
     skip: int = 0,
     limit: int = 100,
@@ -105,7 +105,7 @@ async def get_salaire_historique(
 @router.get("/primes", response_model=List[schemas.PrimeResponse],
            summary="Récupérer la liste des primes",
            description="Permet de récupérer la liste des primes avec possibilité de pagination")
-async def get_primes(
+def get_primes(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -117,7 +117,7 @@ async def get_primes(
 @router.post("/primes", response_model=schemas.PrimeResponse,
              summary="Créer une nouvelle prime",
              description="Permet de créer une nouvelle prime pour un employé")
-async def create_prime(
+def create_prime(
     prime: schemas.PrimeCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -134,7 +134,7 @@ async def create_prime(
 @router.get("/avances", response_model=List[schemas.AvanceResponse],
            summary="Récupérer la liste des avances",
            description="Permet de récupérer la liste des avances avec possibilité de pagination")
-async def get_avances(
+def get_avances(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -146,7 +146,7 @@ async def get_avances(
 @router.post("/avances", response_model=schemas.AvanceResponse,
              summary="Créer une nouvelle avance",
              description="Permet de créer une nouvelle avance pour un employé")
-async def create_avance(
+def create_avance(
     avance: schemas.AvanceCreate,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
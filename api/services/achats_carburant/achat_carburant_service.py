@@ -11,7 +11,9 @@ from ...achats_carburant.schemas import (
 )
 from ...services.tiers.tiers_solde_service import (
     mettre_a_jour_solde_apres_achat,
-    calculer_solde_achat
+    calculer_solde_achat,
+    appliquer_delta_solde_fournisseur,
+    station_principale_achat
 )
 from ...services.tresoreries.validation_service import valider_paiement_achat_carburant
 from ..tresorerie.mouvement_manager import MouvementTresorerieManager
@@ -82,6 +84,14 @@ def create_achat_carburant_complet(
             )
             db.add(ligne)
 
+        # La dette envers le fournisseur augmente du montant de l'achat
+        appliquer_delta_solde_fournisseur(
+            db,
+            achat.fournisseur_id,
+            station_principale_achat(achat_data.details),
+            achat.montant_total
+        )
+
         # Commit explicite pour s'assurer que les changements sont enregistrés
         db.commit()
 
@@ -177,6 +187,14 @@ def ajouter_paiements_achat_carburant(
         # Changer le statut de l'achat à "validé" dès qu'un paiement est effectué
         achat.statut = "validé"
 
+        # La dette envers le fournisseur diminue du montant des nouveaux paiements
+        appliquer_delta_solde_fournisseur(
+            db,
+            achat.fournisseur_id,
+            station_principale_achat(achat.ligne_achat_carburant),
+            -total_nouveaux_paiements
+        )
+
         # Créer les nouveaux paiements
         for reglement in paiements_data:
             # Récupérer l'utilisateur pour la validation
@@ -321,6 +339,15 @@ def annuler_achat_carburant(
                 PaiementAchatCarburant.achat_carburant_id == achat_id
             ).all()
 
+            # Le solde du fournisseur perd ce qui restait dû sur l'achat (montant moins paiements non annulés)
+            montant_paye = sum(float(p.montant) for p in paiements if p.statut != "annulé")
+            appliquer_delta_solde_fournisseur(
+                db,
+                achat.fournisseur_id,
+                station_principale_achat(achat.ligne_achat_carburant),
+                -(float(achat.montant_total) - montant_paye)
+            )
+
             # Annuler les paiements
             for paiement in paiements:
                 # Mettre à jour le statut du paiement
@@ -454,6 +481,7 @@ def traiter_livraison_achat_carburant(
             from ...models.compagnie import MouvementStockCuve
             for livraison in livraisons:
                 # Créer l'enregistrement de mouvement de stock
+                # (stock_avant / stock_apres sont attribués par le trigger du registre de la cuve)
                 mouvement_stock = MouvementStockCuve(
                     livraison_carburant_id=livraison.id,
                     cuve_id=livraison.cuve_id,
@@ -571,6 +599,22 @@ def modifier_achat_carburant_complet(
             # Récupérer la compagnie de l'utilisateur
             compagnie_id = utilisateur.compagnie_id
 
+            # Retirer le reste dû de l'achat tel qu'il était du solde de son fournisseur, il y est ajouté après
+            # modification. Les paiements déjà imputés suivent l'achat si sa station principale ou son fournisseur
+            # change : le solde reste égal à achats - paiements, comme le calcule recalculer_soldes_fournisseurs_compagnie
+            montant_paye = db.query(
+                func.coalesce(func.sum(PaiementAchatCarburant.montant), 0)
+            ).filter(
+                PaiementAchatCarburant.achat_carburant_id == achat_id,
+                PaiementAchatCarburant.statut != "annulé"
+            ).scalar()
+            appliquer_delta_solde_fournisseur(
+                db,
+                achat.fournisseur_id,
+                station_principale_achat(achat.ligne_achat_carburant),
+                -(float(achat.montant_total) - float(montant_paye))
+            )
+
             # Mettre à jour les informations de base de l'achat
             achat.fournisseur_id = achat_data.fournisseur_id
             achat.date_achat = achat_data.date_achat
@@ -599,6 +643,13 @@ def modifier_achat_carburant_complet(
                 )
                 db.add(ligne)
 
+            appliquer_delta_solde_fournisseur(
+                db,
+                achat.fournisseur_id,
+                station_principale_achat(achat_data.details),
+                float(achat.montant_total) - float(montant_paye)
+            )
+
             db.commit()
             db.refresh(achat)
 
@@ -69,7 +69,8 @@ def create_paiement_achat_carburant(
     mettre_a_jour_solde_apres_paiement(
         db=db,
         achat_id=paiement.achat_carburant_id,
-        utilisateur_id=utilisateur_id
+        utilisateur_id=utilisateur_id,
+        montant_delta=paiement.montant
     )
 
     return db_paiement
@@ -145,6 +146,7 @@ def update_paiement_achat_carburant(
     utilisateur_id_original = db_paiement.utilisateur_enregistrement_id
     montant_original = db_paiement.montant
     tresorerie_station_id_original = db_paiement.tresorerie_station_id
+    montant_paye_original = montant_original if db_paiement.statut != "annulé" else 0
 
     # Si le montant est mis à jour, valider le nouveau montant
     if paiement.montant is not None:
@@ -176,12 +178,14 @@ def update_paiement_achat_carburant(
     db.commit()
     db.refresh(db_paiement)
 
-    # Mettre à jour le solde du fournisseur après la modification du paiement
+    # Mettre à jour le solde du fournisseur de la variation du montant payé
     # Utiliser les données originales pour déterminer quel achat mettre à jour
+    montant_paye_nouveau = db_paiement.montant if db_paiement.statut != "annulé" else 0
     mettre_a_jour_solde_apres_paiement(
         db=db,
         achat_id=achat_id_original,
-        utilisateur_id=utilisateur_id_original
+        utilisateur_id=utilisateur_id_original,
+        montant_delta=montant_paye_nouveau - montant_paye_original
     )
 
     return db_paiement
@@ -211,6 +215,7 @@ def delete_paiement_achat_carburant(
     # Sauvegarder les valeurs pour référence avant la suppression
     achat_id_original = db_paiement.achat_carburant_id
     utilisateur_id_original = db_paiement.utilisateur_id
+    montant_paye_original = db_paiement.montant if db_paiement.statut != "annulé" else 0
 
     db.delete(db_paiement)
     db.commit()
@@ -219,7 +224,8 @@ def delete_paiement_achat_carburant(
     mettre_a_jour_solde_apres_paiement(
         db=db,
         achat_id=achat_id_original,
-        utilisateur_id=utilisateur_id_original
+        utilisateur_id=utilisateur_id_original,
+        montant_delta=-montant_paye_original
     )
 
     return True
\ No newline at end of file
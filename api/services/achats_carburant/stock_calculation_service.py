@@ -15,6 +15,55 @@ class StockCalculationService:
     basées sur les écarts entre quantités commandées et reçues.
     """
     
+    @staticmethod
+    def _volumes_cuve_periode(db: Session, cuve_id: UUID, debut: datetime, fin: datetime) -> Dict[str, float]:
+        """
+        Cumule les volumes entrés, sortis et ajustés d'une cuve entre deux instants, en une requête :
+        les journées complètes sont lues sur les points journaliers (point_stock_cuve), seules les
+        journées de début et de fin sont relues mouvement par mouvement.
+        """
+        result = db.execute(text("""
+            SELECT
+                COALESCE(SUM(p.volume_entree), 0) AS volume_entree,
+                COALESCE(SUM(p.volume_sortie), 0) AS volume_sortie,
+                COALESCE(SUM(p.volume_ajustement), 0) AS volume_ajustement,
+                COALESCE(SUM(p.nombre_entrees), 0) AS nombre_entrees,
+                COALESCE(SUM(p.nombre_sorties), 0) AS nombre_sorties,
+                COALESCE(SUM(p.nombre_ajustements), 0) AS nombre_ajustements
+            FROM (
+                SELECT volume_entree, volume_sortie, volume_ajustement,
+                       nombre_entrees, nombre_sorties, nombre_ajustements
+                FROM point_stock_cuve
+                WHERE cuve_id = :cuve_id
+                  AND date_point > CAST(:debut AS date)
+                  AND date_point < CAST(:fin AS date)
+                UNION ALL
+                SELECT
+                    CASE WHEN type_mouvement IN ('entrée', 'entree') THEN quantite ELSE 0 END,
+                    CASE WHEN type_mouvement = 'sortie' THEN quantite ELSE 0 END,
+                    CASE WHEN type_mouvement = 'ajustement' THEN quantite ELSE 0 END,
+                    CASE WHEN type_mouvement IN ('entrée', 'entree') THEN 1 ELSE 0 END,
+                    CASE WHEN type_mouvement = 'sortie' THEN 1 ELSE 0 END,
+                    CASE WHEN type_mouvement = 'ajustement' THEN 1 ELSE 0 END
+                FROM mouvement_stock_cuve
+                WHERE cuve_id = :cuve_id
+                  AND est_actif
+                  AND statut IS DISTINCT FROM 'annulé'
+                  AND date_mouvement >= CAST(:debut AS timestamp)
+                  AND date_mouvement <= CAST(:fin AS timestamp)
+                  AND (date_mouvement < CAST(:debut AS date) + 1 OR date_mouvement >= CAST(:fin AS date))
+            ) p
+        """), {"cuve_id": str(cuve_id), "debut": debut, "fin": fin}).mappings().one()
+
+        return {
+            "volume_entree": float(result["volume_entree"]),
+            "volume_sortie": float(result["volume_sortie"]),
+            "volume_ajustement": float(result["volume_ajustement"]),
+            "nombre_entrees": int(result["nombre_entrees"]),
+            "nombre_sorties": int(result["nombre_sorties"]),
+            "nombre_ajustements": int(result["nombre_ajustements"])
+        }
+
     @staticmethod
     def calculer_stock_theorique_apres_livraison(
         db: Session, 
@@ -34,42 +83,17 @@ class StockCalculationService:
             if not etat_initial:
                 raise ValueError(f"Aucun état initial trouvé pour la cuve {cuve_id}")
             
-            # Calculer le volume total des livraisons après l'état initial jusqu'à la date spécifiée
-            livraisons = db.query(Livraison).filter(
-                Livraison.cuve_id == cuve_id,
-                Livraison.date >= etat_initial.date_initialisation,
-                Livraison.date <= date_livraison
-            ).all()
-            
-            # Calculer le volume total livré
-            volume_total_livre = sum(livraison.quantite_livree for livraison in livraisons)
-            
-            # Calculer le stock théorique
-            stock_theorique = float(etat_initial.volume_initial_calcule) + volume_total_livre
-            
-            # Récupérer les mouvements de sortie pour soustraire
-            mouvements_sortie = db.query(MouvementStockCuve).filter(
-                MouvementStockCuve.cuve_id == cuve_id,
-                MouvementStockCuve.date_mouvement >= etat_initial.date_initialisation,
-                MouvementStockCuve.date_mouvement <= date_livraison,
-                MouvementStockCuve.type_mouvement == 'sortie'
-            ).all()
-            
-            volume_total_sortie = sum(mvt.quantite for mvt in mouvements_sortie)
-            
-            # Calculer le stock théorique final
-            stock_theorique -= volume_total_sortie
+            # Volumes livrés (mouvements d'entrée), sortis et ajustés depuis l'état initial
+            volumes = StockCalculationService._volumes_cuve_periode(
+                db, cuve_id, etat_initial.date_initialisation, date_livraison
+            )
+            volume_total_livre = volumes["volume_entree"]
+            volume_total_sortie = volumes["volume_sortie"]
+            volume_total_ajust = volumes["volume_ajustement"]  # Ajustements positifs ou négatifs
             
-            # Récupérer les mouvements d'ajustement
-            mouvements_ajustement = db.query(MouvementStockCuve).filter(
-                MouvementStockCuve.cuve_id == cuve_id,
-                MouvementStockCuve.date_mouvement >= etat_initial.date_initialisation,
-                MouvementStockCuve.date_mouvement <= date_livraison,
-                MouvementStockCuve.type_mouvement == 'ajustement'
-            ).all()
-            
-            volume_total_ajust = sum(mvt.quantite for mvt in mouvements_ajustement)
-            stock_theorique += volume_total_ajust  # Ajouter les ajustements positifs, soustraire les négatifs
+            stock_theorique = (
+                float(etat_initial.volume_initial_calcule) + volume_total_livre - volume_total_sortie + volume_total_ajust
+            )
             
             return {
                 "cuve_id": cuve_id,
@@ -240,47 +264,17 @@ class StockCalculationService:
             if not etat_initial:
                 raise ValueError(f"Aucun état initial trouvé pour la cuve {cuve_id}")
 
-            # Calculer le volume total des livraisons après l'état initial jusqu'à la date spécifiée
-            livraisons = db.query(Livraison).filter(
-                Livraison.cuve_id == cuve_id,
-                Livraison.date >= etat_initial.date_initialisation,
-                Livraison.date <= date_calculee
-            ).all()
-
-            # Calculer le volume total livré
-            volume_total_livre = sum(livraison.quantite_livree for livraison in livraisons)
-
-            # Calculer le volume total des ventes de carburant pour cette cuve
-            # On utilise les mouvements de stock pour obtenir les ventes
-            ventes = db.query(MouvementStockCuve).filter(
-                MouvementStockCuve.cuve_id == cuve_id,
-                MouvementStockCuve.vente_carburant_id.isnot(None),  # Ajustement pour sélectionner les mouvements liés aux ventes
-                MouvementStockCuve.date_mouvement >= etat_initial.date_initialisation,
-                MouvementStockCuve.date_mouvement <= date_calculee,
-                MouvementStockCuve.type_mouvement == 'sortie'
-            ).all()
-
-            volume_total_vendu = sum(mvt.quantite for mvt in ventes)
-
-            # Calculer le stock théorique
-            stock_theorique = float(etat_initial.volume_initial_calcule) + volume_total_livre - volume_total_vendu
-
-            # Récupérer les mouvements d'autres types (inventaire, ajustement) pour la correction
-            mouvements_autres = db.query(MouvementStockCuve).filter(
-                MouvementStockCuve.cuve_id == cuve_id,
-                MouvementStockCuve.date_mouvement >= etat_initial.date_initialisation,
-                MouvementStockCuve.date_mouvement <= date_calculee,
-                MouvementStockCuve.type_mouvement != 'sortie',  # Exclure les sorties (ventes)
-                MouvementStockCuve.type_mouvement != 'entrée'   # Exclure les entrées (livraisons)
-            ).all()
-
-            # Calculer les ajustements
-            volume_total_ajust = 0
-            for mvt in mouvements_autres:
-                if mvt.type_mouvement == 'ajustement':
-                    volume_total_ajust += float(mvt.quantite)  # Ajouter les ajustements positifs, soustraire les négatifs
+            # Volumes livrés (mouvements d'entrée), vendus (sorties) et ajustés depuis l'état initial
+            volumes = StockCalculationService._volumes_cuve_periode(
+                db, cuve_id, etat_initial.date_initialisation, date_calculee
+            )
+            volume_total_livre = volumes["volume_entree"]
+            volume_total_vendu = volumes["volume_sortie"]
+            volume_total_ajust = volumes["volume_ajustement"]  # Ajustements positifs ou négatifs
 
-            stock_theorique += volume_total_ajust
+            stock_theorique = (
+                float(etat_initial.volume_initial_calcule) + volume_total_livre - volume_total_vendu + volume_total_ajust
+            )
 
             return {
                 "cuve_id": cuve_id,
@@ -291,11 +285,11 @@ class StockCalculationService:
                 "volume_total_vendu": volume_total_vendu,
                 "volume_total_ajustement": volume_total_ajust,
                 "details": {
-                    "nombre_livraisons": len(livraisons),
-                    "nombre_ventes": len(ventes),
-                    "nombre_ajustements": len(mouvements_autres)
+                    "nombre_livraisons": volumes["nombre_entrees"],
+                    "nombre_ventes": volumes["nombre_sorties"],
+                    "nombre_ajustements": volumes["nombre_ajustements"]
                 }
             }
         except Exception as e:
             logging.error(f"Erreur lors du calcul complet du stock théorique: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
@@ -5,7 +5,7 @@ from api.models.prix_carburant import PrixCarburant
 from datetime import datetime
 from uuid import uuid4
 
-async def update_etat_initial_cuve_service(
+def update_etat_initial_cuve_service(
     cuve_id: str,
     etat_initial_data,
     volume_calcule,
@@ -127,7 +127,7 @@ async def update_etat_initial_cuve_service(
     return etat_initial
 
 
-async def delete_etat_initial_cuve_service(
+def delete_etat_initial_cuve_service(
     cuve_id: str,
     db: Session,
     current_user
@@ -170,7 +170,7 @@ async def delete_etat_initial_cuve_service(
     return {"message": "État initial annulé avec succès"}
 
 
-async def create_etat_initial_cuve_service(
+def create_etat_initial_cuve_service(
     cuve_id: str,
     etat_initial_data,
     volume_calcule,
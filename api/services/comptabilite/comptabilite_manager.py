@@ -2,10 +2,11 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from uuid import UUID
 from enum import Enum
-from typing import Optional
+from typing import Optional, Union
 from ...models.journal_comptable import JournalComptable
 from ...models.journal_operations import JournalOperations
 from ...models.ecriture_comptable import EcritureComptableModel
+from ...models.plan_comptable import PlanComptableModel
 from ...models.user import User
 from ...exceptions import InvalidTransactionException
 
@@ -26,24 +27,55 @@ class ComptabiliteManager:
     """
     Classe centralisée pour la gestion des écritures comptables.
     """
-    
+
+    @staticmethod
+    def resoudre_compte(db: Session, compte: Union[UUID, str], compagnie_id: Optional[UUID]) -> UUID:
+        """
+        Retourne l'identifiant du compte : un UUID est retourné tel quel, un numéro de compte (ex: "512")
+        est recherché dans le plan comptable, parmi les comptes partagés puis ceux de la compagnie
+
+        :raises InvalidTransactionException: si le numéro de compte n'existe pas dans le plan comptable
+        """
+        if isinstance(compte, UUID):
+            return compte
+        try:
+            return UUID(str(compte))
+        except ValueError:
+            pass
+
+        compte_id = db.query(PlanComptableModel.id).filter(
+            PlanComptableModel.numero_compte == compte,
+            PlanComptableModel.compagnie_id.is_(None)
+        ).scalar()
+        if compte_id is None and compagnie_id:
+            compte_id = db.query(PlanComptableModel.id).filter(
+                PlanComptableModel.numero_compte == compte,
+                PlanComptableModel.compagnie_id == compagnie_id
+            ).scalar()
+        if compte_id is None:
+            raise InvalidTransactionException(f"Compte {compte} absent du plan comptable")
+        return compte_id
+
     @staticmethod
     def enregistrer_ecriture_comptable(
         db: Session,
         type_operation: TypeOperationComptable,
         reference_origine: str,
         montant: float,
-        compte_debit: UUID,
-        compte_credit: UUID,
+        compte_debit: Union[UUID, str],
+        compte_credit: Union[UUID, str],
         libelle: str,
         utilisateur_id: UUID,
         date_operation: Optional[datetime] = None,
         devise: str = "XOF",
         compagnie_id: Optional[UUID] = None,
-        tiers_id: Optional[UUID] = None
+        tiers_id: Optional[UUID] = None,
+        commit: bool = True
     ) -> EcritureComptableModel:
         """
-        Enregistre une écriture comptable dans la table ecriture_comptable
+        Enregistre une écriture comptable dans la table ecriture_comptable.
+        Les comptes sont des identifiants ou des numéros du plan comptable. Avec commit=False, l'écriture est
+        seulement ajoutée à la session : elle est validée avec la transaction de l'appelant.
         """
         if date_operation is None:
             date_operation = datetime.utcnow()
@@ -54,6 +86,9 @@ class ComptabiliteManager:
             if utilisateur:
                 compagnie_id = utilisateur.compagnie_id
 
+        compte_debit = ComptabiliteManager.resoudre_compte(db, compte_debit, compagnie_id)
+        compte_credit = ComptabiliteManager.resoudre_compte(db, compte_credit, compagnie_id)
+
         # Créer un enregistrement dans la table ecriture_comptable
         ecriture_comptable = EcritureComptableModel(
             date_ecriture=date_operation,
@@ -72,8 +107,9 @@ class ComptabiliteManager:
         )
 
         db.add(ecriture_comptable)
-        db.commit()
-        db.refresh(ecriture_comptable)
+        if commit:
+            db.commit()
+            db.refresh(ecriture_comptable)
 
         return ecriture_comptable
     
@@ -83,17 +119,19 @@ class ComptabiliteManager:
         type_operation: TypeOperationComptable,
         reference_origine: str,
         montant: float,
-        compte_debit: UUID,
-        compte_credit: UUID,
+        compte_debit: Union[UUID, str],
+        compte_credit: Union[UUID, str],
         libelle: str,
         utilisateur_id: UUID,
         date_operation: Optional[datetime] = None,
         devise: str = "XOF",
         compagnie_id: Optional[UUID] = None,
-        tiers_id: Optional[UUID] = None
+        tiers_id: Optional[UUID] = None,
+        commit: bool = True
     ) -> tuple[EcritureComptableModel, EcritureComptableModel]:
         """
-        Enregistre une écriture comptable double (débit et crédit)
+        Enregistre une écriture comptable double (débit et crédit).
+        Avec commit=False, les deux écritures sont validées avec la transaction de l'appelant.
         """
         if date_operation is None:
             date_operation = datetime.utcnow()
@@ -111,7 +149,8 @@ class ComptabiliteManager:
             date_operation=date_operation,
             devise=devise,
             compagnie_id=compagnie_id,
-            tiers_id=tiers_id
+            tiers_id=tiers_id,
+            commit=commit
         )
 
         # Créer l'écriture de crédit (inversée)
@@ -127,7 +166,8 @@ class ComptabiliteManager:
             date_operation=date_operation,
             devise=devise,
             compagnie_id=compagnie_id,
-            tiers_id=tiers_id
+            tiers_id=tiers_id,
+            commit=commit
         )
 
         return debit_operation, credit_operation
@@ -1,95 +1,328 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
 from ..models.produit import Produit
 from ..models.stock import StockProduit
 from ..models.mouvement_stock import MouvementStock
 from decimal import Decimal
 from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+import uuid
 
 
-def calculer_cout_moyen_pondere(db: Session, produit_id: str, station_id: str) -> float:
+# Types de mouvements pris en compte dans le calcul du coût moyen pondéré
+TYPES_MOUVEMENT_ENTREE_CMP = ("entree", "stock_initial", "ajustement_positif")
+TYPES_MOUVEMENT_SORTIE_CMP = ("sortie", "ajustement_negatif")
+
+
+class EtatCoutMoyen:
+    """
+    État du coût moyen pondéré détaché de la base, utilisé pour les calculs d'audit
     """
-    Calcule le coût moyen pondéré d'un produit pour une station spécifique
-    selon la formule : (Qté en stock * Coût moyen précédent + Qté nouvellement entrée * Coût unitaire) / (Qté en stock + Qté nouvellement entrée)
 
-    :param db: Session SQLAlchemy
-    :param produit_id: ID du produit
-    :param station_id: ID de la station
-    :return: Coût moyen pondéré calculé
+    def __init__(self):
+        self.quantite_cmp = Decimal('0')
+        self.valeur_stock_cmp = Decimal('0')
+        self.cout_moyen_pondere = Decimal('0')
+        self.date_dernier_calcul = None
+        self.date_dernier_mouvement_cmp = None
+
+
+def _normaliser_date(date_mouvement: Optional[datetime]) -> Optional[datetime]:
+    """
+    Ramène une date en UTC naïf pour pouvoir la comparer à la colonne DateTime (sans fuseau)
+    """
+    if date_mouvement is not None and date_mouvement.tzinfo is not None:
+        return date_mouvement.astimezone(timezone.utc).replace(tzinfo=None)
+    return date_mouvement
+
+
+def appliquer_mouvement_cout_moyen(
+    stock_produit: StockProduit,
+    type_mouvement: str,
+    quantite: float,
+    cout_unitaire: Optional[float] = None,
+    date_mouvement: Optional[datetime] = None
+) -> Decimal:
     """
+    Applique un mouvement à l'état courant (quantité / valeur) du coût moyen pondéré en O(1),
+    selon la formule : (Qté en stock * Coût moyen précédent + Qté entrée * Coût unitaire) / (Qté en stock + Qté entrée).
+    Les sorties sont valorisées au coût moyen courant et ne le modifient donc pas.
+    Aucune écriture en base n'est effectuée : l'appelant gère le flush/commit.
 
-    # Récupérer les mouvements de stock pour ce produit et cette station
-    mouvements = db.query(MouvementStock).filter(
+    :param stock_produit: Enregistrement StockProduit portant l'état du calcul
+    :param type_mouvement: Type du mouvement ('entree', 'sortie', ...)
+    :param quantite: Quantité du mouvement
+    :param cout_unitaire: Coût unitaire du mouvement (entrées uniquement)
+    :param date_mouvement: Date du mouvement, conservée pour détecter les mouvements antidatés
+    :return: Nouveau coût moyen pondéré
+    """
+    quantite_stock = Decimal(str(stock_produit.quantite_cmp or 0))
+    valeur_stock = Decimal(str(stock_produit.valeur_stock_cmp or 0))
+    cout_moyen = valeur_stock / quantite_stock if quantite_stock > 0 else Decimal('0')
+    quantite_mvt = Decimal(str(quantite or 0))
+
+    if type_mouvement in TYPES_MOUVEMENT_ENTREE_CMP:
+        # Une entrée sans coût est valorisée au coût moyen courant
+        cout_mvt = Decimal(str(cout_unitaire)) if cout_unitaire is not None else cout_moyen
+        nouvelle_quantite = quantite_stock + quantite_mvt
+        if quantite_stock > 0:
+            nouvelle_valeur = valeur_stock + quantite_mvt * cout_mvt
+        else:
+            # Stock nul ou négatif : l'entrée fixe à elle seule le nouveau coût moyen
+            nouvelle_valeur = max(nouvelle_quantite, Decimal('0')) * cout_mvt
+    elif type_mouvement in TYPES_MOUVEMENT_SORTIE_CMP:
+        nouvelle_quantite = quantite_stock - quantite_mvt
+        nouvelle_valeur = nouvelle_quantite * cout_moyen if nouvelle_quantite > 0 else Decimal('0')
+    else:
+        # Les autres types de mouvements n'interviennent pas dans le calcul
+        nouvelle_quantite = quantite_stock
+        nouvelle_valeur = valeur_stock
+
+    if nouvelle_quantite <= 0:
+        nouvelle_valeur = Decimal('0')
+
+    stock_produit.quantite_cmp = nouvelle_quantite
+    stock_produit.valeur_stock_cmp = nouvelle_valeur
+    stock_produit.cout_moyen_pondere = nouvelle_valeur / nouvelle_quantite if nouvelle_quantite > 0 else Decimal('0')
+    stock_produit.date_dernier_calcul = datetime.now(timezone.utc)
+
+    date_mouvement = _normaliser_date(date_mouvement)
+    if date_mouvement is not None and (
+        stock_produit.date_dernier_mouvement_cmp is None
+        or date_mouvement > stock_produit.date_dernier_mouvement_cmp
+    ):
+        stock_produit.date_dernier_mouvement_cmp = date_mouvement
+
+    return stock_produit.cout_moyen_pondere
+
+
+def _requete_mouvements_cmp(db: Session, produit_id: str, station_id: str):
+    """
+    Requête des mouvements valides d'un produit pour une station, dans l'ordre chronologique
+    """
+    return db.query(
+        MouvementStock.type_mouvement,
+        MouvementStock.quantite,
+        MouvementStock.cout_unitaire,
+        MouvementStock.date_mouvement
+    ).filter(
         and_(
             MouvementStock.produit_id == produit_id,
-            MouvementStock.station_id == station_id
+            MouvementStock.station_id == station_id,
+            or_(MouvementStock.statut.is_(None), MouvementStock.statut != "annulé")
         )
-    ).order_by(MouvementStock.date_mouvement).all()
+    ).order_by(MouvementStock.date_mouvement, MouvementStock.date_creation)
+
+
+def _rejouer_historique(db: Session, stock_produit: StockProduit, produit_id: str, station_id: str) -> Decimal:
+    """
+    Réinitialise l'état du coût moyen et rejoue tout l'historique des mouvements
+    """
+    stock_produit.quantite_cmp = Decimal('0')
+    stock_produit.valeur_stock_cmp = Decimal('0')
+    stock_produit.cout_moyen_pondere = Decimal('0')
+    stock_produit.date_dernier_mouvement_cmp = None
 
-    if not mouvements:
-        # Si aucun mouvement, le coût moyen est 0
-        return 0.0
+    for type_mouvement, quantite, cout_unitaire, date_mouvement in _requete_mouvements_cmp(
+        db, produit_id, station_id
+    ).yield_per(1000):
+        appliquer_mouvement_cout_moyen(stock_produit, type_mouvement, quantite, cout_unitaire, date_mouvement)
 
-    # Initialiser les variables de calcul
-    quantite_totale = Decimal('0')
-    valeur_totale = Decimal('0')
+    stock_produit.date_dernier_calcul = datetime.now(timezone.utc)
+    return stock_produit.cout_moyen_pondere
 
-    for mouvement in mouvements:
-        if mouvement.type_mouvement in ["entree", "stock_initial", "ajustement_positif"]:
-            # Pour les entrées, on ajoute la quantité et la valeur
-            if mouvement.cout_unitaire is not None:
-                quantite_mvt = Decimal(str(mouvement.quantite or 0))
-                cout_mvt = Decimal(str(mouvement.cout_unitaire))
-
-                quantite_totale += quantite_mvt
-                valeur_totale += quantite_mvt * cout_mvt
-        elif mouvement.type_mouvement in ["sortie", "ajustement_negatif"]:
-            # Pour les sorties, on retire la quantité (mais on ne modifie pas le coût moyen)
-            quantite_totale -= Decimal(str(mouvement.quantite or 0))
-
-    # Calculer le coût moyen pondéré
-    if quantite_totale > 0:
-        cout_moyen = float(valeur_totale / quantite_totale)
-    else:
-        cout_moyen = 0.0  # Si quantité totale est 0 ou négative, le coût moyen est 0
 
-    return cout_moyen
+def _get_stock_produit_verrouille(db: Session, produit_id: str, station_id: str) -> Optional[StockProduit]:
+    """
+    Récupère l'enregistrement stock_produit en le verrouillant pour sérialiser les mises à jour concurrentes
+    """
+    return db.query(StockProduit).filter(
+        and_(
+            StockProduit.produit_id == produit_id,
+            StockProduit.station_id == station_id
+        )
+    ).with_for_update().first()
 
 
-def mettre_a_jour_cout_moyen_produit(db: Session, produit_id: str, station_id: str):
+def calculer_cout_moyen_pondere(db: Session, produit_id: str, station_id: str) -> float:
     """
-    Met à jour le coût moyen d'un produit pour une station spécifique dans la table stock_produit
+    Calcule le coût moyen pondéré d'un produit pour une station spécifique en rejouant
+    tout l'historique des mouvements, sans rien modifier en base.
+    Utilisé pour les audits ; le calcul courant est maintenu de façon incrémentale
+    par mettre_a_jour_cout_moyen_produit.
+
     :param db: Session SQLAlchemy
     :param produit_id: ID du produit
     :param station_id: ID de la station
+    :return: Coût moyen pondéré calculé
     """
-    nouveau_cout_moyen = calculer_cout_moyen_pondere(db, produit_id, station_id)
+    etat = EtatCoutMoyen()
+    for type_mouvement, quantite, cout_unitaire, date_mouvement in _requete_mouvements_cmp(
+        db, produit_id, station_id
+    ).yield_per(1000):
+        appliquer_mouvement_cout_moyen(etat, type_mouvement, quantite, cout_unitaire, date_mouvement)
 
-    # Mettre à jour le champ cout_moyen_pondere dans la table stock_produit
-    stock_produit = db.query(StockProduit).filter(
-        and_(
-            StockProduit.produit_id == produit_id,
-            StockProduit.station_id == station_id
+    return float(etat.cout_moyen_pondere or 0)
+
+
+def reconstruire_cout_moyen_produit(db: Session, produit_id: str, station_id: str, commit: bool = True) -> Decimal:
+    """
+    Reconstruit l'état du coût moyen pondéré d'un produit pour une station en rejouant
+    tout l'historique. À utiliser pour les audits et après une correction antidatée ou une annulation.
+
+    :param db: Session SQLAlchemy
+    :param produit_id: ID du produit
+    :param station_id: ID de la station
+    :param commit: Valider la transaction à la fin du calcul
+    :return: Coût moyen pondéré reconstruit
+    """
+    stock_produit = _get_stock_produit_verrouille(db, produit_id, station_id)
+    if not stock_produit:
+        stock_produit = StockProduit(
+            id=uuid.uuid4(),
+            produit_id=produit_id,
+            station_id=station_id
         )
-    ).first()
+        db.add(stock_produit)
 
-    if stock_produit:
-        stock_produit.cout_moyen_pondere = Decimal(str(nouveau_cout_moyen))
-        stock_produit.date_dernier_calcul = datetime.now(timezone.utc)
+    cout_moyen = _rejouer_historique(db, stock_produit, produit_id, station_id)
+
+    if commit:
         db.commit()
     else:
-        # Si le stock_produit n'existe pas encore, on le crée avec le coût moyen
-        from sqlalchemy.dialects.postgresql import UUID
-        import uuid
+        db.flush()
+    return cout_moyen
+
+
+def reconstruire_couts_moyens_station(db: Session, station_id: str) -> int:
+    """
+    Reconstruit le coût moyen pondéré de tous les produits en stock d'une station
+
+    :param db: Session SQLAlchemy
+    :param station_id: ID de la station
+    :return: Nombre de produits recalculés
+    """
+    produit_ids = [
+        produit_id for (produit_id,) in db.query(StockProduit.produit_id).filter(
+            StockProduit.station_id == station_id
+        ).all()
+    ]
+
+    for produit_id in produit_ids:
+        reconstruire_cout_moyen_produit(db, produit_id, station_id, commit=False)
+
+    db.commit()
+    return len(produit_ids)
+
+
+def mettre_a_jour_cout_moyen_produit(db: Session, produit_id: str, station_id: str, mouvement: Optional[MouvementStock] = None):
+    """
+    Met à jour le coût moyen d'un produit pour une station spécifique dans la table stock_produit.
+    Si le mouvement qui vient d'être enregistré est fourni et qu'il n'est pas antidaté, l'état est mis à jour
+    en O(1) ; sinon (état jamais initialisé, mouvement antérieur au dernier mouvement pris en compte),
+    l'historique complet est rejoué.
+
+    :param db: Session SQLAlchemy
+    :param produit_id: ID du produit
+    :param station_id: ID de la station
+    :param mouvement: Mouvement de stock qui vient d'être enregistré
+    """
+    stock_produit = _get_stock_produit_verrouille(db, produit_id, station_id)
+
+    if stock_produit is None:
         stock_produit = StockProduit(
             id=uuid.uuid4(),
             produit_id=produit_id,
-            station_id=station_id,
-            cout_moyen_pondere=Decimal(str(nouveau_cout_moyen)),
-            date_dernier_calcul=datetime.now(timezone.utc)
+            station_id=station_id
         )
         db.add(stock_produit)
-        db.commit()
+        _rejouer_historique(db, stock_produit, produit_id, station_id)
+    elif (
+        mouvement is None
+        or stock_produit.date_dernier_mouvement_cmp is None
+        or _normaliser_date(mouvement.date_mouvement) < stock_produit.date_dernier_mouvement_cmp
+    ):
+        _rejouer_historique(db, stock_produit, produit_id, station_id)
+    else:
+        appliquer_mouvement_cout_moyen(
+            stock_produit,
+            mouvement.type_mouvement,
+            mouvement.quantite,
+            mouvement.cout_unitaire,
+            mouvement.date_mouvement
+        )
+
+    db.commit()
+
+
+def mettre_a_jour_couts_moyens_mouvements(db: Session, station_id: str, mouvements: Iterable[MouvementStock]) -> Dict:
+    """
+    Met à jour le coût moyen des produits d'un lot de mouvements d'une même station (lignes d'un document),
+    dans la transaction de l'appelant : les enregistrements stock_produit sont chargés et verrouillés en une
+    requête, les mouvements appliqués en mémoire dans l'ordre du lot, puis le tout est envoyé en un seul flush.
+    Seuls les produits sans état initialisé ou concernés par un mouvement antidaté rejouent leur historique.
+    Aucun commit n'est effectué : l'appelant valide ou annule l'ensemble.
+
+    :param db: Session SQLAlchemy
+    :param station_id: ID de la station des mouvements
+    :param mouvements: Mouvements de stock ajoutés à la session (pas encore envoyés en base)
+    :return: Dictionnaire produit_id -> StockProduit mis à jour
+    """
+    mouvements = list(mouvements)
+    produit_ids = {mouvement.produit_id for mouvement in mouvements}
+    if not produit_ids:
+        return {}
+
+    # Verrouiller dans un ordre stable pour éviter les interblocages entre documents concurrents
+    stocks = {
+        stock_produit.produit_id: stock_produit
+        for stock_produit in db.query(StockProduit).filter(
+            and_(
+                StockProduit.station_id == station_id,
+                StockProduit.produit_id.in_(produit_ids)
+            )
+        ).order_by(StockProduit.produit_id).with_for_update().all()
+    }
+
+    a_rejouer = set()
+    for mouvement in mouvements:
+        stock_produit = stocks.get(mouvement.produit_id)
+        if stock_produit is None:
+            stock_produit = StockProduit(
+                id=uuid.uuid4(),
+                produit_id=mouvement.produit_id,
+                station_id=station_id
+            )
+            db.add(stock_produit)
+            stocks[mouvement.produit_id] = stock_produit
+            a_rejouer.add(mouvement.produit_id)
+
+        if mouvement.produit_id in a_rejouer:
+            continue
+        if (
+            stock_produit.date_dernier_mouvement_cmp is None
+            or _normaliser_date(mouvement.date_mouvement) < stock_produit.date_dernier_mouvement_cmp
+        ):
+            a_rejouer.add(mouvement.produit_id)
+            continue
+
+        appliquer_mouvement_cout_moyen(
+            stock_produit,
+            mouvement.type_mouvement,
+            mouvement.quantite,
+            mouvement.cout_unitaire,
+            mouvement.date_mouvement
+        )
+
+    db.flush()
+
+    # Le rejeu lit l'historique en base, qui contient maintenant les mouvements du lot
+    for produit_id in a_rejouer:
+        _rejouer_historique(db, stocks[produit_id], produit_id, station_id)
+    if a_rejouer:
+        db.flush()
+
+    return stocks
 
 
 def mettre_a_jour_cout_moyen_produit_initial(db: Session, produit_id: str, station_id: str, cout_unitaire_initial: float):
@@ -101,27 +334,24 @@ def mettre_a_jour_cout_moyen_produit_initial(db: Session, produit_id: str, stati
     :param cout_unitaire_initial: Coût unitaire initial à enregistrer comme coût moyen pondéré
     """
     # Mettre à jour le champ cout_moyen_pondere dans la table stock_produit
-    stock_produit = db.query(StockProduit).filter(
-        and_(
-            StockProduit.produit_id == produit_id,
-            StockProduit.station_id == station_id
-        )
-    ).first()
+    stock_produit = _get_stock_produit_verrouille(db, produit_id, station_id)
+
+    cout_initial = Decimal(str(cout_unitaire_initial))
 
     if stock_produit:
-        stock_produit.cout_moyen_pondere = Decimal(str(cout_unitaire_initial))
+        stock_produit.cout_moyen_pondere = cout_initial
+        # Garder la valeur du stock cohérente avec le coût initial
+        stock_produit.valeur_stock_cmp = Decimal(str(stock_produit.quantite_cmp or 0)) * cout_initial
         stock_produit.date_dernier_calcul = datetime.now(timezone.utc)
         db.commit()
     else:
         # Si le stock_produit n'existe pas encore, on le crée avec le coût moyen initial
-        from sqlalchemy.dialects.postgresql import UUID
-        import uuid
         stock_produit = StockProduit(
             id=uuid.uuid4(),
             produit_id=produit_id,
             station_id=station_id,
-            cout_moyen_pondere=Decimal(str(cout_unitaire_initial)),
+            cout_moyen_pondere=cout_initial,
             date_dernier_calcul=datetime.now(timezone.utc)
         )
         db.add(stock_produit)
-        db.commit()
\ No newline at end of file
+        db.commit()
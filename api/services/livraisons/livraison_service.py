@@ -310,12 +310,8 @@ def update_stock_after_delivery(db: Session, livraison: Livraison) -> bool:
 
         # Only create a new movement if the delivery is active and has a positive quantity
         if livraison.est_actif and livraison.quantite_livree and float(livraison.quantite_livree) > 0:
-            # Calculate stock before and after
-            # In a real implementation, we would fetch the current stock from the tank before this delivery
-            # For now, we'll set both to None and let the system calculate it later
-            stock_avant = None  # Would be calculated from previous movements
-            stock_apres = None  # Would be calculated as stock_avant + livraison.quantite_livree
-
+            # stock_avant / stock_apres are assigned by the tank ledger trigger, which also
+            # shifts the balances of later movements when the delivery is back-dated
             # Create a new stock movement record
             mouvement_stock = MouvementStockCuve(
                 livraison_carburant_id=livraison.id,
@@ -323,8 +319,6 @@ def update_stock_after_delivery(db: Session, livraison: Livraison) -> bool:
                 type_mouvement="entrée",  # Delivery increases stock
                 quantite=livraison.quantite_livree,
                 date_mouvement=livraison.date_livraison,
-                stock_avant=stock_avant,
-                stock_apres=stock_apres,
                 utilisateur_id=livraison.utilisateur_id,
                 reference_origine=f"LIV-{str(livraison.id)[:8]}",  # Reference for the delivery
                 module_origine="livraisons",
@@ -1,12 +1,16 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime, timezone
 from decimal import Decimal
 from ..models.mouvement_stock import MouvementStock
 from ..models.stock import StockProduit
 from ..models.produit import Produit
-from .cout_moyen_service import mettre_a_jour_cout_moyen_produit
+from .cout_moyen_service import (
+    mettre_a_jour_cout_moyen_produit,
+    mettre_a_jour_couts_moyens_mouvements,
+    reconstruire_cout_moyen_produit
+)
 
 
 def enregistrer_mouvement_stock(
@@ -53,8 +57,8 @@ def enregistrer_mouvement_stock(
     db.commit()
     db.refresh(mouvement)
 
-    # Mettre à jour le coût moyen du produit
-    mettre_a_jour_cout_moyen_produit(db, produit_id, station_id)
+    # Mettre à jour le coût moyen du produit de façon incrémentale à partir de ce mouvement
+    mettre_a_jour_cout_moyen_produit(db, produit_id, station_id, mouvement)
 
     # Si un prix de vente ou un seuil de stock minimum est fourni, les mettre à jour dans la table stock_produit
     if prix_vente is not None or seuil_stock_min is not None:
@@ -92,6 +96,61 @@ def enregistrer_mouvement_stock(
     return mouvement
 
 
+def enregistrer_mouvements_stock(
+    db: Session,
+    station_id: str,
+    lignes: Iterable[Dict],
+    type_mouvement: str,
+    utilisateur_id: str,
+    module_origine: str = "inconnu",
+    reference_origine: str = "inconnu",
+    date_mouvement: Optional[datetime] = None,
+    transaction_source_id: Optional[str] = None,
+    type_transaction_source: Optional[str] = None
+) -> List[MouvementStock]:
+    """
+    Enregistre en un lot les mouvements de stock de toutes les lignes d'un document (vente, achat, ...).
+    Contrairement à enregistrer_mouvement_stock, rien n'est validé : les mouvements et les coûts moyens
+    sont envoyés en un flush dans la transaction de l'appelant, qui valide ou annule le document entier.
+    La mise à jour du stock théorique reste effectuée par le trigger PostgreSQL.
+
+    Args:
+        db: Session de base de données
+        station_id: ID de la station concernée
+        lignes: Lignes du document, chacune avec produit_id, quantite et éventuellement cout_unitaire
+        type_mouvement: Type des mouvements ('entree', 'sortie', ...)
+        utilisateur_id: ID de l'utilisateur à l'origine du document
+
+    Returns:
+        Les mouvements enregistrés, dans l'ordre des lignes
+    """
+    if date_mouvement is None:
+        date_mouvement = datetime.now(timezone.utc)
+
+    mouvements = [
+        MouvementStock(
+            produit_id=ligne["produit_id"],
+            station_id=station_id,
+            type_mouvement=type_mouvement,
+            quantite=ligne["quantite"],
+            cout_unitaire=ligne.get("cout_unitaire"),
+            date_mouvement=date_mouvement,
+            utilisateur_id=utilisateur_id,
+            module_origine=module_origine,
+            reference_origine=reference_origine,
+            transaction_source_id=transaction_source_id,
+            type_transaction_source=type_transaction_source
+        )
+        for ligne in lignes
+    ]
+    db.add_all(mouvements)
+
+    # Le flush du calcul des coûts moyens envoie aussi les mouvements
+    mettre_a_jour_couts_moyens_mouvements(db, station_id, mouvements)
+
+    return mouvements
+
+
 def mettre_a_jour_stock_produit_automatiquement(
     db: Session,
     produit_id: str,
@@ -198,6 +257,8 @@ def annuler_mouvements_stock_transaction(
     """
     Annule tous les mouvements de stock liés à une transaction spécifique en mettant à jour leur statut.
     La mise à jour des stocks est effectuée automatiquement par un trigger PostgreSQL.
+    Rien n'est validé ici : l'annulation et la reconstruction du coût moyen sont envoyées par flush dans la
+    transaction de l'appelant, qui les valide avec le reste de son opération.
 
     Args:
         db: Session de base de données
@@ -210,11 +271,18 @@ def annuler_mouvements_stock_transaction(
         MouvementStock.type_transaction_source == type_transaction_source
     ).all()
 
+    produits_stations = set()
     for mouvement in mouvements:
         # Marquer le mouvement comme annulé pour déclencher le trigger
         mouvement.statut = 'annulé'
+        produits_stations.add((mouvement.produit_id, mouvement.station_id))
 
-    db.commit()
+    # Le trigger des stocks doit avoir vu l'annulation avant la reconstruction du coût moyen
+    db.flush()
+
+    # Un mouvement annulé peut être antérieur à d'autres : le coût moyen est reconstruit
+    for produit_id, station_id in produits_stations:
+        reconstruire_cout_moyen_produit(db, produit_id, station_id, commit=False)
 
 
 def annuler_stock_initial(
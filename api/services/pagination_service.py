@@ -1,6 +1,6 @@
 from typing import List, TypeVar, Type, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func
 from fastapi import HTTPException
 from ..utils.pagination import PaginatedResponse
 from ..utils.filters import BaseFilterParams
@@ -30,16 +30,10 @@ def apply_filters_and_pagination(
     if query_filters:
         query = query.filter(and_(*query_filters))
     
-    # Application des filtres génériques (recherche textuelle)
+    # Application de la recherche textuelle (classée par pertinence si aucun tri n'est demandé)
     if filter_params.q:
-        # Cette fonctionnalité nécessiterait une logique spécifique selon les champs
-        # à rechercher dans chaque modèle
-        search_filters = []
-        # Ici, nous devrions construire dynamiquement une recherche sur les champs textuels
-        # du modèle, ce qui dépend de chaque modèle spécifique
-        # Pour l'instant, nous n'implémentons pas cette fonctionnalité
-        pass
-    
+        query = appliquer_recherche_textuelle(query, model, filter_params.q, classer=not filter_params.sort_by)
+
     # Application du tri
     if filter_params.sort_by:
         sort_field = getattr(model, filter_params.sort_by, None)
@@ -48,7 +42,7 @@ def apply_filters_and_pagination(
                 query = query.order_by(sort_field.desc())
             else:
                 query = query.order_by(sort_field.asc())
-    
+
     # Calcul du total avant pagination
     total = query.count()
     
@@ -87,4 +81,48 @@ def apply_specific_filters(
             if model_attr is not None:
                 query = query.filter(model_attr == value)
     
-    return query
\ No newline at end of file
+    return query
+
+def _echapper_motif(texte: str) -> str:
+    """
+    Échappe les caractères spéciaux de LIKE pour rechercher le texte tel quel
+    """
+    return texte.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def appliquer_recherche_textuelle(query, model, q: Optional[str], classer: bool = True):
+    """
+    Applique la recherche textuelle du paramètre q sur les champs déclarés par le modèle
+    (attribut __champs_recherche__).
+
+    La correspondance est une sous-chaîne insensible à la casse (ILIKE '%q%'), servie par les index
+    trigrammes (pg_trgm, gin_trgm_ops) de ces colonnes ; les résultats sont classés par similarité
+    trigramme décroissante, la correspondance la plus proche en premier.
+
+    :param query: Requête SQLAlchemy à modifier
+    :param model: Modèle SQLAlchemy requêté
+    :param q: Texte recherché (ignoré s'il est vide)
+    :param classer: Trier les résultats par pertinence
+    :return: Requête SQLAlchemy modifiée
+    :raises HTTPException: 400 si le modèle ne déclare aucun champ de recherche
+    """
+    q = (q or "").strip()
+    if not q:
+        return query
+
+    champs = getattr(model, "__champs_recherche__", None)
+    if not champs:
+        raise HTTPException(
+            status_code=400,
+            detail="La recherche textuelle n'est pas disponible pour cette ressource"
+        )
+
+    colonnes = [getattr(model, champ) for champ in champs]
+    motif = f"%{_echapper_motif(q)}%"
+    query = query.filter(or_(*[colonne.ilike(motif, escape="\\") for colonne in colonnes]))
+
+    if classer:
+        pertinence = func.greatest(*[func.similarity(colonne, q) for colonne in colonnes])
+        query = query.order_by(pertinence.desc(), model.id)
+
+    return query
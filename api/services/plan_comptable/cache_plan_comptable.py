@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import Session
+
+from ...models.plan_comptable import PlanComptableModel
+
+
+# Colonnes d'un compte conservées dans l'index (champs de PlanComptableHierarchyResponse)
+COLONNES_COMPTE = (
+    PlanComptableModel.id,
+    PlanComptableModel.numero_compte,
+    PlanComptableModel.libelle_compte,
+    PlanComptableModel.categorie,
+    PlanComptableModel.type_compte,
+    PlanComptableModel.parent_id,
+    PlanComptableModel.compagnie_id,
+    PlanComptableModel.est_actif,
+)
+
+
+class IndexPlanComptable:
+    """
+    Plan comptable visible par une compagnie (comptes de base + sous-comptes de la compagnie),
+    indexé en mémoire par ID, par parent et par numéro de compte
+    """
+
+    def __init__(self, comptes: List[Dict]):
+        self.comptes = {compte["id"]: compte for compte in comptes}
+        self.enfants: Dict[UUID, List[UUID]] = {}
+        self.racines: List[UUID] = []
+        self.par_numero: Dict[str, List[UUID]] = {}
+
+        for compte in comptes:
+            if compte["parent_id"] is None:
+                self.racines.append(compte["id"])
+            else:
+                self.enfants.setdefault(compte["parent_id"], []).append(compte["id"])
+            if compte["numero_compte"]:
+                self.par_numero.setdefault(compte["numero_compte"], []).append(compte["id"])
+
+    def get_enfants(self, compte_id: UUID) -> List[Dict]:
+        return [self.comptes[enfant_id] for enfant_id in self.enfants.get(compte_id, [])]
+
+    def get_par_numero(self, numero_compte: str, compagnie_id: Optional[UUID]) -> Optional[Dict]:
+        """
+        Retourne le compte de ce numéro appartenant à la compagnie, à défaut le compte de base (racine)
+        """
+        candidats = [self.comptes[compte_id] for compte_id in self.par_numero.get(numero_compte, [])]
+        for compte in candidats:
+            if compagnie_id is not None and compte["compagnie_id"] == compagnie_id:
+                return compte
+        for compte in candidats:
+            if compte["parent_id"] is None:
+                return compte
+        return None
+
+
+def charger_index_plan_comptable(db: Session, compagnie_id: Optional[UUID]) -> IndexPlanComptable:
+    """
+    Charge en une requête les comptes visibles par une compagnie (tous les comptes si compagnie_id est None)
+    """
+    query = db.query(*COLONNES_COMPTE)
+    if compagnie_id is not None:
+        query = query.filter(or_(
+            PlanComptableModel.compagnie_id == compagnie_id,
+            PlanComptableModel.compagnie_id.is_(None),
+            PlanComptableModel.parent_id.is_(None)
+        ))
+    comptes = [ligne._asdict() for ligne in query.order_by(PlanComptableModel.numero_compte).all()]
+    return IndexPlanComptable(comptes)
+
+
+class CachePlanComptable:
+    """
+    Cache borné (LRU) des index du plan comptable, un par compagnie. Les entrées sont invalidées à chaque
+    écriture d'un compte ; la durée de vie borne l'écart entre workers.
+    """
+
+    def __init__(self, duree_vie: float = 300.0, taille_max: int = 256):
+        self.duree_vie = duree_vie
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, compagnie_id: Optional[UUID]) -> Optional[IndexPlanComptable]:
+        if self.duree_vie <= 0:
+            return None
+        with self._verrou:
+            entree = self._entrees.get(compagnie_id)
+            if entree is None:
+                return None
+            index, expiration = entree
+            if expiration < time.monotonic():
+                del self._entrees[compagnie_id]
+                return None
+            self._entrees.move_to_end(compagnie_id)
+            return index
+
+    def enregistrer(self, compagnie_id: Optional[UUID], index: IndexPlanComptable):
+        if self.duree_vie <= 0:
+            return
+        with self._verrou:
+            self._entrees[compagnie_id] = (index, time.monotonic() + self.duree_vie)
+            self._entrees.move_to_end(compagnie_id)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def invalider_compagnie(self, compagnie_id: UUID):
+        """
+        Supprime l'index d'une compagnie, ainsi que l'index global qui contient ses comptes
+        """
+        with self._verrou:
+            self._entrees.pop(compagnie_id, None)
+            self._entrees.pop(None, None)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+cache_plan_comptable = CachePlanComptable(
+    duree_vie=float(os.getenv("PLAN_COMPTABLE_CACHE_TTL", "300")),
+    taille_max=int(os.getenv("PLAN_COMPTABLE_CACHE_MAX_ENTRIES", "256"))
+)
+
+
+def get_index_plan_comptable(db: Session, compagnie_id: Optional[UUID]) -> IndexPlanComptable:
+    """
+    Retourne l'index du plan comptable d'une compagnie, chargé au premier appel puis servi depuis le cache
+    """
+    index = cache_plan_comptable.obtenir(compagnie_id)
+    if index is None:
+        index = charger_index_plan_comptable(db, compagnie_id)
+        cache_plan_comptable.enregistrer(compagnie_id, index)
+    return index
+
+
+# Compagnies dont le plan comptable a été modifié dans la transaction en cours (None = toutes)
+_CLE_COMPAGNIES_MODIFIEES = "plan_comptable_compagnies_modifiees"
+
+
+def _compagnie_modifiee(compte: PlanComptableModel) -> bool:
+    return bool(inspect(compte).attrs.compagnie_id.history.deleted)
+
+
+def _invalider(compagnies):
+    if None in compagnies:
+        cache_plan_comptable.vider()
+    else:
+        for compagnie_id in compagnies:
+            cache_plan_comptable.invalider_compagnie(compagnie_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalider_apres_flush(session, flush_context):
+    compagnies = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, PlanComptableModel):
+            continue
+        # Un compte de base ou un changement de compagnie concerne toutes les compagnies
+        if obj.compagnie_id is None or _compagnie_modifiee(obj):
+            compagnies.add(None)
+        else:
+            compagnies.add(obj.compagnie_id)
+
+    if compagnies:
+        _invalider(compagnies)
+        # Invalider à nouveau à la fin de la transaction : un index rechargé entre le flush et le commit
+        # ne verrait pas encore les modifications
+        session.info.setdefault(_CLE_COMPAGNIES_MODIFIEES, set()).update(compagnies)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalider_fin_transaction(session):
+    compagnies = session.info.pop(_CLE_COMPAGNIES_MODIFIEES, None)
+    if compagnies:
+        _invalider(compagnies)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _invalider_apres_requete_groupee(contexte):
+    if contexte.mapper.class_ is PlanComptableModel:
+        cache_plan_comptable.vider()
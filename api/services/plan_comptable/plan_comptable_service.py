@@ -1,11 +1,13 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
+from sqlalchemy.orm import aliased
 from typing import List, Optional
 from uuid import UUID
 from ...database.transaction_manager import transaction
 from ...services.database_service import DatabaseService
 from ...models.plan_comptable import PlanComptableModel
 from ...plan_comptable.schemas import PlanComptableCreate, PlanComptableUpdate, PlanComptableResponse
+from .cache_plan_comptable import COLONNES_COMPTE, IndexPlanComptable, get_index_plan_comptable
 
 class PlanComptableService(DatabaseService):
     def __init__(self, db: Session):
@@ -144,8 +146,8 @@ class PlanComptableService(DatabaseService):
         for field, value in update_data.items():
             setattr(plan, field, value)
 
-        # Rafraîchir l'objet pour s'assurer que les modifications sont prises en compte
-        self.db.flush()
+        # Valider la transaction pour persister les changements (et invalider le plan comptable en cache)
+        self.db.commit()
 
         return PlanComptableResponse.from_orm(plan)
 
@@ -153,7 +155,9 @@ class PlanComptableService(DatabaseService):
         """Supprimer (soft delete) un compte"""
         plan = self.get_by_id(plan_id)
         if plan:
-            return self.soft_delete(plan_id)
+            plan.soft_delete()
+            self.db.commit()
+            return True
         return False
 
     def get_all_plans_comptables(self, skip: int = 0, limit: int = 100) -> List[PlanComptableResponse]:
@@ -163,86 +167,58 @@ class PlanComptableService(DatabaseService):
 
     def get_plan_hierarchy(self, plan_id: UUID) -> Optional[PlanComptableResponse]:
         """Récupérer un compte avec sa hiérarchie complète"""
-        plan = self.db.query(PlanComptableModel).filter(PlanComptableModel.id == plan_id).first()
-        if plan:
-            return self._build_hierarchy(plan)
-        return None
+        # Charger le compte et tous ses descendants en une seule requête récursive
+        sous_arbre = self.db.query(*COLONNES_COMPTE).filter(
+            PlanComptableModel.id == plan_id
+        ).cte(name="sous_arbre", recursive=True)
+        descendants = aliased(PlanComptableModel, name="descendant")
+        sous_arbre = sous_arbre.union(
+            self.db.query(
+                descendants.id,
+                descendants.numero_compte,
+                descendants.libelle_compte,
+                descendants.categorie,
+                descendants.type_compte,
+                descendants.parent_id,
+                descendants.compagnie_id,
+                descendants.est_actif
+            ).filter(descendants.parent_id == sous_arbre.c.id)
+        )
+
+        comptes = [ligne._asdict() for ligne in self.db.query(sous_arbre).order_by(sous_arbre.c.numero_compte).all()]
+        index = IndexPlanComptable(comptes)
+        if plan_id not in index.comptes:
+            return None
+        return self._build_hierarchy(index, index.comptes[plan_id])
 
     def get_full_plan_hierarchy(self, compagnie_id: Optional[UUID] = None) -> List[PlanComptableResponse]:
         """Récupérer la hiérarchie complète du plan comptable"""
-        # Récupérer tous les comptes racines (sans parent)
-        root_plans = self.db.query(PlanComptableModel).filter(PlanComptableModel.parent_id.is_(None)).all()
-
-        if compagnie_id:
-            # Filtrer les plans comptables enfants par compagnie_id si spécifié
-            return [self._build_hierarchy_filtered(plan, compagnie_id) for plan in root_plans]
-        else:
-            return [self._build_hierarchy(plan) for plan in root_plans]
+        # Les comptes de base et les sous-comptes de la compagnie sont servis depuis l'index en cache
+        index = get_index_plan_comptable(self.db, compagnie_id)
+        return [self._build_hierarchy(index, index.comptes[racine_id]) for racine_id in index.racines]
 
     def get_plan_hierarchy_by_numero(self, numero_compte: str, compagnie_id: UUID) -> Optional[PlanComptableResponse]:
         """Récupérer un compte avec sa hiérarchie complète par son numéro de compte"""
-        # Récupérer le compte par son numéro
-        plan = self.db.query(PlanComptableModel).filter(
-            PlanComptableModel.numero_compte == numero_compte,
-            # Filtrer par compagnie_id pour les comptes de base (parent_id IS NULL)
-            # ou les comptes appartenant à la même compagnie
-            or_(
-                PlanComptableModel.compagnie_id == compagnie_id,
-                PlanComptableModel.parent_id.is_(None)  # Comptes de base
-            )
-        ).first()
+        # Rechercher le compte de la compagnie, à défaut le compte de base, dans l'index en cache
+        index = get_index_plan_comptable(self.db, compagnie_id)
+        plan = index.get_par_numero(numero_compte, compagnie_id)
 
         if plan:
-            return self._build_hierarchy_filtered(plan, compagnie_id)
+            return self._build_hierarchy(index, plan)
         return None
 
-    def _build_hierarchy(self, plan: PlanComptableModel) -> PlanComptableResponse:
-        """Construire récursivement la hiérarchie d'un compte"""
+    def _build_hierarchy(self, index: IndexPlanComptable, plan: dict, ancetres: frozenset = frozenset()) -> PlanComptableResponse:
+        """Construire en mémoire la hiérarchie d'un compte à partir de l'index du plan comptable"""
         from ...plan_comptable.schemas import PlanComptableHierarchyResponse
 
-        # Récupérer les enfants directs
-        children = self.db.query(PlanComptableModel).filter(PlanComptableModel.parent_id == plan.id).all()
-
-        # Construire l'objet de réponse avec la hiérarchie
-        hierarchy_response = PlanComptableHierarchyResponse(
-            id=plan.id,
-            numero_compte=plan.numero_compte,
-            libelle_compte=plan.libelle_compte,
-            categorie=plan.categorie,
-            type_compte=plan.type_compte,
-            parent_id=plan.parent_id,
-            compagnie_id=plan.compagnie_id,
-            est_actif=plan.est_actif,
-            enfants=[self._build_hierarchy(child) for child in children]
-        )
-
-        return hierarchy_response
+        # Un compte déjà présent parmi les ancêtres (cycle dans les parent_id) n'est pas redescendu
+        ancetres = ancetres | {plan["id"]}
 
-    def _build_hierarchy_filtered(self, plan: PlanComptableModel, compagnie_id: UUID) -> PlanComptableResponse:
-        """Construire récursivement la hiérarchie d'un compte en filtrant par compagnie_id"""
-        from ...plan_comptable.schemas import PlanComptableHierarchyResponse
-
-        # Récupérer les enfants directs filtrés par compagnie_id
-        children = self.db.query(PlanComptableModel).filter(
-            PlanComptableModel.parent_id == plan.id,
-            # Filtrer les enfants par compagnie_id
-            or_(
-                PlanComptableModel.compagnie_id == compagnie_id,
-                PlanComptableModel.compagnie_id.is_(None)  # Comptes de base
-            )
-        ).all()
-
-        # Construire l'objet de réponse avec la hiérarchie filtrée
-        hierarchy_response = PlanComptableHierarchyResponse(
-            id=plan.id,
-            numero_compte=plan.numero_compte,
-            libelle_compte=plan.libelle_compte,
-            categorie=plan.categorie,
-            type_compte=plan.type_compte,
-            parent_id=plan.parent_id,
-            compagnie_id=plan.compagnie_id,
-            est_actif=plan.est_actif,
-            enfants=[self._build_hierarchy_filtered(child, compagnie_id) for child in children]
+        return PlanComptableHierarchyResponse(
+            **plan,
+            enfants=[
+                self._build_hierarchy(index, enfant, ancetres)
+                for enfant in index.get_enfants(plan["id"])
+                if enfant["id"] not in ancetres
+            ]
         )
-
-        return hierarchy_response
\ No newline at end of file
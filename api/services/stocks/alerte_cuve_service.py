@@ -0,0 +1,83 @@
+"""Surveillance des cuves en stock bas : niveau, seuil d'alerte et autonomie calculés en une requête"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional
+import uuid
+
+
+def get_cuves_stock_bas(
+    db: Session,
+    compagnie_id: uuid.UUID,
+    station_id: Optional[uuid.UUID] = None,
+    periode_jours: int = 7,
+    jours_autonomie_max: Optional[float] = None,
+    limit: int = 100
+) -> List[Dict]:
+    """
+    Retourne les cuves de la compagnie sous leur seuil d'alerte (alert_stock), triées par autonomie croissante.
+
+    L'autonomie (jours de couverture) est le stock actuel divisé par le débit journalier moyen des ventes
+    de carburant de la cuve sur les periode_jours derniers jours ; elle est NULL pour une cuve sans vente
+    sur la période (ces cuves viennent en dernier). Le niveau (vue_stock_cuve), le seuil de la cuve et le
+    débit sont lus dans une seule requête ; le débit est agrégé par cuve sur l'index (cuve_id, date_vente).
+
+    :param station_id: Limiter aux cuves d'une station
+    :param periode_jours: Fenêtre des ventes servant au calcul du débit
+    :param jours_autonomie_max: Inclure aussi les cuves au-dessus du seuil dont l'autonomie est inférieure ou égale à ce nombre de jours
+    :param limit: Nombre maximum de cuves retournées
+    """
+    conditions_cuve = ["s.compagnie_id = CAST(:compagnie_id AS uuid)"]
+    params = {
+        "compagnie_id": str(compagnie_id),
+        "periode_jours": periode_jours,
+        "limit": limit
+    }
+    if station_id is not None:
+        conditions_cuve.append("v.station_id = CAST(:station_id AS uuid)")
+        params["station_id"] = str(station_id)
+
+    conditions_alerte = ["t.stock_actuel <= t.alert_stock"]
+    if jours_autonomie_max is not None:
+        conditions_alerte.append("t.jours_autonomie <= :jours_autonomie_max")
+        params["jours_autonomie_max"] = jours_autonomie_max
+
+    result = db.execute(text(f"""
+        SELECT *
+        FROM (
+            SELECT
+                v.*,
+                COALESCE(c.alert_stock, 0) AS alert_stock,
+                ventes.volume_vendu AS volume_vendu_periode,
+                ventes.volume_vendu / :periode_jours AS debit_journalier_moyen,
+                CASE
+                    WHEN ventes.volume_vendu > 0 THEN v.stock_actuel / (ventes.volume_vendu / :periode_jours)
+                END AS jours_autonomie
+            FROM vue_stock_cuve v
+            JOIN cuve c ON c.id = v.cuve_id
+            JOIN station s ON s.id = v.station_id
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(SUM(vc.quantite_vendue), 0) AS volume_vendu
+                FROM vente_carburant vc
+                WHERE vc.cuve_id = v.cuve_id
+                  AND vc.date_vente >= now() - make_interval(days => :periode_jours)
+                  AND vc.statut IS DISTINCT FROM 'annulée'
+            ) ventes
+            WHERE {" AND ".join(conditions_cuve)}
+        ) t
+        WHERE {" OR ".join(conditions_alerte)}
+        ORDER BY t.jours_autonomie ASC NULLS LAST, t.stock_actuel - t.alert_stock ASC, t.cuve_nom
+        LIMIT :limit
+    """), params)
+
+    cuves = []
+    for row in result.mappings():
+        cuve = dict(row)
+        for champ in ("stock_initial", "stock_actuel", "alert_stock", "volume_vendu_periode", "debit_journalier_moyen"):
+            cuve[champ] = float(cuve[champ] or 0)
+        if cuve["jours_autonomie"] is not None:
+            cuve["jours_autonomie"] = round(float(cuve["jours_autonomie"]), 2)
+        cuve["sous_seuil_alerte"] = cuve["stock_actuel"] <= cuve["alert_stock"]
+        cuves.append(cuve)
+
+    return cuves
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+
+class BaremeCuve:
+    """
+    Barremage d'une cuve compilé : points (hauteur en cm, volume en litres) triés une fois pour toutes,
+    convertis par recherche dichotomique et interpolation linéaire entre les deux points encadrants.
+    Hors du barème, la conversion retourne le premier ou le dernier point (comme Cuve.calculer_volume).
+    """
+
+    __slots__ = ("hauteurs", "volumes_par_hauteur", "volumes", "hauteurs_par_volume")
+
+    def __init__(self, points: Sequence[Tuple[float, float]]):
+        if not points:
+            raise ValueError("Le barremage ne contient aucun point")
+        par_hauteur = sorted(points, key=lambda point: point[0])
+        par_volume = sorted(points, key=lambda point: point[1])
+        self.hauteurs = tuple(point[0] for point in par_hauteur)
+        self.volumes_par_hauteur = tuple(point[1] for point in par_hauteur)
+        self.volumes = tuple(point[1] for point in par_volume)
+        self.hauteurs_par_volume = tuple(point[0] for point in par_volume)
+
+    @property
+    def hauteur_max(self) -> float:
+        return self.hauteurs[-1]
+
+    @staticmethod
+    def _interpoler(abscisses: Tuple[float, ...], ordonnees: Tuple[float, ...], valeur: float) -> float:
+        if valeur <= abscisses[0]:
+            return ordonnees[0]
+        if valeur > abscisses[-1]:
+            return ordonnees[-1]
+
+        i = bisect_left(abscisses, valeur)
+        if abscisses[i] == valeur:
+            return ordonnees[i]
+
+        x_inf, x_sup = abscisses[i - 1], abscisses[i]
+        y_inf, y_sup = ordonnees[i - 1], ordonnees[i]
+        facteur = (valeur - x_inf) / (x_sup - x_inf)
+        return round(y_inf + (y_sup - y_inf) * facteur, 2)  # Arrondir à 2 décimales
+
+    def volume(self, hauteur_cm: float) -> float:
+        """
+        Volume en litres correspondant à une hauteur de jauge en cm
+        """
+        return self._interpoler(self.hauteurs, self.volumes_par_hauteur, float(hauteur_cm))
+
+    def hauteur(self, volume_litres: float) -> float:
+        """
+        Hauteur de jauge en cm correspondant à un volume en litres
+        """
+        return self._interpoler(self.volumes, self.hauteurs_par_volume, float(volume_litres))
+
+    def volumes_depuis_hauteurs(self, hauteurs_cm: Iterable[float]) -> List[float]:
+        return [self.volume(hauteur_cm) for hauteur_cm in hauteurs_cm]
+
+
+def compiler_barremage(barremage) -> BaremeCuve:
+    """
+    Compile le barremage d'une cuve (chaîne JSON ou liste d'objets hauteur_cm/volume_litres ou hauteur/volume)
+
+    :raises ValueError: Si le barremage est absent ou mal formaté
+    """
+    if not barremage:
+        raise ValueError("Le barremage n'est pas défini pour cette cuve")
+
+    # Gérer les deux cas : barremage peut être une chaîne JSON ou déjà un objet Python
+    if isinstance(barremage, str):
+        try:
+            barremage = json.loads(barremage)
+        except json.JSONDecodeError:
+            raise ValueError("Le barremage est mal formaté")
+
+    if not isinstance(barremage, list):
+        raise ValueError("Le barremage est mal formaté - ce n'est pas une liste d'objets")
+
+    points = []
+    try:
+        for item in barremage:
+            hauteur = item.get('hauteur_cm', item.get('hauteur', 0))
+            volume = item.get('volume_litres', item.get('volume', 0))
+            points.append((float(hauteur), float(volume)))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError("Le barremage est mal formaté - ce n'est pas une liste d'objets")
+
+    return BaremeCuve(points)
+
+
+def version_barremage(barremage) -> str:
+    """
+    Empreinte du contenu du barremage : une modification du barremage change la clé du cache
+    """
+    if not isinstance(barremage, str):
+        barremage = json.dumps(barremage, sort_keys=True, default=str)
+    return hashlib.blake2b(barremage.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CacheBaremes:
+    """
+    Cache borné (LRU) des barèmes compilés, indexé par (cuve_id, version du barremage). La version étant
+    l'empreinte du contenu, un barremage modifié n'est jamais servi depuis une ancienne entrée.
+    """
+
+    def __init__(self, taille_max: int = 1024):
+        self.taille_max = taille_max
+        self._entrees: "OrderedDict[Tuple[Optional[UUID], str], BaremeCuve]" = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cuve_id: Optional[UUID], barremage) -> BaremeCuve:
+        cle = (cuve_id, version_barremage(barremage))
+        with self._verrou:
+            bareme = self._entrees.get(cle)
+            if bareme is not None:
+                self._entrees.move_to_end(cle)
+                return bareme
+
+        bareme = compiler_barremage(barremage)
+        if self.taille_max > 0:
+            with self._verrou:
+                self._entrees[cle] = bareme
+                self._entrees.move_to_end(cle)
+                while len(self._entrees) > self.taille_max:
+                    self._entrees.popitem(last=False)
+        return bareme
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+cache_baremes = CacheBaremes(
+    taille_max=int(os.getenv("BARREMAGE_CACHE_MAX_ENTRIES", "1024"))
+)
+
+
+def get_bareme_cuve(cuve) -> BaremeCuve:
+    """
+    Retourne le barème compilé d'une cuve, compilé au premier appel puis servi depuis le cache du processus
+
+    :raises ValueError: Si le barremage est absent ou mal formaté
+    """
+    return cache_baremes.obtenir(cuve.id, cuve.barremage)
+
+
+def convertir_hauteurs_en_volumes(
+    db: Session,
+    mesures: Iterable[Tuple[UUID, float]],
+    station_id: Optional[UUID] = None
+) -> List[Dict]:
+    """
+    Convertit en une fois un ensemble de hauteurs de jauge (par exemple les jaugeages de fin de poste
+    d'une station) : les cuves sont chargées en une requête et chaque barème n'est compilé qu'une fois.
+
+    :param mesures: Couples (cuve_id, hauteur_cm)
+    :param station_id: Limiter la conversion aux cuves de cette station (les autres sont signalées non trouvées)
+    :return: Pour chaque mesure, dans l'ordre : cuve_id, hauteur_cm, volume_litres et erreur (None si la conversion a réussi)
+    """
+    from ...models.compagnie import Cuve
+
+    mesures = list(mesures)
+    cuve_ids = {cuve_id for cuve_id, _ in mesures}
+    barremages = {}
+    if cuve_ids:
+        query = db.query(Cuve.id, Cuve.barremage).filter(Cuve.id.in_(cuve_ids))
+        if station_id is not None:
+            query = query.filter(Cuve.station_id == station_id)
+        barremages = dict(query.all())
+
+    resultats = []
+    for cuve_id, hauteur_cm in mesures:
+        resultat = {"cuve_id": cuve_id, "hauteur_cm": hauteur_cm, "volume_litres": None, "erreur": None}
+        if cuve_id not in barremages:
+            resultat["erreur"] = "Cuve non trouvée"
+        else:
+            try:
+                resultat["volume_litres"] = cache_baremes.obtenir(cuve_id, barremages[cuve_id]).volume(hauteur_cm)
+            except ValueError as e:
+                resultat["erreur"] = str(e)
+        resultats.append(resultat)
+
+    return resultats
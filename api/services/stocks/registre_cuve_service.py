@@ -0,0 +1,119 @@
+"""Lecture du registre des mouvements de cuve (stock_avant / stock_apres tenus par les triggers)"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+import uuid
+
+from api.models.compagnie import MouvementStockCuve
+
+
+def verrouiller_cuve(db: Session, cuve_id: uuid.UUID):
+    """
+    Prend le verrou du registre de la cuve jusqu'à la fin de la transaction (le même que celui des triggers),
+    pour qu'un contrôle de stock et le mouvement qui le suit ne soient pas entrelacés avec une autre écriture
+    """
+    db.execute(text("SELECT verrouiller_registre_cuve(CAST(:cuve_id AS uuid))"), {"cuve_id": str(cuve_id)})
+
+
+def get_stock_cuve(db: Session, cuve_id: uuid.UUID, date_reference: Optional[datetime] = None) -> float:
+    """
+    Retourne le niveau de la cuve (courant, ou à une date) : stock_apres du dernier mouvement du registre
+
+    :param date_reference: Niveau après les mouvements datés au plus tard de cette date (None pour le niveau courant)
+    :return: Niveau en litres (0 si la cuve n'a aucun mouvement)
+    """
+    query = db.query(MouvementStockCuve.stock_apres).filter(MouvementStockCuve.cuve_id == cuve_id)
+    if date_reference is not None:
+        query = query.filter(MouvementStockCuve.date_mouvement <= date_reference)
+
+    result = query.order_by(
+        MouvementStockCuve.date_mouvement.desc(),
+        MouvementStockCuve.date_creation.desc(),
+        MouvementStockCuve.id.desc()
+    ).first()
+    return float(result.stock_apres) if result and result.stock_apres is not None else 0.0
+
+
+def get_stocks_cuves(
+    db: Session,
+    cuve_ids: Iterable[uuid.UUID],
+    date_reference: Optional[datetime] = None
+) -> Dict[uuid.UUID, float]:
+    """
+    Retourne en une requête le niveau d'un ensemble de cuves
+
+    :return: Dictionnaire cuve_id -> niveau (les cuves sans mouvement sont absentes)
+    """
+    cuve_ids = list(set(cuve_ids))
+    if not cuve_ids:
+        return {}
+
+    query = db.query(MouvementStockCuve.cuve_id, MouvementStockCuve.stock_apres).filter(
+        MouvementStockCuve.cuve_id.in_(cuve_ids)
+    )
+    if date_reference is not None:
+        query = query.filter(MouvementStockCuve.date_mouvement <= date_reference)
+
+    results = query.distinct(MouvementStockCuve.cuve_id).order_by(
+        MouvementStockCuve.cuve_id,
+        MouvementStockCuve.date_mouvement.desc(),
+        MouvementStockCuve.date_creation.desc(),
+        MouvementStockCuve.id.desc()
+    ).all()
+    return {cuve_id: float(stock_apres or 0) for cuve_id, stock_apres in results}
+
+
+def recalculer_registre_cuves(
+    db: Session,
+    cuve_id: Optional[uuid.UUID] = None,
+    depuis: Optional[datetime] = None
+) -> int:
+    """
+    Recalcule les soldes courants du registre. Les triggers tiennent les soldes à jour, y compris pour les
+    mouvements antidatés : ce recalcul sert de réparation (import en masse, triggers désactivés, ...).
+
+    :param cuve_id: Limiter le recalcul à une cuve (toutes les cuves sinon)
+    :param depuis: Ne recalculer que les mouvements datés à partir de cette date
+    :return: Nombre de mouvements corrigés
+    """
+    if cuve_id is not None:
+        cuve_ids = [cuve_id]
+    else:
+        cuve_ids = [c for (c,) in db.query(MouvementStockCuve.cuve_id).distinct().all()]
+
+    nombre_mouvements = 0
+    for identifiant in cuve_ids:
+        nombre_mouvements += db.execute(
+            text("SELECT recalculer_stock_mouvement_cuve(CAST(:cuve_id AS uuid), :depuis)"),
+            {"cuve_id": str(identifiant), "depuis": depuis}
+        ).scalar() or 0
+        # Valider cuve par cuve pour relâcher le verrou de chaque registre au plus tôt
+        db.commit()
+
+    return nombre_mouvements
+
+
+def reconstruire_points_cuves(db: Session, cuve_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Reconstruit les points journaliers de stock (point_stock_cuve) à partir des mouvements. Les triggers
+    tiennent les points à jour : cette reconstruction sert de réparation, comme recalculer_registre_cuves.
+
+    :param cuve_id: Limiter la reconstruction à une cuve (toutes les cuves sinon)
+    :return: Nombre de points reconstruits
+    """
+    if cuve_id is not None:
+        cuve_ids = [cuve_id]
+    else:
+        cuve_ids = [c for (c,) in db.query(MouvementStockCuve.cuve_id).distinct().all()]
+
+    nombre_points = 0
+    for identifiant in cuve_ids:
+        nombre_points += db.execute(
+            text("SELECT reconstruire_points_stock_cuve(CAST(:cuve_id AS uuid))"),
+            {"cuve_id": str(identifiant)}
+        ).scalar() or 0
+        db.commit()
+
+    return nombre_points
@@ -6,7 +6,7 @@ from datetime import datetime
 from uuid import uuid4
 
 
-async def creer_stock_initial_carburant(
+def creer_stock_initial_carburant(
     stock_initial_data,
     volume_calcule,
     db: Session,
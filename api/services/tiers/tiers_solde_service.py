@@ -6,71 +6,152 @@ les soldes des tiers dans l'application Succès Fuel.
 """
 
 from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from typing import Dict, Optional, Tuple
 from uuid import UUID
 
 from ...models.tiers import Tiers, SoldeTiers, MouvementTiers
-from ...models.achat_carburant import AchatCarburant, PaiementAchatCarburant
+from ...models.achat_carburant import AchatCarburant, LigneAchatCarburant, PaiementAchatCarburant
 from ...models.mouvement_financier import Avoir
 
 
+def station_principale_achat(lignes) -> Optional[UUID]:
+    """
+    Station à laquelle est rattachée la dette d'un achat : celle de la ligne de plus grande quantité
+    (à quantité égale, le plus petit identifiant de station, comme _stations_achats côté SQL).
+
+    Args:
+        lignes: Lignes de l'achat (objets ayant quantite et station_id)
+
+    Returns:
+        UUID: ID de la station, ou None si l'achat n'a pas de ligne
+    """
+    lignes = [ligne for ligne in lignes if ligne.station_id is not None]
+    if not lignes:
+        return None
+    return min(lignes, key=lambda ligne: (-(ligne.quantite or 0), str(ligne.station_id))).station_id
+
+
+def _stations_achats(db: Session):
+    """
+    Sous-requête (achat_carburant_id, station_id) : station principale de chaque achat
+    """
+    return db.query(
+        LigneAchatCarburant.achat_carburant_id,
+        LigneAchatCarburant.station_id
+    ).distinct(
+        LigneAchatCarburant.achat_carburant_id
+    ).order_by(
+        LigneAchatCarburant.achat_carburant_id,
+        LigneAchatCarburant.quantite.desc(),
+        LigneAchatCarburant.station_id
+    ).subquery()
+
+
+def _soldes_achats(db: Session, *filtres):
+    """
+    Requête groupée (fournisseur_id, station_id, solde) : montant des achats non annulés moins
+    leurs paiements non annulés, par fournisseur et station principale des achats
+    """
+    stations = _stations_achats(db)
+    paiements = db.query(
+        PaiementAchatCarburant.achat_carburant_id,
+        func.sum(PaiementAchatCarburant.montant).label("montant_paye")
+    ).filter(
+        PaiementAchatCarburant.statut != "annulé"
+    ).group_by(
+        PaiementAchatCarburant.achat_carburant_id
+    ).subquery()
+
+    return db.query(
+        AchatCarburant.fournisseur_id,
+        stations.c.station_id,
+        func.sum(AchatCarburant.montant_total - func.coalesce(paiements.c.montant_paye, 0)).label("solde")
+    ).join(
+        stations, stations.c.achat_carburant_id == AchatCarburant.id
+    ).outerjoin(
+        paiements, paiements.c.achat_carburant_id == AchatCarburant.id
+    ).filter(
+        AchatCarburant.statut != "annulé",
+        *filtres
+    ).group_by(
+        AchatCarburant.fournisseur_id,
+        stations.c.station_id
+    )
+
+
+def _solde_initial(solde: SoldeTiers) -> float:
+    """
+    Solde d'ouverture signé d'un fournisseur (positif = dette envers le fournisseur)
+    """
+    montant_initial = float(solde.montant_initial or 0)
+    return -montant_initial if solde.type_solde_initial == "creance" else montant_initial
+
+
 def calculer_solde_fournisseur(db: Session, tiers_id: UUID, station_id: UUID = None) -> float:
     """
-    Calcule le solde actuel d'un fournisseur en fonction des achats et des paiements.
+    Calcule le solde d'un fournisseur en fonction des achats et des paiements, par agrégat SQL.
     
     Args:
         db: Session de base de données
         tiers_id: ID du fournisseur
-        station_id: ID de la station (facultatif, pour filtrer par station)
+        station_id: ID de la station (facultatif, pour filtrer par station principale des achats)
     
     Returns:
         float: Solde du fournisseur (positif = dette du fournisseur, négatif = créance du fournisseur)
     """
-    # Calcul du montant total des achats
-    achats_query = db.query(AchatCarburant).filter(
-        AchatCarburant.fournisseur_id == tiers_id,
-        AchatCarburant.statut != "annulé"
-    )
-    
-    if station_id:
-        achats_query = achats_query.filter(
-            AchatCarburant.compagnie_id == station_id
-        )
+    soldes = _soldes_achats(db, AchatCarburant.fournisseur_id == tiers_id).all()
     
-    achats = achats_query.all()
-    
-    # Calcul du montant total des achats
-    montant_total_achats = sum(achat.montant_total for achat in achats if achat.montant_total)
-    
-    # Calcul du montant total des paiements effectués
-    paiements_query = db.query(PaiementAchatCarburant).join(
-        AchatCarburant
-    ).filter(
-        AchatCarburant.fournisseur_id == tiers_id,
-        AchatCarburant.statut != "annulé",
-        PaiementAchatCarburant.statut != "annulé"
-    )
-    
-    if station_id:
-        paiements_query = paiements_query.filter(
-            AchatCarburant.compagnie_id == station_id
-        )
-    
-    paiements = paiements_query.all()
-    
-    montant_total_paiements = sum(paiement.montant for paiement in paiements if paiement.montant)
-    
-    # Calcul du solde : montant_total_achats - montant_total_paiements
     # Si positif : dette du fournisseur (on lui doit de l'argent)
     # Si négatif : créance du fournisseur (il nous doit de l'argent)
-    solde = montant_total_achats - montant_total_paiements
-    
-    return solde
+    return float(sum(
+        (row.solde or 0) for row in soldes
+        if station_id is None or row.station_id == station_id
+    ))
+
+
+def appliquer_delta_solde_fournisseur(db: Session, tiers_id: UUID, station_id: UUID, delta) -> None:
+    """
+    Applique une variation au solde d'un fournisseur pour une station, sans recalculer son historique :
+    +montant à l'enregistrement d'un achat, -montant à un paiement, l'inverse à leur annulation.
+    La mise à jour est atomique (INSERT ... ON CONFLICT DO UPDATE montant_actuel = montant_actuel + delta) ;
+    le solde est créé s'il n'existe pas.
+    Ne valide pas la transaction : la variation est enregistrée avec l'opération qui la provoque.
+
+    Args:
+        db: Session de base de données
+        tiers_id: ID du fournisseur
+        station_id: ID de la station
+        delta: Variation du solde (positif = la dette envers le fournisseur augmente)
+    """
+    delta = float(delta or 0)
+    if delta == 0 or tiers_id is None or station_id is None:
+        return
+
+    # Un seul aller-retour et pas de course entre deux premières opérations concurrentes :
+    # la contrainte unique (tiers_id, station_id) fait de l'insertion une mise à jour si le solde existe
+    requete = insert(SoldeTiers).values(
+        tiers_id=tiers_id,
+        station_id=station_id,
+        montant_initial=0,  # Le solde initial est souvent zéro pour les nouveaux tiers
+        montant_actuel=delta,
+        devise="XOF",  # Devise par défaut
+        date_derniere_mise_a_jour=func.now()
+    )
+    db.execute(requete.on_conflict_do_update(
+        index_elements=[SoldeTiers.tiers_id, SoldeTiers.station_id],
+        set_={
+            SoldeTiers.montant_actuel: SoldeTiers.montant_actuel + requete.excluded.montant_actuel,
+            SoldeTiers.date_derniere_mise_a_jour: func.now()
+        }
+    ))
 
 
 def mettre_a_jour_solde_fournisseur(db: Session, tiers_id: UUID, station_id: UUID, utilisateur_id: UUID) -> SoldeTiers:
     """
-    Met à jour le solde d'un fournisseur dans la table SoldeTiers.
+    Recalcule entièrement le solde d'un fournisseur pour une station (réconciliation) :
+    solde d'ouverture + achats - paiements.
     
     Args:
         db: Session de base de données
@@ -81,59 +162,81 @@ def mettre_a_jour_solde_fournisseur(db: Session, tiers_id: UUID, station_id: UUI
     Returns:
         SoldeTiers: L'objet SoldeTiers mis à jour
     """
-    # Calculer le solde actuel
-    nouveau_solde = calculer_solde_fournisseur(db, tiers_id, station_id)
+    solde_achats = calculer_solde_fournisseur(db, tiers_id, station_id)
     
     # Vérifier si un solde existe déjà pour ce tiers et cette station
     solde_existant = db.query(SoldeTiers).filter(
         SoldeTiers.tiers_id == tiers_id,
         SoldeTiers.station_id == station_id
-    ).first()
+    ).with_for_update().first()
     
     if solde_existant:
-        # Mettre à jour le solde existant
-        solde_existant.montant_actuel = nouveau_solde
-        solde_existant.date_derniere_mise_a_jour = db.query(AchatCarburant).filter(
-            AchatCarburant.fournisseur_id == tiers_id
-        ).order_by(AchatCarburant.date_modification.desc()).first().date_modification if db.query(AchatCarburant).filter(
-            AchatCarburant.fournisseur_id == tiers_id
-        ).first() else None
+        solde_existant.montant_actuel = _solde_initial(solde_existant) + solde_achats
+        solde_existant.date_derniere_mise_a_jour = func.now()
     else:
         # Créer un nouveau solde
         solde_existant = SoldeTiers(
             tiers_id=tiers_id,
             station_id=station_id,
             montant_initial=0,  # Le solde initial est souvent zéro pour les nouveaux tiers
-            montant_actuel=nouveau_solde,
-            devise="XOF"  # Devise par défaut
+            montant_actuel=solde_achats,
+            devise="XOF",  # Devise par défaut
+            date_derniere_mise_a_jour=func.now()
         )
         db.add(solde_existant)
     
     db.commit()
+    db.refresh(solde_existant)
     
-    from datetime import datetime
+    return solde_existant
+
+
+def recalculer_soldes_fournisseurs_compagnie(db: Session, compagnie_id: UUID) -> int:
+    """
+    Recalcule les soldes de tous les fournisseurs d'une compagnie (réconciliation des soldes tenus par variations).
+    Les soldes achats - paiements de tous les fournisseurs et stations sont obtenus en une requête groupée,
+    puis appliqués aux soldes enregistrés (chargés en une requête) : solde d'ouverture + achats - paiements.
+
+    Args:
+        db: Session de base de données
+        compagnie_id: ID de la compagnie
+
+    Returns:
+        int: Nombre de soldes fournisseurs mis à jour ou créés
+    """
+    soldes_achats: Dict[Tuple[UUID, UUID], float] = {
+        (row.fournisseur_id, row.station_id): float(row.solde or 0)
+        for row in _soldes_achats(db, AchatCarburant.compagnie_id == compagnie_id).all()
+    }
+
+    soldes = db.query(SoldeTiers).join(
+        Tiers, Tiers.id == SoldeTiers.tiers_id
+    ).filter(
+        Tiers.compagnie_id == compagnie_id,
+        Tiers.type == "fournisseur"
+    ).with_for_update(of=SoldeTiers).all()
+
+    nombre = 0
+    for solde in soldes:
+        montant = _solde_initial(solde) + soldes_achats.pop((solde.tiers_id, solde.station_id), 0.0)
+        if solde.montant_actuel != montant:
+            solde.montant_actuel = montant
+            solde.date_derniere_mise_a_jour = func.now()
+            nombre += 1
+
+    for (tiers_id, station_id), montant in soldes_achats.items():
+        db.add(SoldeTiers(
+            tiers_id=tiers_id,
+            station_id=station_id,
+            montant_initial=0,
+            montant_actuel=montant,
+            devise="XOF",
+            date_derniere_mise_a_jour=func.now()
+        ))
+        nombre += 1
 
-    # Créer un mouvement pour enregistrer cette mise à jour
-    mouvement = MouvementTiers(
-        tiers_id=tiers_id,
-        station_id=station_id,
-        type_mouvement="débit" if nouveau_solde > 0 else "crédit",  # "débit" si dette, "crédit" si créance
-        montant=abs(nouveau_solde),
-        date_mouvement=datetime.now(),  # Ajouter la date du mouvement
-        description="Mise à jour du solde fournisseur",
-        reference="SOLDE_UPDATE",
-        statut="validé",
-        module_origine="tiers",  # Ajouter le module d'origine
-        reference_origine="SOLDE_UPDATE",  # Ajouter la référence d'origine
-        utilisateur_id=utilisateur_id,  # Ajouter l'ID de l'utilisateur
-        est_annule=False,  # Par défaut, le mouvement n'est pas annulé
-        transaction_source_id=None,  # ID de la transaction source (achat, vente, etc.)
-        type_transaction_source=None  # Type de la transaction source
-    )
-    db.add(mouvement)
     db.commit()
-    
-    return solde_existant
+    return nombre
 
 
 def obtenir_solde_fournisseur(db: Session, tiers_id: UUID, station_id: UUID = None) -> Optional[SoldeTiers]:
@@ -183,7 +286,7 @@ def calculer_solde_achat(db: Session, achat_id: UUID) -> float:
     total_paiements = db.query(PaiementAchatCarburant).filter(
         PaiementAchatCarburant.achat_carburant_id == achat_id,
         PaiementAchatCarburant.statut != "annulé"
-    ).with_entities(db.func.sum(PaiementAchatCarburant.montant)).scalar() or 0
+    ).with_entities(func.sum(PaiementAchatCarburant.montant)).scalar() or 0
     
     # Calcul du solde : montant_total - total_paiements
     solde_restant = achat.montant_total - total_paiements
@@ -191,14 +294,15 @@ def calculer_solde_achat(db: Session, achat_id: UUID) -> float:
     return solde_restant
 
 
-def mettre_a_jour_solde_apres_paiement(db: Session, achat_id: UUID, utilisateur_id: UUID) -> None:
+def mettre_a_jour_solde_apres_paiement(db: Session, achat_id: UUID, utilisateur_id: UUID, montant_delta) -> None:
     """
-    Met à jour le solde du fournisseur après un nouveau paiement.
+    Met à jour le solde du fournisseur après l'enregistrement, la modification ou la suppression d'un paiement.
     
     Args:
         db: Session de base de données
         achat_id: ID de l'achat concerné par le paiement
         utilisateur_id: ID de l'utilisateur effectuant le paiement
+        montant_delta: Variation du montant payé sur l'achat (positif pour un nouveau paiement)
     """
     # Récupérer l'achat pour obtenir le fournisseur et la station
     achat = db.query(AchatCarburant).filter(
@@ -207,14 +311,16 @@ def mettre_a_jour_solde_apres_paiement(db: Session, achat_id: UUID, utilisateur_
     
     if not achat:
         raise ValueError(f"L'achat avec l'ID {achat_id} n'existe pas")
-    
-    # Mettre à jour le solde du fournisseur
-    mettre_a_jour_solde_fournisseur(
-        db=db,
-        tiers_id=achat.fournisseur_id,
-        station_id=achat.station_id if hasattr(achat, 'station_id') else achat.ligne_achat_carburant[0].station_id if achat.ligne_achat_carburant else None,
-        utilisateur_id=utilisateur_id
-    )
+
+    # Les paiements d'un achat annulé ne comptent plus dans le solde
+    if achat.statut != "annulé":
+        appliquer_delta_solde_fournisseur(
+            db,
+            achat.fournisseur_id,
+            station_principale_achat(achat.ligne_achat_carburant),
+            -float(montant_delta or 0)
+        )
+    db.commit()
 
 
 def valider_montant_paiements_achat(db: Session, achat_id: UUID, montant_paiements: float) -> bool:
@@ -248,14 +354,15 @@ def valider_montant_paiements_achat(db: Session, achat_id: UUID, montant_paiemen
     return True
 
 
-def mettre_a_jour_solde_apres_achat(db: Session, achat_id: UUID, utilisateur_id: UUID) -> None:
+def mettre_a_jour_solde_apres_achat(db: Session, achat_id: UUID, utilisateur_id: UUID, montant_delta=None) -> None:
     """
-    Met à jour le solde du fournisseur après la création d'un nouvel achat.
+    Met à jour le solde du fournisseur après l'enregistrement ou la modification d'un achat.
 
     Args:
         db: Session de base de données
-        achat_id: ID du nouvel achat
+        achat_id: ID de l'achat
         utilisateur_id: ID de l'utilisateur effectuant l'achat
+        montant_delta: Variation du montant de l'achat (montant total de l'achat par défaut, pour un nouvel achat)
     """
     # Récupérer l'achat pour obtenir le fournisseur et la station
     achat = db.query(AchatCarburant).filter(
@@ -265,13 +372,13 @@ def mettre_a_jour_solde_apres_achat(db: Session, achat_id: UUID, utilisateur_id:
     if not achat:
         raise ValueError(f"L'achat avec l'ID {achat_id} n'existe pas")
 
-    # Mettre à jour le solde du fournisseur
-    mettre_a_jour_solde_fournisseur(
-        db=db,
-        tiers_id=achat.fournisseur_id,
-        station_id=achat.station_id if hasattr(achat, 'station_id') else achat.ligne_achat_carburant[0].station_id if achat.ligne_achat_carburant else None,
-        utilisateur_id=utilisateur_id
+    appliquer_delta_solde_fournisseur(
+        db,
+        achat.fournisseur_id,
+        station_principale_achat(achat.ligne_achat_carburant),
+        achat.montant_total if montant_delta is None else montant_delta
     )
+    db.commit()
 
 
 def enregistrer_mouvement_tiers(
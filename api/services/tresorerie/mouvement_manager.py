@@ -315,6 +315,7 @@ class MouvementTresorerieManager:
 
         mouvement_annulation = MouvementTresorerie(
             tresorerie_station_id=mouvement_original.tresorerie_station_id,
+            tresorerie_globale_id=mouvement_original.tresorerie_globale_id,
             station_id=mouvement_original.station_id,
             type_mouvement=type_inverse,
             montant=mouvement_original.montant,
@@ -324,6 +325,9 @@ class MouvementTresorerieManager:
             reference_origine=f"AN-{mouvement_original.reference_origine}",  # Ajouter un préfixe pour identifier l'annulation
             utilisateur_id=utilisateur_id,
             mouvement_origine_id=mouvement_original.id,
+            # Le mouvement original passe au statut annulé et sort du solde : le mouvement inverse
+            # n'est qu'une trace et ne doit pas être compté une seconde fois
+            statut="annulé",
             est_annule=True
         )
 
@@ -414,15 +418,16 @@ class MouvementTresorerieManager:
             else:
                 raise InvalidTransactionException("Un mouvement ne peut être lié qu'à une seule trésorerie (station, liaison ou globale)")
 
-        # Valider le solde avant transaction si c'est une sortie
-        if type_mouvement == "sortie":
-            if tresorerie_station_id:
+        # Valider le solde avant transaction si c'est une sortie (seuls les mouvements validés impactent le solde)
+        if type_mouvement == "sortie" and statut == "validé":
+            if tresorerie_station_id or tresorerie_globale_id:
                 MouvementTresorerieManager.valider_solde_avant_transaction(
-                    db, tresorerie_station_id, montant, TypeMouvement.SORTIE
+                    db, tresorerie_station_id, montant, TypeMouvement.SORTIE,
+                    tresorerie_globale_id=tresorerie_globale_id
                 )
-            elif station_id or tresorerie_globale_id:
-                # Pour les mouvements liés à une station ou trésorerie globale, on ne peut pas valider directement
-                # On suppose que la validation a été faite dans la fonction appelante
+            elif station_id:
+                # Pour les mouvements liés directement à une station, on suppose que la validation
+                # a été faite dans la fonction appelante
                 pass
 
         # Créer le mouvement de trésorerie
@@ -515,8 +520,8 @@ class MouvementTresorerieManager:
 
         # Valider le solde avant transaction si c'est une sortie
         if type_mouvement == "sortie":
-            from ..tresoreries.tresorerie_service import get_solde_tresorerie_globale
-            solde_actuel = get_solde_tresorerie_globale(db, station_id, None)
+            from ..tresoreries.solde_service import TYPE_STATION, get_solde
+            solde_actuel = get_solde(db, TYPE_STATION, station_id, verrouiller=True)
             if solde_actuel < montant:
                 raise InsufficientFundsException(
                     f"Solde insuffisant pour la trésorerie globale. Solde actuel: {solde_actuel}, Montant requis: {montant}"
@@ -610,8 +615,8 @@ class MouvementTresorerieManager:
 
         # Valider le solde avant transaction si c'est une sortie
         if type_mouvement == "sortie":
-            from ..tresoreries.tresorerie_service import get_solde_tresorerie_station
-            solde_actuel = get_solde_tresorerie_station(db, None, tresorerie_station_id)
+            from ..tresoreries.solde_service import TYPE_TRESORERIE_STATION, get_solde
+            solde_actuel = get_solde(db, TYPE_TRESORERIE_STATION, tresorerie_station_id, verrouiller=True)
             if solde_actuel < montant:
                 raise InsufficientFundsException(
                     f"Solde insuffisant pour la trésorerie station. Solde actuel: {solde_actuel}, Montant requis: {montant}"
@@ -746,26 +751,26 @@ class MouvementTresorerieManager:
         tresorerie_station_id: Optional[uuid.UUID] = None,
         montant: float = 0,
         type_mouvement: TypeMouvement = None,
-        station_id: Optional[uuid.UUID] = None
+        station_id: Optional[uuid.UUID] = None,
+        tresorerie_globale_id: Optional[uuid.UUID] = None
     ) -> bool:
         """
         Valide qu'une trésorerie a suffisamment de fonds pour une transaction de sortie.
+        Le solde est lu dans solde_tresorerie et sa ligne reste verrouillée jusqu'au commit du mouvement.
         """
         if type_mouvement == TypeMouvement.SORTIE:
+            from ..tresoreries.solde_service import (
+                TYPE_TRESORERIE_STATION, TYPE_TRESORERIE_GLOBALE, verifier_solde_disponible
+            )
             if tresorerie_station_id is not None:
-                from ..tresoreries.tresorerie_service import get_solde_tresorerie_station
-                solde_actuel = get_solde_tresorerie_station(db, None, tresorerie_station_id)
-                if solde_actuel < montant:
-                    raise InsufficientFundsException(
-                        f"Solde insuffisant. Solde actuel: {solde_actuel}, Montant requis: {montant}"
-                    )
+                verifier_solde_disponible(db, TYPE_TRESORERIE_STATION, tresorerie_station_id, montant)
+            elif tresorerie_globale_id is not None:
+                verifier_solde_disponible(db, TYPE_TRESORERIE_GLOBALE, tresorerie_globale_id, montant)
             elif station_id is not None:
-                from ..tresoreries.tresorerie_service import get_solde_tresorerie_globale
                 # Pour la validation avec station_id, on suppose que la validation a été faite dans la fonction appelante
-                # car on ne peut pas valider directement le solde avec seulement station_id
                 pass
             else:
                 # Aucune trésorerie spécifiée
                 raise InvalidTransactionException("Une trésorerie (station ou globale) doit être spécifiée")
 
-        return True
\ No newline at end of file
+        return True
@@ -36,6 +36,7 @@ from .tresorerie_service import (
 
 from .cloture_service import (
     cloturer_soldes_mensuels,
+    cloturer_soldes_mensuels_par_compagnie,
     cloturer_solde_tresorerie_station,
     cloturer_solde_global_tresorerie,
     processus_cloture_mensuelle,
@@ -81,6 +82,7 @@ __all__ = [
     "get_mouvements_tresorerie_by_reference",
     "get_mouvements_tresorerie_by_transfert_id",
     "cloturer_soldes_mensuels",
+    "cloturer_soldes_mensuels_par_compagnie",
     "cloturer_solde_tresorerie_station",
     "cloturer_solde_global_tresorerie",
     "processus_cloture_mensuelle",
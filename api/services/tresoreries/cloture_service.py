@@ -2,97 +2,171 @@
 
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import List, Optional
+import logging
 import uuid
 from ...models.tresorerie import Tresorerie, TresorerieStation
-
-
-def cloturer_soldes_mensuels(db: Session, mois: date):
+from ...models import Station
+
+logger = logging.getLogger(__name__)
+
+
+# Clôture ensembliste des trésoreries stations pour un mois :
+# - le solde d'ouverture est la clôture du mois précédent quand elle existe ; à défaut (première clôture),
+#   c'est l'état initial le plus récent augmenté des mouvements validés antérieurs au mois ;
+# - les mouvements validés du mois sont agrégés en une seule requête groupée ;
+# - les clôtures sont insérées en un seul INSERT ... SELECT, les clôtures déjà présentes sont conservées.
+_REQUETE_CLOTURE_STATIONS = """
+    WITH perimetre AS (
+        SELECT ts.id AS tresorerie_station_id, ts.tresorerie_id
+        FROM tresorerie_station ts
+        JOIN station s ON s.id = ts.station_id
+        WHERE (CAST(:compagnie_id AS uuid) IS NULL OR s.compagnie_id = CAST(:compagnie_id AS uuid))
+          AND (CAST(:tresorerie_station_id AS uuid) IS NULL OR ts.id = CAST(:tresorerie_station_id AS uuid))
+    ),
+    cloture_precedente AS (
+        SELECT c.tresorerie_station_id, c.solde_cloture
+        FROM cloture_solde_tresorerie c
+        JOIN perimetre p ON p.tresorerie_station_id = c.tresorerie_station_id
+        WHERE c.date_cloture = :date_cloture_precedente
+    ),
+    etat_initial AS (
+        SELECT DISTINCT ON (e.tresorerie_station_id) e.tresorerie_station_id, e.montant
+        FROM etat_initial_tresorerie e
+        JOIN perimetre p ON p.tresorerie_station_id = e.tresorerie_station_id
+        WHERE e.tresorerie_station_id NOT IN (SELECT tresorerie_station_id FROM cloture_precedente)
+        ORDER BY e.tresorerie_station_id, e.date_enregistrement DESC
+    ),
+    mouvements AS (
+        SELECT
+            m.tresorerie_station_id,
+            SUM(CASE m.type_mouvement WHEN 'entrée' THEN m.montant WHEN 'sortie' THEN -m.montant ELSE 0 END)
+                FILTER (WHERE m.date_mouvement >= :date_debut) AS total_periode,
+            SUM(CASE m.type_mouvement WHEN 'entrée' THEN m.montant WHEN 'sortie' THEN -m.montant ELSE 0 END)
+                FILTER (WHERE m.date_mouvement < :date_debut) AS total_anterieur
+        FROM mouvement_tresorerie m
+        JOIN perimetre p ON p.tresorerie_station_id = m.tresorerie_station_id
+        WHERE m.statut = 'validé'
+          AND m.date_mouvement < :date_fin_exclue
+          -- L'historique antérieur n'est lu que pour les trésoreries sans clôture précédente
+          AND (m.date_mouvement >= :date_debut
+               OR m.tresorerie_station_id NOT IN (SELECT tresorerie_station_id FROM cloture_precedente))
+        GROUP BY m.tresorerie_station_id
+    )
+    INSERT INTO cloture_solde_tresorerie (
+        tresorerie_id,
+        tresorerie_station_id,
+        date_cloture,
+        periode_debut,
+        periode_fin,
+        solde_cloture
+    )
+    SELECT
+        p.tresorerie_id,
+        p.tresorerie_station_id,
+        :date_fin,
+        :date_debut,
+        :date_fin,
+        COALESCE(cp.solde_cloture, COALESCE(ei.montant, 0) + COALESCE(mv.total_anterieur, 0))
+            + COALESCE(mv.total_periode, 0)
+    FROM perimetre p
+    LEFT JOIN cloture_precedente cp ON cp.tresorerie_station_id = p.tresorerie_station_id
+    LEFT JOIN etat_initial ei ON ei.tresorerie_station_id = p.tresorerie_station_id
+    LEFT JOIN mouvements mv ON mv.tresorerie_station_id = p.tresorerie_station_id
+    ON CONFLICT (tresorerie_station_id, date_cloture) DO NOTHING
+"""
+
+
+def _bornes_mois(mois: date):
     """
-    Effectue la clôture mensuelle des soldes pour toutes les trésoreries stations
+    Retourne le premier jour, le dernier jour et le premier jour du mois suivant
     """
-    from sqlalchemy import text
-
-    # Définir la période de clôture
     date_debut = date(mois.year, mois.month, 1)
-    # Calculer la date de fin (dernier jour du mois)
     if mois.month == 12:
-        date_fin = date(mois.year + 1, 1, 1) - datetime.timedelta(days=1)
+        date_fin_exclue = date(mois.year + 1, 1, 1)
     else:
-        date_fin = date(mois.year, mois.month + 1, 1) - datetime.timedelta(days=1)
+        date_fin_exclue = date(mois.year, mois.month + 1, 1)
+    return date_debut, date_fin_exclue - timedelta(days=1), date_fin_exclue
 
-    # Boucler sur chaque trésorerie-station
-    tresorerie_stations = db.query(TresorerieStation).all()
-    
-    for tresorerie_station in tresorerie_stations:
-        # Calculer le solde pour cette trésorerie-station pour la période
-        # Dans la nouvelle architecture, le solde initial est géré via la table etat_initial_tresorerie
-        from ...models.tresorerie import EtatInitialTresorerie as EtatInitialTresorerieModel
-        etat_initial = db.query(EtatInitialTresorerieModel).filter(
-            EtatInitialTresorerieModel.tresorerie_station_id == tresorerie_station.id
-        ).order_by(EtatInitialTresorerieModel.date_enregistrement.desc()).first()
-
-        solde_initial = float(etat_initial.montant) if etat_initial else 0.0
-
-        result = db.execute(text("""
-            SELECT
-                :solde_initial +
-                COALESCE((SELECT SUM(montant) FROM mouvement_tresorerie
-                         WHERE tresorerie_station_id = :ts_id
-                         AND type_mouvement = 'entrée'
-                         AND date_mouvement >= :date_debut
-                         AND date_mouvement <= :date_fin
-                         AND statut = 'validé'), 0) -
-                COALESCE((SELECT SUM(montant) FROM mouvement_tresorerie
-                         WHERE tresorerie_station_id = :ts_id
-                         AND type_mouvement = 'sortie'
-                         AND date_mouvement >= :date_debut
-                         AND date_mouvement <= :date_fin
-                         AND statut = 'validé'), 0) AS solde_cloture
-        """), {
-            "solde_initial": solde_initial,
-            "ts_id": tresorerie_station.id,
-            "date_debut": date_debut,
-            "date_fin": date_fin
-        }).fetchone()
-
-        solde_cloture = float(result.solde_cloture) if result and result.solde_cloture is not None else solde_initial
-        
-        # Insérer la clôture dans la table appropriée
-        db.execute(text("""
-            INSERT INTO cloture_solde_tresorerie (
-                tresorerie_id,
-                tresorerie_station_id,
-                date_cloture,
-                periode_debut,
-                periode_fin,
-                solde_cloture
-            ) VALUES (
-                :tresorerie_id,
-                :tresorerie_station_id,
-                :date_cloture,
-                :periode_debut,
-                :periode_fin,
-                :solde_cloture
-            ) ON CONFLICT (tresorerie_station_id, date_cloture) DO NOTHING
-        """), {
-            "tresorerie_id": tresorerie_station.tresorerie_id,
-            "tresorerie_station_id": tresorerie_station.id,
-            "date_cloture": date_fin,
-            "periode_debut": date_debut,
-            "periode_fin": date_fin,
-            "solde_cloture": solde_cloture
-        })
 
+def _cloturer_tresoreries_stations(
+    db: Session,
+    mois: date,
+    compagnie_id: Optional[uuid.UUID] = None,
+    tresorerie_station_id: Optional[uuid.UUID] = None
+) -> int:
+    """
+    Exécute la clôture ensembliste des trésoreries stations du périmètre et retourne le nombre de clôtures créées
+    """
+    date_debut, date_fin, date_fin_exclue = _bornes_mois(mois)
+
+    result = db.execute(text(_REQUETE_CLOTURE_STATIONS), {
+        "compagnie_id": compagnie_id,
+        "tresorerie_station_id": tresorerie_station_id,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+        "date_fin_exclue": date_fin_exclue,
+        "date_cloture_precedente": date_debut - timedelta(days=1)
+    })
+    return result.rowcount or 0
+
+
+def cloturer_soldes_mensuels(db: Session, mois: date, compagnie_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Effectue la clôture mensuelle des soldes de toutes les trésoreries stations (ou de celles d'une compagnie)
+    en une seule requête, chaînée sur la clôture du mois précédent
+    """
+    nombre_clotures = _cloturer_tresoreries_stations(db, mois, compagnie_id=compagnie_id)
     db.commit()
+    return nombre_clotures
+
+
+def cloturer_soldes_mensuels_par_compagnie(
+    mois: date,
+    compagnie_ids: Optional[List[uuid.UUID]] = None,
+    nombre_workers: int = 4
+) -> dict:
+    """
+    Effectue la clôture mensuelle compagnie par compagnie, en parallèle.
+    Chaque compagnie est clôturée dans sa propre session et sa propre transaction :
+    les périmètres sont disjoints et une erreur sur une compagnie n'annule pas les autres.
+
+    :param mois: Mois à clôturer (n'importe quel jour du mois)
+    :param compagnie_ids: Compagnies à clôturer (toutes celles ayant des stations par défaut)
+    :param nombre_workers: Nombre de clôtures exécutées simultanément
+    :return: Dictionnaire compagnie_id -> nombre de clôtures créées (ou message d'erreur)
+    """
+    from ...database.db_config import SessionLocal
+
+    if compagnie_ids is None:
+        db = SessionLocal()
+        try:
+            compagnie_ids = [compagnie_id for (compagnie_id,) in db.query(Station.compagnie_id).distinct().all()]
+        finally:
+            db.close()
+
+    def cloturer_compagnie(compagnie_id):
+        db = SessionLocal()
+        try:
+            return cloturer_soldes_mensuels(db, mois, compagnie_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la clôture mensuelle de la compagnie {compagnie_id}: {e}")
+            return f"erreur: {e}"
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, nombre_workers)) as executor:
+        resultats = executor.map(cloturer_compagnie, compagnie_ids)
+        return dict(zip(compagnie_ids, resultats))
 
 
 def cloturer_solde_tresorerie_station(db: Session, tresorerie_station_id: uuid.UUID, mois: date):
     """
     Effectue la clôture du solde pour une trésorerie station spécifique
     """
-    from sqlalchemy import text
-
     # Vérifier que la trésorerie station existe
     tresorerie_station = db.query(TresorerieStation).filter(
         TresorerieStation.id == tresorerie_station_id
@@ -100,74 +174,8 @@ def cloturer_solde_tresorerie_station(db: Session, tresorerie_station_id: uuid.U
     
     if not tresorerie_station:
         raise ValueError(f"Trésorerie station {tresorerie_station_id} non trouvée")
-    
-    # Définir la période de clôture
-    date_debut = date(mois.year, mois.month, 1)
-    # Calculer la date de fin (dernier jour du mois)
-    if mois.month == 12:
-        date_fin = date(mois.year + 1, 1, 1) - datetime.timedelta(days=1)
-    else:
-        date_fin = date(mois.year, mois.month + 1, 1) - datetime.timedelta(days=1)
-
-    # Calculer le solde pour cette trésorerie-station pour la période
-    # Dans la nouvelle architecture, le solde initial est géré via la table etat_initial_tresorerie
-    from ...models.tresorerie import EtatInitialTresorerie as EtatInitialTresorerieModel
-    etat_initial = db.query(EtatInitialTresorerieModel).filter(
-        EtatInitialTresorerieModel.tresorerie_station_id == tresorerie_station_id
-    ).order_by(EtatInitialTresorerieModel.date_enregistrement.desc()).first()
-
-    solde_initial = float(etat_initial.montant) if etat_initial else 0.0
-
-    result = db.execute(text("""
-        SELECT
-            :solde_initial +
-            COALESCE((SELECT SUM(montant) FROM mouvement_tresorerie
-                     WHERE tresorerie_station_id = :ts_id
-                     AND type_mouvement = 'entrée'
-                     AND date_mouvement >= :date_debut
-                     AND date_mouvement <= :date_fin
-                     AND statut = 'validé'), 0) -
-            COALESCE((SELECT SUM(montant) FROM mouvement_tresorerie
-                     WHERE tresorerie_station_id = :ts_id
-                     AND type_mouvement = 'sortie'
-                     AND date_mouvement >= :date_debut
-                     AND date_mouvement <= :date_fin
-                     AND statut = 'validé'), 0) AS solde_cloture
-    """), {
-        "solde_initial": solde_initial,
-        "ts_id": tresorerie_station_id,
-        "date_debut": date_debut,
-        "date_fin": date_fin
-    }).fetchone()
-
-    solde_cloture = float(result.solde_cloture) if result and result.solde_cloture is not None else solde_initial
-    
-    # Insérer la clôture dans la table appropriée
-    db.execute(text("""
-        INSERT INTO cloture_solde_tresorerie (
-            tresorerie_id,
-            tresorerie_station_id,
-            date_cloture,
-            periode_debut,
-            periode_fin,
-            solde_cloture
-        ) VALUES (
-            :tresorerie_id,
-            :tresorerie_station_id,
-            :date_cloture,
-            :periode_debut,
-            :periode_fin,
-            :solde_cloture
-        ) ON CONFLICT (tresorerie_station_id, date_cloture) DO NOTHING
-    """), {
-        "tresorerie_id": tresorerie_station.tresorerie_id,
-        "tresorerie_station_id": tresorerie_station_id,
-        "date_cloture": date_fin,
-        "periode_debut": date_debut,
-        "periode_fin": date_fin,
-        "solde_cloture": solde_cloture
-    })
 
+    _cloturer_tresoreries_stations(db, mois, tresorerie_station_id=tresorerie_station_id)
     db.commit()
 
 
@@ -186,12 +194,7 @@ def cloturer_solde_global_tresorerie(db: Session, tresorerie_id: uuid.UUID, mois
         raise ValueError(f"Trésorerie {tresorerie_id} non trouvée")
     
     # Définir la période de clôture
-    date_debut = date(mois.year, mois.month, 1)
-    # Calculer la date de fin (dernier jour du mois)
-    if mois.month == 12:
-        date_fin = date(mois.year + 1, 1, 1) - datetime.timedelta(days=1)
-    else:
-        date_fin = date(mois.year, mois.month + 1, 1) - datetime.timedelta(days=1)
+    date_debut, date_fin, date_fin_exclue = _bornes_mois(mois)
 
     # Calculer le solde global pour cette trésorerie pour la période
     # En additionnant les soldes de toutes les trésoreries stations associées
@@ -203,20 +206,20 @@ def cloturer_solde_global_tresorerie(db: Session, tresorerie_id: uuid.UUID, mois
                      WHERE ts.tresorerie_id = :t_id 
                      AND mt.type_mouvement = 'entrée' 
                      AND mt.date_mouvement >= :date_debut 
-                     AND mt.date_mouvement <= :date_fin 
+                     AND mt.date_mouvement < :date_fin_exclue
                      AND mt.statut = 'validé'), 0) -
             COALESCE((SELECT SUM(montant) FROM mouvement_tresorerie mt
                      JOIN tresorerie_station ts ON mt.tresorerie_station_id = ts.id
                      WHERE ts.tresorerie_id = :t_id 
                      AND mt.type_mouvement = 'sortie' 
                      AND mt.date_mouvement >= :date_debut 
-                     AND mt.date_mouvement <= :date_fin 
+                     AND mt.date_mouvement < :date_fin_exclue
                      AND mt.statut = 'validé'), 0) AS solde_cloture
     """), {
         "solde_initial": float(tresorerie.solde_initial or 0),
         "t_id": tresorerie_id,
         "date_debut": date_debut,
-        "date_fin": date_fin
+        "date_fin_exclue": date_fin_exclue
     }).fetchone()
     
     solde_cloture = float(result.solde_cloture) if result and result.solde_cloture is not None else float(tresorerie.solde_initial or 0)
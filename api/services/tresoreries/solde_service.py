@@ -0,0 +1,192 @@
+"""Service de lecture et de reconstruction du solde courant des trésoreries (table solde_tresorerie)"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Iterable, Optional
+import uuid
+
+from ...models.tresorerie import SoldeTresorerie
+from ...exceptions import InsufficientFundsException
+
+
+# Types de trésorerie portés par la table solde_tresorerie (un par lien possible d'un mouvement)
+TYPE_TRESORERIE_STATION = "tresorerie_station"
+TYPE_TRESORERIE_GLOBALE = "tresorerie_globale"
+TYPE_STATION = "station"
+
+
+# Requêtes de reconstruction : un agrégat groupé par type de trésorerie, appliqué par UPSERT.
+# Elles reprennent la règle de calcul des triggers (état initial le plus récent + entrées - sorties validées).
+_REQUETES_RECONSTRUCTION = (
+    """
+    INSERT INTO solde_tresorerie (
+        id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde,
+        date_dernier_mouvement, created_at, updated_at, est_actif
+    )
+    SELECT
+        md5('tresorerie_station:' || ts.id::text)::uuid, 'tresorerie_station', ts.id,
+        COALESCE(ei.montant, 0), COALESCE(m.total, 0), COALESCE(ei.montant, 0) + COALESCE(m.total, 0),
+        m.dernier_mouvement, now(), now(), true
+    FROM tresorerie_station ts
+    JOIN station s ON s.id = ts.station_id
+    LEFT JOIN LATERAL (
+        SELECT e.montant FROM etat_initial_tresorerie e
+        WHERE e.tresorerie_station_id = ts.id
+        ORDER BY e.date_enregistrement DESC
+        LIMIT 1
+    ) ei ON TRUE
+    LEFT JOIN (
+        SELECT tresorerie_station_id AS reference_id,
+               SUM(CASE type_mouvement WHEN 'entrée' THEN montant WHEN 'sortie' THEN -montant ELSE 0 END) AS total,
+               MAX(date_mouvement) AS dernier_mouvement
+        FROM mouvement_tresorerie
+        WHERE statut = 'validé' AND tresorerie_station_id IS NOT NULL
+        GROUP BY tresorerie_station_id
+    ) m ON m.reference_id = ts.id
+    WHERE (CAST(:compagnie_id AS uuid) IS NULL OR s.compagnie_id = CAST(:compagnie_id AS uuid))
+    ON CONFLICT (type_tresorerie, reference_id) DO UPDATE SET
+        solde_initial = EXCLUDED.solde_initial,
+        total_mouvements = EXCLUDED.total_mouvements,
+        solde = EXCLUDED.solde,
+        date_dernier_mouvement = EXCLUDED.date_dernier_mouvement,
+        updated_at = now()
+    """,
+    """
+    INSERT INTO solde_tresorerie (
+        id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde,
+        date_dernier_mouvement, created_at, updated_at, est_actif
+    )
+    SELECT
+        md5('tresorerie_globale:' || t.id::text)::uuid, 'tresorerie_globale', t.id,
+        COALESCE(t.solde_initial, 0), COALESCE(m.total, 0), COALESCE(t.solde_initial, 0) + COALESCE(m.total, 0),
+        m.dernier_mouvement, now(), now(), true
+    FROM tresorerie t
+    LEFT JOIN (
+        SELECT tresorerie_globale_id AS reference_id,
+               SUM(CASE type_mouvement WHEN 'entrée' THEN montant WHEN 'sortie' THEN -montant ELSE 0 END) AS total,
+               MAX(date_mouvement) AS dernier_mouvement
+        FROM mouvement_tresorerie
+        WHERE statut = 'validé' AND tresorerie_globale_id IS NOT NULL
+        GROUP BY tresorerie_globale_id
+    ) m ON m.reference_id = t.id
+    WHERE (CAST(:compagnie_id AS uuid) IS NULL OR t.compagnie_id = CAST(:compagnie_id AS uuid))
+    ON CONFLICT (type_tresorerie, reference_id) DO UPDATE SET
+        solde_initial = EXCLUDED.solde_initial,
+        total_mouvements = EXCLUDED.total_mouvements,
+        solde = EXCLUDED.solde,
+        date_dernier_mouvement = EXCLUDED.date_dernier_mouvement,
+        updated_at = now()
+    """,
+    """
+    INSERT INTO solde_tresorerie (
+        id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde,
+        date_dernier_mouvement, created_at, updated_at, est_actif
+    )
+    SELECT
+        md5('station:' || m.reference_id::text)::uuid, 'station', m.reference_id,
+        0, m.total, m.total, m.dernier_mouvement, now(), now(), true
+    FROM (
+        SELECT station_id AS reference_id,
+               COALESCE(SUM(CASE type_mouvement WHEN 'entrée' THEN montant WHEN 'sortie' THEN -montant ELSE 0 END)
+                        FILTER (WHERE statut = 'validé'), 0) AS total,
+               MAX(date_mouvement) FILTER (WHERE statut = 'validé') AS dernier_mouvement
+        FROM mouvement_tresorerie
+        WHERE station_id IS NOT NULL
+        GROUP BY station_id
+    ) m
+    JOIN station s ON s.id = m.reference_id
+    WHERE (CAST(:compagnie_id AS uuid) IS NULL OR s.compagnie_id = CAST(:compagnie_id AS uuid))
+    ON CONFLICT (type_tresorerie, reference_id) DO UPDATE SET
+        solde_initial = EXCLUDED.solde_initial,
+        total_mouvements = EXCLUDED.total_mouvements,
+        solde = EXCLUDED.solde,
+        date_dernier_mouvement = EXCLUDED.date_dernier_mouvement,
+        updated_at = now()
+    """,
+)
+
+
+def get_solde(db: Session, type_tresorerie: str, reference_id: uuid.UUID, verrouiller: bool = False) -> float:
+    """
+    Retourne le solde courant d'une trésorerie en lisant une seule ligne de solde_tresorerie.
+
+    :param db: Session SQLAlchemy
+    :param type_tresorerie: tresorerie_station, tresorerie_globale ou station
+    :param reference_id: ID de la trésorerie (ou de la station)
+    :param verrouiller: Verrouiller la ligne jusqu'à la fin de la transaction, pour qu'un contrôle de solde
+                        et le mouvement qui le suit ne puissent pas être entrelacés avec une autre sortie
+    :return: Solde courant (0 si la trésorerie n'a encore ni état initial ni mouvement)
+    """
+    if verrouiller:
+        # Créer la ligne si elle n'existe pas encore pour que le verrou porte sur quelque chose
+        db.execute(text("""
+            INSERT INTO solde_tresorerie (
+                id, type_tresorerie, reference_id, solde_initial, total_mouvements, solde,
+                created_at, updated_at, est_actif
+            ) VALUES (
+                md5(:type_tresorerie || ':' || CAST(:reference_id AS text))::uuid, :type_tresorerie,
+                :reference_id, 0, 0, 0, now(), now(), true
+            ) ON CONFLICT (type_tresorerie, reference_id) DO NOTHING
+        """), {"type_tresorerie": type_tresorerie, "reference_id": reference_id})
+
+    query = db.query(SoldeTresorerie.solde).filter(
+        SoldeTresorerie.type_tresorerie == type_tresorerie,
+        SoldeTresorerie.reference_id == reference_id
+    )
+    if verrouiller:
+        query = query.with_for_update()
+
+    result = query.first()
+    return float(result.solde) if result and result.solde is not None else 0.0
+
+
+def get_soldes(db: Session, type_tresorerie: str, reference_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, float]:
+    """
+    Retourne en une requête les soldes courants d'un ensemble de trésoreries d'un même type
+
+    :return: Dictionnaire reference_id -> solde (les trésoreries sans ligne de solde sont absentes)
+    """
+    reference_ids = list(set(reference_ids))
+    if not reference_ids:
+        return {}
+
+    results = db.query(SoldeTresorerie.reference_id, SoldeTresorerie.solde).filter(
+        SoldeTresorerie.type_tresorerie == type_tresorerie,
+        SoldeTresorerie.reference_id.in_(reference_ids)
+    ).all()
+    return {reference_id: float(solde or 0) for reference_id, solde in results}
+
+
+def verifier_solde_disponible(db: Session, type_tresorerie: str, reference_id: uuid.UUID, montant: float) -> float:
+    """
+    Vérifie qu'une trésorerie peut couvrir une sortie. La ligne de solde reste verrouillée jusqu'au commit
+    du mouvement, ce qui sérialise les sorties concurrentes sur une même trésorerie.
+
+    :raises InsufficientFundsException: si le solde est inférieur au montant
+    :return: Solde courant
+    """
+    solde_actuel = get_solde(db, type_tresorerie, reference_id, verrouiller=True)
+    if solde_actuel < float(montant):
+        raise InsufficientFundsException(
+            f"Solde insuffisant. Solde actuel: {solde_actuel}, Montant requis: {montant}"
+        )
+    return solde_actuel
+
+
+def reconstruire_soldes_tresorerie(db: Session, compagnie_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Recalcule les soldes à partir des états initiaux et de l'historique des mouvements.
+    Les triggers maintiennent les soldes au fil de l'eau : cette reconstruction sert d'audit et de
+    réparation (import de données en masse, triggers désactivés, ...).
+
+    :param db: Session SQLAlchemy
+    :param compagnie_id: Limiter la reconstruction aux trésoreries d'une compagnie
+    :return: Nombre de soldes recalculés
+    """
+    nombre_soldes = 0
+    for requete in _REQUETES_RECONSTRUCTION:
+        result = db.execute(text(requete), {"compagnie_id": compagnie_id})
+        nombre_soldes += result.rowcount or 0
+
+    db.commit()
+    return nombre_soldes
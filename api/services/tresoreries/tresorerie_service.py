@@ -14,6 +14,13 @@ from ...models.tresorerie import (
 )
 from ...models import Station
 from ...tresoreries import schemas
+from .solde_service import (
+    TYPE_TRESORERIE_STATION,
+    TYPE_TRESORERIE_GLOBALE,
+    get_solde,
+    get_soldes,
+    reconstruire_soldes_tresorerie
+)
 import uuid
 from datetime import datetime, date
 
@@ -48,21 +55,15 @@ def mettre_a_jour_solde_tresorerie(db: Session, tresorerie_station_id: uuid.UUID
     if not tresorerie_station:
         raise HTTPException(status_code=404, detail="Trésorerie station non trouvée")
 
-    # Pour le moment, retourner 0 car les vues matérialisées n'existent pas encore dans la base de données
-    # et le champ solde_actuel a été supprimé de la table tresorerie_station
-    solde_actuel = 0.0
-
-    # Mettre à jour le solde actuel dans la base
-    # NOTE: Le champ solde_actuel a été supprimé de la table tresorerie_station
-    # Donc on ne met plus à jour ce champ, mais on retourne le solde calculé
-    return solde_actuel
+    # Le solde est tenu à jour par les triggers de la table solde_tresorerie : lecture d'une seule ligne
+    return get_solde(db, TYPE_TRESORERIE_STATION, tresorerie_station_id)
 
 
-def refresh_vue_solde_tresorerie(db: Session):
-    """Fonction pour rafraîchir les vues matérialisées des soldes de trésorerie"""
-    # Pour le moment, cette fonction ne fait rien car les vues matérialisées
-    # n'existent pas encore dans la base de données
-    pass
+def refresh_vue_solde_tresorerie(db: Session, compagnie_id: uuid.UUID = None):
+    """Recalcule les soldes de trésorerie à partir des états initiaux et de l'historique des mouvements"""
+    # Les soldes sont maintenus au fil de l'eau par les triggers ; ce recalcul sert d'audit et de réparation
+    nombre_soldes = reconstruire_soldes_tresorerie(db, compagnie_id)
+    return {"message": "Soldes de trésorerie recalculés avec succès", "nombre_soldes": nombre_soldes}
 
 
 def get_tresoreries_sans_methode_paiement(db: Session, current_user):
@@ -177,6 +178,10 @@ def get_tresoreries_station(db: Session, current_user, skip: int = 0, limit: int
 
     results = query.offset(skip).limit(limit).all()
 
+    # Soldes courants de toutes les trésoreries de la page, en une requête par type
+    soldes_stations = get_soldes(db, TYPE_TRESORERIE_STATION, [row[0].id for row in results])
+    soldes_globaux = get_soldes(db, TYPE_TRESORERIE_GLOBALE, [row[1].id for row in results])
+
     # Préparer les résultats combinés et nettoyés
     processed_results = []
     for tresorerie_station, tresorerie, station in results:
@@ -189,13 +194,8 @@ def get_tresoreries_station(db: Session, current_user, skip: int = 0, limit: int
                 # Si ce n'est pas un JSON valide, laisser comme chaîne
                 pass
 
-        # Pour le moment, utiliser directement le solde initial de la trésorerie
-        # car les vues matérialisées n'existent pas encore dans la base de données
-        solde_tresorerie_globale = float(tresorerie.solde_initial or 0)
-
-        # Pour le moment, le solde de la trésorerie station est défini à 0
-        # car les vues matérialisées n'existent pas encore dans la base de données
-        solde_tresorerie_station = 0.0
+        solde_tresorerie_globale = soldes_globaux.get(tresorerie.id, float(tresorerie.solde_initial or 0))
+        solde_tresorerie_station = soldes_stations.get(tresorerie_station.id, 0.0)
 
         # Créer un dictionnaire combiné selon le schéma StationTresorerieResponse
         combined_result = {
@@ -616,11 +616,7 @@ def get_solde_tresorerie_globale(db: Session, current_user, tresorerie_id: uuid.
     if not tresorerie:
         raise HTTPException(status_code=404, detail="Tresorerie globale non trouvée")
 
-    # Pour le moment, utiliser directement le solde initial de la trésorerie
-    # car les vues matérialisées n'existent pas encore dans la base de données
-    solde_actuel = float(tresorerie.solde_initial or 0.0)
-
-    return solde_actuel
+    return get_solde(db, TYPE_TRESORERIE_GLOBALE, tresorerie_id)
 
 
 def cloture_soldes_mensuels(db: Session, mois: date):
@@ -682,6 +678,10 @@ def get_tresoreries_station_by_station(db: Session, current_user, station_id: uu
         TresorerieStationModel.station_id == station_id
     ).all()
 
+    # Soldes courants de toutes les trésoreries de la station, en une requête par type
+    soldes_stations = get_soldes(db, TYPE_TRESORERIE_STATION, [row[0].id for row in results])
+    soldes_globaux = get_soldes(db, TYPE_TRESORERIE_GLOBALE, [row[1].id for row in results])
+
     # Préparer les résultats combinés et nettoyés
     processed_results = []
     for tresorerie_station, tresorerie in results:
@@ -694,13 +694,8 @@ def get_tresoreries_station_by_station(db: Session, current_user, station_id: uu
                 # Si ce n'est pas un JSON valide, laisser comme chaîne
                 pass
 
-        # Pour le moment, utiliser directement le solde initial de la trésorerie
-        # car les vues matérialisées n'existent pas encore dans la base de données
-        solde_tresorerie_globale = float(tresorerie.solde_initial or 0)
-
-        # Pour le moment, le solde de la trésorerie station est défini à 0
-        # car les vues matérialisées n'existent pas encore dans la base de données
-        solde_tresorerie_station = 0.0
+        solde_tresorerie_globale = soldes_globaux.get(tresorerie.id, float(tresorerie.solde_initial or 0))
+        solde_tresorerie_station = soldes_stations.get(tresorerie_station.id, 0.0)
 
         # Créer un dictionnaire combiné selon le schéma StationTresorerieResponse
         combined_result = {
@@ -957,7 +952,7 @@ def create_tresorerie_station(db: Session, current_user, tresorerie_station: sch
 
 
 def create_etat_initial_tresorerie(db: Session, current_user, etat_initial: schemas.EtatInitialTresorerieCreate):
-    """Crée un état initial de trésorerie avec rafraîchissement de la vue matérialisée"""
+    """Crée un état initial de trésorerie"""
     from sqlalchemy import text
 
     # Vérifier que la trésorerie station appartient à l'utilisateur
@@ -985,8 +980,7 @@ def create_etat_initial_tresorerie(db: Session, current_user, etat_initial: sche
     db.commit()
     db.refresh(db_etat_initial)
 
-    # Rafraîchir la vue matérialisée pour les soldes
-    refresh_vue_solde_tresorerie(db)
+    # Le solde de la trésorerie station est mis à jour par le trigger sur etat_initial_tresorerie
 
     # Nettoyer les données de sortie avant de les retourner
     result = clean_special_characters(db_etat_initial.__dict__)
@@ -1153,48 +1147,26 @@ def create_transfert_tresorerie(db: Session, current_user, transfert: schemas.Tr
 
     logging.info("Vérification de la disponibilité des fonds dans la trésorerie source...")
     # Vérifier qu'il y a suffisamment de fonds dans la trésorerie source
-    # Pour les trésoreries station, on calcule le solde à partir des mouvements
-    if tresorerie_source_station:
-        logging.info("Calcul du solde pour la trésorerie station source...")
-        # Pour les trésoreries station, on calcule le solde à partir des mouvements
-        from sqlalchemy import func, case
-        result = db.query(
-            func.coalesce(func.sum(
-                case(
-                    (MouvementTresorerieModel.type_mouvement == 'entrée', MouvementTresorerieModel.montant),
-                    (MouvementTresorerieModel.type_mouvement == 'sortie', -MouvementTresorerieModel.montant),
-                    else_=0
-                )
-            ), 0).label('solde')
-        ).filter(
-            MouvementTresorerieModel.tresorerie_station_id == transfert.tresorerie_source_id,
-            MouvementTresorerieModel.statut == 'validé'
-        ).first()
-
-        solde_actuel = float(result.solde) if result else 0.0
-        logging.info(f"Solde calculé de la trésorerie station source: {solde_actuel}")
-    else:
-        logging.info("Calcul du solde pour la trésorerie globale source...")
-        # Pour les trésoreries globales, on calcule le solde à partir des mouvements
-        from sqlalchemy import func, case
-        result = db.query(
-            func.coalesce(func.sum(
-                case(
-                    (MouvementTresorerieModel.type_mouvement == 'entrée', MouvementTresorerieModel.montant),
-                    (MouvementTresorerieModel.type_mouvement == 'sortie', -MouvementTresorerieModel.montant),
-                    else_=0
-                )
-            ), 0).label('solde')
-        ).filter(
-            MouvementTresorerieModel.tresorerie_globale_id == transfert.tresorerie_source_id,
-            MouvementTresorerieModel.statut == 'validé'
-        ).first()
-
-        solde_actuel = float(result.solde) if result else 0.0
-        logging.info(f"Solde calculé de la trésorerie globale source: {solde_actuel}")
+    # Le solde est lu dans solde_tresorerie et sa ligne reste verrouillée jusqu'au commit du transfert,
+    # ce qui empêche deux transferts concurrents de dépasser le solde disponible
+    type_source = TYPE_TRESORERIE_STATION if tresorerie_source_station else TYPE_TRESORERIE_GLOBALE
+    type_destination = TYPE_TRESORERIE_STATION if tresorerie_destination_station else TYPE_TRESORERIE_GLOBALE
+
+    # Les lignes de la source et de la destination sont verrouillées avant les mouvements, toujours dans
+    # l'ordre (type, id) : sinon la destination est verrouillée plus tard par le trigger du mouvement d'entrée,
+    # et deux transferts A -> B et B -> A simultanés s'attendent l'un l'autre (deadlock)
+    soldes = {}
+    for type_tresorerie, reference_id in sorted(
+        {(type_source, transfert.tresorerie_source_id), (type_destination, transfert.tresorerie_destination_id)},
+        key=lambda cle: (cle[0], str(cle[1]))
+    ):
+        soldes[(type_tresorerie, reference_id)] = get_solde(db, type_tresorerie, reference_id, verrouiller=True)
+    solde_actuel = soldes[(type_source, transfert.tresorerie_source_id)]
+    logging.info(f"Solde de la trésorerie source: {solde_actuel}")
 
     if solde_actuel < transfert.montant:
         logging.error(f"Solde insuffisant: disponible={solde_actuel}, demandé={transfert.montant}")
+        db.rollback()
         raise HTTPException(status_code=400, detail="Insufficient balance in source trésorerie")
 
     logging.info("Création de l'enregistrement de transfert...")
@@ -1207,8 +1179,8 @@ def create_transfert_tresorerie(db: Session, current_user, transfert: schemas.Tr
     # Créer le transfert
     db_transfert = TransfertTresorerieModel(**cleaned_data)
     db.add(db_transfert)
-    db.commit()
-    db.refresh(db_transfert)
+    # Pas de commit ici : le transfert est validé avec le mouvement de sortie, sans relâcher le verrou du solde source
+    db.flush()
     logging.info(f"Transfert créé avec succès, ID: {db_transfert.id}")
 
     # Créer les mouvements correspondants en utilisant le manager centralisé
@@ -1264,72 +1236,10 @@ def create_transfert_tresorerie(db: Session, current_user, transfert: schemas.Tr
     logging.info(f"Mouvement d'entrée créé: ID {mouvement_entree.id if mouvement_entree else 'None'}")
 
     logging.info("Vérification des soldes après création des mouvements...")
-    # Récupérer et afficher les soldes après les mouvements
-    if tresorerie_source_station:
-        # Pour les trésoreries station, on calcule le solde à partir des mouvements
-        from sqlalchemy import func, case
-        result = db.query(
-            func.coalesce(func.sum(
-                case(
-                    (MouvementTresorerieModel.type_mouvement == 'entrée', MouvementTresorerieModel.montant),
-                    (MouvementTresorerieModel.type_mouvement == 'sortie', -MouvementTresorerieModel.montant),
-                    else_=0
-                )
-            ), 0).label('solde')
-        ).filter(
-            MouvementTresorerieModel.tresorerie_station_id == transfert.tresorerie_source_id,
-            MouvementTresorerieModel.statut == 'validé'
-        ).first()
-        nouveau_solde_source = float(result.solde) if result else 0.0
-        logging.info(f"Nouveau solde de la trésorerie source station: {nouveau_solde_source}")
-    else:
-        result = db.query(
-            func.coalesce(func.sum(
-                case(
-                    (MouvementTresorerieModel.type_mouvement == 'entrée', MouvementTresorerieModel.montant),
-                    (MouvementTresorerieModel.type_mouvement == 'sortie', -MouvementTresorerieModel.montant),
-                    else_=0
-                )
-            ), 0).label('solde')
-        ).filter(
-            MouvementTresorerieModel.tresorerie_globale_id == transfert.tresorerie_source_id,
-            MouvementTresorerieModel.statut == 'validé'
-        ).first()
-        nouveau_solde_source = float(result.solde) if result else 0.0
-        logging.info(f"Nouveau solde de la trésorerie source globale: {nouveau_solde_source}")
-
-    if tresorerie_destination_station:
-        # Pour les trésoreries station, on calcule le solde à partir des mouvements
-        from sqlalchemy import func, case
-        result = db.query(
-            func.coalesce(func.sum(
-                case(
-                    (MouvementTresorerieModel.type_mouvement == 'entrée', MouvementTresorerieModel.montant),
-                    (MouvementTresorerieModel.type_mouvement == 'sortie', -MouvementTresorerieModel.montant),
-                    else_=0
-                )
-            ), 0).label('solde')
-        ).filter(
-            MouvementTresorerieModel.tresorerie_station_id == transfert.tresorerie_destination_id,
-            MouvementTresorerieModel.statut == 'validé'
-        ).first()
-        nouveau_solde_destination = float(result.solde) if result else 0.0
-        logging.info(f"Nouveau solde de la trésorerie destination station: {nouveau_solde_destination}")
-    else:
-        result = db.query(
-            func.coalesce(func.sum(
-                case(
-                    (MouvementTresorerieModel.type_mouvement == 'entrée', MouvementTresorerieModel.montant),
-                    (MouvementTresorerieModel.type_mouvement == 'sortie', -MouvementTresorerieModel.montant),
-                    else_=0
-                )
-            ), 0).label('solde')
-        ).filter(
-            MouvementTresorerieModel.tresorerie_globale_id == transfert.tresorerie_destination_id,
-            MouvementTresorerieModel.statut == 'validé'
-        ).first()
-        nouveau_solde_destination = float(result.solde) if result else 0.0
-        logging.info(f"Nouveau solde de la trésorerie destination globale: {nouveau_solde_destination}")
+    nouveau_solde_source = get_solde(db, type_source, transfert.tresorerie_source_id)
+    logging.info(f"Nouveau solde de la trésorerie source: {nouveau_solde_source}")
+    nouveau_solde_destination = get_solde(db, type_destination, transfert.tresorerie_destination_id)
+    logging.info(f"Nouveau solde de la trésorerie destination: {nouveau_solde_destination}")
 
     # Dans la nouvelle architecture, les soldes sont gérés automatiquement par les triggers
     # On n'a plus besoin de rafraîchir les vues matérialisées ici
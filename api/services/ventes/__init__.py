@@ -7,12 +7,17 @@ from .vente_service import (
     get_vente_details,
     get_ventes_carburant,
     create_vente_carburant,
+    cloturer_poste_carburant,
     get_vente_carburant_by_id,
     update_vente_carburant,
     delete_vente_carburant,
     get_creances_employes,
     get_creance_employe_by_id
 )
+from .statistique_vente_service import (
+    get_statistiques_ventes,
+    reconstruire_cumuls_ventes
+)
 
 __all__ = [
     "get_ventes",
@@ -23,9 +28,12 @@ __all__ = [
     "get_vente_details",
     "get_ventes_carburant",
     "create_vente_carburant",
+    "cloturer_poste_carburant",
     "get_vente_carburant_by_id",
     "update_vente_carburant",
     "delete_vente_carburant",
     "get_creances_employes",
-    "get_creance_employe_by_id"
+    "get_creance_employe_by_id",
+    "get_statistiques_ventes",
+    "reconstruire_cumuls_ventes"
 ]
\ No newline at end of file
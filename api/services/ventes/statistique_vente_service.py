@@ -0,0 +1,138 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, text
+from typing import Optional
+from fastapi import HTTPException
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+from ...models import Station
+from ...models.cumul_vente import CumulVenteCarburantJour, CumulVenteBoutiqueJour
+from ...ventes import schemas
+
+
+def _verifier_station(db: Session, current_user, station_id: UUID):
+    station = db.query(Station.id).filter(
+        Station.id == station_id,
+        Station.compagnie_id == current_user.compagnie_id
+    ).first()
+    if not station:
+        raise HTTPException(status_code=404, detail="Station non trouvée ou n'appartenant pas à votre compagnie")
+
+
+def _lire_cumuls(db: Session, current_user, modele, colonne_article, colonne_quantite, date_debut, date_fin, station_id, par_jour):
+    colonnes = [modele.station_id, colonne_article]
+    if par_jour:
+        colonnes.append(modele.jour)
+
+    query = db.query(
+        *colonnes,
+        func.sum(colonne_quantite).label("quantite"),
+        func.sum(modele.chiffre_affaires).label("chiffre_affaires"),
+        func.sum(modele.cout_cmp).label("cout_cmp"),
+        func.sum(modele.nombre_transactions).label("nombre_transactions")
+    ).join(
+        Station,
+        modele.station_id == Station.id
+    ).filter(
+        Station.compagnie_id == current_user.compagnie_id,
+        modele.jour >= date_debut,
+        modele.jour <= date_fin
+    )
+    if station_id:
+        query = query.filter(modele.station_id == station_id)
+
+    # Les cumuls ramenés à zéro par des annulations ne sont pas des ventes
+    return query.group_by(*colonnes).having(func.sum(modele.nombre_transactions) != 0).order_by(*colonnes).all()
+
+
+def get_statistiques_ventes(
+    db: Session,
+    current_user,
+    date_debut: date,
+    date_fin: date,
+    station_id: Optional[UUID] = None,
+    type_vente: Optional[str] = None,
+    par_jour: bool = True
+):
+    """
+    Statistiques des ventes de carburant et boutique sur une période, lues dans les cumuls journaliers
+    (une ligne par station, article et jour) plutôt que dans les ventes elles-mêmes.
+
+    :param type_vente: "carburant", "boutique" ou None pour les deux
+    :param par_jour: Détailler par jour ; sinon une ligne par station et article sur toute la période
+    """
+    if date_fin < date_debut:
+        raise HTTPException(status_code=400, detail="La date de fin doit être postérieure à la date de début")
+    if station_id:
+        _verifier_station(db, current_user, station_id)
+
+    sources = []
+    if type_vente in (None, "carburant"):
+        sources.append(("carburant", CumulVenteCarburantJour, CumulVenteCarburantJour.carburant_id, CumulVenteCarburantJour.volume))
+    if type_vente in (None, "boutique"):
+        sources.append(("boutique", CumulVenteBoutiqueJour, CumulVenteBoutiqueJour.produit_id, CumulVenteBoutiqueJour.quantite))
+
+    lignes = []
+    for type_source, modele, colonne_article, colonne_quantite in sources:
+        for row in _lire_cumuls(db, current_user, modele, colonne_article, colonne_quantite, date_debut, date_fin, station_id, par_jour):
+            chiffre_affaires = row.chiffre_affaires or Decimal("0")
+            cout_cmp = row.cout_cmp or Decimal("0")
+            lignes.append(schemas.StatistiqueVenteLigne(
+                type_vente=type_source,
+                station_id=row.station_id,
+                article_id=row[1],
+                jour=row.jour if par_jour else None,
+                quantite=float(row.quantite or 0),
+                chiffre_affaires=float(chiffre_affaires),
+                cout_cmp=float(round(cout_cmp, 2)),
+                marge=float(round(chiffre_affaires - cout_cmp, 2)),
+                nombre_transactions=int(row.nombre_transactions or 0)
+            ))
+
+    chiffre_affaires_total = sum(ligne.chiffre_affaires for ligne in lignes)
+    cout_total = sum(ligne.cout_cmp for ligne in lignes)
+    return schemas.StatistiquesVentesResponse(
+        date_debut=date_debut,
+        date_fin=date_fin,
+        chiffre_affaires=round(chiffre_affaires_total, 2),
+        cout_cmp=round(cout_total, 2),
+        marge=round(chiffre_affaires_total - cout_total, 2),
+        nombre_transactions=sum(ligne.nombre_transactions for ligne in lignes),
+        lignes=lignes
+    )
+
+
+def reconstruire_cumuls_ventes(
+    db: Session,
+    current_user,
+    station_id: Optional[UUID] = None,
+    date_debut: Optional[date] = None,
+    date_fin: Optional[date] = None
+) -> int:
+    """
+    Reconstruit les cumuls journaliers à partir des ventes (réparation après une correction hors application).
+    Sans station, toutes les stations de la compagnie sont reconstruites.
+
+    :return: Nombre de cumuls reconstruits
+    """
+    if station_id:
+        _verifier_station(db, current_user, station_id)
+        station_ids = [station_id]
+    else:
+        station_ids = [row.id for row in db.query(Station.id).filter(
+            Station.compagnie_id == current_user.compagnie_id
+        ).all()]
+
+    try:
+        nombre = 0
+        for id_station in station_ids:
+            nombre += db.execute(
+                text("SELECT reconstruire_cumuls_ventes(CAST(:station_id AS uuid), :date_debut, :date_fin)"),
+                {"station_id": str(id_station), "date_debut": date_debut, "date_fin": date_fin}
+            ).scalar() or 0
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return nombre
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from fastapi import HTTPException
 from datetime import datetime, timezone
 from uuid import UUID
@@ -9,10 +9,14 @@ from ...models.tresorerie import TresorerieStation as TresorerieStationModel, Mo
 from ...models.compagnie import MouvementStockCuve
 from ...models.mouvement_financier import Avoir as AvoirModel
 from ...ventes import schemas
-from ...utils.pagination import PaginatedResponse
+from ...utils.pagination import PaginatedResponse, paginer_requete
 from ..tresorerie.mouvement_manager import MouvementTresorerieManager
-from ..mouvement_stock_service import enregistrer_mouvement_stock
+from ..mouvement_stock_service import enregistrer_mouvements_stock
 from ...services.comptabilite import ComptabiliteManager, TypeOperationComptable
+from ...exceptions import InvalidTransactionException
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def get_ventes(db: Session, current_user, skip: int = 0, limit: int = 100):
@@ -43,30 +47,45 @@ def get_ventes(db: Session, current_user, skip: int = 0, limit: int = 100):
 
 
 def create_vente(db: Session, current_user, vente: schemas.VenteCreate):
-    """Crée une nouvelle vente avec ses détails"""
+    """
+    Crée une nouvelle vente avec ses détails. La vente, ses détails, les mouvements de stock et les coûts
+    moyens des produits sont enregistrés dans une seule transaction : une erreur annule la vente entière.
+    """
     from ...models.tresorerie import Tresorerie as TresorerieModel
 
-    with db.begin():  # Using SQLAlchemy's built-in transaction management
-        # Vérifier que la trésorerie appartient à l'utilisateur
-        tresorerie = db.query(TresorerieModel).filter(
-            TresorerieModel.id == vente.tresorerie_id,
-            # Vérifier que la trésorerie est liée à une station de la compagnie de l'utilisateur
-            # On suppose que la table trésorerie a un champ station_id
-        ).join(
-            Station,
-            TresorerieModel.station_id == Station.id
-        ).filter(
-            Station.compagnie_id == current_user.compagnie_id
-        ).first()
-
-        if not tresorerie:
-            raise HTTPException(status_code=403, detail="Trésorerie does not belong to your company")
+    # Vérifier que la trésorerie appartient à la compagnie de l'utilisateur et trouver sa station
+    query_tresorerie_station = db.query(TresorerieStationModel).join(
+        TresorerieModel,
+        TresorerieStationModel.tresorerie_id == TresorerieModel.id
+    ).filter(
+        TresorerieModel.id == vente.tresorerie_id,
+        TresorerieModel.compagnie_id == current_user.compagnie_id
+    )
+    if vente.station_id:
+        query_tresorerie_station = query_tresorerie_station.filter(
+            TresorerieStationModel.station_id == vente.station_id
+        )
+    # Deux lignes suffisent pour détecter une trésorerie partagée entre plusieurs stations
+    tresorerie_stations = query_tresorerie_station.limit(2).all()
+
+    if not tresorerie_stations:
+        if vente.station_id:
+            raise HTTPException(status_code=400, detail="La trésorerie n'est pas rattachée à cette station")
+        raise HTTPException(status_code=403, detail="Trésorerie does not belong to your company")
+    if len(tresorerie_stations) > 1:
+        raise HTTPException(
+            status_code=400,
+            detail="La trésorerie est rattachée à plusieurs stations : préciser station_id"
+        )
+    tresorerie_station = tresorerie_stations[0]
 
-        # Calculate total amount from details
-        total_amount = sum(detail.montant for detail in vente.details)
+    # Calculate total amount from details
+    total_amount = sum(detail.montant for detail in vente.details)
 
+    try:
         # Create the main vente record
         db_vente = VenteModel(
+            station_id=tresorerie_station.station_id,
             client_id=vente.client_id,
             date=vente.date,
             montant_total=total_amount,
@@ -78,57 +97,61 @@ def create_vente(db: Session, current_user, vente: schemas.VenteCreate):
         )
 
         db.add(db_vente)
-        db.flush()  # To get the ID before committing
+        db.flush()  # To get the ID before creating the details
 
-        # Create the details
-        for detail in vente.details:
-            db_detail = VenteDetailModel(
-                vente_id=db_vente.id,  # Utilisation directe de l'ID objet SQLAlchemy
+        db.add_all([
+            VenteDetailModel(
+                vente_id=db_vente.id,
                 produit_id=detail.produit_id,
                 quantite=detail.quantite,
                 prix_unitaire=detail.prix_unitaire,
                 montant=detail.montant,
                 remise=detail.remise
             )
-            db.add(db_detail)
+            for detail in vente.details
+        ])
 
-            # Enregistrer le mouvement de stock pour chaque détail de vente
-            try:
-                enregistrer_mouvement_stock(
-                    db=db,
-                    produit_id=detail.produit_id,
-                    station_id=tresorerie.station_id,  # Utiliser la station de la trésorerie
-                    type_mouvement="sortie",
-                    quantite=detail.quantite,
-                    cout_unitaire=detail.prix_unitaire,  # Utiliser le prix de vente comme coût pour la sortie
-                    utilisateur_id=current_user.id,
-                    module_origine="ventes_boutique",
-                    reference_origine=f"VTE-{db_vente.id}",
-                    transaction_source_id=str(db_vente.id),
-                    type_transaction_source="vente"
-                )
-            except Exception as e:
-                # If stock movement creation fails, we should handle it appropriately
-                # For now, we'll just log the error, but in a real application you might want to rollback
-                print(f"Error creating stock movement for vente {db_vente.id}, product {detail.produit_id}: {str(e)}")
-
-        # Créer un mouvement de trésorerie pour enregistrer l'entrée d'argent via le gestionnaire
-        try:
-            mouvement = MouvementTresorerieManager.creer_mouvement_vente(
-                db=db,
-                vente_id=db_vente.id,
-                type_vente='boutique',
-                utilisateur_id=current_user.id
-            )
-        except Exception as e:
-            # If treasury movement creation fails, we should handle it appropriately
-            # For now, we'll just log the error, but in a real application you might want to rollback
-            print(f"Error creating treasury movement for vente {db_vente.id}: {str(e)}")
+        # Mouvements de stock de toutes les lignes, envoyés avec les détails en un flush
+        enregistrer_mouvements_stock(
+            db=db,
+            station_id=tresorerie_station.station_id,
+            lignes=[
+                {
+                    "produit_id": detail.produit_id,
+                    "quantite": detail.quantite,
+                    "cout_unitaire": detail.prix_unitaire  # Utiliser le prix de vente comme coût pour la sortie
+                }
+                for detail in vente.details
+            ],
+            type_mouvement="sortie",
+            utilisateur_id=current_user.id,
+            module_origine="ventes_boutique",
+            reference_origine=f"VTE-{db_vente.id}",
+            transaction_source_id=str(db_vente.id),
+            type_transaction_source="vente"
+        )
 
         db.commit()
-        db.refresh(db_vente)
+    except Exception:
+        db.rollback()
+        raise
+
+    # Créer un mouvement de trésorerie pour enregistrer l'entrée d'argent via le gestionnaire
+    # (le gestionnaire valide lui-même son mouvement et l'écriture comptable associée)
+    try:
+        MouvementTresorerieManager.creer_mouvement_vente(
+            db=db,
+            vente_id=db_vente.id,
+            type_vente='boutique',
+            utilisateur_id=current_user.id,
+            tresorerie_station_id=tresorerie_station.id
+        )
+    except Exception:
+        db.rollback()
+        logger.exception("Erreur lors de la création du mouvement de trésorerie de la vente %s", db_vente.id)
 
-        return db_vente
+    db.refresh(db_vente)
+    return db_vente
 
 
 def get_vente_by_id(db: Session, current_user, vente_id: UUID):
@@ -250,30 +273,33 @@ def get_vente_details(db: Session, current_user, vente_id: UUID, skip: int = 0,
     return details
 
 
-def get_ventes_carburant(db: Session, current_user, skip: int = 0, limit: int = 100):
-    """Récupère les ventes de carburant appartenant aux stations de l'utilisateur"""
-    # Calculer le total pour les métadonnées de pagination
-    total_query = db.query(VenteCarburantModel).join(
+def get_ventes_carburant(
+    db: Session,
+    current_user,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    comptage: str = "exact"
+):
+    """
+    Récupère les ventes de carburant appartenant aux stations de l'utilisateur, de la plus récente
+    à la plus ancienne. Avec un curseur, la page est lue par clé (date_vente, id) au lieu de OFFSET.
+    """
+    query = db.query(VenteCarburantModel).join(
         Station,
         VenteCarburantModel.station_id == Station.id
     ).filter(
         Station.compagnie_id == current_user.compagnie_id
     )
-    total = total_query.count()
 
-    # Récupérer les ventes de carburant avec pagination
-    ventes_carburant = total_query.offset(skip).limit(limit).all()
-
-    # Déterminer s'il y a plus d'éléments
-    has_more = (skip + limit) < total
-
-    # Retourner une réponse paginée structurée
-    return PaginatedResponse(
-        items=ventes_carburant,
-        total=total,
-        skip=skip,
+    return paginer_requete(
+        query,
+        VenteCarburantModel.date_vente,
+        VenteCarburantModel.id,
         limit=limit,
-        has_more=has_more
+        skip=skip,
+        cursor=cursor,
+        comptage=comptage
     )
 
 
@@ -479,8 +505,7 @@ def create_vente_carburant(db: Session, current_user, vente_carburant: schemas.V
             type_mouvement="sortie",  # Carburant sort de la cuve
             quantite=vente_carburant.quantite_vendue,
             date_mouvement=vente_carburant.date_vente,
-            stock_avant=None,  # Pourrait être calculé si nécessaire
-            stock_apres=None,  # Pourrait être calculé si nécessaire
+            # stock_avant / stock_apres sont attribués par le trigger du registre de la cuve
             utilisateur_id=vente_carburant.utilisateur_id,
             reference_origine=f"VTE-CB-{db_vente_carburant.id}",
             module_origine="ventes_carburant",
@@ -509,6 +534,254 @@ def create_vente_carburant(db: Session, current_user, vente_carburant: schemas.V
         return db_vente_carburant
 
 
+def cloturer_poste_carburant(db: Session, current_user, cloture: schemas.ClotureCarburantCreate):
+    """
+    Enregistre en une fois les relevés d'index de tous les pistolets d'un poste (clôture de poste).
+
+    Les cuves, pistolets, prix et trésoreries sont chargés en une requête chacun, les lignes sont validées
+    et valorisées en mémoire, puis les ventes, créances, avoirs, mouvements de stock et de trésorerie et
+    les écritures comptables des encaissements sont insérés par lots et validés en une seule transaction.
+    Une ligne invalide est rejetée avec son motif sans empêcher l'enregistrement des autres.
+    """
+    from decimal import Decimal
+    from uuid import uuid4
+    from ...models import Cuve, Pistolet
+    from ...models.tresorerie import Tresorerie as TresorerieModel
+
+    station = db.query(Station).filter(
+        Station.id == cloture.station_id,
+        Station.compagnie_id == current_user.compagnie_id
+    ).first()
+
+    if not station:
+        raise HTTPException(status_code=403, detail="Station does not belong to your company")
+
+    cuve_ids = {ligne.cuve_id for ligne in cloture.lignes}
+    carburants_cuves = dict(
+        db.query(Cuve.id, Cuve.carburant_id).filter(
+            Cuve.id.in_(cuve_ids),
+            Cuve.station_id == station.id
+        ).all()
+    )
+    cuves_pistolets = dict(
+        db.query(Pistolet.id, Pistolet.cuve_id).filter(
+            Pistolet.id.in_({ligne.pistolet_id for ligne in cloture.lignes})
+        ).all()
+    )
+
+    # Premier prix trouvé par carburant, comme pour une vente unitaire
+    prix_carburants = {}
+    for carburant_id, prix_vente in db.query(PrixCarburant.carburant_id, PrixCarburant.prix_vente).filter(
+        PrixCarburant.station_id == station.id
+    ).all():
+        prix_carburants.setdefault(carburant_id, prix_vente)
+
+    tresorerie_ids = {ligne.tresorerie_id or cloture.tresorerie_id for ligne in cloture.lignes} - {None}
+    tresoreries_autorisees = {
+        tresorerie_id for (tresorerie_id,) in db.query(TresorerieModel.id).filter(
+            TresorerieModel.id.in_(tresorerie_ids),
+            TresorerieModel.compagnie_id == current_user.compagnie_id
+        ).all()
+    } if tresorerie_ids else set()
+
+    seuil_ecart = Decimal("1.0")  # en litres, comme pour une vente unitaire
+    ventes, creances, avoirs, mouvements_stock, mouvements_tresorerie = [], [], [], [], []
+    ventes_encaissees = []
+    erreurs = []
+    pistolets_vus = set()
+
+    for position, ligne in enumerate(cloture.lignes):
+        def rejeter(detail):
+            erreurs.append(schemas.ErreurLigneCloture(ligne=position, pistolet_id=ligne.pistolet_id, detail=detail))
+
+        tresorerie_id = ligne.tresorerie_id or cloture.tresorerie_id
+        index_initial = Decimal(str(ligne.index_initial))
+        index_final = Decimal(str(ligne.index_final))
+
+        if ligne.pistolet_id in pistolets_vus:
+            rejeter("Ce pistolet figure plusieurs fois dans la clôture")
+            continue
+        if ligne.cuve_id not in carburants_cuves:
+            rejeter("Cuve non trouvée dans cette station")
+            continue
+        if cuves_pistolets.get(ligne.pistolet_id) != ligne.cuve_id:
+            rejeter("Le pistolet n'est pas rattaché à cette cuve")
+            continue
+        if index_initial > index_final:
+            rejeter("L'index initial ne peut pas être supérieur à l'index final")
+            continue
+        if tresorerie_id is not None and tresorerie_id not in tresoreries_autorisees:
+            rejeter("Trésorerie does not belong to your company")
+            continue
+
+        carburant_id = ligne.carburant_id or carburants_cuves[ligne.cuve_id]
+        prix_unitaire = prix_carburants.get(carburant_id)
+        if not prix_unitaire:
+            rejeter("Prix de vente non trouvé pour ce carburant et cette station")
+            continue
+
+        quantite_mesuree = index_final - index_initial
+        quantite_vendue = Decimal(str(ligne.quantite_vendue)) if ligne.quantite_vendue is not None else quantite_mesuree
+        if quantite_vendue <= 0:
+            rejeter("Aucune quantité vendue sur ce pistolet")
+            continue
+        pistolets_vus.add(ligne.pistolet_id)
+
+        ecart_quantite = abs(quantite_vendue - quantite_mesuree)
+        besoin_compensation = ecart_quantite > seuil_ecart
+        montant_total = quantite_vendue * prix_unitaire
+        montant_paye = Decimal(str(ligne.montant_paye or 0))
+
+        vente = VenteCarburantModel(
+            id=uuid4(),
+            station_id=station.id,
+            cuve_id=ligne.cuve_id,
+            pistolet_id=ligne.pistolet_id,
+            tresorerie_id=tresorerie_id,
+            quantite_vendue=quantite_vendue,
+            prix_unitaire=prix_unitaire,
+            montant_total=montant_total,
+            date_vente=cloture.date_vente,
+            index_initial=index_initial,
+            index_final=index_final,
+            quantite_mesuree=quantite_mesuree,
+            ecart_quantite=ecart_quantite,
+            besoin_compensation=besoin_compensation,
+            pompiste=ligne.pompiste,
+            qualite_marshalle_id=ligne.qualite_marshalle_id,
+            montant_paye=montant_paye,
+            mode_paiement=ligne.mode_paiement,
+            utilisateur_id=cloture.utilisateur_id
+        )
+        reference_origine = f"VTE-CB-{vente.id}"
+
+        # Paiement insuffisant : créance sur le pompiste
+        if montant_paye < montant_total:
+            creance = CreanceEmployeModel(
+                id=uuid4(),
+                vente_carburant_id=vente.id,
+                pompiste=ligne.pompiste,
+                montant_du=montant_total - montant_paye,
+                montant_paye=montant_paye,
+                solde_creance=montant_total - montant_paye,
+                created_at=cloture.date_vente,
+                utilisateur_gestion_id=cloture.utilisateur_id
+            )
+            creances.append((vente, creance))
+
+        # Écart de quantité, puis écart de paiement : avoirs (le premier est lié à la vente)
+        ecarts = []
+        if besoin_compensation:
+            ecarts.append((ecart_quantite * prix_unitaire, f"Compensation pour écart de quantité sur la vente de carburant ID: {vente.id}"))
+        if montant_paye > montant_total:
+            ecarts.append((montant_paye - montant_total, f"Avoir pour écart de paiement sur la vente de carburant ID: {vente.id}"))
+        for montant_avoir, motif_avoir in ecarts:
+            avoir = AvoirModel(
+                id=uuid4(),
+                tiers_id=cloture.utilisateur_id,
+                montant_initial=float(montant_avoir),
+                montant_utilise=0,
+                montant_restant=float(montant_avoir),
+                date_emission=datetime.now(timezone.utc),
+                motif=motif_avoir,
+                statut="emis",
+                utilisateur_emission_id=cloture.utilisateur_id,
+                reference_origine=reference_origine,
+                module_origine="ventes_carburant",
+                compagnie_id=str(current_user.compagnie_id),
+                station_id=str(station.id)
+            )
+            avoirs.append(avoir)
+            if vente.compensation_id is None:
+                vente.compensation_id = avoir.id
+
+        mouvements_stock.append(MouvementStockCuve(
+            vente_carburant_id=vente.id,
+            cuve_id=ligne.cuve_id,
+            type_mouvement="sortie",
+            quantite=quantite_vendue,
+            date_mouvement=cloture.date_vente,
+            # stock_avant / stock_apres sont attribués par le trigger du registre de la cuve
+            utilisateur_id=cloture.utilisateur_id,
+            reference_origine=reference_origine,
+            module_origine="ventes_carburant",
+            statut="validé"
+        ))
+
+        # Encaissement en espèces ou par chèque : entrée dans la trésorerie
+        if ligne.mode_paiement in ("espèce", "chèque") and tresorerie_id:
+            mouvements_tresorerie.append(MouvementTresorerieModel(
+                tresorerie_globale_id=tresorerie_id,
+                type_mouvement="entrée",
+                montant=montant_total,
+                date_mouvement=cloture.date_vente,
+                description=f"Paiement reçu pour ventes_carburant {vente.id}",
+                module_origine="ventes_carburant",
+                reference_origine=f"VC-{vente.id}",
+                utilisateur_id=current_user.id
+            ))
+            ventes_encaissees.append(vente)
+
+        ventes.append(vente)
+
+    if ventes_encaissees:
+        # Comptes de l'écriture d'encaissement (trésorerie / ventes de carburant), résolus une fois pour le lot
+        try:
+            compte_tresorerie = ComptabiliteManager.resoudre_compte(db, "512", current_user.compagnie_id)
+            compte_ventes = ComptabiliteManager.resoudre_compte(db, "707", current_user.compagnie_id)
+        except InvalidTransactionException as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if ventes:
+        try:
+            # Insertions par lots, dans l'ordre des clés étrangères (avoirs -> ventes -> créances et mouvements)
+            db.add_all(avoirs)
+            db.flush()
+            db.add_all(ventes)
+            db.flush()
+            db.add_all([creance for _, creance in creances])
+            db.add_all(mouvements_stock)
+            db.add_all(mouvements_tresorerie)
+            db.flush()
+            for vente, creance in creances:
+                vente.creance_employe_id = creance.id
+            # Écritures des encaissements, comme pour une vente unitaire, dans la même transaction
+            for vente in ventes_encaissees:
+                ComptabiliteManager.enregistrer_ecriture_double(
+                    db=db,
+                    type_operation=TypeOperationComptable.VENTE_CARBURANT,
+                    reference_origine=f"VC-{vente.id}",
+                    montant=vente.montant_total,
+                    compte_debit=compte_tresorerie,  # Trésorerie
+                    compte_credit=compte_ventes,  # Ventes de carburant
+                    libelle=f"Vente carburant #{vente.id}",
+                    utilisateur_id=current_user.id,
+                    date_operation=cloture.date_vente,
+                    compagnie_id=current_user.compagnie_id,
+                    commit=False
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        # Recharger les ventes validées en une requête plutôt qu'une par vente, dans l'ordre des lignes
+        ventes_rechargees = {
+            vente.id: vente for vente in db.query(VenteCarburantModel).filter(
+                VenteCarburantModel.id.in_([vente.id for vente in ventes])
+            ).all()
+        }
+        ventes = [ventes_rechargees[vente.id] for vente in ventes]
+
+    return schemas.ClotureCarburantResponse(
+        nombre_lignes=len(cloture.lignes),
+        nombre_ventes=len(ventes),
+        montant_total=float(sum((vente.montant_total for vente in ventes), Decimal("0"))),
+        ventes=[schemas.VenteCarburantResponse.model_validate(vente) for vente in ventes],
+        erreurs=erreurs
+    )
+
+
 def get_vente_carburant_by_id(db: Session, current_user, vente_carburant_id: UUID):
     """Récupère une vente de carburant spécifique par son ID"""
     vente_carburant = db.query(VenteCarburantModel).join(
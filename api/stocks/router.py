@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 from typing import List
 from ..database import get_db
@@ -9,7 +10,7 @@ from ..models.mouvement_stock import MouvementStock
 from ..models.user import User
 from . import schemas, lot_schemas
 from ..services.mouvement_stock_service import enregistrer_mouvement_stock
-from ..utils.pagination import PaginatedResponse
+from ..utils.pagination import PaginatedResponse, paginer_requete
 from ..utils.filters import StockFilterParams, MouvementStockFilterParams
 from ..services.pagination_service import apply_filters_and_pagination, apply_specific_filters
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -27,7 +28,7 @@ security = HTTPBearer()
              summary="Créer un stock initial",
              description="Crée un stock initial pour un produit spécifique dans une station. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées. Le stock initial est essentiel pour commencer la gestion des stocks dans le système.",
              tags=["Stock initial"])
-async def creer_stock_initial(
+def creer_stock_initial(
     stock_initial: schemas.StockInitialCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -187,7 +188,7 @@ async def creer_stock_initial(
              summary="Annuler un stock initial",
              description="Annule un stock initial en vérifiant qu'il n'y a pas d'autres mouvements pour ce produit et cette station, puis en supprimant l'enregistrement de mouvement de stock initial et en supprimant l'entrée dans la table stock_produit. Nécessite des droits de gérant de compagnie ou administrateur.",
              tags=["Stock initial"])
-async def annuler_stock_initial(
+def annuler_stock_initial(
     produit_id: uuid.UUID,
     station_id: uuid.UUID,
     request: Request,
@@ -273,7 +274,7 @@ async def annuler_stock_initial(
             summary="Corriger un stock initial",
             description="Corrige un stock initial enregistré en créant un mouvement de correction. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées.",
             tags=["Stock initial"])
-async def corriger_stock_initial(
+def corriger_stock_initial(
     produit_id: uuid.UUID,
     station_id: uuid.UUID,
     correction: schemas.StockInitialCorrection,
@@ -390,7 +391,7 @@ async def corriger_stock_initial(
              summary="Réinitialiser un stock initial",
              description="Réinitialise un stock initial après annulation en créant un nouveau mouvement. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées.",
              tags=["Stock initial"])
-async def reinitialiser_stock_initial(
+def reinitialiser_stock_initial(
     produit_id: uuid.UUID,
     station_id: uuid.UUID,
     stock_initial: schemas.StockInitialCreate,
@@ -483,7 +484,7 @@ async def reinitialiser_stock_initial(
              summary="Récupérer les mouvements de stock d'un produit",
              description="Récupère la liste paginée des mouvements de stock pour un produit spécifique. Permet de visualiser l'historique des entrées, sorties et ajustements pour un produit donné. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur.",
              tags=["Mouvements de stock"])
-async def get_mouvements_stock_produit(
+def get_mouvements_stock_produit(
     produit_id: uuid.UUID,
     filters: MouvementStockFilterParams = Depends(),
     db: Session = Depends(get_db),
@@ -550,36 +551,126 @@ async def get_mouvements_stock_produit(
     if filters.utilisateur_id:
         query = query.filter(MouvementStock.utilisateur_id == filters.utilisateur_id)
 
-    # Application du tri
-    if filters.sort_by:
-        sort_field = getattr(MouvementStock, filters.sort_by, None)
-        if sort_field:
-            if filters.sort_order == 'desc':
-                query = query.order_by(sort_field.desc())
-            else:
-                query = query.order_by(sort_field.asc())
-    else:
-        # Tri par défaut par date de mouvement décroissante
-        query = query.order_by(MouvementStock.date_mouvement.desc())
+    # Tri par date de mouvement décroissante par défaut, départagé par l'identifiant pour que
+    # la pagination par curseur soit stable. Seules les colonnes sont triables ; sur une colonne qui accepte
+    # NULL (cout_unitaire...), paginer_requete ne propose pas de curseur et refuse celui qu'on lui passe
+    colonne_tri = MouvementStock.date_mouvement
+    descendant = True
+    if filters.sort_by and filters.sort_by in inspect(MouvementStock).column_attrs.keys():
+        colonne_tri = getattr(MouvementStock, filters.sort_by)
+        descendant = filters.sort_order == 'desc'
+
+    page = paginer_requete(
+        query,
+        colonne_tri,
+        MouvementStock.id,
+        limit=filters.limit,
+        skip=filters.skip,
+        cursor=filters.cursor,
+        comptage=filters.comptage,
+        descendant=descendant
+    )
 
-    # Calcul du total avant pagination
-    total = query.count()
+    # Conversion des résultats en objets MouvementStockResponse
+    page.items = [schemas.MouvementStockResponse.from_orm(mvt) for mvt in page.items]
 
-    # Application de la pagination
-    resultats = query.offset(filters.skip).limit(filters.limit).all()
+    return page
 
-    # Conversion des résultats en objets MouvementStockResponse
-    mouvements = [schemas.MouvementStockResponse.from_orm(mvt) for mvt in resultats]
 
-    # Détermination s'il y a plus d'éléments
-    has_more = (filters.skip + filters.limit) < total
+# Endpoint pour reconstruire le coût moyen pondéré d'un produit
+@router.post("/produits/{produit_id}/cout-moyen/reconstruire",
+             response_model=schemas.CoutMoyenReconstructionResponse,
+             summary="Reconstruire le coût moyen pondéré d'un produit",
+             description="Recalcule le coût moyen pondéré d'un produit pour une station en rejouant tout l'historique de ses mouvements de stock. Le coût moyen est normalement maintenu de façon incrémentale ; cette reconstruction sert aux audits et aux corrections antidatées. Nécessite des droits de gérant de compagnie ou administrateur.",
+             tags=["Mouvements de stock"])
+def reconstruire_cout_moyen(
+    produit_id: uuid.UUID,
+    station_id: uuid.UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Reconstruit le coût moyen pondéré d'un produit pour une station à partir de l'historique complet.
 
-    return PaginatedResponse(
-        items=mouvements,
-        total=total,
-        skip=filters.skip,
-        limit=filters.limit,
-        has_more=has_more
+    Args:
+        produit_id (uuid.UUID): L'identifiant du produit
+        station_id (uuid.UUID): L'identifiant de la station
+        request (Request): La requête HTTP
+        db (Session): Session de base de données
+        credentials (HTTPAuthorizationCredentials): Informations d'identification de l'utilisateur
+
+    Returns:
+        schemas.CoutMoyenReconstructionResponse: Coût moyen avant et après reconstruction
+
+    Raises:
+        HTTPException: Si l'utilisateur n'a pas les permissions nécessaires,
+                       si le produit ou la station n'appartient pas à sa compagnie
+    """
+    current_user = get_current_user_security(credentials, db)
+
+    # Vérifier les permissions
+    if current_user.role not in ["admin", "gerant_compagnie"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissions insuffisantes pour reconstruire le coût moyen"
+        )
+
+    produit = db.query(ProduitModel).filter(
+        ProduitModel.id == produit_id,
+        ProduitModel.compagnie_id == current_user.compagnie_id
+    ).first()
+    if not produit:
+        raise HTTPException(status_code=404, detail="Produit non trouvé ou non autorisé")
+
+    from ..models.compagnie import Station
+    station = db.query(Station).filter(
+        Station.id == station_id,
+        Station.compagnie_id == current_user.compagnie_id
+    ).first()
+    if not station:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Vous n'avez pas accès à cette station"
+        )
+
+    stock_existant = db.query(StockModel).filter(
+        StockModel.produit_id == produit_id,
+        StockModel.station_id == station_id
+    ).first()
+    cout_moyen_precedent = float(stock_existant.cout_moyen_pondere) if stock_existant and stock_existant.cout_moyen_pondere is not None else None
+
+    from ..services.cout_moyen_service import reconstruire_cout_moyen_produit
+    cout_moyen = reconstruire_cout_moyen_produit(db, produit_id, station_id)
+
+    stock = db.query(StockModel).filter(
+        StockModel.produit_id == produit_id,
+        StockModel.station_id == station_id
+    ).first()
+
+    # Log the action
+    log_user_action(
+        db,
+        utilisateur_id=str(current_user.id),
+        type_action="update",
+        module_concerne="stock_management",
+        donnees_avant={'cout_moyen_pondere': cout_moyen_precedent},
+        donnees_apres={
+            'produit_id': str(produit_id),
+            'station_id': str(station_id),
+            'cout_moyen_pondere': float(cout_moyen)
+        },
+        ip_utilisateur=request.client.host,
+        user_agent=request.headers.get("user-agent")
+    )
+
+    return schemas.CoutMoyenReconstructionResponse(
+        produit_id=produit_id,
+        station_id=station_id,
+        cout_moyen_pondere=float(cout_moyen),
+        cout_moyen_precedent=cout_moyen_precedent,
+        quantite=float(stock.quantite_cmp or 0),
+        valeur_stock=float(stock.valeur_stock_cmp or 0)
     )
 
 
@@ -589,7 +680,7 @@ async def get_mouvements_stock_produit(
              summary="Créer un nouveau lot",
              description="Crée un nouveau lot pour un produit spécifique dans une station. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées. Utilisé pour des produits avec gestion de lots et péremption.",
              tags=["lots"])
-async def creer_lot(
+def creer_lot(
     lot: lot_schemas.LotCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -698,7 +789,7 @@ async def creer_lot(
             summary="Récupérer un lot par ID",
             description="Récupère les détails d'un lot spécifique par son identifiant unique. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur. L'utilisateur doit avoir accès à la station à laquelle le lot est affecté.",
             tags=["lots"])
-async def get_lot_par_id(
+def get_lot_par_id(
     lot_id: uuid.UUID,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -750,7 +841,7 @@ async def get_lot_par_id(
             summary="Récupérer les lots d'un produit",
             description="Récupère la liste des lots associés à un produit spécifique. Permet de paginer les résultats. Nécessite des droits d'accès appropriés selon le rôle de l'utilisateur et l'accès aux stations du produit.",
             tags=["lots"])
-async def get_lots_par_produit(
+def get_lots_par_produit(
     produit_id: uuid.UUID,
     skip: int = 0,
     limit: int = 100,
@@ -801,7 +892,7 @@ async def get_lots_par_produit(
             summary="Mettre à jour un lot",
             description="Met à jour les détails d'un lot existant. Nécessite des droits de gérant de compagnie ou utilisateur avec permissions appropriées. La modification affecte la gestion des stocks et les alertes de péremption.",
             tags=["lots"])
-async def update_lot(
+def update_lot(
     lot_id: uuid.UUID,
     lot_update: lot_schemas.LotUpdate,
     request: Request,
@@ -880,7 +971,7 @@ async def update_lot(
                summary="Supprimer un lot",
                description="Supprime un lot existant. Nécessite des droits de gérant de compagnie ou administrateur. La suppression affecte les calculs de stock et les alertes de péremption.",
                tags=["lots"])
-async def delete_lot(
+def delete_lot(
     lot_id: uuid.UUID,
     request: Request,
     db: Session = Depends(get_db),
@@ -67,4 +67,12 @@ class StockInitialCorrection(BaseModel):
     cout_unitaire: float = Field(..., description="Coût unitaire après correction")
     prix_vente: Optional[float] = Field(None, description="Prix de vente après correction")
     seuil_stock_min: Optional[float] = Field(None, description="Seuil minimum de stock après correction")
-    raison: str = Field(..., description="Raison de la correction")
\ No newline at end of file
+    raison: str = Field(..., description="Raison de la correction")
+
+class CoutMoyenReconstructionResponse(BaseModel):
+    produit_id: UUID
+    station_id: UUID
+    cout_moyen_pondere: float = Field(..., description="Coût moyen pondéré reconstruit à partir de l'historique")
+    cout_moyen_precedent: Optional[float] = Field(None, description="Coût moyen pondéré avant reconstruction")
+    quantite: float = Field(..., description="Quantité valorisée au coût moyen après reconstruction")
+    valeur_stock: float = Field(..., description="Valeur du stock au coût moyen après reconstruction")
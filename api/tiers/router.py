@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import uuid
 from ..database import get_db
 from ..auth.auth_handler import get_current_user_security
@@ -10,6 +10,7 @@ from . import schemas, soldes_schemas
 from ..models.tiers import Tiers, SoldeTiers
 from ..models.compagnie import Station
 from ..rbac_decorators import require_permission
+from ..services.pagination_service import appliquer_recherche_textuelle
 from ..services.comptabilite import ComptabiliteManager, TypeOperationComptable
 from ..models.plan_comptable import PlanComptableModel
 
@@ -17,7 +18,7 @@ security = HTTPBearer()
 
 
 # Dépendance pour obtenir l'utilisateur courant
-async def get_current_active_user(
+def get_current_active_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
@@ -32,7 +33,7 @@ router = APIRouter(tags=["Tiers"])
 
 
 @router.post("/clients", response_model=schemas.TiersResponse, dependencies=[Depends(require_permission("Module Tiers"))])
-async def create_client(
+def create_client(
     client: schemas.ClientCreateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -133,7 +134,7 @@ async def create_client(
 
 
 @router.post("/fournisseurs", response_model=schemas.TiersResponse, dependencies=[Depends(require_permission("Module Tiers"))])
-async def create_fournisseur(
+def create_fournisseur(
     fournisseur: schemas.FournisseurCreateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -227,7 +228,7 @@ async def create_fournisseur(
 
 
 @router.post("/employes", response_model=schemas.TiersResponse, dependencies=[Depends(require_permission("Module Tiers"))])
-async def create_employe(
+def create_employe(
     employe: schemas.EmployeCreateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -346,7 +347,7 @@ async def create_employe(
 
 
 @router.get("/stations/{station_id}/clients", response_model=List[schemas.TiersResponse], dependencies=[Depends(require_permission("Module Tiers"))])
-async def get_clients_by_station(
+def get_clients_by_station(
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -375,7 +376,7 @@ async def get_clients_by_station(
 
 
 @router.get("/clients/{client_id}", response_model=schemas.TiersResponse, dependencies=[Depends(require_permission("Module Tiers"))])
-async def get_client(
+def get_client(
     client_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -397,7 +398,7 @@ async def get_client(
 
 
 @router.get("/fournisseurs/{fournisseur_id}", response_model=schemas.TiersResponse)
-async def get_fournisseur(
+def get_fournisseur(
     fournisseur_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -419,58 +420,64 @@ async def get_fournisseur(
 
 
 @router.get("/clients", response_model=List[schemas.TiersResponse])
-async def get_all_clients(
+def get_all_clients(
+    q: Optional[str] = Query(None, description="Recherche sur le nom, l'email ou le téléphone"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> List[schemas.TiersResponse]:
     """
-    Récupérer tous les clients de la compagnie
+    Récupérer tous les clients de la compagnie, filtrés et classés par pertinence si q est fourni
     """
-    clients = db.query(Tiers).filter(
+    query = db.query(Tiers).filter(
         Tiers.type == "client",
         Tiers.statut != "supprimé",  # Exclure les tiers supprimés
         Tiers.compagnie_id == current_user.compagnie_id
-    ).all()
+    )
+    clients = appliquer_recherche_textuelle(query, Tiers, q).all()
 
     return clients
 
 
 @router.get("/fournisseurs", response_model=List[schemas.TiersResponse])
-async def get_all_fournisseurs(
+def get_all_fournisseurs(
+    q: Optional[str] = Query(None, description="Recherche sur le nom, l'email ou le téléphone"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> List[schemas.TiersResponse]:
     """
-    Récupérer tous les fournisseurs de la compagnie
+    Récupérer tous les fournisseurs de la compagnie, filtrés et classés par pertinence si q est fourni
     """
-    fournisseurs = db.query(Tiers).filter(
+    query = db.query(Tiers).filter(
         Tiers.type == "fournisseur",
         Tiers.statut != "supprimé",  # Exclure les tiers supprimés
         Tiers.compagnie_id == current_user.compagnie_id
-    ).all()
+    )
+    fournisseurs = appliquer_recherche_textuelle(query, Tiers, q).all()
 
     return fournisseurs
 
 
 @router.get("/employes", response_model=List[schemas.TiersResponse])
-async def get_all_employes(
+def get_all_employes(
+    q: Optional[str] = Query(None, description="Recherche sur le nom, l'email ou le téléphone"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> List[schemas.TiersResponse]:
     """
-    Récupérer tous les employés de la compagnie
+    Récupérer tous les employés de la compagnie, filtrés et classés par pertinence si q est fourni
     """
-    employes = db.query(Tiers).filter(
+    query = db.query(Tiers).filter(
         Tiers.type == "employé",
         Tiers.statut != "supprimé",  # Exclure les tiers supprimés
         Tiers.compagnie_id == current_user.compagnie_id
-    ).all()
+    )
+    employes = appliquer_recherche_textuelle(query, Tiers, q).all()
 
     return employes
 
 
 @router.get("/employes/{employe_id}", response_model=schemas.TiersResponse)
-async def get_employe(
+def get_employe(
     employe_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -492,7 +499,7 @@ async def get_employe(
 
 
 @router.get("/stations/{station_id}/fournisseurs", response_model=List[schemas.TiersResponse])
-async def get_fournisseurs_by_station(
+def get_fournisseurs_by_station(
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -521,7 +528,7 @@ async def get_fournisseurs_by_station(
 
 
 @router.put("/clients/{client_id}", response_model=schemas.TiersResponse)
-async def update_client(
+def update_client(
     client_id: uuid.UUID,
     client_update: schemas.TiersUpdate,
     db: Session = Depends(get_db),
@@ -650,7 +657,7 @@ async def update_client(
 
 
 @router.put("/fournisseurs/{fournisseur_id}", response_model=schemas.TiersResponse)
-async def update_fournisseur(
+def update_fournisseur(
     fournisseur_id: uuid.UUID,
     fournisseur_update: schemas.TiersUpdate,
     db: Session = Depends(get_db),
@@ -778,7 +785,7 @@ async def update_fournisseur(
 
 
 @router.put("/employes/{employe_id}", response_model=schemas.TiersResponse)
-async def update_employe(
+def update_employe(
     employe_id: uuid.UUID,
     employe_update: schemas.TiersUpdate,
     db: Session = Depends(get_db),
@@ -954,7 +961,7 @@ async def update_employe(
 
 
 @router.delete("/clients/{client_id}", response_model=dict)
-async def delete_client(
+def delete_client(
     client_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -981,7 +988,7 @@ async def delete_client(
 
 
 @router.delete("/fournisseurs/{fournisseur_id}", response_model=dict)
-async def delete_fournisseur(
+def delete_fournisseur(
     fournisseur_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -1008,7 +1015,7 @@ async def delete_fournisseur(
 
 
 @router.delete("/employes/{employe_id}", response_model=dict)
-async def delete_employe(
+def delete_employe(
     employe_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -1035,7 +1042,7 @@ async def delete_employe(
 
 
 @router.post("/tiers/{tiers_id}/associer-station/{station_id}", response_model=dict)
-async def associer_tiers_a_station(
+def associer_tiers_a_station(
     tiers_id: uuid.UUID,
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -1078,7 +1085,7 @@ async def associer_tiers_a_station(
 
 
 @router.post("/tiers/{tiers_id}/dissocier-station/{station_id}", response_model=dict)
-async def dissocier_tiers_de_station(
+def dissocier_tiers_de_station(
     tiers_id: uuid.UUID,
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -1121,7 +1128,7 @@ async def dissocier_tiers_de_station(
 
 
 @router.get("/stations/{station_id}/employes", response_model=List[schemas.TiersResponse])
-async def get_employes_by_station(
+def get_employes_by_station(
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -1150,7 +1157,7 @@ async def get_employes_by_station(
 
 
 @router.post("/tiers/{tiers_id}/soldes/{station_id}", response_model=soldes_schemas.SoldeTiersResponse)
-async def create_solde_initial_tiers_par_station(
+def create_solde_initial_tiers_par_station(
     tiers_id: uuid.UUID,
     station_id: uuid.UUID,
     solde_create: soldes_schemas.SoldeTiersCreate,
@@ -1318,7 +1325,7 @@ async def create_solde_initial_tiers_par_station(
 
 
 @router.get("/tiers/{tiers_id}/soldes/{station_id}", response_model=soldes_schemas.SoldeTiersResponse)
-async def get_solde_initial_tiers_par_station(
+def get_solde_initial_tiers_par_station(
     tiers_id: uuid.UUID,
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -1358,7 +1365,7 @@ async def get_solde_initial_tiers_par_station(
 
 
 @router.put("/tiers/{tiers_id}/soldes/{station_id}", response_model=soldes_schemas.SoldeTiersResponse)
-async def update_solde_initial_tiers_par_station(
+def update_solde_initial_tiers_par_station(
     tiers_id: uuid.UUID,
     station_id: uuid.UUID,
     solde_update: soldes_schemas.SoldeTiersUpdate,
@@ -1444,7 +1451,7 @@ async def update_solde_initial_tiers_par_station(
 
 
 @router.get("/tiers/{tiers_id}/soldes", response_model=List[soldes_schemas.SoldeTiersResponse])
-async def get_soldes_tiers_par_station(
+def get_soldes_tiers_par_station(
     tiers_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -1470,7 +1477,7 @@ async def get_soldes_tiers_par_station(
 
 
 @router.get("/stations/{station_id}/soldes", response_model=List[soldes_schemas.SoldeTiersResponse])
-async def get_soldes_par_station(
+def get_soldes_par_station(
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -1492,4 +1499,18 @@ async def get_soldes_par_station(
         SoldeTiers.station_id == station_id
     ).all()
 
-    return soldes
\ No newline at end of file
+    return soldes
+
+@router.post("/fournisseurs/soldes/recalculer", response_model=dict, dependencies=[Depends(require_permission("Module Tiers"))])
+def recalculer_soldes_fournisseurs(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Recalculer en une passe les soldes de tous les fournisseurs de la compagnie à partir des achats
+    et paiements (réconciliation des soldes tenus à jour par variations)
+    """
+    from ..services.tiers.tiers_solde_service import recalculer_soldes_fournisseurs_compagnie
+
+    nombre = recalculer_soldes_fournisseurs_compagnie(db, current_user.compagnie_id)
+    return {"soldes_recalcules": nombre}
@@ -54,7 +54,7 @@ router = APIRouter(tags=["Tresorerie"])
             summary="Récupérer les tresoreries par station",
             description="Récupère la liste des tresoreries associées aux stations avec pagination. Permet de consulter toutes les tresoreries définies par station, y compris leurs soldes et configurations. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les stations concernées.",
             tags=["Tresorerie"])
-async def get_tresoreries_station(
+def get_tresoreries_station(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -69,7 +69,7 @@ async def get_tresoreries_station(
             summary="Récupérer les tresoreries globales",
             description="Récupère la liste des tresoreries globales avec pagination. Ces tresoreries sont des comptes généraux qui ne sont pas spécifiquement liés à une station. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les tresoreries concernées.",
             tags=["Tresorerie"])
-async def get_tresoreries(
+def get_tresoreries(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -82,7 +82,7 @@ async def get_tresoreries(
              summary="Créer une nouvelle trésorerie globale",
              description="Crée une nouvelle trésorerie globale dans le système. Une trésorerie globale est un compte général qui ne dépend pas d'une station spécifique. Le solde initial peut être défini lors de la création de la trésorerie. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la trésorerie à créer.",
              tags=["Tresorerie"])
-async def create_tresorerie(
+def create_tresorerie(
     tresorerie: schemas.TresorerieCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -105,7 +105,7 @@ async def create_tresorerie(
             summary="Récupérer les tresoreries sans méthode de paiement",
             description="Récupère la liste des tresoreries qui n'ont aucune méthode de paiement associée. Permet d'identifier les tresoreries qui n'ont pas encore été configurées avec des méthodes de paiement. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les tresoreries concernées.",
             tags=["Tresorerie"])
-async def get_tresoreries_sans_methode_paiement(
+def get_tresoreries_sans_methode_paiement(
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
 ):
@@ -117,7 +117,7 @@ async def get_tresoreries_sans_methode_paiement(
              summary="Créer une nouvelle trésorerie associée à une station",
              description="Crée une nouvelle trésorerie liée à une station spécifique. Cette trésorerie est utilisée pour gérer les flux financiers spécifiques à une station. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
              tags=["Tresorerie"])
-async def create_tresorerie_station(
+def create_tresorerie_station(
     tresorerie_station: schemas.TresorerieStationCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -130,7 +130,7 @@ async def create_tresorerie_station(
             summary="Récupérer les tresoreries d'une station spécifique",
             description="Récupère la liste des tresoreries associées à une station spécifique par son identifiant. Permet de consulter toutes les tresoreries définies pour une station particulière, y compris leurs soldes et configurations. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit avoir accès à la station concernée.",
             tags=["Tresorerie"])
-async def get_tresoreries_station_by_station(
+def get_tresoreries_station_by_station(
     station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -146,7 +146,7 @@ async def get_tresoreries_station_by_station(
              summary="Créer un nouveau mouvement de trésorerie",
              description="Crée un nouveau mouvement (entrée/sortie) dans une trésorerie station. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
              tags=["Tresorerie"])
-async def create_mouvement_tresorerie(
+def create_mouvement_tresorerie(
     mouvement: schemas.MouvementTresorerieCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -159,7 +159,7 @@ async def create_mouvement_tresorerie(
             summary="Récupérer tous les mouvements de trésorerie",
             description="Récupère la liste de tous les mouvements de trésorerie avec pagination. Nécessite la permission 'Module Trésorerie'. L'utilisateur ne peut voir que les mouvements liés à sa compagnie.",
             tags=["Tresorerie"])
-async def get_all_mouvements_tresorerie(
+def get_all_mouvements_tresorerie(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -173,7 +173,7 @@ async def get_all_mouvements_tresorerie(
             summary="Récupérer un mouvement de trésorerie",
             description="Récupère les détails d'un mouvement de trésorerie spécifique par son identifiant. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
             tags=["Tresorerie"])
-async def get_mouvement_tresorerie_by_id(
+def get_mouvement_tresorerie_by_id(
     mouvement_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -186,7 +186,7 @@ async def get_mouvement_tresorerie_by_id(
             summary="Mettre à jour un mouvement de trésorerie",
             description="Met à jour les informations d'un mouvement de trésorerie existant. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
             tags=["Tresorerie"])
-async def update_mouvement_tresorerie(
+def update_mouvement_tresorerie(
     mouvement_id: uuid.UUID,
     mouvement: schemas.MouvementTresorerieUpdate,
     db: Session = Depends(get_db),
@@ -199,7 +199,7 @@ async def update_mouvement_tresorerie(
              summary="Annuler un mouvement de trésorerie",
              description="Annule un mouvement de trésorerie existant en créant un mouvement inverse. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
              tags=["Tresorerie"])
-async def annuler_mouvement_tresorerie(
+def annuler_mouvement_tresorerie(
     mouvement_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -211,7 +211,7 @@ async def annuler_mouvement_tresorerie(
                 summary="Supprimer un mouvement de trésorerie",
                 description="Supprime un mouvement de trésorerie du système. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
                 tags=["Tresorerie"])
-async def delete_mouvement_tresorerie(
+def delete_mouvement_tresorerie(
     mouvement_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -227,7 +227,7 @@ async def delete_mouvement_tresorerie(
              summary="Créer un nouveau transfert de trésorerie",
              description="Crée un nouveau transfert entre deux trésoreries. L'identifiant de l'utilisateur est automatiquement récupéré à partir de la session. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les trésoreries concernées.",
              tags=["Tresorerie"])
-async def create_transfert_tresorerie(
+def create_transfert_tresorerie(
     transfert: schemas.TransfertTresorerieCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -240,7 +240,7 @@ async def create_transfert_tresorerie(
             summary="Récupérer tous les transferts de trésorerie",
             description="Récupère la liste de tous les transferts de trésorerie avec pagination. Nécessite la permission 'Module Trésorerie'. L'utilisateur ne peut voir que les transferts liés à sa compagnie.",
             tags=["Tresorerie"])
-async def get_all_transferts_tresorerie(
+def get_all_transferts_tresorerie(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -254,7 +254,7 @@ async def get_all_transferts_tresorerie(
             summary="Récupérer un transfert de trésorerie",
             description="Récupère les détails d'un transfert de trésorerie spécifique par son identifiant. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les trésoreries concernées.",
             tags=["Tresorerie"])
-async def get_transfert_tresorerie_by_id(
+def get_transfert_tresorerie_by_id(
     transfert_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -267,7 +267,7 @@ async def get_transfert_tresorerie_by_id(
             summary="Mettre à jour un transfert de trésorerie",
             description="Met à jour les informations d'un transfert de trésorerie existant. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les trésoreries concernées.",
             tags=["Tresorerie"])
-async def update_transfert_tresorerie(
+def update_transfert_tresorerie(
     transfert_id: uuid.UUID,
     transfert: schemas.TransfertTresorerieUpdate,
     db: Session = Depends(get_db),
@@ -280,7 +280,7 @@ async def update_transfert_tresorerie(
              summary="Annuler un transfert de trésorerie",
              description="Annule un transfert de trésorerie existant en créant des mouvements inverses. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les trésoreries concernées.",
              tags=["Tresorerie"])
-async def annuler_transfert_tresorerie(
+def annuler_transfert_tresorerie(
     transfert_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -292,7 +292,7 @@ async def annuler_transfert_tresorerie(
                 summary="Supprimer un transfert de trésorerie",
                 description="Supprime un transfert de trésorerie du système. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les trésoreries concernées.",
                 tags=["Tresorerie"])
-async def delete_transfert_tresorerie(
+def delete_transfert_tresorerie(
     transfert_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -302,21 +302,21 @@ async def delete_transfert_tresorerie(
 
 # Endpoints spécifiques pour la nouvelle architecture
 @router.post("/refresh-solde",
-             summary="Rafraîchir les vues matérialisées de solde",
-             description="Force le rafraîchissement des vues matérialisées de solde de trésorerie. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les trésoreries concernées.",
+             summary="Recalculer les soldes de trésorerie",
+             description="Recalcule les soldes de trésorerie de la compagnie à partir des états initiaux et de l'historique des mouvements (les soldes sont sinon maintenus à chaque mouvement). Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que les trésoreries concernées.",
              tags=["Tresorerie"])
-async def refresh_solde_tresorerie(
+def refresh_solde_tresorerie(
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
 ):
-    return service_refresh_vue_solde_tresorerie(db)
+    return service_refresh_vue_solde_tresorerie(db, current_user.compagnie_id)
 
 
 @router.post("/cloture-mensuelle",
              summary="Clôture mensuelle manuelle",
              description="Exécute manuellement le processus de clôture mensuelle. Nécessite la permission 'Module Trésorerie'.",
              tags=["Tresorerie"])
-async def cloture_mensuelle_manuelle(
+def cloture_mensuelle_manuelle(
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
 ):
@@ -344,7 +344,7 @@ async def cloture_mensuelle_manuelle(
             summary="Récupérer une trésorerie par ID",
             description="Récupère les détails d'une trésorerie spécifique par son identifiant. Permet d'obtenir toutes les informations relatives à une trésorerie, y compris son solde, sa station associée et ses paramètres de configuration. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit avoir accès à la trésorerie concernée via sa compagnie ou sa station.",
             tags=["Tresorerie"])
-async def get_tresorerie_by_id(
+def get_tresorerie_by_id(
     tresorerie_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -356,7 +356,7 @@ async def get_tresorerie_by_id(
             summary="Mettre à jour une trésorerie",
             description="Met à jour les informations d'une trésorerie existante. Permet de modifier les détails d'une trésorerie, comme son nom, sa devise ou ses paramètres de configuration. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit avoir accès à la trésorerie concernée via sa compagnie ou sa station.",
             tags=["Tresorerie"])
-async def update_tresorerie(
+def update_tresorerie(
     tresorerie_id: uuid.UUID,
     tresorerie: schemas.TresorerieUpdate,
     db: Session = Depends(get_db),
@@ -368,7 +368,7 @@ async def update_tresorerie(
                 summary="Supprimer une trésorerie",
                 description="Supprime une trésorerie du système. Cette opération effectue une suppression logique de la trésorerie. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit avoir accès à la trésorerie concernée via sa compagnie ou sa station. Ne doit être effectuée que si la trésorerie n'a pas d'opérations en cours ou liées.",
                 tags=["Tresorerie"])
-async def delete_tresorerie(
+def delete_tresorerie(
     tresorerie_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -382,7 +382,7 @@ async def delete_tresorerie(
             summary="Récupérer le solde d'une trésorerie",
             description="Récupère les informations et le solde actuel d'une trésorerie spécifique par son identifiant. Le solde actuel est calculé à partir de l'ensemble des tresoreries station associées à cette trésorerie. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la trésorerie concernée.",
             tags=["Tresorerie"])
-async def get_solde_tresorerie(
+def get_solde_tresorerie(
     tresorerie_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -396,7 +396,7 @@ async def get_solde_tresorerie(
             summary="Récupérer une association trésorerie-station",
             description="Récupère les détails d'une association trésorerie-station spécifique par son identifiant. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
             tags=["Tresorerie"])
-async def get_tresorerie_station_by_id(
+def get_tresorerie_station_by_id(
     tresorerie_station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -409,7 +409,7 @@ async def get_tresorerie_station_by_id(
             summary="Mettre à jour une association trésorerie-station",
             description="Met à jour les informations d'une association trésorerie-station existante. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
             tags=["Tresorerie"])
-async def update_tresorerie_station(
+def update_tresorerie_station(
     tresorerie_station_id: uuid.UUID,
     tresorerie_station: schemas.TresorerieStationUpdate,
     db: Session = Depends(get_db),
@@ -422,7 +422,7 @@ async def update_tresorerie_station(
                 summary="Supprimer une association trésorerie-station",
                 description="Supprime une association trésorerie-station du système. Cette opération dissocie la trésorerie de la station. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
                 tags=["Tresorerie"])
-async def delete_tresorerie_station(
+def delete_tresorerie_station(
     tresorerie_station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -435,7 +435,7 @@ async def delete_tresorerie_station(
             summary="Récupérer tous les mouvements d'une trésorerie spécifique",
             description="Récupère la liste de tous les mouvements d'une trésorerie spécifique par son identifiant, avec pagination. Nécessite la permission 'Module Trésorerie'. L'utilisateur ne peut voir que les mouvements liés à sa compagnie.",
             tags=["Tresorerie"])
-async def get_mouvements_by_tresorerie(
+def get_mouvements_by_tresorerie(
     tresorerie_id: uuid.UUID,
     skip: int = 0,
     limit: int = 100,
@@ -452,7 +452,7 @@ async def get_mouvements_by_tresorerie(
             summary="Récupérer le solde d'une trésorerie par station",
             description="Récupère le solde actuel d'une trésorerie pour une station spécifique. Le solde est calculé à partir des mouvements enregistrés. Nécessite la permission 'Module Trésorerie'. L'utilisateur doit appartenir à la même compagnie que la station concernée.",
             tags=["Tresorerie"])
-async def get_solde_tresorerie_station(
+def get_solde_tresorerie_station(
     tresorerie_station_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -466,7 +466,7 @@ async def get_solde_tresorerie_station(
             summary="Récupérer les mouvements de trésorerie liés à une vente",
             description="Récupère la liste des mouvements de trésorerie associés à une vente spécifique. Nécessite la permission 'Module Trésorerie'. L'utilisateur ne peut voir que les mouvements liés à sa compagnie.",
             tags=["Tresorerie"])
-async def get_mouvements_vente(
+def get_mouvements_vente(
     vente_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -480,7 +480,7 @@ async def get_mouvements_vente(
             summary="Récupérer les mouvements de trésorerie liés à un achat",
             description="Récupère la liste des mouvements de trésorerie associés à un achat spécifique. Nécessite la permission 'Module Trésorerie'. L'utilisateur ne peut voir que les mouvements liés à sa compagnie.",
             tags=["Tresorerie"])
-async def get_mouvements_achat(
+def get_mouvements_achat(
     achat_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -494,7 +494,7 @@ async def get_mouvements_achat(
             summary="Récupérer les mouvements de trésorerie liés à un transfert",
             description="Récupère la liste des mouvements de trésorerie associés à un transfert spécifique. Nécessite la permission 'Module Trésorerie'. L'utilisateur ne peut voir que les mouvements liés à sa compagnie.",
             tags=["Tresorerie"])
-async def get_mouvements_transfert(
+def get_mouvements_transfert(
     transfert_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -508,7 +508,7 @@ async def get_mouvements_transfert(
             summary="Récupérer les mouvements de trésorerie liés à une charge",
             description="Récupère la liste des mouvements de trésorerie associés à une charge spécifique. Nécessite la permission 'Module Trésorerie'. L'utilisateur ne peut voir que les mouvements liés à sa compagnie.",
             tags=["Tresorerie"])
-async def get_mouvements_charge(
+def get_mouvements_charge(
     charge_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Trésorerie"))
@@ -1,7 +1,7 @@
 from typing import Optional
 from pydantic import Field, BaseModel
 from fastapi import Query
-from .pagination import BaseFilterParams
+from .pagination import BaseFilterParams, CurseurParams
 
 
 class ProduitFilterParams(BaseFilterParams):
@@ -140,7 +140,7 @@ class VenteCarburantFilterParams(BaseFilterParams):
     quantite_max: Optional[float] = Query(None, ge=0, description="Quantité maximum vendue")
 
 
-class MouvementStockFilterParams(BaseFilterParams):
+class MouvementStockFilterParams(BaseFilterParams, CurseurParams):
     """
     Paramètres de filtre pour les mouvements de stock
     """
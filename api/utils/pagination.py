@@ -1,6 +1,13 @@
-from typing import Generic, TypeVar, Optional, List
+from typing import Generic, TypeVar, Optional, List, Tuple, Any
 from pydantic import BaseModel, Field
-from fastapi import Query
+from fastapi import Query, HTTPException
+from datetime import date, datetime
+from decimal import Decimal
+import base64
+import json
+import uuid
+
+from sqlalchemy import tuple_
 
 
 T = TypeVar('T')
@@ -14,6 +21,14 @@ class PaginationParams(BaseModel):
     limit: int = Query(100, ge=1, le=1000, description="Nombre maximum d'éléments à retourner")
 
 
+class CurseurParams(BaseModel):
+    """
+    Paramètres de la pagination par curseur (keyset), proposée par les listes volumineuses
+    """
+    cursor: Optional[str] = Query(None, description="Curseur opaque (next_cursor de la page précédente) : la page suivante est lue par clé, skip est ignoré")
+    comptage: str = Query("exact", pattern="^(exact|estime|aucun)$", description="Calcul du total : exact (COUNT), estime (estimation du planificateur) ou aucun")
+
+
 class SortParams(BaseModel):
     """
     Paramètres pour le tri
@@ -51,9 +66,144 @@ class PaginatedResponse(BaseModel, Generic[T]):
     Réponse paginée contenant une liste d'éléments avec des métadonnées de pagination
     """
     items: List[T]
-    total: int
+    total: Optional[int] = Field(description="Nombre total d'éléments (estimé ou absent selon le paramètre comptage)")
     skip: int
     limit: int
     has_more: bool = Field(description="Indique s'il y a plus d'éléments disponibles")
+    next_cursor: Optional[str] = Field(None, description="Curseur de la page suivante, à passer dans le paramètre cursor")
+
+    model_config = {'from_attributes': True}
+
+
+def encoder_curseur(valeur_tri: Any, identifiant: Any) -> str:
+    """
+    Encode la position d'un élément (valeur de la clé de tri, identifiant) en un curseur opaque
+    """
+    if isinstance(valeur_tri, (datetime, date)):
+        valeur_tri = valeur_tri.isoformat()
+    elif isinstance(valeur_tri, (Decimal, uuid.UUID)):
+        valeur_tri = str(valeur_tri)
+    contenu = json.dumps([valeur_tri, str(identifiant)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(contenu.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decoder_curseur(curseur: str, colonne_tri, colonne_id) -> Tuple[Any, Any]:
+    """
+    Décode un curseur en (valeur de la clé de tri, identifiant), convertis aux types des colonnes
+
+    :raises HTTPException: 400 si le curseur est invalide
+    """
+    try:
+        contenu = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4))
+        valeur_tri, identifiant = json.loads(contenu)
+        return _convertir(colonne_tri, valeur_tri), _convertir(colonne_id, identifiant)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+
+def _convertir(colonne, valeur):
+    try:
+        type_python = colonne.type.python_type
+    except NotImplementedError:
+        return valeur
+    if valeur is None:
+        return None
+    if type_python is datetime:
+        return datetime.fromisoformat(valeur)
+    if type_python is date:
+        return date.fromisoformat(valeur)
+    if type_python in (uuid.UUID, Decimal):
+        return type_python(valeur)
+    return valeur
+
+
+def colonne_acceptant_null(colonne) -> bool:
+    """
+    Indique si la colonne peut contenir NULL (les expressions qui ne sont pas des colonnes sont supposées l'accepter)
+    """
+    return getattr(getattr(colonne, "expression", colonne), "nullable", True)
+
+
+def estimer_total(query) -> Optional[int]:
+    """
+    Estime le nombre de lignes d'une requête à partir du plan de PostgreSQL (EXPLAIN), sans la parcourir
+    """
+    session = query.session
+    # render_postcompile : les paramètres « expanding » des filtres .in_() sont développés dans le SQL
+    compilee = query.statement.compile(
+        dialect=session.get_bind().dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compilee}", compilee.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"]) if plan else None
+
+
+def paginer_requete(
+    query,
+    colonne_tri,
+    colonne_id,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    comptage: str = "exact",
+    descendant: bool = True
+) -> PaginatedResponse:
+    """
+    Pagine une requête SQLAlchemy triée sur (colonne_tri, colonne_id).
+
+    Sans curseur, la page est lue par OFFSET/LIMIT (comportement historique) ; avec le curseur d'une page
+    précédente, elle est lue par clé (keyset) : WHERE (colonne_tri, colonne_id) < (dernière valeur, dernier id),
+    dont le coût ne dépend pas de la profondeur de la page. Chaque page renvoie le curseur de la suivante.
+    Une colonne de tri qui accepte NULL n'a pas de curseur (une comparaison avec NULL n'est jamais vraie) :
+    ses pages sont lues par skip et un curseur reçu pour elle est refusé.
+
+    :param comptage: "exact" (COUNT), "estime" (estimation du planificateur) ou "aucun"
+    :param descendant: Ordre de tri (le plus récent en premier par défaut)
+    :raises HTTPException: 400 si le curseur est invalide ou si la colonne de tri accepte NULL
+    """
+    pagination_par_cle = not colonne_acceptant_null(colonne_tri)
+    if cursor and not pagination_par_cle:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La pagination par curseur n'est pas possible sur {colonne_tri.key}, qui accepte des valeurs nulles : utiliser skip"
+        )
+
+    if comptage == "exact":
+        total = query.order_by(None).count()
+    elif comptage == "estime":
+        total = estimer_total(query.order_by(None))
+    else:
+        total = None
+
+    if cursor:
+        valeur_tri, identifiant = decoder_curseur(cursor, colonne_tri, colonne_id)
+        position = tuple_(colonne_tri, colonne_id)
+        query = query.filter(position < (valeur_tri, identifiant) if descendant else position > (valeur_tri, identifiant))
+        skip = 0
+
+    if descendant:
+        query = query.order_by(None).order_by(colonne_tri.desc(), colonne_id.desc())
+    else:
+        query = query.order_by(None).order_by(colonne_tri.asc(), colonne_id.asc())
+
+    # Lire un élément de plus que demandé pour savoir s'il existe une page suivante
+    items = query.offset(skip).limit(limit + 1).all() if skip else query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    next_cursor = None
+    if has_more and items and pagination_par_cle:
+        dernier = items[-1]
+        next_cursor = encoder_curseur(getattr(dernier, colonne_tri.key), getattr(dernier, colonne_id.key))
 
-    model_config = {'from_attributes': True}
\ No newline at end of file
+    return PaginatedResponse(
+        items=items,
+        total=total,
+        skip=skip,
+        limit=limit,
+        has_more=has_more,
+        next_cursor=next_cursor
+    )
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
 import uuid
 from ..database import get_db
 from . import schemas
-from ..utils.pagination import PaginatedResponse
+from ..utils.pagination import PaginatedResponse, CurseurParams
 from ..auth.auth_handler import get_current_user_security
 from ..rbac_decorators import require_permission
 from ..services.ventes import (
@@ -17,11 +18,14 @@ from ..services.ventes import (
     get_vente_details as service_get_vente_details,
     get_ventes_carburant as service_get_ventes_carburant,
     create_vente_carburant as service_create_vente_carburant,
+    cloturer_poste_carburant as service_cloturer_poste_carburant,
     get_vente_carburant_by_id as service_get_vente_carburant_by_id,
     update_vente_carburant as service_update_vente_carburant,
     delete_vente_carburant as service_delete_vente_carburant,
     get_creances_employes as service_get_creances_employes,
-    get_creance_employe_by_id as service_get_creance_employe_by_id
+    get_creance_employe_by_id as service_get_creance_employe_by_id,
+    get_statistiques_ventes as service_get_statistiques_ventes,
+    reconstruire_cumuls_ventes as service_reconstruire_cumuls_ventes
 )
 
 router = APIRouter(
@@ -37,7 +41,7 @@ security = HTTPBearer()
             summary="Récupérer les ventes de produits",
             description="Récupérer la liste des ventes de produits avec pagination. Cet endpoint permet de consulter toutes les ventes effectuées dans le module de boutique, avec filtrage possible par utilisateur, station et compagnie. Nécessite la permission 'Module Ventes Boutique'.",
             tags=["Ventes"])
-async def get_ventes(
+def get_ventes(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -68,7 +72,7 @@ async def get_ventes(
              summary="Créer une nouvelle vente de produits",
              description="Crée une nouvelle vente de produits dans le système. Cet endpoint permet d'enregistrer une vente avec ses détails, y compris les produits vendus, les quantités, les prix et les éventuelles remises. Nécessite la permission 'Module Ventes Boutique'.",
              tags=["Ventes"])
-async def create_vente(
+def create_vente(
     vente: schemas.VenteCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Boutique"))
@@ -98,9 +102,10 @@ async def create_vente(
             summary="Récupérer les ventes de carburant",
             description="Récupérer la liste des ventes de carburant avec pagination. Cet endpoint permet de consulter toutes les ventes de carburant effectuées, y compris les détails de quantité vendue, prix, indices de pistolet et éventuels écarts de mesure. Nécessite la permission 'Module Ventes Carburant'.",
             tags=["Ventes"])
-async def get_ventes_carburant(
+def get_ventes_carburant(
     skip: int = 0,
     limit: int = 100,
+    curseur: CurseurParams = Depends(),
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Carburant"))
 ):
@@ -122,14 +127,14 @@ async def get_ventes_carburant(
     Raises:
         HTTPException: Si l'utilisateur n'a pas la permission d'accéder à ce module
     """
-    return service_get_ventes_carburant(db, current_user, skip, limit)
+    return service_get_ventes_carburant(db, current_user, skip, limit, curseur.cursor, curseur.comptage)
 
 @router.post("/carburant",
              response_model=schemas.VenteCarburantResponse,
              summary="Créer une nouvelle vente de carburant",
              description="Crée une nouvelle vente de carburant dans le système. Cet endpoint permet d'enregistrer une vente de carburant avec les détails de quantité vendue, indices de pistolet, prix de vente et informations sur le pompiste. Nécessite la permission 'Module Ventes Carburant'.",
              tags=["Ventes"])
-async def create_vente_carburant(
+def create_vente_carburant(
     vente_carburant: schemas.VenteCarburantCreate,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Carburant"))
@@ -154,13 +159,39 @@ async def create_vente_carburant(
     # Appel au service pour créer la vente carburant
     return service_create_vente_carburant(db, current_user, vente_carburant)
 
+@router.post("/carburant/cloture",
+             response_model=schemas.ClotureCarburantResponse,
+             summary="Clôturer un poste de ventes de carburant",
+             description="Enregistre en un appel les relevés d'index de tous les pistolets d'une station en fin de poste. Les lignes sont validées et valorisées ensemble puis enregistrées en une seule transaction ; les lignes invalides sont rejetées avec leur motif sans bloquer les autres. Nécessite la permission 'Module Ventes Carburant'.",
+             tags=["Ventes"])
+def cloturer_poste_carburant(
+    cloture: schemas.ClotureCarburantCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_permission("Module Ventes Carburant"))
+):
+    """
+    Clôture un poste : crée les ventes de carburant de tous les pistolets relevés.
+
+    Args:
+        cloture (schemas.ClotureCarburantCreate): Station, date de clôture et relevés d'index des pistolets
+        db (Session): Session de base de données
+        current_user: Informations sur l'utilisateur connecté (fourni par le décorateur de permission)
+
+    Returns:
+        schemas.ClotureCarburantResponse: Ventes enregistrées et lignes rejetées
+
+    Raises:
+        HTTPException: Si la station n'appartient pas à la compagnie de l'utilisateur
+    """
+    return service_cloturer_poste_carburant(db, current_user, cloture)
+
 # Endpoints pour les créances employés
 @router.get("/creances_employes",
             response_model=PaginatedResponse[schemas.CreanceEmployeResponse],
             summary="Récupérer les créances des employés",
             description="Récupérer la liste des créances des employés avec pagination. Cet endpoint permet de consulter toutes les créances liées aux employés (notamment les pompistes) pour les ventes de carburant, y compris les montants dus, les montants payés et les dates d'échéance. Nécessite la permission 'Module Ventes Carburant'.",
             tags=["Ventes"])
-async def get_creances_employes(
+def get_creances_employes(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -186,13 +217,86 @@ async def get_creances_employes(
     """
     return service_get_creances_employes(db, current_user, skip, limit)
 
+# Endpoints pour les statistiques de ventes
+@router.get("/statistiques",
+            response_model=schemas.StatistiquesVentesResponse,
+            summary="Récupérer les statistiques de ventes",
+            description="Retourne, pour une période, les volumes, chiffres d'affaires, coûts au coût moyen pondéré, marges et nombres de transactions des ventes de carburant et boutique, par station et article, détaillés par jour ou cumulés sur la période. Les statistiques sont lues dans les cumuls journaliers tenus à jour à chaque vente et annulation. Nécessite la permission 'Module Ventes Carburant'.",
+            tags=["Ventes"])
+def get_statistiques_ventes(
+    date_debut: date = Query(..., description="Premier jour de la période (YYYY-MM-DD)"),
+    date_fin: date = Query(..., description="Dernier jour de la période (YYYY-MM-DD)"),
+    station_id: Optional[uuid.UUID] = Query(None, description="Limiter aux ventes d'une station"),
+    type_vente: Optional[str] = Query(None, pattern="^(carburant|boutique)$", description="Limiter aux ventes de carburant ou boutique"),
+    par_jour: bool = Query(True, description="Détailler par jour (sinon cumul sur la période)"),
+    db: Session = Depends(get_db),
+    current_user = Depends(require_permission("Module Ventes Carburant"))
+):
+    """
+    Récupère les statistiques de ventes d'une période.
+
+    Args:
+        date_debut (date): Premier jour de la période
+        date_fin (date): Dernier jour de la période
+        station_id (uuid.UUID): Station à considérer (toutes les stations de la compagnie par défaut)
+        type_vente (str): carburant ou boutique (les deux par défaut)
+        par_jour (bool): Détailler les statistiques par jour
+        db (Session): Session de base de données
+        current_user: Informations sur l'utilisateur connecté (fourni par le décorateur de permission)
+
+    Returns:
+        schemas.StatistiquesVentesResponse: Totaux de la période et lignes par station, article (et jour)
+
+    Raises:
+        HTTPException: Si la période est invalide ou si la station n'appartient pas à la compagnie de l'utilisateur
+    """
+    return service_get_statistiques_ventes(db, current_user, date_debut, date_fin, station_id, type_vente, par_jour)
+
+@router.post("/statistiques/reconstruire",
+             response_model=schemas.ReconstructionCumulsVentesResponse,
+             summary="Reconstruire les cumuls journaliers des ventes",
+             description="Recalcule les cumuls journaliers des ventes à partir des ventes enregistrées, pour une station ou toutes les stations de la compagnie, sur une période ou tout l'historique. Les cumuls sont normalement tenus à jour automatiquement ; cette reconstruction sert aux réparations. Nécessite la permission 'Module Ventes Carburant' et le rôle gérant de compagnie ou administrateur.",
+             tags=["Ventes"])
+def reconstruire_cumuls_ventes(
+    station_id: Optional[uuid.UUID] = Query(None, description="Station à reconstruire (toutes par défaut)"),
+    date_debut: Optional[date] = Query(None, description="Premier jour à reconstruire (tout l'historique par défaut)"),
+    date_fin: Optional[date] = Query(None, description="Dernier jour à reconstruire"),
+    db: Session = Depends(get_db),
+    current_user = Depends(require_permission("Module Ventes Carburant"))
+):
+    """
+    Reconstruit les cumuls journaliers des ventes.
+
+    Args:
+        station_id (uuid.UUID): Station à reconstruire (toutes les stations de la compagnie par défaut)
+        date_debut (date): Premier jour à reconstruire
+        date_fin (date): Dernier jour à reconstruire
+        db (Session): Session de base de données
+        current_user: Informations sur l'utilisateur connecté (fourni par le décorateur de permission)
+
+    Returns:
+        schemas.ReconstructionCumulsVentesResponse: Nombre de cumuls reconstruits
+
+    Raises:
+        HTTPException: Si l'utilisateur n'est ni gérant de compagnie ni administrateur
+    """
+    # Reconstruction à l'échelle de la compagnie : réservée aux gérants, comme celle du coût moyen
+    if current_user.role not in ["admin", "gerant_compagnie"]:
+        raise HTTPException(
+            status_code=403,
+            detail="Permissions insuffisantes pour reconstruire les cumuls des ventes"
+        )
+
+    nombre_cumuls = service_reconstruire_cumuls_ventes(db, current_user, station_id, date_debut, date_fin)
+    return {"nombre_cumuls": nombre_cumuls, "message": "Cumuls des ventes reconstruits"}
+
 # Définir les routes avec paramètres après les routes avec chemins fixes
 @router.get("/{vente_id}",
             response_model=schemas.VenteResponse,
             summary="Récupérer une vente de produit par ID",
             description="Récupère les détails d'une vente de produit spécifique par son identifiant. Cet endpoint permet d'obtenir toutes les informations relatives à une vente spécifique, y compris ses détails de produits vendus. Nécessite la permission 'Module Ventes Boutique'.",
             tags=["Ventes"])
-async def get_vente_by_id(
+def get_vente_by_id(
     vente_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Boutique"))
@@ -221,7 +325,7 @@ async def get_vente_by_id(
             summary="Mettre à jour une vente de produit",
             description="Met à jour les informations d'une vente de produit existante. Cet endpoint permet de modifier les détails d'une vente, comme le client, la date, le statut ou le numéro de pièce comptable. Nécessite la permission 'Module Ventes Boutique'.",
             tags=["Ventes"])
-async def update_vente(
+def update_vente(
     vente_id: uuid.UUID,
     vente: schemas.VenteUpdate,
     db: Session = Depends(get_db),
@@ -251,7 +355,7 @@ async def update_vente(
                summary="Supprimer une vente de produit",
                description="Supprime une vente de produit du système. Cet endpoint effectue une suppression logique de la vente en mettant à jour son statut. Nécessite la permission 'Module Ventes Boutique'.",
                tags=["Ventes"])
-async def delete_vente(
+def delete_vente(
     vente_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Boutique"))
@@ -279,7 +383,7 @@ async def delete_vente(
             summary="Récupérer les détails d'une vente",
             description="Récupère les détails d'une vente spécifique, y compris les produits vendus, les quantités, les prix unitaires et les montants. Nécessite la permission 'Module Ventes Boutique'.",
             tags=["Ventes"])
-async def get_vente_details(
+def get_vente_details(
     vente_id: uuid.UUID,
     skip: int = 0,
     limit: int = 100,
@@ -312,7 +416,7 @@ async def get_vente_details(
             summary="Récupérer une vente de carburant par ID",
             description="Récupère les détails d'une vente de carburant spécifique par son identifiant. Cet endpoint permet d'obtenir toutes les informations relatives à une vente de carburant spécifique, y compris les indices de pistolet, les mesures et les éventuels écarts. Nécessite la permission 'Module Ventes Carburant'.",
             tags=["Ventes"])
-async def get_vente_carburant_by_id(
+def get_vente_carburant_by_id(
     vente_carburant_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Carburant"))
@@ -342,7 +446,7 @@ async def get_vente_carburant_by_id(
             summary="Mettre à jour une vente de carburant",
             description="Met à jour les informations d'une vente de carburant existante. Cet endpoint permet de modifier les détails d'une vente de carburant, comme le mode de paiement, le montant payé, ou le statut. Nécessite la permission 'Module Ventes Carburant'.",
             tags=["Ventes"])
-async def update_vente_carburant(
+def update_vente_carburant(
     vente_carburant_id: uuid.UUID,
     vente_carburant: schemas.VenteCarburantUpdate,
     db: Session = Depends(get_db),
@@ -372,7 +476,7 @@ async def update_vente_carburant(
                summary="Supprimer une vente de carburant",
                description="Supprime une vente de carburant du système. Cet endpoint effectue une suppression logique de la vente en mettant à jour son statut. Nécessite la permission 'Module Ventes Carburant'.",
                tags=["Ventes"])
-async def delete_vente_carburant(
+def delete_vente_carburant(
     vente_carburant_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Carburant"))
@@ -400,7 +504,7 @@ async def delete_vente_carburant(
             summary="Récupérer une créance employé par ID",
             description="Récupère les détails d'une créance d'employé spécifique par son identifiant. Cet endpoint permet d'obtenir toutes les informations relatives à une créance d'employé spécifique, y compris le montant dû, le montant payé et la date d'échéance. Nécessite la permission 'Module Ventes Carburant'.",
             tags=["Ventes"])
-async def get_creance_employe_by_id(
+def get_creance_employe_by_id(
     creance_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user = Depends(require_permission("Module Ventes Carburant"))
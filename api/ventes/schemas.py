@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Union
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, date
 import uuid
 
 class VenteDetailCreate(BaseModel):
@@ -92,6 +92,11 @@ class VenteCreate(BaseModel):
         description="Identifiant de la trésorerie utilisée pour la vente",
         example="123e4567-e89b-12d3-a456-426614174002"
     )
+    station_id: Optional[uuid.UUID] = Field(
+        None,
+        description="Station de la vente, parmi celles de la trésorerie (obligatoire si la trésorerie est rattachée à plusieurs stations)",
+        example="123e4567-e89b-12d3-a456-426614174003"
+    )
     details: List[VenteDetailCreate] = Field(
         ...,
         description="Détails des produits vendus dans cette vente"
@@ -653,4 +658,127 @@ class CreanceEmployeResponse(BaseModel):
     )
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class LigneClotureCarburant(BaseModel):
+    cuve_id: uuid.UUID = Field(
+        ...,
+        description="Identifiant unique de la cuve alimentant le pistolet",
+        example="123e4567-e89b-12d3-a456-426614174004"
+    )
+    pistolet_id: uuid.UUID = Field(
+        ...,
+        description="Identifiant unique du pistolet relevé",
+        example="123e4567-e89b-12d3-a456-426614174005"
+    )
+    carburant_id: Optional[uuid.UUID] = Field(
+        None,
+        description="Identifiant du type de carburant vendu (celui de la cuve par défaut)",
+        example="123e4567-e89b-12d3-a456-426614174006"
+    )
+    index_initial: Union[float, Decimal] = Field(
+        ...,
+        ge=0,
+        description="Index du pistolet en début de poste",
+        example=1250.0
+    )
+    index_final: Union[float, Decimal] = Field(
+        ...,
+        ge=0,
+        description="Index du pistolet en fin de poste",
+        example=1475.0
+    )
+    quantite_vendue: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Quantité vendue en litres (différence des index par défaut)",
+        example=225.0
+    )
+    pompiste: str = Field(
+        ...,
+        description="Nom du pompiste en charge du pistolet",
+        example="M. Diop"
+    )
+    qualite_marshalle_id: Optional[uuid.UUID] = Field(
+        None,
+        description="Identifiant du contrôleur qualité qui a vérifié le relevé",
+        example="123e4567-e89b-12d3-a456-426614174008"
+    )
+    montant_paye: Optional[float] = Field(
+        0,
+        ge=0,
+        description="Montant encaissé pour ce pistolet",
+        example=281250.0
+    )
+    mode_paiement: Optional[str] = Field(
+        None,
+        description="Mode de paiement utilisé (espèce, chèque, carte crédit, note de crédit, crédit client)",
+        example="espèce"
+    )
+    tresorerie_id: Optional[uuid.UUID] = Field(
+        None,
+        description="Trésorerie de l'encaissement (celle de la clôture par défaut)",
+        example="123e4567-e89b-12d3-a456-426614174002"
+    )
+
+class ClotureCarburantCreate(BaseModel):
+    station_id: uuid.UUID = Field(
+        ...,
+        description="Identifiant unique de la station dont le poste est clôturé",
+        example="123e4567-e89b-12d3-a456-426614174003"
+    )
+    date_vente: datetime = Field(
+        ...,
+        description="Date et heure de clôture du poste",
+        example="2023-10-15T14:00:00"
+    )
+    utilisateur_id: uuid.UUID = Field(
+        ...,
+        description="Identifiant de l'utilisateur qui enregistre la clôture",
+        example="123e4567-e89b-12d3-a456-426614174009"
+    )
+    tresorerie_id: Optional[uuid.UUID] = Field(
+        None,
+        description="Trésorerie par défaut des encaissements du poste",
+        example="123e4567-e89b-12d3-a456-426614174002"
+    )
+    lignes: List[LigneClotureCarburant] = Field(
+        ...,
+        min_length=1,
+        description="Relevés d'index de tous les pistolets du poste"
+    )
+
+class ErreurLigneCloture(BaseModel):
+    ligne: int = Field(..., description="Position de la ligne en erreur dans la requête (à partir de 0)", example=3)
+    pistolet_id: uuid.UUID = Field(..., description="Pistolet de la ligne en erreur")
+    detail: str = Field(..., description="Motif du rejet de la ligne", example="Prix de vente non trouvé pour ce carburant et cette station")
+
+class ClotureCarburantResponse(BaseModel):
+    nombre_lignes: int = Field(..., description="Nombre de lignes reçues", example=12)
+    nombre_ventes: int = Field(..., description="Nombre de ventes enregistrées", example=11)
+    montant_total: float = Field(..., description="Montant total des ventes enregistrées", example=3093750.0)
+    ventes: List[VenteCarburantResponse] = Field(..., description="Ventes enregistrées")
+    erreurs: List[ErreurLigneCloture] = Field(..., description="Lignes rejetées et motif du rejet")
+
+class StatistiqueVenteLigne(BaseModel):
+    type_vente: str = Field(..., description="Type de vente : carburant ou boutique", example="carburant")
+    station_id: uuid.UUID = Field(..., description="Station des ventes")
+    article_id: uuid.UUID = Field(..., description="Carburant (ventes carburant) ou produit (ventes boutique)")
+    jour: Optional[date] = Field(None, description="Jour des ventes (absent si les statistiques couvrent toute la période)", example="2023-10-15")
+    quantite: float = Field(..., description="Volume (litres) ou quantité vendue", example=4520.0)
+    chiffre_affaires: float = Field(..., description="Chiffre d'affaires", example=3390000.0)
+    cout_cmp: float = Field(..., description="Coût des ventes au coût moyen pondéré", example=2938000.0)
+    marge: float = Field(..., description="Marge au coût moyen pondéré", example=452000.0)
+    nombre_transactions: int = Field(..., description="Nombre de ventes (carburant) ou de lignes de vente (boutique)", example=37)
+
+class StatistiquesVentesResponse(BaseModel):
+    date_debut: date = Field(..., description="Premier jour de la période", example="2023-10-01")
+    date_fin: date = Field(..., description="Dernier jour de la période", example="2023-10-31")
+    chiffre_affaires: float = Field(..., description="Chiffre d'affaires total de la période", example=101700000.0)
+    cout_cmp: float = Field(..., description="Coût total des ventes au coût moyen pondéré", example=88140000.0)
+    marge: float = Field(..., description="Marge totale au coût moyen pondéré", example=13560000.0)
+    nombre_transactions: int = Field(..., description="Nombre total de transactions", example=1130)
+    lignes: List[StatistiqueVenteLigne] = Field(..., description="Statistiques par station, article (et jour)")
+
+class ReconstructionCumulsVentesResponse(BaseModel):
+    nombre_cumuls: int = Field(..., description="Nombre de cumuls journaliers reconstruits", example=248)
+    message: str = Field(..., description="Message de confirmation", example="Cumuls des ventes reconstruits")
@@ -0,0 +1,84 @@
+"""
+Nombre de requêtes SQL du bilan consolidé en fonction du nombre de stations.
+
+Le bilan est calculé sur des sous-ensembles croissants des stations d'une compagnie
+(1, 2, 4, ... toutes) ; le nombre de requêtes doit rester constant, seule la durée varie
+avec le volume de données. Nécessite une base renseignée (variable DATABASE_URL).
+
+Exemples :
+    python benchmarks/bilan_consolide_requetes.py --compagnie-id <uuid>
+    python benchmarks/bilan_consolide_requetes.py --compagnie-id <uuid> --date-debut 2025-01-01 --date-fin 2025-12-31
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def _charger_modeles():
+    # Les routers déclarent les modèles référencés par les relations (plan comptable, écritures, ...)
+    from api.main import create_app
+    create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compagnie-id", required=True, help="Compagnie dont les stations sont consolidées")
+    parser.add_argument("--date-debut", default=f"{datetime.now().year}-01-01", help="Début de période (YYYY-MM-DD)")
+    parser.add_argument("--date-fin", default=datetime.now().strftime("%Y-%m-%d"), help="Fin de période (YYYY-MM-DD)")
+    parser.add_argument("--repetitions", type=int, default=3, help="Nombre de calculs par palier (meilleure durée retenue)")
+    args = parser.parse_args()
+
+    _charger_modeles()
+
+    from sqlalchemy import event
+    from api.database.db_config import SessionLocal, engine
+    from api.models import Station
+    from api.bilans.consolidation_service import calculer_totaux_stations
+
+    compteur = {"requetes": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def compter(conn, cursor, statement, parameters, context, executemany):
+        compteur["requetes"] += 1
+
+    date_debut = datetime.strptime(args.date_debut, "%Y-%m-%d")
+    date_fin_exclue = datetime.strptime(args.date_fin, "%Y-%m-%d") + timedelta(days=1)
+
+    db = SessionLocal()
+    try:
+        station_ids = [
+            station_id for (station_id,) in db.query(Station.id).filter(
+                Station.compagnie_id == args.compagnie_id
+            ).order_by(Station.id).all()
+        ]
+        if not station_ids:
+            print("Aucune station pour cette compagnie")
+            return
+
+        paliers = []
+        taille = 1
+        while taille < len(station_ids):
+            paliers.append(taille)
+            taille *= 2
+        paliers.append(len(station_ids))
+
+        print(f"{'stations':>10} {'requêtes':>10} {'durée (ms)':>12}")
+        for taille in paliers:
+            meilleure_duree = None
+            for _ in range(max(1, args.repetitions)):
+                compteur["requetes"] = 0
+                debut = time.perf_counter()
+                calculer_totaux_stations(db, station_ids[:taille], date_debut, date_fin_exclue)
+                duree = time.perf_counter() - debut
+                meilleure_duree = duree if meilleure_duree is None else min(meilleure_duree, duree)
+            print(f"{taille:>10} {compteur['requetes']:>10} {meilleure_duree * 1000:>12.1f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Test de charge : débit des endpoints en fonction du nombre de requêtes concurrentes.
+
+Deux modes :
+
+- sans argument, un serveur uvicorn local expose le même traitement bloquant
+  (simulant une requête SQLAlchemy synchrone) via un endpoint `async def` et via un
+  endpoint `def` exécuté dans le pool de threads. Le premier plafonne à ~1 requête
+  par latence quelle que soit la concurrence, le second monte en charge ;
+- avec --url, la même mesure est faite contre une instance déployée de l'API.
+
+Exemples :
+    python benchmarks/charge_concurrente.py
+    python benchmarks/charge_concurrente.py --url http://localhost:8000/api/v1/health
+    python benchmarks/charge_concurrente.py --url http://localhost:8000/api/v1/produits --token <jwt>
+"""
+import argparse
+import socket
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _requete(url: str, token: str = None) -> float:
+    entetes = {"Authorization": f"Bearer {token}"} if token else {}
+    debut = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url, headers=entetes), timeout=60) as reponse:
+        reponse.read()
+    return time.perf_counter() - debut
+
+
+def mesurer_debit(url: str, concurrence: int, nombre_requetes: int, token: str = None) -> dict:
+    """
+    Envoie `nombre_requetes` requêtes avec `concurrence` clients simultanés et retourne le débit et les latences
+    """
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as executor:
+        latences = sorted(executor.map(lambda _: _requete(url, token), range(nombre_requetes)))
+    duree = time.perf_counter() - debut
+    return {
+        "concurrence": concurrence,
+        "debit": nombre_requetes / duree,
+        "p50_ms": latences[len(latences) // 2] * 1000,
+        "p99_ms": latences[min(len(latences) - 1, int(len(latences) * 0.99))] * 1000,
+    }
+
+
+def afficher(titre: str, resultats: list):
+    print(f"\n{titre}")
+    print(f"{'concurrence':>12} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'gain':>7}")
+    base = resultats[0]["debit"]
+    for r in resultats:
+        print(f"{r['concurrence']:>12} {r['debit']:>10.1f} {r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f} {r['debit'] / base:>6.1f}x")
+
+
+def _port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def demarrer_serveur_demo(latence: float):
+    """
+    Démarre un serveur uvicorn local avec un endpoint bloquant `async def` et son équivalent `def`
+    """
+    import uvicorn
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.get("/async-bloquant")
+    async def async_bloquant():
+        time.sleep(latence)  # Requête synchrone dans une coroutine : bloque la boucle d'événements
+        return {"ok": True}
+
+    @app.get("/pool-threads")
+    def pool_threads():
+        time.sleep(latence)  # Même requête, exécutée dans le pool de threads
+        return {"ok": True}
+
+    port = _port_libre()
+    serveur = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=serveur.run, daemon=True).start()
+    while not serveur.started:
+        time.sleep(0.05)
+    return serveur, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL d'un endpoint de l'API à mesurer")
+    parser.add_argument("--token", help="Jeton d'accès Bearer pour les endpoints protégés")
+    parser.add_argument("--requetes", type=int, default=64, help="Nombre de requêtes par palier")
+    parser.add_argument("--concurrence", default="1,4,16", help="Paliers de concurrence, séparés par des virgules")
+    parser.add_argument("--latence", type=float, default=0.05, help="Durée de la requête simulée (mode démo), en secondes")
+    args = parser.parse_args()
+
+    paliers = [int(c) for c in args.concurrence.split(",")]
+
+    if args.url:
+        afficher(args.url, [mesurer_debit(args.url, c, args.requetes, args.token) for c in paliers])
+        return
+
+    serveur, base_url = demarrer_serveur_demo(args.latence)
+    try:
+        for chemin in ("/async-bloquant", "/pool-threads"):
+            afficher(
+                f"{chemin} (requête bloquante de {args.latence * 1000:.0f} ms)",
+                [mesurer_debit(base_url + chemin, c, args.requetes) for c in paliers]
+            )
+    finally:
+        serveur.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Test de charge : latence des autres endpoints pendant une rafale de connexions (changement d'équipe).
+
+Des clients envoient des connexions en continu pendant que d'autres interrogent un endpoint
+ordinaire ; le script rapporte les latences p50/p99 de ce dernier, sans puis avec la rafale.
+
+Deux modes :
+
+- sans argument, un serveur uvicorn local expose la même vérification bcrypt de trois façons :
+  dans une coroutine (sur la boucle d'événements), dans un endpoint `def` (pool de threads partagé
+  avec les autres endpoints) et via l'exécuteur de hachage borné de l'API. Un endpoint `def`
+  simulant une requête SQL courte sert de témoin ;
+- avec --url, la mesure est faite contre une instance déployée : rafale sur /auth/login avec
+  --login/--password, latences mesurées sur --url.
+
+Exemples :
+    python benchmarks/tempete_connexions.py
+    BCRYPT_ROUNDS=10 python benchmarks/tempete_connexions.py --connexions 16
+    python benchmarks/tempete_connexions.py --url http://localhost:8000/api/v1/health \\
+        --url-login http://localhost:8000/api/v1/auth/login --login gerant --password secret
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def _requete(url: str, token: str = None) -> float:
+    entetes = {"Authorization": f"Bearer {token}"} if token else {}
+    debut = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url, headers=entetes), timeout=60) as reponse:
+        reponse.read()
+    return time.perf_counter() - debut
+
+
+def _connexion(url_login: str, login: str, mot_de_passe: str):
+    corps = json.dumps({"login": login, "password": mot_de_passe}).encode()
+    requete = urllib.request.Request(url_login, data=corps, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(requete, timeout=60) as reponse:
+            reponse.read()
+    except urllib.error.HTTPError:
+        pass  # 401, 429 ou 503 : la rafale continue
+
+
+def mesurer_latences(url: str, concurrence: int, nombre_requetes: int, token: str = None) -> dict:
+    with ThreadPoolExecutor(max_workers=concurrence) as executor:
+        latences = sorted(executor.map(lambda _: _requete(url, token), range(nombre_requetes)))
+    return {
+        "p50_ms": latences[len(latences) // 2] * 1000,
+        "p99_ms": latences[min(len(latences) - 1, int(len(latences) * 0.99))] * 1000,
+    }
+
+
+def mesurer_pendant_rafale(url: str, url_login: str, login: str, mot_de_passe: str,
+                           connexions: int, concurrence: int, nombre_requetes: int, token: str = None) -> dict:
+    """
+    Mesure les latences de `url` pendant que `connexions` clients se connectent en boucle sur `url_login`
+    """
+    arret = threading.Event()
+
+    def rafale():
+        while not arret.is_set():
+            _connexion(url_login, login, mot_de_passe)
+
+    clients = [threading.Thread(target=rafale, daemon=True) for _ in range(connexions)]
+    for client in clients:
+        client.start()
+    time.sleep(0.5)  # Laisser la rafale s'installer
+    try:
+        return mesurer_latences(url, concurrence, nombre_requetes, token)
+    finally:
+        arret.set()
+        for client in clients:
+            client.join()
+
+
+def afficher(titre: str, resultats: list):
+    print(f"\n{titre}")
+    print(f"{'situation':>22} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for situation, r in resultats:
+        print(f"{situation:>22} {r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f}")
+
+
+def _port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def demarrer_serveur_demo(latence: float, threads_pool: int):
+    """
+    Démarre un serveur uvicorn local avec trois variantes de connexion et un endpoint témoin
+    """
+    import uvicorn
+    from fastapi import FastAPI, Body
+    from api.auth.hachage import pwd_context, verifier_mot_de_passe_async
+
+    app = FastAPI()
+    hachage = pwd_context.hash("secret")
+
+    @app.on_event("startup")
+    async def configurer_pool_threads():
+        from anyio import to_thread
+        to_thread.current_default_thread_limiter().total_tokens = threads_pool
+
+    @app.post("/login-boucle")
+    async def login_boucle(corps: dict = Body(...)):
+        return {"ok": pwd_context.verify(corps["password"], hachage)}  # bcrypt sur la boucle d'événements
+
+    @app.post("/login-pool-threads")
+    def login_pool_threads(corps: dict = Body(...)):
+        return {"ok": pwd_context.verify(corps["password"], hachage)}  # bcrypt dans le pool partagé
+
+    @app.post("/login-executeur")
+    async def login_executeur(corps: dict = Body(...)):
+        valide, _ = await verifier_mot_de_passe_async(corps["password"], hachage)  # Exécuteur borné
+        return {"ok": valide}
+
+    @app.get("/temoin")
+    def temoin():
+        time.sleep(latence)  # Requête SQL courte simulée
+        return {"ok": True}
+
+    port = _port_libre()
+    serveur = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=serveur.run, daemon=True).start()
+    while not serveur.started:
+        time.sleep(0.05)
+    return serveur, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL d'un endpoint de l'API dont mesurer la latence")
+    parser.add_argument("--url-login", help="URL de connexion de l'API (mode --url)")
+    parser.add_argument("--login", default="", help="Login utilisé pour la rafale (mode --url)")
+    parser.add_argument("--password", default="", help="Mot de passe utilisé pour la rafale (mode --url)")
+    parser.add_argument("--token", help="Jeton d'accès Bearer pour l'endpoint mesuré")
+    parser.add_argument("--connexions", type=int, default=8, help="Clients se connectant en boucle")
+    parser.add_argument("--concurrence", type=int, default=4, help="Clients simultanés sur l'endpoint mesuré")
+    parser.add_argument("--requetes", type=int, default=200, help="Requêtes envoyées à l'endpoint mesuré")
+    parser.add_argument("--latence", type=float, default=0.005, help="Durée de la requête témoin (mode démo), en secondes")
+    parser.add_argument("--threads-pool", type=int, default=8, help="Taille du pool de threads (mode démo)")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.url_login:
+            parser.error("--url-login est requis avec --url")
+        afficher(args.url, [
+            ("sans connexions", mesurer_latences(args.url, args.concurrence, args.requetes, args.token)),
+            (f"{args.connexions} connexions", mesurer_pendant_rafale(
+                args.url, args.url_login, args.login, args.password,
+                args.connexions, args.concurrence, args.requetes, args.token
+            )),
+        ])
+        return
+
+    serveur, base_url = demarrer_serveur_demo(args.latence, args.threads_pool)
+    url_temoin = base_url + "/temoin"
+    try:
+        resultats = [("sans connexions", mesurer_latences(url_temoin, args.concurrence, args.requetes))]
+        for chemin in ("/login-boucle", "/login-pool-threads", "/login-executeur"):
+            resultats.append((chemin.removeprefix("/login-"), mesurer_pendant_rafale(
+                url_temoin, base_url + chemin, "demo", "secret",
+                args.connexions, args.concurrence, args.requetes
+            )))
+        afficher(
+            f"/temoin (requête de {args.latence * 1000:.0f} ms) pendant {args.connexions} connexions en boucle",
+            resultats
+        )
+    finally:
+        serveur.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Mesure du temps de démarrage d'un worker dans un interpréteur neuf, avec `python -X importtime`, en deux temps :
+l'import du module (`import api.main`, sans effet de bord) puis la construction de l'application par sa
+fabrique (`create_app()` : configuration des logs, middlewares et import des routers).
+
+Le script rapporte la durée totale et celle de chaque étape, les modules de l'API les plus coûteux (durée
+cumulée, qui inclut leurs propres imports, et durée propre) et les dépendances externes les plus lourdes.
+Avec --budget-ms, il se termine en erreur si la durée totale médiane dépasse le budget (à utiliser en
+intégration continue). Aucune connexion à la base n'est nécessaire : le démarrage n'en ouvre pas, et les
+logs du démarrage sont écrits dans un répertoire temporaire.
+
+Exemples :
+    python benchmarks/temps_demarrage.py
+    python benchmarks/temps_demarrage.py --repetitions 5 --budget-ms 3000
+    python benchmarks/temps_demarrage.py --module api.ventes.router --fabrique "" --top 30
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RACINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+_LIGNE_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+# Exécuté dans l'interpréteur mesuré : durées de l'import et de la fabrique, en JSON sur la sortie standard
+_PROGRAMME = """
+import json, time
+debut = time.perf_counter()
+import {module} as module
+import_ms = (time.perf_counter() - debut) * 1000
+debut = time.perf_counter()
+if {fabrique!r}:
+    getattr(module, {fabrique!r})()
+print(json.dumps({{"import_ms": import_ms, "fabrique_ms": (time.perf_counter() - debut) * 1000}}))
+"""
+
+
+def mesurer(module: str, fabrique: str) -> dict:
+    """
+    Importe `module` puis appelle sa fabrique (si elle est indiquée) dans un interpréteur neuf avec
+    -X importtime, et retourne les durées totale, d'import et de fabrique (ms) et, par module importé,
+    les durées propre et cumulée (ms)
+    """
+    with tempfile.TemporaryDirectory() as log_dir:
+        debut = time.perf_counter()
+        resultat = subprocess.run(
+            [sys.executable, "-X", "importtime", "-W", "ignore", "-c", _PROGRAMME.format(module=module, fabrique=fabrique)],
+            cwd=RACINE, capture_output=True, text=True, env={**os.environ, "LOG_DIR": log_dir}
+        )
+        duree_totale = (time.perf_counter() - debut) * 1000
+    if resultat.returncode != 0:
+        raise RuntimeError(f"Le démarrage de {module} a échoué :\n{resultat.stderr[-2000:]}")
+
+    modules = {}
+    for ligne in resultat.stderr.splitlines():
+        correspondance = _LIGNE_IMPORTTIME.match(ligne)
+        if correspondance:
+            propre, cumule, _, nom = correspondance.groups()
+            modules[nom] = {"propre_ms": int(propre) / 1000, "cumule_ms": int(cumule) / 1000}
+    etapes = json.loads(resultat.stdout.strip().splitlines()[-1])
+    return {"total_ms": duree_totale, **etapes, "modules": modules}
+
+
+def afficher(titre: str, modules: dict, cle: str, top: int):
+    print(f"\n{titre}")
+    print(f"{'module':<60} {'propre (ms)':>12} {'cumulé (ms)':>12}")
+    for nom, durees in sorted(modules.items(), key=lambda m: m[1][cle], reverse=True)[:top]:
+        print(f"{nom:<60} {durees['propre_ms']:>12.1f} {durees['cumule_ms']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="api.main", help="Module à importer")
+    parser.add_argument("--fabrique", default="create_app", help="Fonction du module qui construit l'application (vide : import seul)")
+    parser.add_argument("--repetitions", type=int, default=3, help="Nombre de démarrages mesurés (médiane retenue)")
+    parser.add_argument("--top", type=int, default=15, help="Nombre de modules affichés par tableau")
+    parser.add_argument("--budget-ms", type=float, help="Budget de démarrage : code de sortie 1 s'il est dépassé")
+    args = parser.parse_args()
+
+    mesures = [mesurer(args.module, args.fabrique) for _ in range(args.repetitions)]
+    mediane = statistics.median(m["total_ms"] for m in mesures)
+    # Détail du dernier démarrage : les caches de bytecode sont chauds, comme au recyclage d'un worker
+    modules = mesures[-1]["modules"]
+
+    modules_api = {nom: d for nom, d in modules.items() if nom == "api" or nom.startswith("api.")}
+    modules_externes = {}
+    for nom, durees in modules.items():
+        if nom.startswith("api"):
+            continue
+        # Regrouper les dépendances par paquet de premier niveau (durée propre additionnée)
+        paquet = nom.split(".")[0]
+        cumul = modules_externes.setdefault(paquet, {"propre_ms": 0.0, "cumule_ms": 0.0})
+        cumul["propre_ms"] += durees["propre_ms"]
+        cumul["cumule_ms"] = max(cumul["cumule_ms"], durees["cumule_ms"])
+
+    afficher("Modules de l'API par durée cumulée", modules_api, "cumule_ms", args.top)
+    afficher("Modules de l'API par durée propre", modules_api, "propre_ms", args.top)
+    afficher("Dépendances par durée propre (par paquet)", modules_externes, "propre_ms", args.top)
+
+    durees = ", ".join(f"{m['total_ms']:.0f}" for m in mesures)
+    print(f"\nimport {args.module} : médiane {statistics.median(m['import_ms'] for m in mesures):.0f} ms")
+    if args.fabrique:
+        print(f"{args.fabrique}() : médiane {statistics.median(m['fabrique_ms'] for m in mesures):.0f} ms")
+    print(f"Démarrage complet : médiane {mediane:.0f} ms sur {args.repetitions} démarrages ({durees} ms)")
+    if args.budget_ms is not None:
+        if mediane > args.budget_ms:
+            print(f"Budget de {args.budget_ms:.0f} ms dépassé")
+            sys.exit(1)
+        print(f"Budget de {args.budget_ms:.0f} ms respecté")
+
+
+if __name__ == "__main__":
+    main()
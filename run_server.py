@@ -8,4 +8,4 @@ if __name__ == "__main__":
     sys.path.insert(0, project_root)
     
     # Run the FastAPI application
-    uvicorn.run("api.main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("api.main:create_app", factory=True, host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
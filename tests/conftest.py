@@ -0,0 +1,84 @@
+"""
+Fixtures des tests adossés à PostgreSQL.
+
+Les triggers plpgsql ne s'exécutent que sur une vraie base : TEST_DATABASE_URL doit désigner une base
+PostgreSQL migrée (`DATABASE_URL=... alembic upgrade head`). Sans cette variable, les tests sont ignorés.
+Chaque test s'exécute dans une transaction annulée à la fin : la base n'est pas modifiée.
+"""
+import os
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL n'est pas définie (base PostgreSQL migrée requise)")
+    # Import complet des modèles : les relations entre modèles sont résolues par nom
+    import api.models  # noqa: F401
+    engine = create_engine(TEST_DATABASE_URL)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """Session liée à une transaction annulée à la fin du test (les commits deviennent des savepoints)"""
+    connexion = engine.connect()
+    transaction = connexion.begin()
+    session = Session(bind=connexion, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connexion.close()
+
+
+def _code() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+@pytest.fixture
+def station_equipee(db):
+    """Compagnie, station, utilisateur, carburant, cuve, pistolet et produit boutique de test"""
+    from api.models import Compagnie, Station, User, Carburant, Cuve, Pistolet, Produit
+    from api.models.pays import Pays
+
+    pays = Pays(nom=f"Pays {_code()}")
+    db.add(pays)
+    db.flush()
+    compagnie = Compagnie(nom=f"Compagnie {_code()}", pays_id=pays.id)
+    db.add(compagnie)
+    db.flush()
+    station = Station(compagnie_id=compagnie.id, nom="Station test", code=_code(), statut="actif")
+    code_utilisateur = _code()
+    utilisateur = User(
+        nom="Test", prenom="Trigger", email=f"{code_utilisateur}@exemple.test", login=code_utilisateur,
+        mot_de_passe_hash="-", role="gerant_compagnie", compagnie_id=compagnie.id
+    )
+    carburant = Carburant(libelle="Gasoil test", code=_code())
+    produit = Produit(nom="Huile test", code=_code(), type="lubrifiant", compagnie_id=compagnie.id)
+    db.add_all([station, utilisateur, carburant, produit])
+    db.flush()
+    cuve = Cuve(
+        station_id=station.id, nom="Cuve test", code=_code(),
+        capacite_maximale=Decimal("50000"), carburant_id=carburant.id
+    )
+    db.add(cuve)
+    db.flush()
+    pistolet = Pistolet(cuve_id=cuve.id, numero="P1")
+    db.add(pistolet)
+    db.flush()
+
+    return SimpleNamespace(
+        compagnie=compagnie, station=station, utilisateur=utilisateur, carburant=carburant,
+        cuve=cuve, pistolet=pistolet, produit=produit
+    )
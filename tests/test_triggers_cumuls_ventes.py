@@ -0,0 +1,125 @@
+"""
+Triggers des cumuls journaliers de ventes (cumul_vente_carburant_jour, cumul_vente_boutique_jour) :
+après des insertions, des ventes antidatées, des annulations et des suppressions, les cumuls tenus à jour
+incrémentalement doivent être ceux que donne reconstruire_cumuls_ventes.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from api.models import Vente, VenteDetail, VenteCarburant
+
+
+def _vente_carburant(db, equipement, quantite, prix, date_vente):
+    vente = VenteCarburant(
+        station_id=equipement.station.id, cuve_id=equipement.cuve.id, pistolet_id=equipement.pistolet.id,
+        quantite_vendue=Decimal(quantite), prix_unitaire=Decimal(prix),
+        montant_total=Decimal(quantite) * Decimal(prix), date_vente=date_vente,
+        index_initial=Decimal("0"), index_final=Decimal(quantite), pompiste="Pompiste test",
+        utilisateur_id=equipement.utilisateur.id, cout_unitaire_cmp=Decimal("550.5")
+    )
+    db.add(vente)
+    db.flush()
+    return vente
+
+
+def _vente_boutique(db, equipement, date_vente, *lignes):
+    vente = Vente(
+        station_id=equipement.station.id, compagnie_id=equipement.compagnie.id, date=date_vente,
+        montant_total=sum(quantite * prix for quantite, prix in lignes), statut="terminee"
+    )
+    db.add(vente)
+    db.flush()
+    details = [_ligne(db, equipement, vente, quantite, prix) for quantite, prix in lignes]
+    return vente, details
+
+
+def _ligne(db, equipement, vente, quantite, prix):
+    detail = VenteDetail(
+        vente_id=vente.id, produit_id=equipement.produit.id, quantite=quantite,
+        prix_unitaire=prix, montant=quantite * prix, cout_unitaire_cmp=Decimal("1200.25")
+    )
+    db.add(detail)
+    db.flush()
+    return detail
+
+
+def _cumuls(db, station_id):
+    """Cumuls de la station, sans les journées vidées par les retraits (que la reconstruction ne crée pas)"""
+    carburant = db.execute(text("""
+        SELECT carburant_id, jour, volume, chiffre_affaires, cout_cmp, nombre_transactions
+        FROM cumul_vente_carburant_jour
+        WHERE station_id = :station_id AND nombre_transactions <> 0
+        ORDER BY carburant_id, jour
+    """), {"station_id": station_id}).all()
+    boutique = db.execute(text("""
+        SELECT produit_id, jour, quantite, chiffre_affaires, cout_cmp, nombre_transactions
+        FROM cumul_vente_boutique_jour
+        WHERE station_id = :station_id AND nombre_transactions <> 0
+        ORDER BY produit_id, jour
+    """), {"station_id": station_id}).all()
+    return carburant, boutique
+
+
+def _reconstruire(db, station_id):
+    db.execute(
+        text("SELECT reconstruire_cumuls_ventes(:station_id, NULL, NULL)"), {"station_id": station_id}
+    )
+
+
+def test_cumuls_carburant_egaux_a_la_reconstruction(db, station_equipee):
+    _vente_carburant(db, station_equipee, "40", "650", datetime(2026, 2, 1, 9))
+    corrigee = _vente_carburant(db, station_equipee, "25", "650", datetime(2026, 2, 1, 15))
+    antidatee = _vente_carburant(db, station_equipee, "60", "655", datetime(2026, 2, 3, 11))
+    annulee = _vente_carburant(db, station_equipee, "30", "655", datetime(2026, 2, 2, 10))
+    supprimee = _vente_carburant(db, station_equipee, "15", "655", datetime(2026, 2, 2, 16))
+
+    antidatee.date_vente = datetime(2026, 2, 1, 18)
+    db.flush()
+    corrigee.quantite_vendue = Decimal("20")
+    corrigee.montant_total = Decimal("13000")
+    db.flush()
+    annulee.statut = "annulée"
+    db.flush()
+    db.delete(supprimee)
+    db.flush()
+
+    station_id = station_equipee.station.id
+    carburant_incremental, _ = _cumuls(db, station_id)
+    _reconstruire(db, station_id)
+    carburant_reconstruit, _ = _cumuls(db, station_id)
+
+    assert carburant_reconstruit == carburant_incremental
+    # Le 2 février ne compte plus aucune vente, le 3 a été vidé par l'antidatage
+    assert [cumul.jour.day for cumul in carburant_incremental] == [1]
+    assert carburant_incremental[0].volume == Decimal("120")
+    assert carburant_incremental[0].nombre_transactions == 3
+
+
+def test_cumuls_boutique_egaux_a_la_reconstruction(db, station_equipee):
+    vente, (ligne_supprimee, _) = _vente_boutique(
+        db, station_equipee, datetime(2026, 2, 1, 9), (2, 3500.0), (3, 3500.0)
+    )
+    antidatee, _ = _vente_boutique(db, station_equipee, datetime(2026, 2, 3, 11), (1, 3500.0))
+    annulee, _ = _vente_boutique(db, station_equipee, datetime(2026, 2, 2, 10), (4, 3400.0))
+    _vente_boutique(db, station_equipee, datetime(2026, 2, 2, 17), (5, 3400.0))
+
+    # Vente antidatée, vente annulée, ligne supprimée puis ajoutée à une vente existante
+    antidatee.date = datetime(2026, 2, 1, 19)
+    db.flush()
+    annulee.statut = "annulee"
+    db.flush()
+    db.delete(ligne_supprimee)
+    db.flush()
+    _ligne(db, station_equipee, vente, 6, 3450.0)
+
+    station_id = station_equipee.station.id
+    _, boutique_incremental = _cumuls(db, station_id)
+    _reconstruire(db, station_id)
+    _, boutique_reconstruit = _cumuls(db, station_id)
+
+    assert boutique_reconstruit == boutique_incremental
+    assert [(cumul.jour.day, cumul.quantite) for cumul in boutique_incremental] == [
+        (1, Decimal("10")), (2, Decimal("5")),
+    ]
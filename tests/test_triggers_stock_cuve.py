@@ -0,0 +1,101 @@
+"""
+Triggers du registre des mouvements de cuve (stock_avant / stock_apres) et des points journaliers
+(point_stock_cuve) : après des insertions, des mouvements antidatés, des annulations et des suppressions,
+l'état tenu à jour incrémentalement doit être celui que donnent les fonctions de reconstruction.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from api.models import MouvementStockCuve
+
+_COLONNES_POINT = (
+    "volume_entree", "volume_sortie", "volume_ajustement", "volume_initialisation",
+    "nombre_entrees", "nombre_sorties", "nombre_ajustements",
+)
+
+
+def _mouvement(db, equipement, type_mouvement, quantite, date_mouvement):
+    mouvement = MouvementStockCuve(
+        cuve_id=equipement.cuve.id, type_mouvement=type_mouvement, quantite=Decimal(quantite),
+        date_mouvement=date_mouvement, utilisateur_id=equipement.utilisateur.id,
+        reference_origine=f"TEST-{type_mouvement}", module_origine="tests"
+    )
+    db.add(mouvement)
+    db.flush()
+    return mouvement
+
+
+def _historique(db, equipement):
+    """Insère, antidate, annule, désactive et supprime des mouvements de la cuve"""
+    _mouvement(db, equipement, "stock_initial", "10000", datetime(2026, 1, 1, 8))
+    entree = _mouvement(db, equipement, "entrée", "5000", datetime(2026, 1, 2, 10))
+    sortie = _mouvement(db, equipement, "sortie", "2000", datetime(2026, 1, 3, 12))
+    tardive = _mouvement(db, equipement, "sortie", "1500", datetime(2026, 1, 4, 9))
+    ajustement = _mouvement(db, equipement, "ajustement_negatif", "200", datetime(2026, 1, 3, 18))
+    _mouvement(db, equipement, "ajustement", "-50", datetime(2026, 1, 5, 7))
+
+    # Mouvement saisi après coup, antidaté avant tous les autres sauf le stock initial
+    _mouvement(db, equipement, "entrée", "3000", datetime(2026, 1, 1, 20))
+
+    # Changement de date et de quantité d'un mouvement existant
+    tardive.date_mouvement = datetime(2026, 1, 2, 7)
+    db.flush()
+    tardive.quantite = Decimal("1800")
+    db.flush()
+
+    entree.statut = "annulé"
+    db.flush()
+    ajustement.est_actif = False
+    db.flush()
+    db.delete(sortie)
+    db.flush()
+
+
+def _soldes(db, cuve_id):
+    return db.execute(text("""
+        SELECT id, stock_avant, stock_apres
+        FROM mouvement_stock_cuve
+        WHERE cuve_id = :cuve_id
+        ORDER BY date_mouvement, created_at, id
+    """), {"cuve_id": cuve_id}).all()
+
+
+def _points(db, cuve_id):
+    """Points de la cuve, sans les journées vidées par les retraits (que la reconstruction ne crée pas)"""
+    lignes = db.execute(text(f"""
+        SELECT date_point, {", ".join(_COLONNES_POINT)}, stock_cloture
+        FROM point_stock_cuve
+        WHERE cuve_id = :cuve_id
+        ORDER BY date_point
+    """), {"cuve_id": cuve_id}).mappings().all()
+    return [dict(ligne) for ligne in lignes if any(ligne[colonne] != 0 for colonne in _COLONNES_POINT)]
+
+
+def test_registre_cuve_egal_au_recalcul_complet(db, station_equipee):
+    _historique(db, station_equipee)
+    cuve_id = station_equipee.cuve.id
+    soldes_incrementaux = _soldes(db, cuve_id)
+
+    # Le recalcul complet retourne le nombre de mouvements dont les soldes étaient faux
+    corriges = db.execute(
+        text("SELECT recalculer_stock_mouvement_cuve(:cuve_id, NULL)"), {"cuve_id": cuve_id}
+    ).scalar_one()
+
+    assert corriges == 0
+    assert _soldes(db, cuve_id) == soldes_incrementaux
+    # stock initial 10000 + entrée antidatée 3000 - sortie déplacée 1800 - ajustement 50
+    assert soldes_incrementaux[-1].stock_apres == Decimal("11150")
+
+
+def test_points_journaliers_egaux_a_la_reconstruction(db, station_equipee):
+    _historique(db, station_equipee)
+    cuve_id = station_equipee.cuve.id
+    points_incrementaux = _points(db, cuve_id)
+
+    db.execute(text("SELECT reconstruire_points_stock_cuve(:cuve_id)"), {"cuve_id": cuve_id})
+
+    assert _points(db, cuve_id) == points_incrementaux
+    # Le dernier point clôture au solde du dernier mouvement du registre
+    assert points_incrementaux[-1]["stock_cloture"] == _soldes(db, cuve_id)[-1].stock_apres